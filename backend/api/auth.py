@@ -1,13 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr
 from typing import List, Optional
 from datetime import datetime, timedelta
 import uuid
 import logging
 
-from models.database import get_db, User, UserSession
+from models.database import get_async_db, User, UserSession
+from core.executors import run_cpu, run_io
+from services.principal_cache_service import principal_cache_service
 from auth.auth_utils import (
     verify_password, get_password_hash, create_access_token,
     get_current_user, get_current_active_user, get_current_admin_user,
@@ -62,7 +65,7 @@ class UserUpdate(BaseModel):
     is_admin: Optional[bool] = None
 
 @router.post("/register", response_model=UserResponse)
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user."""
     # Validate password
     is_valid, error_message = validate_password(user.password)
@@ -73,21 +76,21 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Check if username already exists
-    if db.query(User).filter(User.username == user.username).first():
+    if (await db.execute(select(User.id).where(User.username == user.username))).first():
         raise HTTPException(
             status_code=400,
             detail="Username already registered"
         )
     
     # Check if email already exists
-    if db.query(User).filter(User.email == user.email).first():
+    if (await db.execute(select(User.id).where(User.email == user.email))).first():
         raise HTTPException(
             status_code=400,
             detail="Email already registered"
         )
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await run_cpu(get_password_hash, user.password)
     db_user = User(
         username=user.username,
         email=user.email,
@@ -95,8 +98,8 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return UserResponse(
         id=db_user.id,
@@ -109,12 +112,14 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
     )
 
 @router.post("/login", response_model=Token)
-async def login_user(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login_user(user_credentials: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """Login user and create session."""
     # Find user
-    user = db.query(User).filter(User.username == user_credentials.username).first()
+    user = (await db.execute(select(User).where(User.username == user_credentials.username))).scalars().first()
     
-    if not user or not verify_password(user_credentials.password, user.hashed_password):
+    # bcrypt takes a few hundred milliseconds; keep it off the event loop
+    password_ok = user is not None and await run_cpu(verify_password, user_credentials.password, user.hashed_password)
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -136,11 +141,12 @@ async def login_user(user_credentials: UserLogin, db: Session = Depends(get_db))
     )
     
     # Create or refresh user session (idempotent per tenant_id)
-    session_token = create_user_session(user.id, tenant_id, db)
+    session_token = await create_user_session(user.id, tenant_id, db)
     
     # Update last login
     user.last_login = datetime.utcnow()
-    db.commit()
+    await db.commit()
+    await run_io(principal_cache_service.invalidate, user.username)
     
     return Token(
         access_token=access_token,
@@ -158,7 +164,7 @@ async def login_user(user_credentials: UserLogin, db: Session = Depends(get_db))
     )
 
 @router.post("/login/azure-ad", response_model=Token)
-async def login_azure_ad(azure_login: AzureADLogin, db: Session = Depends(get_db)):
+async def login_azure_ad(azure_login: AzureADLogin, db: AsyncSession = Depends(get_async_db)):
     """
     Login user via Azure AD (OAuth2).
     Creates or updates user based on email and account_id.
@@ -167,7 +173,7 @@ async def login_azure_ad(azure_login: AzureADLogin, db: Session = Depends(get_db
     email = azure_login.email.lower()
     
     # Try to find existing user by email
-    user = db.query(User).filter(User.email == email).first()
+    user = (await db.execute(select(User).where(User.email == email))).scalars().first()
     
     if not user:
         # Create new Azure AD user
@@ -177,13 +183,13 @@ async def login_azure_ad(azure_login: AzureADLogin, db: Session = Depends(get_db
         
         # Ensure unique username
         counter = 1
-        while db.query(User).filter(User.username == username).first():
+        while (await db.execute(select(User.id).where(User.username == username))).first():
             username = f"{username_base}{counter}"
             counter += 1
         
         # Azure AD users don't have a password, use a placeholder
         placeholder_password = str(uuid.uuid4())
-        hashed_password = get_password_hash(placeholder_password)
+        hashed_password = await run_cpu(get_password_hash, placeholder_password)
         
         user = User(
             username=username,
@@ -194,8 +200,8 @@ async def login_azure_ad(azure_login: AzureADLogin, db: Session = Depends(get_db
         )
         
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
     
     # Ensure user is active
     if not user.is_active:
@@ -213,11 +219,12 @@ async def login_azure_ad(azure_login: AzureADLogin, db: Session = Depends(get_db
     )
     
     # Create or refresh user session
-    session_token = create_user_session(user.id, tenant_id, db)
+    session_token = await create_user_session(user.id, tenant_id, db)
     
     # Update last login
     user.last_login = datetime.utcnow()
-    db.commit()
+    await db.commit()
+    await run_io(principal_cache_service.invalidate, user.username)
     
     return Token(
         access_token=access_token,
@@ -235,7 +242,7 @@ async def login_azure_ad(azure_login: AzureADLogin, db: Session = Depends(get_db
     )
 
 @router.post("/login/epic", response_model=Token)
-async def login_epic(epic_login: EpicLogin, db: Session = Depends(get_db)):
+async def login_epic(epic_login: EpicLogin, db: AsyncSession = Depends(get_async_db)):
     """
     Login user via Epic OAuth2.
     Exchanges authorization code for access token and user info from Epic.
@@ -318,7 +325,8 @@ async def login_epic(epic_login: EpicLogin, db: Session = Depends(get_db)):
             token_data['client_secret'] = epic_client_secret
 
         # Allow more time for Epic token endpoint (timeouts have been observed)
-        token_response = requests.post(
+        token_response = await run_io(
+            requests.post,
             epic_token_url,
             data=token_data,
             headers={'Content-Type': 'application/x-www-form-urlencoded'},
@@ -389,7 +397,8 @@ async def login_epic(epic_login: EpicLogin, db: Session = Depends(get_db)):
             # If JWT decode fails, try userinfo endpoint
             try:
                 userinfo_url = os.getenv('EPIC_USERINFO_URL', 'https://fhir.epic.com/interconnect-fhir-oauth/api/FHIR/R4/metadata')
-                userinfo_response = requests.get(
+                userinfo_response = await run_io(
+                    requests.get,
                     userinfo_url,
                     headers={'Authorization': f'Bearer {access_token}'},
                     timeout=10
@@ -421,7 +430,7 @@ async def login_epic(epic_login: EpicLogin, db: Session = Depends(get_db)):
         is_admin_user = email in [e.lower() for e in admin_emails]
         
         # Try to find existing user by email
-        user = db.query(User).filter(User.email == email).first()
+        user = (await db.execute(select(User).where(User.email == email))).scalars().first()
         
         if not user:
             # Create new Epic user
@@ -430,13 +439,13 @@ async def login_epic(epic_login: EpicLogin, db: Session = Depends(get_db)):
             
             # Ensure unique username
             counter = 1
-            while db.query(User).filter(User.username == username).first():
+            while (await db.execute(select(User.id).where(User.username == username))).first():
                 username = f"{username_base}{counter}"
                 counter += 1
             
             # Epic users don't have a password, use a placeholder
             placeholder_password = str(uuid.uuid4())
-            hashed_password = get_password_hash(placeholder_password)
+            hashed_password = await run_cpu(get_password_hash, placeholder_password)
             
             user = User(
                 username=username,
@@ -447,8 +456,8 @@ async def login_epic(epic_login: EpicLogin, db: Session = Depends(get_db)):
             )
             
             db.add(user)
-            db.commit()
-            db.refresh(user)
+            await db.commit()
+            await db.refresh(user)
         
         # Ensure user is active
         if not user.is_active:
@@ -466,11 +475,12 @@ async def login_epic(epic_login: EpicLogin, db: Session = Depends(get_db)):
         )
         
         # Create or refresh user session
-        session_token = create_user_session(user.id, tenant_id, db)
+        session_token = await create_user_session(user.id, tenant_id, db)
         
         # Update last login
         user.last_login = datetime.utcnow()
-        db.commit()
+        await db.commit()
+        await run_io(principal_cache_service.invalidate, user.username)
         
         # Return both local access token and Epic FHIR token for write operations
         return Token(
@@ -499,12 +509,12 @@ async def login_epic(epic_login: EpicLogin, db: Session = Depends(get_db)):
 @router.post("/logout")
 async def logout_user(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Logout user and deactivate session."""
     # Deactivate all sessions for this user
-    db.query(UserSession).filter(UserSession.user_id == current_user.id).update({"is_active": False})
-    db.commit()
+    await db.execute(update(UserSession).where(UserSession.user_id == current_user.id).values(is_active=False))
+    await db.commit()
     
     return {"message": "Successfully logged out"}
 
@@ -524,10 +534,10 @@ async def get_current_user_info(current_user: User = Depends(get_current_active_
 @router.get("/users", response_model=List[UserResponse])
 async def get_all_users(
     current_user: User = Depends(get_authorized_email_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all users (restricted to authorized email addresses only)."""
-    users = db.query(User).all()
+    users = (await db.execute(select(User))).scalars().all()
     return [
         UserResponse(
             id=user.id,
@@ -546,12 +556,13 @@ async def update_user(
     user_id: int,
     user_update: UserUpdate,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update user (admin only)."""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    previous_username = user.username
     
     # Update fields
     if user_update.username is not None:
@@ -559,14 +570,16 @@ async def update_user(
     if user_update.email is not None:
         user.email = user_update.email
     if user_update.password is not None:
-        user.hashed_password = get_password_hash(user_update.password)
+        user.hashed_password = await run_cpu(get_password_hash, user_update.password)
     if user_update.is_active is not None:
         user.is_active = user_update.is_active
     if user_update.is_admin is not None:
         user.is_admin = user_update.is_admin
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    # Drop the cached principal so the change (e.g. deactivation) applies to the next request
+    await run_io(principal_cache_service.invalidate, previous_username, user.username)
     
     return UserResponse(
         id=user.id,
@@ -582,35 +595,36 @@ async def update_user(
 async def delete_user(
     user_id: int,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete user (admin only)."""
     if user_id == current_user.id:
         raise HTTPException(status_code=400, detail="Cannot delete your own account")
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Deactivate all sessions for this user
-    db.query(UserSession).filter(UserSession.user_id == user_id).update({"is_active": False})
+    await db.execute(update(UserSession).where(UserSession.user_id == user_id).values(is_active=False))
     
     # Delete user
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
+    await run_io(principal_cache_service.invalidate, user.username)
     
     return {"message": "User deleted successfully"}
 
 @router.get("/sessions")
 async def get_user_sessions(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get current user's active sessions."""
-    sessions = db.query(UserSession).filter(
+    sessions = (await db.execute(select(UserSession).where(
         UserSession.user_id == current_user.id,
         UserSession.is_active == True
-    ).all()
+    ))).scalars().all()
     
     return [
         {
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Response, Depends, Body
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Response, Depends, Body, Header
 from fastapi.responses import StreamingResponse
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import logging
 import asyncio
 import json
@@ -22,14 +22,29 @@ from utility.config import setup_logging
 from core.enhanced_text_processor import EnhancedTextProcessor
 from core.excel_exporter import ExcelExporter
 from auth.auth_utils import get_current_active_user
-from models.database import User, get_db, ProcessedFile
-from sqlalchemy.orm import Session
+from models.database import User, ProcessedFile, AsyncSessionLocal
+from sqlalchemy import select
 from services.azure_blob_service import AzureBlobService
+from services.async_azure_blob_service import async_blob_service
+from services.blob_catalog_service import blob_catalog_service
+from services.processed_json_format import is_compact_metadata, DETAIL_FIELDS
 from services.template_mapper import TemplateMapper
 from services.epic_fhir_service import EpicFHIRService
-from core.celery_tasks import process_document, process_batch_documents
+from services.single_flight_service import single_flight_service
+from services.fair_scheduler import fair_scheduler, LANE_INTERACTIVE
+from services.task_events_service import task_events_service
+from services.result_store_service import result_store_service, INCLUDE_OPTIONS
+from services.processed_result_service import processed_result_service
+from services.analysis_cache_service import analysis_cache_service
+from services.processing_history_service import processing_history_service
+from core.celery_tasks import process_batch_documents, submit_process_document
 from core.celery_app import celery_app
+from core.executors import run_db, run_cpu, run_io, render_metrics
+from utility.upload_spool import SpooledUpload, UploadTooLargeError, spool_upload
+from utility.json_response import json_response, dumps_json
+from utility.byte_range import RangeNotSatisfiableError, parse_range_header
 import base64
+import hmac
 
 # logging
 logger = setup_logging()
@@ -40,6 +55,22 @@ async def health_check():
     """Lightweight health endpoint for container orchestration."""
     return {"status": "ok"}
 
+# Bearer token scrapers must send to /metrics (the endpoint is disabled while unset)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+def verify_metrics_token(authorization: Optional[str] = Header(None)) -> None:
+    """Allow /metrics only with the configured METRICS_TOKEN."""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+
+@router.get("/metrics", dependencies=[Depends(verify_metrics_token)])
+async def metrics():
+    """Event-loop lag and executor usage in Prometheus text format."""
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4")
+
 @router.get("/epic/status")
 async def epic_status_check():
     """Check Epic FHIR service configuration status."""
@@ -60,7 +91,7 @@ async def epic_status_check():
         
         # Try to get an access token
         if epic_service.is_available():
-            token = epic_service._get_access_token()
+            token = await run_io(epic_service._get_access_token)
             status["can_get_token"] = bool(token)
             # SECURITY: Never expose access tokens, even partially
             # Removed token_preview to prevent credential leakage
@@ -86,7 +117,7 @@ async def get_epic_jwks():
     """
     try:
         epic_service = EpicFHIRService()
-        jwks = epic_service.get_jwks()
+        jwks = await run_cpu(epic_service.get_jwks)
         
         if not jwks:
             return Response(
@@ -132,6 +163,16 @@ def check_blob_access(blob_name: str, current_user: User) -> bool:
     
     return any(decoded_blob_name.startswith(prefix) for prefix in allowed_prefixes)
 
+def enforce_admission(tenant_id: str, lane: str, incoming: int = 1) -> None:
+    """Reject with 429 and Retry-After if the tenant's backlog in this lane is over its quota."""
+    allowed, retry_after = fair_scheduler.check_admission(tenant_id, lane, incoming)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many documents are queued for processing. Please retry in {retry_after} seconds.",
+            headers={"Retry-After": str(retry_after)}
+        )
+
 # Multi-tenancy support
 import uuid
 from datetime import datetime
@@ -141,6 +182,19 @@ BACKEND_DIR = Path(__file__).parent.parent
 DATA_DIR = BACKEND_DIR / "data"
 TENANTS_BASE_DIR = (DATA_DIR / "tenants").resolve()
 
+# Files of synchronous batches processed at the same time per API worker (OCR calls / LLM calls)
+BATCH_OCR_CONCURRENCY = int(os.getenv("BATCH_OCR_CONCURRENCY", "4"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+_batch_semaphores = None  # (loop, OCR semaphore, LLM semaphore), created on first use
+
+def get_batch_semaphores() -> Tuple[asyncio.Semaphore, asyncio.Semaphore]:
+    """Get the OCR and LLM semaphores shared by all synchronous batches on the running loop."""
+    global _batch_semaphores
+    loop = asyncio.get_running_loop()
+    if _batch_semaphores is None or _batch_semaphores[0] is not loop:
+        _batch_semaphores = (loop, asyncio.Semaphore(BATCH_OCR_CONCURRENCY), asyncio.Semaphore(BATCH_LLM_CONCURRENCY))
+    return _batch_semaphores[1], _batch_semaphores[2]
+
 def validate_tenant_id(tenant_id: str) -> str:
     """Validate and sanitize tenant_id to prevent path traversal attacks.
     
@@ -195,84 +249,67 @@ def get_tenant_dir(validated_tenant_id: str) -> Path:
     return tenant_dir
 
 
-def load_tenant_history(tenant_id: str) -> List[Dict[str, Any]]:
-    """Load processing history for a specific tenant from data folder."""
-    # Validate tenant_id to prevent path traversal
-    try:
-        validated_tenant_id = validate_tenant_id(tenant_id)
-    except ValueError as e:
-        logger.error(f"Invalid tenant_id in load_tenant_history: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
-    
-    # Compute a safe tenant directory based on backend data directory
-    try:
-        tenant_dir = get_tenant_dir(validated_tenant_id)
-    except HTTPException:
-        # get_tenant_dir already logged the error with details
-        raise
-    
-    history_file = tenant_dir / "processing_history.json"
+def import_legacy_history(tenant_id: str) -> int:
+    """
+    Import a tenant's legacy processing_history.json from the data folder into the database.
     
-    # Create directory if it doesn't exist
-    tenant_dir.mkdir(parents=True, exist_ok=True)
+    The file is renamed to processing_history.json.migrated afterwards, so this is a cheap
+    existence check once the tenant has been migrated.
     
-    if history_file.exists():
-        try:
-            with open(history_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError) as e:
-            logger.error(f"Error loading history for tenant {validated_tenant_id}: {e}")
-            return []
-    return []
-
-def save_tenant_history(tenant_id: str, history: List[Dict[str, Any]]):
-    """Save processing history for a specific tenant to data folder."""
+    Returns:
+        Number of entries imported
+    """
     # Validate tenant_id to prevent path traversal
     try:
         validated_tenant_id = validate_tenant_id(tenant_id)
     except ValueError as e:
-        logger.error(f"Invalid tenant_id in save_tenant_history: {e}")
+        logger.error(f"Invalid tenant_id in import_legacy_history: {e}")
         raise HTTPException(status_code=400, detail=str(e))
     
-    # Use absolute path based on backend directory
-    tenant_dir = DATA_DIR / "tenants" / validated_tenant_id
-    history_file = tenant_dir / "processing_history.json"
-    
-    # Verify the resolved path is within the expected directory (defense in depth)
-    try:
-        history_file_resolved = history_file.resolve()
-        expected_base = (DATA_DIR / "tenants").resolve()
-        # Ensure history_file_resolved is within expected_base
-        try:
-            # Python 3.9+: use Path.is_relative_to for a clear containment check
-            is_relative = history_file_resolved.is_relative_to(expected_base)  # type: ignore[attr-defined]
-        except AttributeError:
-            # Fallback for Python < 3.9: compare commonpath of the string forms
-            common_base = os.path.commonpath(
-                [str(history_file_resolved), str(expected_base)]
-            )
-            is_relative = common_base == str(expected_base)
-        
-        if not is_relative:
-            raise ValueError(f"Path traversal attempt detected: {tenant_id}")
-    except (ValueError, OSError) as e:
-        logger.error(f"Path validation failed for tenant {tenant_id}: {e}")
-        raise HTTPException(status_code=400, detail="Invalid tenant path")
+    history_file = get_tenant_dir(validated_tenant_id) / "processing_history.json"
+    if not history_file.exists():
+        return 0
     
-    # Create directory if it doesn't exist
     try:
-        tenant_dir.mkdir(parents=True, exist_ok=True)
-    except OSError as e:
-        logger.error(f"Error creating directory {tenant_dir} for tenant {validated_tenant_id}: {e}")
-        raise
+        with open(history_file, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        logger.error(f"Error loading legacy history for tenant {validated_tenant_id}: {e}")
+        return 0
     
+    imported = processing_history_service.import_entries(validated_tenant_id, entries if isinstance(entries, list) else [])
+    history_file.replace(history_file.with_name("processing_history.json.migrated"))
+    logger.info(f"Imported {imported} legacy history entries for tenant {validated_tenant_id}")
+    return imported
+
+def check_tenant_access(tenant_id: str, current_user: User) -> None:
+    """Reject with 403 unless the user belongs to the tenant or is an admin."""
+    if not current_user.is_admin and tenant_id != getattr(current_user, "tenant_id", None):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+def parse_list_param(value: Optional[str]) -> Optional[List[str]]:
+    """Split a comma-separated parameter (None if the parameter was not given)."""
+    if value is None:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def parse_include_param(include: Optional[str]) -> Optional[List[str]]:
+    """Parse an include= parameter, rejecting unknown parts with 400."""
+    parts = parse_list_param(include)
+    unknown = [part for part in parts or [] if part not in INCLUDE_OPTIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown include value(s): {', '.join(unknown)}. Allowed: {', '.join(INCLUDE_OPTIONS)}"
+        )
+    return parts
+
+async def ingest_upload(file: UploadFile) -> SpooledUpload:
+    """Spool an uploaded file, answering 413 if it exceeds the file size limit."""
     try:
-        with open(history_file, 'w', encoding='utf-8') as f:
-            json.dump(history, f, indent=2, ensure_ascii=False)
-        logger.info(f"Successfully saved {len(history)} history entries to {history_file}")
-    except (IOError, OSError, json.JSONEncodeError) as e:
-        logger.error(f"Error saving history for tenant {validated_tenant_id} to {history_file}: {e}")
-        raise
+        return await spool_upload(file)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
 @router.post("/ocr/enhanced/process")
 async def process_enhanced_ocr(
@@ -283,8 +320,10 @@ async def process_enhanced_ocr(
     include_raw_text: bool = Form(True, description="Include raw OCR text in response"),
     include_metadata: bool = Form(True, description="Include processing metadata"),
     use_blob_workflow: bool = Form(True, description="Use source → process → processed workflow"),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Form(None, description="Comma-separated top-level fields to return"),
+    include: Optional[str] = Form(None, description="Heavy parts to return: ocr_detail, source_file (default: all)"),
+    accept_encoding: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_active_user)
 ) -> Dict[str, Any]:
     """
     Process uploaded file with enhanced OCR and AI-powered key-value extraction.
@@ -295,8 +334,16 @@ async def process_enhanced_ocr(
     - Optional template-based structured extraction
     - Document classification and summarization
     - Multi-tenant data isolation
+    
+    With include= set, OCR detail and the source file are only returned if named there;
+    otherwise the response links to /results/{processing_id}/ocr-detail and /source-file.
     """
+    owns_flight = False
+    upload = None
     try:
+        selected_fields = parse_list_param(fields)
+        selected_parts = parse_include_param(include)
+        
         # Validate file type
         allowed_types = ["application/pdf", "image/png", "image/jpeg", "image/jpg"]
         if file.content_type not in allowed_types:
@@ -307,9 +354,9 @@ async def process_enhanced_ocr(
         
         logger.info(f"Processing enhanced OCR for {file.filename} with preprocessing: {apply_preprocessing}, quality enhancement: {enhance_quality}")
         
-        # Read file data
-        file_data = await file.read()
-        logger.info(f"Read file data: {len(file_data)} bytes for {file.filename}")
+        # Spool the upload (hashed while it is read; oversized files are rejected early)
+        upload = await ingest_upload(file)
+        logger.info(f"Received {upload.size} bytes for {file.filename}")
         
         # Generate processing ID and tenant ID
         processing_id = str(uuid.uuid4())
@@ -317,13 +364,15 @@ async def process_enhanced_ocr(
         
         # ===== DEDUPLICATION CHECK (INFO ONLY - NO LONGER BLOCKS PROCESSING) =====
         # Check if this exact file has already been processed (for logging only)
-        import hashlib
-        file_hash = hashlib.sha256(file_data).hexdigest()
+        file_hash = upload.sha256
         
-        existing_file = db.query(ProcessedFile).filter(
-            ProcessedFile.file_hash == file_hash,
-            ProcessedFile.tenant_id == tenant_id
-        ).first()
+        async with AsyncSessionLocal() as session:
+            existing_file = (await session.execute(
+                select(ProcessedFile.processing_id, ProcessedFile.created_at).where(
+                    ProcessedFile.file_hash == file_hash,
+                    ProcessedFile.tenant_id == tenant_id
+                )
+            )).first()
         
         if existing_file:
             logger.info(f"⚠️ DUPLICATE FILE DETECTED: {file.filename} (hash: {file_hash[:16]}...)")
@@ -334,37 +383,40 @@ async def process_enhanced_ocr(
             logger.info(f"✓ New file detected: {file.filename} (hash: {file_hash[:16]}...)")
         # ===== END DEDUPLICATION CHECK =====
         
-        # Step 1: Upload to source folder if using blob workflow
+        # ===== SINGLE-FLIGHT: collapse concurrent uploads of the same file =====
+        owns_flight, flight_owner = await run_io(single_flight_service.acquire, tenant_id, file_hash, {
+            "token": processing_id,
+            "processing_id": processing_id,
+            "filename": file.filename,
+            "template_id": template_id
+        })
+        # Only reuse results from another synchronous request with the same template
+        # (Celery task results have a different response shape)
+        if (not owns_flight and flight_owner and not flight_owner.get("task_id")
+                and flight_owner.get("template_id") == template_id):
+            logger.info(f"⏳ Identical upload already in flight (processing ID: {flight_owner.get('processing_id')}) - waiting for its result")
+            shared_receipt = await run_io(single_flight_service.wait_for_result, tenant_id, file_hash,
+                                          flight_owner.get("token"))
+            shared_result = None
+            if result_store_service.is_receipt(shared_receipt):
+                shared_result = await run_io(result_store_service.load_full_result, shared_receipt)
+            if shared_result:
+                shared_result["deduplicated"] = True
+                shared_result["deduplicated_from"] = flight_owner.get("processing_id")
+                return await run_cpu(
+                    json_response,
+                    result_store_service.shape_result(shared_result, selected_fields, selected_parts),
+                    accept_encoding
+                )
+            logger.info(f"In-flight upload finished without a result - processing {file.filename} normally")
+        # ===== END SINGLE-FLIGHT =====
+        
+        # Step 1: The source file is uploaded once, after OCR, straight to its confidence folder
         source_blob_info = None
-        if use_blob_workflow:
-            try:
-                blob_service = AzureBlobService()
-                if blob_service.is_available():
-                    source_blob_info = blob_service.upload_source_document(
-                        file_data=file_data,
-                        filename=file.filename or "unknown",
-                        tenant_id=tenant_id,
-                        processing_id=processing_id,
-                        content_type=file.content_type or "application/octet-stream",
-                        skip_duplicate_check=True  # Always upload to blob, even for duplicates
-                    )
-                    
-                    if not source_blob_info.get("success"):
-                        logger.warning(f"Failed to upload to source folder: {source_blob_info.get('error')}")
-                        # Continue with direct processing if source upload fails
-                    else:
-                        logger.info(f"File uploaded to source folder: {source_blob_info['blob_path']}")
-                else:
-                    logger.info("Azure Blob Storage not available - skipping source upload")
-                    source_blob_info = {"success": False, "error": "Azure Blob Storage not available", "skipped": True}
-                    
-            except Exception as e:
-                logger.warning(f"Azure Blob Storage error (non-critical): {e}")
-                source_blob_info = {"success": False, "error": "Azure Blob Storage error", "skipped": True}
         
-        # Step 2: Process with Azure Computer Vision OCR
+        # Step 2: Process with Azure Computer Vision OCR (streamed from the spool, not copied into memory)
         result = await ocr_from_path(
-            file_data=file_data,
+            file_data=upload.open(),
             original_filename=file.filename or "unknown",
             ocr_engine="azure_computer_vision",
             ground_truth="",
@@ -379,7 +431,7 @@ async def process_enhanced_ocr(
         if template_id:
             # Load template and process with template
             template_mapper = TemplateMapper()
-            tenant_template = template_mapper.get_template(template_id, current_user.tenant_id)
+            tenant_template = await run_io(template_mapper.get_template, template_id, current_user.tenant_id)
             if not tenant_template:
                 raise HTTPException(status_code=404, detail="Template not found for tenant")
             
@@ -408,7 +460,8 @@ async def process_enhanced_ocr(
             
             # Create mapping status/metrics based on LLM output
             document_id = str(uuid.uuid4())
-            mapping_result = template_mapper.map_document_to_template(
+            mapping_result = await run_io(
+                template_mapper.map_document_to_template,
                 template_id=template_id,
                 tenant_id=current_user.tenant_id,
                 extracted_data=processing_result.key_value_pairs,
@@ -426,8 +479,9 @@ async def process_enhanced_ocr(
             mapping_result = None
             logger.info(f"Processed without template: {len(processing_result.key_value_pairs)} fields extracted")
         
-        # Document classification
-        document_classification = text_processor.classify_document_type(
+        # Document classification (blocking LLM call)
+        document_classification = await run_io(
+            text_processor.classify_document_type,
             ocr_text=result.get("combined_text", "")
         )
         
@@ -435,7 +489,8 @@ async def process_enhanced_ocr(
         ocr_confidence_score = calculate_ocr_confidence(result)
         
         # Calculate confidence scores for each key-value pair
-        kv_confidence_scores = calculate_key_value_pair_confidence_scores(
+        kv_confidence_scores = await run_cpu(
+            calculate_key_value_pair_confidence_scores,
             key_value_pairs=processing_result.key_value_pairs,
             ocr_result=result,
             raw_ocr_text=result.get("combined_text", "")
@@ -453,38 +508,45 @@ async def process_enhanced_ocr(
                     low_confidence_pairs[key] = value
                     low_confidence_scores_filtered[key] = normalized_conf
         
-        # Store file as base64 for later low-confidence analysis
-        file_base64 = base64.b64encode(file_data).decode('utf-8')
+        # Store file as base64 for later low-confidence analysis (only returned with low-confidence pairs)
+        file_base64 = None
+        if low_confidence_pairs:
+            file_bytes = await run_io(upload.read_bytes)
+            file_base64 = await run_cpu(lambda: base64.b64encode(file_bytes).decode('utf-8'))
+            del file_bytes
         
         # Log low-confidence pairs count
         if low_confidence_pairs:
             logger.info(f"Identified {len(low_confidence_pairs)} low-confidence pairs for {file.filename} - ready for manual analysis")
         
-        # Reorganize source file based on confidence score if it was uploaded
-        # FIRST check the confidence score, THEN move the file to the correct folder
-        if source_blob_info and source_blob_info.get("success") and source_blob_info.get("blob_path"):
-            logger.info(f"[CHECK] Checking confidence score for source file: {ocr_confidence_score}")
+        # Upload source file now that the confidence score (and so the target folder) is known
+        if use_blob_workflow:
             try:
                 blob_service = AzureBlobService()
                 if blob_service.is_available():
-                    new_blob_path = blob_service.reorganize_source_file_by_confidence(
-                        blob_path=source_blob_info["blob_path"],
+                    source_blob_info = await run_io(
+                        blob_service.upload_source_document,
+                        file_data=upload.open(),
+                        size_bytes=upload.size,
+                        filename=file.filename or "unknown",
                         tenant_id=tenant_id,
                         processing_id=processing_id,
-                        filename=file.filename or "unknown",
-                        confidence_score=ocr_confidence_score
+                        content_type=file.content_type or "application/octet-stream",
+                        confidence_score=ocr_confidence_score,
+                        skip_duplicate_check=True  # Always upload to blob, even for duplicates
                     )
-                    if new_blob_path:
-                        source_blob_info["blob_path"] = new_blob_path
-                        logger.info(f"[SUCCESS] Reorganized source file to: {new_blob_path}")
+                    
+                    if not source_blob_info.get("success"):
+                        logger.warning(f"Failed to upload to source folder: {source_blob_info.get('error')}")
                     else:
-                        logger.warning(f"[WARNING] Failed to reorganize source file - returned None")
+                        logger.info(f"File uploaded to source folder: {source_blob_info['blob_path']}")
                 else:
-                    logger.warning(f"[WARNING] Azure Blob Storage not available for reorganization")
+                    logger.info("Azure Blob Storage not available - skipping source upload")
+                    source_blob_info = {"success": False, "error": "Azure Blob Storage not available", "skipped": True}
+                    
             except Exception as e:
-                logger.error(f"[ERROR] Failed to reorganize source file by confidence: {e}")
-                import traceback
-                logger.error(f"Traceback: {traceback.format_exc()}")
+                logger.warning(f"Azure Blob Storage error (non-critical): {e}")
+                source_blob_info = {"success": False, "error": "Azure Blob Storage error", "skipped": True}
         
         # Calculate total processing time (OCR + extraction)
         ocr_time = result.get("processing_time_seconds", 0) or result.get("processing_time", 0)
@@ -504,7 +566,7 @@ async def process_enhanced_ocr(
                     "file_info": {
                         "filename": file.filename,
                         "content_type": file.content_type,
-                        "size_bytes": len(file_data),
+                        "size_bytes": upload.size,
                         "pages_processed": len(result.get("raw_ocr_results", []))
                     },
                     "key_value_pairs": processing_result.key_value_pairs,
@@ -528,11 +590,13 @@ async def process_enhanced_ocr(
                     } if include_metadata else None
                 }
                 
-                json_upload_result = blob_service.upload_processed_json(
+                json_upload_result = await run_io(
+                    blob_service.upload_processed_json,
                     json_data=processed_json_data,
                     filename=file.filename or "unknown",
                     tenant_id=tenant_id,
-                    processing_id=processing_id
+                    processing_id=processing_id,
+                    source_blob_path=source_blob_info.get("blob_path") if source_blob_info and source_blob_info.get("success") else None
                 )
                 
                 if json_upload_result.get("success"):
@@ -551,7 +615,8 @@ async def process_enhanced_ocr(
         try:
             from services.null_field_service import null_field_service
             logger.info(f"Storing null field tracking for {file.filename}...")
-            null_field_service.store_null_fields(
+            await run_db(
+                null_field_service.store_null_fields,
                 processing_id=processing_id,
                 tenant_id=tenant_id,
                 filename=file.filename or "unknown",
@@ -561,59 +626,24 @@ async def process_enhanced_ocr(
             logger.error(f"✗ Failed to store null field tracking: {null_error}")
 
         # Store processed file data in database
+        persisted_in_db = False
         try:
             # Get unique_file_id from json_upload_result if available, otherwise use processing_id
             unique_file_id = json_upload_result.get("blob_path") if json_upload_result and json_upload_result.get("success") else processing_id
             
-            # Calculate file hash for deduplication
-            import hashlib
-            file_hash = hashlib.sha256(file_data).hexdigest()
+            # file_hash was computed for the deduplication check above
+            async with AsyncSessionLocal() as session:
+                # Check if file already exists in database (by file_hash to prevent duplicates)
+                existing_file = (await session.execute(
+                    select(ProcessedFile).where(ProcessedFile.file_hash == file_hash)
+                )).scalars().first()
             
-            # Check if file already exists in database (by file_hash to prevent duplicates)
-            existing_file = db.query(ProcessedFile).filter(
-                ProcessedFile.file_hash == file_hash
-            ).first()
-            
-            if existing_file:
-                # Update existing entry
-                existing_file.processing_id = unique_file_id
-                existing_file.processed_blob_path = unique_file_id if json_upload_result and json_upload_result.get("success") else None
-                existing_file.source_blob_path = source_blob_info.get("blob_path") if source_blob_info and source_blob_info.get("success") else None
-                existing_file.processed_data = {
-                    "key_value_pairs": processing_result.key_value_pairs,
-                    "key_value_pair_confidence_scores": kv_confidence_scores,
-                    "summary": processing_result.summary,
-                    "confidence_score": processing_result.confidence_score,
-                    "ocr_confidence_score": ocr_confidence_score,
-                    "document_classification": document_classification,
-                    "processing_info": {
-                        "processing_time": total_processing_time,
-                        "ocr_time": ocr_time,
-                        "extraction_time": extraction_time,
-                        "preprocessing_applied": apply_preprocessing,
-                        "quality_enhanced": enhance_quality,
-                        "extraction_method": "Template-based AI extraction" if template_id else ("AI-powered" if text_processor.is_available() else "Basic pattern matching")
-                    },
-                    "metadata": {
-                        "extraction_timestamp": datetime.now().isoformat(),
-                        "text_length": len(result.get("combined_text", "")),
-                        "ai_processing": text_processor.is_available()
-                    } if include_metadata else None
-                }
-                existing_file.ocr_confidence_score = str(ocr_confidence_score) if ocr_confidence_score else None
-                existing_file.processing_time = str(total_processing_time) if total_processing_time else None
-                existing_file.updated_at = datetime.utcnow()
-                logger.info(f"💾 Updated existing processed file entry for {file.filename} (hash: {file_hash[:16]}...)")
-            else:
-                # Create new entry
-                new_processed_file = ProcessedFile(
-                    file_hash=file_hash,
-                    processing_id=unique_file_id,
-                    tenant_id=tenant_id,
-                    filename=file.filename or "unknown",
-                    source_blob_path=source_blob_info.get("blob_path") if source_blob_info and source_blob_info.get("success") else None,
-                    processed_blob_path=unique_file_id if json_upload_result and json_upload_result.get("success") else None,
-                    processed_data={
+                if existing_file:
+                    # Update existing entry
+                    existing_file.processing_id = unique_file_id
+                    existing_file.processed_blob_path = unique_file_id if json_upload_result and json_upload_result.get("success") else None
+                    existing_file.source_blob_path = source_blob_info.get("blob_path") if source_blob_info and source_blob_info.get("success") else None
+                    existing_file.processed_data = {
                         "key_value_pairs": processing_result.key_value_pairs,
                         "key_value_pair_confidence_scores": kv_confidence_scores,
                         "summary": processing_result.summary,
@@ -633,28 +663,65 @@ async def process_enhanced_ocr(
                             "text_length": len(result.get("combined_text", "")),
                             "ai_processing": text_processor.is_available()
                         } if include_metadata else None
-                    },
-                    ocr_confidence_score=str(ocr_confidence_score) if ocr_confidence_score else None,
-                    processing_time=str(total_processing_time) if total_processing_time else None,
-                    created_at=datetime.utcnow()
-                )
-                db.add(new_processed_file)
-                logger.info(f"💾 Created new processed file entry for {file.filename} (hash: {file_hash[:16]}...)")
+                    }
+                    existing_file.ocr_confidence_score = str(ocr_confidence_score) if ocr_confidence_score else None
+                    existing_file.processing_time = str(total_processing_time) if total_processing_time else None
+                    existing_file.updated_at = datetime.utcnow()
+                    # Full rewrite: ETags taken from the previous document no longer match
+                    existing_file.version = ProcessedFile.version + 1
+                    logger.info(f"💾 Updated existing processed file entry for {file.filename} (hash: {file_hash[:16]}...)")
+                else:
+                    # Create new entry
+                    new_processed_file = ProcessedFile(
+                        file_hash=file_hash,
+                        processing_id=unique_file_id,
+                        tenant_id=tenant_id,
+                        filename=file.filename or "unknown",
+                        source_blob_path=source_blob_info.get("blob_path") if source_blob_info and source_blob_info.get("success") else None,
+                        processed_blob_path=unique_file_id if json_upload_result and json_upload_result.get("success") else None,
+                        processed_data={
+                            "key_value_pairs": processing_result.key_value_pairs,
+                            "key_value_pair_confidence_scores": kv_confidence_scores,
+                            "summary": processing_result.summary,
+                            "confidence_score": processing_result.confidence_score,
+                            "ocr_confidence_score": ocr_confidence_score,
+                            "document_classification": document_classification,
+                            "processing_info": {
+                                "processing_time": total_processing_time,
+                                "ocr_time": ocr_time,
+                                "extraction_time": extraction_time,
+                                "preprocessing_applied": apply_preprocessing,
+                                "quality_enhanced": enhance_quality,
+                                "extraction_method": "Template-based AI extraction" if template_id else ("AI-powered" if text_processor.is_available() else "Basic pattern matching")
+                            },
+                            "metadata": {
+                                "extraction_timestamp": datetime.now().isoformat(),
+                                "text_length": len(result.get("combined_text", "")),
+                                "ai_processing": text_processor.is_available()
+                            } if include_metadata else None
+                        },
+                        ocr_confidence_score=str(ocr_confidence_score) if ocr_confidence_score else None,
+                        processing_time=str(total_processing_time) if total_processing_time else None,
+                        created_at=datetime.utcnow()
+                    )
+                    session.add(new_processed_file)
+                    logger.info(f"💾 Created new processed file entry for {file.filename} (hash: {file_hash[:16]}...)")
+            
+                await session.commit()
+            persisted_in_db = True
             
-            db.commit()
             logger.info(f"✓ Successfully saved processed file to database for {file.filename}")
         except Exception as db_error:
             logger.error(f"✗ Failed to save processed file to database: {db_error}", exc_info=True)
-            db.rollback()
             # Don't fail the request if database save fails
 
-        return {
+        response = {
             "status": "success",
             "message": f"Enhanced OCR processing completed for {file.filename}" + (f" with template {template_id}" if template_id else ""),
             "file_info": {
                 "filename": file.filename,
                 "content_type": file.content_type,
-                "size_bytes": len(file_data),
+                "size_bytes": upload.size,
                 "pages_processed": len(result.get("raw_ocr_results", []))
             },
             "key_value_pairs": processing_result.key_value_pairs,
@@ -700,11 +767,30 @@ async def process_enhanced_ocr(
             } if low_confidence_pairs else None
         }
         
+        if owns_flight:
+            # Followers rebuild the full result from the store; never put the payload in Redis
+            flight_receipt = result_store_service.make_receipt(response, tenant_id, file_hash, persisted_in_db)
+            if result_store_service.is_receipt(flight_receipt):
+                await run_io(single_flight_service.publish_result, tenant_id, file_hash, processing_id, flight_receipt)
+        
+        return await run_cpu(
+            json_response,
+            result_store_service.shape_result(response, selected_fields, selected_parts),
+            accept_encoding
+        )
+        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Enhanced OCR processing error for {file.filename}: {e}")
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail="Enhanced OCR processing failed")
+    finally:
+        if owns_flight:
+            await run_io(single_flight_service.release, tenant_id, file_hash, processing_id)
+        if upload is not None:
+            upload.close()
 
 
 # This endpoint was redundant because /ocr/enhanced/process already handles the complete workflow.
@@ -872,6 +958,223 @@ async def process_enhanced_ocr(
     #     logger.error(f"Error processing file from source blob {blob_path}: {e}")
     #     raise HTTPException(status_code=500, detail=f"Processing from source failed: {str(e)}")
 
+async def process_batch_file(
+    upload: SpooledUpload,
+    filename: Optional[str],
+    content_type: Optional[str],
+    tenant_id: str,
+    apply_preprocessing: bool,
+    enhance_quality: bool,
+    include_raw_text: bool,
+    include_metadata: bool,
+    ocr_semaphore: asyncio.Semaphore,
+    llm_semaphore: asyncio.Semaphore
+) -> Dict[str, Any]:
+    """
+    Run one file of a synchronous batch through OCR, AI extraction, scoring and upload.
+    
+    OCR and LLM calls are bounded by the batch's semaphores; blocking calls run in threads.
+    The file is only read from its spool once it gets an OCR slot.
+    Errors are returned as an error result so one file never fails the batch.
+    """
+    try:
+        logger.info(f"Processing file: {filename}")
+        
+        # Process with Azure Computer Vision OCR
+        async with ocr_semaphore:
+            file_data = await run_io(upload.read_bytes)
+            result = await ocr_from_path(
+                file_data=file_data,
+                original_filename=filename or "unknown",
+                ocr_engine="azure_computer_vision",
+                ground_truth="",
+                apply_preprocessing=apply_preprocessing,
+                enhance_quality=enhance_quality
+            )
+        
+        # Initialize enhanced text processor
+        text_processor = EnhancedTextProcessor()
+        
+        async with llm_semaphore:
+            # Process with AI-powered key-value extraction
+            processing_result = await text_processor.process_without_template(
+                ocr_text=result.get("combined_text", ""),
+                filename=filename or "unknown"
+            )
+            
+            # Document classification (blocking LLM call)
+            document_classification = await run_io(
+                text_processor.classify_document_type,
+                ocr_text=result.get("combined_text", "")
+            )
+        
+        # Check if result is a fallback (has error flag)
+        is_fallback = "_extraction_error" in processing_result.key_value_pairs or "_extraction_method" in processing_result.key_value_pairs
+        extraction_error = processing_result.key_value_pairs.get("_extraction_error")
+        
+        # Determine extraction method
+        if is_fallback:
+            extraction_method = "Fallback (Basic pattern matching)"
+        elif text_processor.is_available():
+            extraction_method = "AI-powered"
+        else:
+            extraction_method = "Basic pattern matching"
+        
+        # Calculate OCR confidence from text_blocks
+        ocr_confidence_score = calculate_ocr_confidence(result)
+
+        # Calculate confidence scores for each key-value pair
+        kv_confidence_scores = await run_cpu(
+            calculate_key_value_pair_confidence_scores,
+            key_value_pairs=processing_result.key_value_pairs,
+            ocr_result=result,
+            raw_ocr_text=result.get("combined_text", "")
+        )
+
+        # Identify low-confidence pairs (< 95%) for later manual analysis
+        low_confidence_pairs = {}
+        low_confidence_scores_filtered = {}
+        for key, value in processing_result.key_value_pairs.items():
+            conf = kv_confidence_scores.get(key)
+            if conf is not None:
+                # Normalize confidence if needed
+                normalized_conf = conf / 100 if conf > 1 else conf
+                if normalized_conf < 0.95:
+                    low_confidence_pairs[key] = value
+                    low_confidence_scores_filtered[key] = normalized_conf
+        
+        # Store file as base64 for later low-confidence analysis
+        file_base64 = await run_cpu(lambda: base64.b64encode(file_data).decode('utf-8'))
+        
+        # Log low-confidence pairs count
+        if low_confidence_pairs:
+            logger.info(f"Identified {len(low_confidence_pairs)} low-confidence pairs for {filename} - ready for manual analysis")
+        
+        file_info = {
+            "filename": filename,
+            "content_type": content_type,
+            "size_bytes": len(file_data),
+            "pages_processed": len(result.get("raw_ocr_results", []))
+        }
+        processing_info = {
+            "processing_time": result.get("processing_time", 0),
+            "preprocessing_applied": apply_preprocessing,
+            "quality_enhanced": enhance_quality,
+            "extraction_method": extraction_method,
+            "is_fallback": is_fallback
+        }
+        metadata = {
+            "extraction_timestamp": datetime.now().isoformat(),
+            "text_length": len(result.get("combined_text", "")),
+            "ai_processing": text_processor.is_available(),
+            "extraction_error": extraction_error if is_fallback else None
+        } if include_metadata else None
+        low_confidence_data = {
+            "has_low_confidence_pairs": len(low_confidence_pairs) > 0,
+            "low_confidence_pairs": low_confidence_pairs,
+            "low_confidence_scores": low_confidence_scores_filtered,
+            "source_file_base64": file_base64,
+            "source_file_content_type": content_type or "application/octet-stream",
+            "count": len(low_confidence_pairs)
+        } if low_confidence_pairs else None
+        
+        processing_id = str(uuid.uuid4())
+        
+        # Upload JSON data to Azure Blob Storage (NO original files)
+        json_upload_result = None
+        try:
+            blob_service = AzureBlobService()
+            if blob_service.is_available():
+                # Upload processed JSON data
+                processed_json_data = {
+                    "file_info": file_info,
+                    "key_value_pairs": processing_result.key_value_pairs,
+                    "summary": processing_result.summary,
+                    "confidence_score": processing_result.confidence_score,
+                    "ocr_confidence_score": ocr_confidence_score,
+                    "document_classification": document_classification,
+                    "processing_info": processing_info,
+                    "raw_ocr_text": result.get("combined_text", "") if include_raw_text else None,
+                    "raw_ocr_results": result.get("raw_ocr_results", []), 
+                    "metadata": metadata,
+                    "low_confidence_data": low_confidence_data
+                }
+                
+                json_upload_result = await run_io(
+                    blob_service.upload_processed_json,
+                    json_data=processed_json_data,
+                    filename=filename or "unknown",
+                    tenant_id=tenant_id,
+                    processing_id=processing_id
+                )
+                
+        except Exception as e:
+            logger.error(f"Failed to upload batch JSON to blob storage: {e}")
+            json_upload_result = {"success": False, "error": str(e)}
+        
+        # Store null field tracking data
+        try:
+            from services.null_field_service import null_field_service
+            logger.info(f"[BATCH] Storing null field tracking for {filename}...")
+            await run_db(
+                null_field_service.store_null_fields,
+                processing_id=processing_id,
+                tenant_id=tenant_id,
+                filename=filename or "unknown",
+                extracted_fields=processing_result.key_value_pairs
+            )
+        except Exception as null_error:
+            logger.error(f"[BATCH] ✗ Failed to store null field tracking: {null_error}")
+
+        return {
+            "file_info": file_info,
+            "key_value_pairs": processing_result.key_value_pairs,
+            "key_value_pair_confidence_scores": kv_confidence_scores,
+            "summary": processing_result.summary,
+            "confidence_score": processing_result.confidence_score,
+            "ocr_confidence_score": ocr_confidence_score,
+            "document_classification": document_classification,
+            "processing_info": processing_info,
+            "raw_ocr_text": result.get("combined_text", "") if include_raw_text else None,
+            "raw_ocr_results": result.get("raw_ocr_results", []),
+            "metadata": metadata,
+            "blob_storage": {
+                "processed_json": json_upload_result
+            },
+            "low_confidence_data": low_confidence_data
+        }
+    
+    except Exception as e:
+        logger.error(f"Error processing file {filename}: {e}")
+        return {
+            "file_info": {
+                "filename": filename,
+                "error": str(e)
+            },
+            "key_value_pairs": {},
+            "summary": f"Error processing file: {str(e)}",
+            "confidence_score": 0.0,
+            "document_classification": "Error",
+            "processing_info": {
+                "processing_time": 0,
+                "preprocessing_applied": apply_preprocessing,
+                "quality_enhanced": enhance_quality,
+                "extraction_method": "Error"
+            }
+        }
+
+def summarize_batch(total_files: int, individual_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build the batch_info of a synchronous batch from its results."""
+    # Count fallback results
+    fallback_count = sum(1 for r in individual_results if r.get("processing_info", {}).get("is_fallback", False))
+    return {
+        "total_files": total_files,
+        "processed_files": len(individual_results),
+        "total_processing_time": sum(r.get("processing_info", {}).get("processing_time", 0) for r in individual_results),
+        "fallback_count": fallback_count,
+        "successful_ai_extraction": len(individual_results) - fallback_count
+    }
+
 @router.post("/ocr/enhanced/batch/process")
 async def process_enhanced_batch_ocr(
     files: List[UploadFile] = File(..., description="Files to process (PDF, PNG, JPG, JPEG)"),
@@ -879,9 +1182,12 @@ async def process_enhanced_batch_ocr(
     enhance_quality: bool = Form(True, description="Apply quality enhancements"),
     include_raw_text: bool = Form(True, description="Include raw OCR text in response"),
     include_metadata: bool = Form(True, description="Include processing metadata"),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-) -> Dict[str, Any]:
+    stream: bool = Form(False, description="Stream each file's result as NDJSON as soon as it finishes"),
+    fields: Optional[str] = Form(None, description="Comma-separated top-level fields to return per file"),
+    include: Optional[str] = Form(None, description="Heavy parts to return per file: ocr_detail, source_file (default: all)"),
+    accept_encoding: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_active_user)
+):
     """
     Process multiple files with enhanced OCR and AI-powered key-value extraction.
     
@@ -890,241 +1196,86 @@ async def process_enhanced_batch_ocr(
     - AI-powered key-value pair extraction for each file
     - Document classification and summarization
     - Multi-tenant data isolation
+    
+    Files are processed concurrently (at most BATCH_OCR_CONCURRENCY OCR calls and
+    BATCH_LLM_CONCURRENCY LLM calls at a time across all batches of the worker);
+    results are returned in input order.
+    With stream=true the response is NDJSON: one {"index", "result"} line per file in
+    completion order, then a final {"status", "batch_info"} line.
+    fields= and include= select what each file's result contains (see /ocr/enhanced/process).
     """
     try:
         if not files:
             raise HTTPException(status_code=400, detail="No files provided")
         
+        selected_fields = parse_list_param(fields)
+        selected_parts = parse_include_param(include)
         logger.info(f"Processing enhanced batch OCR for {len(files)} files")
         
-        individual_results = []
-        total_processing_time = 0
-        
-        for file in files:
-            try:
-                # Validate file type
-                allowed_types = ["application/pdf", "image/png", "image/jpeg", "image/jpg"]
+        # Validate file types and spool file data
+        allowed_types = ["application/pdf", "image/png", "image/jpeg", "image/jpg"]
+        batch_files = []
+        try:
+            for file in files:
                 if file.content_type not in allowed_types:
                     logger.warning(f"Skipping unsupported file type: {file.content_type} for {file.filename}")
                     continue
-                
-                logger.info(f"Processing file: {file.filename}")
-                
-                # Read file data
-                file_data = await file.read()
-                
-                # Process with Azure Computer Vision OCR
-                result = await ocr_from_path(
-                    file_data=file_data,
-                    original_filename=file.filename or "unknown",
-                    ocr_engine="azure_computer_vision",
-                    ground_truth="",
-                    apply_preprocessing=apply_preprocessing,
-                    enhance_quality=enhance_quality
-                )
-                
-                # Initialize enhanced text processor
-                text_processor = EnhancedTextProcessor()
-                
-                # Process with AI-powered key-value extraction
-                processing_result = await text_processor.process_without_template(
-                    ocr_text=result.get("combined_text", ""),
-                    filename=file.filename or "unknown"
-                )
-                
-                # Check if result is a fallback (has error flag)
-                is_fallback = "_extraction_error" in processing_result.key_value_pairs or "_extraction_method" in processing_result.key_value_pairs
-                extraction_error = processing_result.key_value_pairs.get("_extraction_error")
-                
-                # Determine extraction method
-                if is_fallback:
-                    extraction_method = "Fallback (Basic pattern matching)"
-                elif text_processor.is_available():
-                    extraction_method = "AI-powered"
-                else:
-                    extraction_method = "Basic pattern matching"
-                
-                # Document classification
-                document_classification = text_processor.classify_document_type(
-                    ocr_text=result.get("combined_text", "")
-                )
-                
-                # Calculate OCR confidence from text_blocks
-                ocr_confidence_score = calculate_ocr_confidence(result)
-
-                # Calculate confidence scores for each key-value pair
-                kv_confidence_scores = calculate_key_value_pair_confidence_scores(
-                    key_value_pairs=processing_result.key_value_pairs,
-                    ocr_result=result,
-                    raw_ocr_text=result.get("combined_text", "")
+                batch_files.append(await ingest_upload(file))
+        except Exception:
+            for upload in batch_files:
+                upload.close()
+            raise
+        
+        ocr_semaphore, llm_semaphore = get_batch_semaphores()
+        
+        async def run_file(index: int, upload: SpooledUpload):
+            try:
+                result = await process_batch_file(
+                    upload, upload.filename, upload.content_type, current_user.tenant_id, apply_preprocessing,
+                    enhance_quality, include_raw_text, include_metadata, ocr_semaphore, llm_semaphore
                 )
-
-                # Identify low-confidence pairs (< 95%) for later manual analysis
-                low_confidence_pairs = {}
-                low_confidence_scores_filtered = {}
-                for key, value in processing_result.key_value_pairs.items():
-                    conf = kv_confidence_scores.get(key)
-                    if conf is not None:
-                        # Normalize confidence if needed
-                        normalized_conf = conf / 100 if conf > 1 else conf
-                        if normalized_conf < 0.95:
-                            low_confidence_pairs[key] = value
-                            low_confidence_scores_filtered[key] = normalized_conf
-                
-                # Store file as base64 for later low-confidence analysis
-                file_base64 = base64.b64encode(file_data).decode('utf-8')
-                
-                # Log low-confidence pairs count
-                if low_confidence_pairs:
-                    logger.info(f"Identified {len(low_confidence_pairs)} low-confidence pairs for {file.filename} - ready for manual analysis")
-                
-                # Upload JSON data to Azure Blob Storage (NO original files)
-                json_upload_result = None
-                try:
-                    blob_service = AzureBlobService()
-                    if blob_service.is_available():
-                        processing_id = str(uuid.uuid4())
-                        
-                        # Upload processed JSON data
-                        processed_json_data = {
-                            "file_info": {
-                                "filename": file.filename,
-                                "content_type": file.content_type,
-                                "size_bytes": len(file_data),
-                                "pages_processed": len(result.get("raw_ocr_results", []))
-                            },
-                            "key_value_pairs": processing_result.key_value_pairs,
-                            "summary": processing_result.summary,
-                            "confidence_score": processing_result.confidence_score,
-                            "ocr_confidence_score": ocr_confidence_score,
-                            "document_classification": document_classification,
-                            "processing_info": {
-                                "processing_time": result.get("processing_time", 0),
-                                "preprocessing_applied": apply_preprocessing,
-                                "quality_enhanced": enhance_quality,
-                                "extraction_method": extraction_method,
-                                "is_fallback": is_fallback
-                            },
-                            "raw_ocr_text": result.get("combined_text", "") if include_raw_text else None,
-                            "raw_ocr_results": result.get("raw_ocr_results", []), 
-                            "metadata": {
-                                "extraction_timestamp": datetime.now().isoformat(),
-                                "text_length": len(result.get("combined_text", "")),
-                                "ai_processing": text_processor.is_available(),
-                                "extraction_error": extraction_error if is_fallback else None
-                            } if include_metadata else None,
-                            "low_confidence_data": {
-                                "has_low_confidence_pairs": len(low_confidence_pairs) > 0,
-                                "low_confidence_pairs": low_confidence_pairs,
-                                "low_confidence_scores": low_confidence_scores_filtered,
-                                "source_file_base64": file_base64,
-                                "source_file_content_type": file.content_type or "application/octet-stream",
-                                "count": len(low_confidence_pairs)
-                            } if low_confidence_pairs else None
-                        }
-                        
-                        json_upload_result = blob_service.upload_processed_json(
-                            json_data=processed_json_data,
-                            filename=file.filename or "unknown",
-                            tenant_id=current_user.tenant_id,
-                            processing_id=processing_id
-                        )
-                        
-                except Exception as e:
-                    logger.error(f"Failed to upload batch JSON to blob storage: {e}")
-                    json_upload_result = {"success": False, "error": str(e)}
-                
-                # Store null field tracking data
+            finally:
+                upload.close()
+            return index, result
+        
+        if stream:
+            async def ndjson_results():
+                tasks = [asyncio.ensure_future(run_file(index, upload)) for index, upload in enumerate(batch_files)]
+                individual_results = [None] * len(tasks)
                 try:
-                    from services.null_field_service import null_field_service
-                    logger.info(f"[BATCH] Storing null field tracking for {file.filename}...")
-                    null_field_service.store_null_fields(
-                        processing_id=processing_id,
-                        tenant_id=current_user.tenant_id,
-                        filename=file.filename or "unknown",
-                        extracted_fields=processing_result.key_value_pairs
-                    )
-                except Exception as null_error:
-                    logger.error(f"[BATCH] ✗ Failed to store null field tracking: {null_error}")
-
-                individual_results.append({
-                    "file_info": {
-                        "filename": file.filename,
-                        "content_type": file.content_type,
-                        "size_bytes": len(file_data),
-                        "pages_processed": len(result.get("raw_ocr_results", []))
-                    },
-                    "key_value_pairs": processing_result.key_value_pairs,
-                    "key_value_pair_confidence_scores": kv_confidence_scores,
-                    "summary": processing_result.summary,
-                    "confidence_score": processing_result.confidence_score,
-                    "ocr_confidence_score": ocr_confidence_score,
-                    "document_classification": document_classification,
-                    "processing_info": {
-                        "processing_time": result.get("processing_time", 0),
-                        "preprocessing_applied": apply_preprocessing,
-                        "quality_enhanced": enhance_quality,
-                        "extraction_method": extraction_method,
-                        "is_fallback": is_fallback
-                    },
-                    "raw_ocr_text": result.get("combined_text", "") if include_raw_text else None,
-                    "raw_ocr_results": result.get("raw_ocr_results", []),
-                    "metadata": {
-                        "extraction_timestamp": datetime.now().isoformat(),
-                        "text_length": len(result.get("combined_text", "")),
-                        "ai_processing": text_processor.is_available(),
-                        "extraction_error": extraction_error if is_fallback else None
-                    } if include_metadata else None,
-                    "blob_storage": {
-                        "processed_json": json_upload_result
-                    },
-                    "low_confidence_data": {
-                        "has_low_confidence_pairs": len(low_confidence_pairs) > 0,
-                        "low_confidence_pairs": low_confidence_pairs,
-                        "low_confidence_scores": low_confidence_scores_filtered,
-                        "source_file_base64": file_base64,
-                        "source_file_content_type": file.content_type or "application/octet-stream",
-                        "count": len(low_confidence_pairs)
-                    } if low_confidence_pairs else None
-                })
-                
-                total_processing_time += result.get("processing_time", 0)
+                    for completed in asyncio.as_completed(tasks):
+                        index, result = await completed
+                        individual_results[index] = result
+                        shaped = result_store_service.shape_result(result, selected_fields, selected_parts)
+                        yield dumps_json({"index": index, "result": shaped}).decode("utf-8") + "\n"
+                finally:
+                    # Client disconnected: stop the remaining files
+                    for task in tasks:
+                        task.cancel()
+                    for upload in batch_files:
+                        upload.close()
+                yield json.dumps({
+                    "status": "success",
+                    "batch_info": summarize_batch(len(files), individual_results)
+                }) + "\n"
             
-            except Exception as e:
-                logger.error(f"Error processing file {file.filename}: {e}")
-                individual_results.append({
-                    "file_info": {
-                        "filename": file.filename,
-                        "error": str(e)
-                    },
-                    "key_value_pairs": {},
-                    "summary": f"Error processing file: {str(e)}",
-                    "confidence_score": 0.0,
-                    "document_classification": "Error",
-                    "processing_info": {
-                        "processing_time": 0,
-                        "preprocessing_applied": apply_preprocessing,
-                        "quality_enhanced": enhance_quality,
-                        "extraction_method": "Error"
-                    }
-                })
+            return StreamingResponse(ndjson_results(), media_type="application/x-ndjson")
         
-        # Count fallback results
-        fallback_count = sum(1 for r in individual_results if r.get("processing_info", {}).get("is_fallback", False))
+        completed = await asyncio.gather(*(run_file(index, upload) for index, upload in enumerate(batch_files)))
+        individual_results = [result for _, result in completed]
         
-        return {
+        return await run_cpu(json_response, {
             "status": "success",
             "message": f"Enhanced batch OCR processing completed for {len(individual_results)} files",
-            "batch_info": {
-                "total_files": len(files),
-                "processed_files": len(individual_results),
-                "total_processing_time": total_processing_time,
-                "fallback_count": fallback_count,
-                "successful_ai_extraction": len(individual_results) - fallback_count
-            },
-            "individual_results": individual_results
-        }
+            "batch_info": summarize_batch(len(files), individual_results),
+            "individual_results": [
+                result_store_service.shape_result(result, selected_fields, selected_parts)
+                for result in individual_results
+            ]
+        }, accept_encoding)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Enhanced batch OCR processing error: {e}")
         import traceback
@@ -1139,8 +1290,7 @@ async def process_enhanced_batch_ocr_async(
     enhance_quality: bool = Form(True, description="Apply quality enhancements"),
     include_raw_text: bool = Form(True, description="Include raw OCR text in response"),
     include_metadata: bool = Form(True, description="Include processing metadata"),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ) -> Dict[str, Any]:
     """
     Process multiple files with enhanced OCR using Celery workers for parallel processing.
@@ -1153,17 +1303,14 @@ async def process_enhanced_batch_ocr_async(
     - Multi-tenant data isolation
     - Returns task ID immediately for status tracking
     """
+    files_data = []
     try:
         if not files:
             raise HTTPException(status_code=400, detail="No files provided")
         
         logger.info(f"Processing enhanced batch OCR async for {len(files)} files using Celery")
         
-        # Validate and read all files
-        files_data = []
-        filenames = []
-        content_types = []
-        
+        # Validate and spool all files (size-checked and hashed while read)
         for file in files:
             # Validate file type
             allowed_types = ["application/pdf", "image/png", "image/jpeg", "image/jpg"]
@@ -1171,17 +1318,14 @@ async def process_enhanced_batch_ocr_async(
                 logger.warning(f"Skipping unsupported file type: {file.content_type} for {file.filename}")
                 continue
             
-            # Read file data
-            file_data = await file.read()
-            files_data.append(file_data)
-            filenames.append(file.filename or "unknown")
-            content_types.append(file.content_type or "application/octet-stream")
+            files_data.append(await ingest_upload(file))
         
         if not files_data:
             raise HTTPException(status_code=400, detail="No valid files provided")
         
-        # Encode all files as base64 for Celery serialization
-        files_data_b64 = [base64.b64encode(f).decode('utf-8') for f in files_data]
+        # Small batches share the interactive lane; large ones are fair-scheduled as bulk work
+        lane = fair_scheduler.lane_for_batch(len(files_data))
+        enforce_admission(current_user.tenant_id, lane, incoming=len(files_data))
         
         # Generate individual task IDs for tracking
         task_ids = []
@@ -1190,29 +1334,36 @@ async def process_enhanced_batch_ocr_async(
         logger.info(f"Submitting {len(files_data)} individual tasks to Celery workers for parallel processing...")
         
         try:
-            for idx, (file_data_b64, filename) in enumerate(zip(files_data_b64, filenames)):
-                processing_id = str(uuid.uuid4())
-                
+            for idx, upload in enumerate(files_data):
+                filename = upload.filename or "unknown"
+                # Only one file's bytes are held in memory at a time
+                file_data = await run_io(upload.read_bytes)
                 # Submit INDIVIDUAL task for each file - each goes to a separate worker
-                individual_task = process_document.delay(
-                    file_data=file_data_b64,
+                # Identical files already in flight attach to the existing task instead
+                submission = await run_io(
+                    submit_process_document,
+                    file_bytes=file_data,
+                    file_hash=upload.sha256,
                     filename=filename,
                     tenant_id=current_user.tenant_id,
-                    processing_id=processing_id,
+                    content_type=upload.content_type or "application/octet-stream",
                     apply_preprocessing=apply_preprocessing,
                     enhance_quality=enhance_quality,
                     include_raw_text=include_raw_text,
                     include_metadata=include_metadata,
-                    content_type=content_types[idx] if idx < len(content_types) else "application/octet-stream"
+                    lane=lane
                 )
+                task_id = submission["task_id"]
+                del file_data
                 
                 task_ids.append({
-                    "task_id": individual_task.id,
+                    "task_id": task_id,
                     "filename": filename,
-                    "status_url": f"/api/v1/tasks/{individual_task.id}"
+                    "deduplicated": submission["deduplicated"],
+                    "status_url": f"/api/v1/tasks/{task_id}"
                 })
                 
-                logger.info(f"Submitted task {idx + 1}/{len(files_data)}: {filename} -> Worker (Task ID: {individual_task.id})")
+                logger.info(f"Submitted task {idx + 1}/{len(files_data)}: {filename} -> Worker (Task ID: {task_id}, deduplicated: {submission['deduplicated']})")
         except Exception as celery_error:
             error_msg = str(celery_error).lower()
             if "redis" in error_msg or "connection" in error_msg or "broker" in error_msg:
@@ -1230,6 +1381,7 @@ async def process_enhanced_batch_ocr_async(
             "status": "accepted",
             "message": f"Batch processing started for {len(files_data)} files in parallel",
             "total_files": len(files_data),
+            "lane": lane,
             "individual_tasks": task_ids,
             "note": "Each file is processed independently by separate workers. Check status for each task individually."
         }
@@ -1242,16 +1394,110 @@ async def process_enhanced_batch_ocr_async(
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail="Enhanced batch OCR async processing failed")
+    finally:
+        for upload in files_data:
+            upload.close()
+
+
+async def hydrate_task_result(result: Any, current_user: User) -> Any:
+    """
+    Replace a slim task receipt with the full result from the persistent store.
+    Results of other tenants' tasks are never hydrated.
+    """
+    if not result_store_service.is_receipt(result):
+        return result
+    if not current_user.is_admin and result.get("tenant_id") != getattr(current_user, 'tenant_id', None):
+        return result
+    full_result = await run_io(result_store_service.load_full_result, result)
+    return full_result or result
+
+
+@router.get("/tasks/events")
+async def stream_task_events(
+    task_ids: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Stream task progress events for the current tenant as Server-Sent Events.
+    
+    Each event is sent as `event: task` with JSON data {task_id, state, meta, timestamp}.
+    Clients that cannot stream should poll /tasks/batch-status instead.
+    
+    Args:
+        task_ids: Optional comma-separated task IDs to limit the stream to
+    """
+    tenant_id = getattr(current_user, 'tenant_id', f"tenant_{current_user.id}")
+    wanted_task_ids = {task_id for task_id in task_ids.split(",") if task_id} if task_ids else None
+    
+    async def event_generator():
+        yield "retry: 3000\n\n"
+        try:
+            async for event in task_events_service.stream(tenant_id, wanted_task_ids):
+                if event is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield f"event: task\ndata: {json.dumps(event)}\n\n"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Task event stream error for {tenant_id}: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': 'Event stream interrupted'})}\n\n"
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _format_task_error(info: Any) -> str:
+    """Format a failed task's stored exception (raw backend meta or exception object) as text."""
+    if not info:
+        return 'Unknown error'
+    if isinstance(info, dict) and 'exc_message' in info:
+        exc_message = info.get('exc_message')
+        if isinstance(exc_message, (list, tuple)):
+            return " ".join(str(part) for part in exc_message) or info.get('exc_type', 'Unknown error')
+        return str(exc_message)
+    return str(info)
+
+
+def _read_task_state(task_id: str) -> Tuple[str, Any]:
+    """Read a task's state and info through the Celery result backend (blocking; call via run_io)."""
+    task = celery_app.AsyncResult(task_id)
+    return task.state, task.info
+
+
+async def read_task_state(task_id: str) -> Tuple[str, Any]:
+    """
+    Get a task's state and stored info without blocking the event loop.
+    Failed tasks return the raw stored exception (format it with _format_task_error).
+    """
+    try:
+        meta = (await task_events_service.get_task_metas([task_id])).get(task_id)
+    except Exception as e:
+        logger.warning(f"Task meta lookup failed for {task_id}, falling back to the result backend: {e}")
+        return await run_io(_read_task_state, task_id)
+    if not meta:
+        return 'PENDING', None
+    return meta.get("status", "PENDING"), meta.get("result")
 
 
 @router.get("/tasks/{task_id}")
 async def get_task_status(
     task_id: str,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    accept_encoding: Optional[str] = Header(None),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     Get the status of a Celery task.
     
+    Args:
+        fields: Optional comma-separated top-level fields of the result to return
+        include: Heavy parts of the result to return (ocr_detail, source_file; default: all)
+    
     Returns:
         - PENDING: Task is waiting to be processed
         - PROCESSING: Task is being processed
@@ -1259,23 +1505,25 @@ async def get_task_status(
         - FAILURE: Task failed
     """
     try:
-        task = celery_app.AsyncResult(task_id)
+        selected_fields = parse_list_param(fields)
+        selected_parts = parse_include_param(include)
+        state, info = await read_task_state(task_id)
         
-        if task.state == 'PENDING':
+        if state == 'PENDING':
             response = {
                 'status': 'PENDING',
-                'state': task.state,
+                'state': state,
                 'message': 'Task is waiting to be processed'
             }
-        elif task.state == 'PROCESSING':
+        elif state == 'PROCESSING':
             response = {
                 'status': 'PROCESSING',
-                'state': task.state,
+                'state': state,
                 'message': 'Task is being processed',
-                'info': task.info
+                'info': info
             }
-        elif task.state == 'SUCCESS':
-            result = task.result
+        elif state == 'SUCCESS':
+            result = await hydrate_task_result(info, current_user)
             # Normalize result format for frontend compatibility
             if result and isinstance(result, dict):
                 # Extract filename from file_info if present
@@ -1291,34 +1539,84 @@ async def get_task_status(
                         result['template_used'] = result['template_info'].get('template_id', 'Unknown')
             response = {
                 'status': 'SUCCESS',
-                'state': task.state,
+                'state': state,
                 'message': 'Task completed successfully',
-                'result': result
+                'result': result_store_service.shape_result(result, selected_fields, selected_parts)
             }
-        elif task.state == 'FAILURE':
+        elif state == 'FAILURE':
             response = {
                 'status': 'FAILURE',
-                'state': task.state,
+                'state': state,
                 'message': 'Task failed',
-                'error': str(task.info) if task.info else 'Unknown error'
+                'error': _format_task_error(info)
             }
         else:
             response = {
-                'status': task.state,
-                'state': task.state,
-                'info': task.info
+                'status': state,
+                'state': state,
+                'info': info
             }
         
-        return response
+        return await run_cpu(json_response, response, accept_encoding)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting task status for {task_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to get task status")
 
 
+@router.get("/tasks/{task_id}/result")
+async def get_task_result(
+    task_id: str,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    accept_encoding: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get the full result of a completed task from the persistent store.
+    
+    Args:
+        task_id: Celery task ID
+        fields: Optional comma-separated top-level fields to return
+            (e.g. "key_value_pairs,key_value_pair_confidence_scores,summary")
+        include: Heavy parts to return (ocr_detail, source_file; default: all)
+    """
+    try:
+        selected_parts = parse_include_param(include)
+        state, result = await read_task_state(task_id)
+        if state != 'SUCCESS':
+            raise HTTPException(status_code=404, detail=f"Task result not available (state: {state})")
+        
+        if result_store_service.is_receipt(result):
+            if not current_user.is_admin and result.get("tenant_id") != getattr(current_user, 'tenant_id', None):
+                raise HTTPException(status_code=403, detail="Access denied")
+            full_result = await run_io(result_store_service.load_full_result, result)
+            if full_result is None:
+                raise HTTPException(status_code=404, detail="Processed result not found in storage")
+            result = full_result
+        
+        return await run_cpu(json_response, {
+            "status": "success",
+            "task_id": task_id,
+            "result": result_store_service.shape_result(result, parse_list_param(fields), selected_parts)
+        }, accept_encoding)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting task result for {task_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get task result")
+
+
 @router.post("/tasks/batch-status")
 async def get_batch_task_status(
     task_ids: List[str] = Body(...),
+    include_results: bool = False,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    accept_encoding: Optional[str] = Header(None),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -1326,23 +1624,47 @@ async def get_batch_task_status(
     
     Request body: ["task_id_1", "task_id_2", ...]
     
+    Args:
+        include_results: Return full results for completed tasks; by default only the
+            slim receipts are returned (fetch full results via /tasks/{task_id}/result)
+        fields: Optional comma-separated top-level fields of each result to return
+        include: Heavy parts of each result to return (ocr_detail, source_file; default: all)
+    
     Returns status for all tasks in the batch.
     """
     try:
+        selected_fields = parse_list_param(fields)
+        selected_parts = parse_include_param(include)
         results = []
         
+        # Read all result keys with pipelined MGETs instead of one round trip per task
+        try:
+            task_metas = await task_events_service.get_task_metas(task_ids)
+        except Exception as mget_error:
+            logger.warning(f"Batch status MGET failed, falling back to per-task lookups: {mget_error}")
+            task_metas = None
+        
         for task_id in task_ids:
             try:
-                task = celery_app.AsyncResult(task_id)
+                if task_metas is not None:
+                    meta = task_metas.get(task_id)
+                    state = meta.get("status", "PENDING") if meta else "PENDING"
+                    info = meta.get("result") if meta else None
+                else:
+                    state, info = await run_io(_read_task_state, task_id)
+                
+                if state == 'SUCCESS' and include_results:
+                    info = await hydrate_task_result(info, current_user)
+                
                 task_info = {
                     "task_id": task_id,
-                    "state": task.state,
-                    "status": task.state
+                    "state": state,
+                    "status": state
                 }
                 
-                if task.state == 'SUCCESS':
+                if state == 'SUCCESS':
                     try:
-                        result = task.result
+                        result = info
                         if result is None:
                             logger.warning(f"Task {task_id} state is SUCCESS but result is None")
                             task_info['result'] = None
@@ -1359,7 +1681,7 @@ async def get_batch_task_status(
                                 mapping_result = result['template_info']['mapping_result']
                                 if 'mapped_values' in mapping_result:
                                     result['template_used'] = result['template_info'].get('template_id', 'Unknown')
-                            task_info['result'] = result
+                            task_info['result'] = result_store_service.shape_result(result, selected_fields, selected_parts)
                         else:
                             # Result is not a dict, store as-is
                             task_info['result'] = result
@@ -1367,10 +1689,10 @@ async def get_batch_task_status(
                         logger.error(f"Error retrieving result for task {task_id}: {result_error}")
                         task_info['result'] = None
                         task_info['error'] = f"Failed to retrieve result: {str(result_error)}"
-                elif task.state == 'FAILURE':
-                    task_info['error'] = str(task.info) if task.info else 'Unknown error'
-                elif task.state == 'PROCESSING':
-                    task_info['info'] = task.info
+                elif state == 'FAILURE':
+                    task_info['error'] = _format_task_error(info)
+                elif state == 'PROCESSING':
+                    task_info['info'] = info
                 
                 results.append(task_info)
             except Exception as e:
@@ -1390,7 +1712,7 @@ async def get_batch_task_status(
         results_with_data = sum(1 for r in results if r.get('result') is not None)
         logger.info(f"Batch status check: {len(task_ids)} tasks - {success} SUCCESS, {failure} FAILED, {pending} PENDING, {processing} PROCESSING, {results_with_data} with results")
         
-        return {
+        return await run_cpu(json_response, {
             "status": "success",
             "total_tasks": len(task_ids),
             "summary": {
@@ -1401,8 +1723,10 @@ async def get_batch_task_status(
                 "progress_percent": int((success + failure) / len(task_ids) * 100) if len(task_ids) > 0 else 0
             },
             "tasks": results
-        }
+        }, accept_encoding)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting batch task status: {e}")
         import traceback
@@ -1419,8 +1743,7 @@ async def process_enhanced_ocr_async(
     include_raw_text: bool = Form(True, description="Include raw OCR text in response"),
     include_metadata: bool = Form(True, description="Include processing metadata"),
     use_blob_workflow: bool = Form(True, description="Use source → process → processed workflow"),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ) -> Dict[str, Any]:
     """
     Process uploaded file with enhanced OCR using Celery for async processing.
@@ -1445,39 +1768,41 @@ async def process_enhanced_ocr_async(
         
         logger.info(f"Processing enhanced OCR async for {file.filename}")
         
-        # Read file data
-        file_data = await file.read()
-        logger.info(f"Read file data: {len(file_data)} bytes for {file.filename}")
+        # Spool the upload (hashed while it is read; oversized files are rejected early)
+        with await ingest_upload(file) as upload:
+            logger.info(f"Received {upload.size} bytes for {file.filename}")
+            file_data = await run_io(upload.read_bytes)
         
-        # Generate processing ID and tenant ID
-        processing_id = str(uuid.uuid4())
+        # Generate tenant ID
         tenant_id = getattr(current_user, 'tenant_id', f"tenant_{current_user.id}")
+        enforce_admission(tenant_id, LANE_INTERACTIVE)
         
-        # Encode file data as base64 for Celery serialization
-        file_data_b64 = base64.b64encode(file_data).decode('utf-8')
-        
-        # Submit task to Celery
-        task = process_document.delay(
-            file_data=file_data_b64,
+        # Submit task to Celery (identical files already in flight attach to the existing task)
+        submission = await run_io(
+            submit_process_document,
+            file_bytes=file_data,
+            file_hash=upload.sha256,
             filename=file.filename or "unknown",
             tenant_id=tenant_id,
-            processing_id=processing_id,
+            content_type=file.content_type or "application/octet-stream",
             apply_preprocessing=apply_preprocessing,
             enhance_quality=enhance_quality,
             include_raw_text=include_raw_text,
             include_metadata=include_metadata,
-            template_id=template_id,
-            content_type=file.content_type or "application/octet-stream"
+            template_id=template_id
         )
+        task_id = submission["task_id"]
         
         return {
             "status": "accepted",
-            "message": f"Processing started for {file.filename}",
-            "task_id": task.id,
-            "processing_id": processing_id,
+            "message": (f"Identical file already processing - attached to existing task for {file.filename}"
+                        if submission["deduplicated"] else f"Processing started for {file.filename}"),
+            "task_id": task_id,
+            "processing_id": submission["processing_id"],
             "filename": file.filename,
             "template_id": template_id,
-            "check_status_url": f"/api/v1/tasks/{task.id}"
+            "deduplicated": submission["deduplicated"],
+            "check_status_url": f"/api/v1/tasks/{task_id}"
         }
         
     except HTTPException:
@@ -1504,7 +1829,8 @@ async def export_excel_from_data(
             logger.info(f"Excel export request received. Keys count: {len(kv) if isinstance(kv, dict) else 0}")
         except Exception:
             pass
-        excel_buffer = exporter.create_individual_excel(
+        excel_buffer = await run_cpu(
+            exporter.create_individual_excel,
             processed_data=processed_data,
             include_raw_text=include_raw_text,
             include_metadata=include_metadata
@@ -1535,7 +1861,8 @@ async def export_batch_excel_from_data(
     """Export batch processed OCR data to Excel files (ZIP)."""
     try:
         exporter = ExcelExporter()
-        zip_buffer = exporter.create_individual_excel_files(
+        zip_buffer = await run_cpu(
+            exporter.create_individual_excel_files,
             batch_data=batch_data,
             include_raw_text=include_raw_text,
             include_metadata=include_metadata
@@ -1556,46 +1883,24 @@ async def export_batch_excel_from_data(
 @router.post("/history/save")
 async def save_processing_result(
     result_data: Dict[str, Any],
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
-    """Save a processing result to history for a specific tenant in data folder."""
+    """Append a processing result to a tenant's history."""
     try:
         tenant_id = result_data.get("tenant_id")
         if not tenant_id:
             raise HTTPException(status_code=400, detail="tenant_id is required")
+        check_tenant_access(tenant_id, current_user)
         
-        logger.info(f"Saving processing result to data folder for tenant: {tenant_id}")
-        
-        # Load existing history from data folder
-        history = load_tenant_history(tenant_id)
-        logger.info(f"Loaded {len(history)} existing history entries for tenant {tenant_id}")
-        
-        # Create history entry
-        entry = {
-            "id": result_data.get("id", int(datetime.now().timestamp() * 1000)),
-            "timestamp": result_data.get("timestamp", datetime.now().isoformat()),
-            "filename": result_data.get("filename", "Unknown"),
-            "result": result_data.get("result", {}),
-            "processing_type": result_data.get("processing_type", "single")
-        }
+        entry_id = await run_db(processing_history_service.add_entry, tenant_id, result_data, current_user.username)
+        logger.info(f"Saved processing result to history for tenant {tenant_id}, entry ID: {entry_id}")
         
-        # Add to beginning of history (most recent first)
-        history.insert(0, entry)
-        
-        # Keep only last 100 entries to prevent file from growing too large
-        if len(history) > 100:
-            history = history[:100]
-            logger.info(f"Trimmed history to 100 entries for tenant {tenant_id}")
-        
-        # Save to data folder
-        save_tenant_history(tenant_id, history)
-        logger.info(f"Successfully saved processing result to data folder for tenant {tenant_id}, entry ID: {entry['id']}")
-        
-        return {"status": "success", "message": "Result saved to history in data folder", "id": entry["id"]}
+        return {"status": "success", "message": "Result saved to history", "id": entry_id}
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error saving processing result to data folder: {e}", exc_info=True)
+        logger.error(f"Error saving processing result to history: {e}", exc_info=True)
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail="Failed to save result")
@@ -1603,19 +1908,42 @@ async def save_processing_result(
 @router.get("/history/{tenant_id}")
 async def get_processing_history(
     tenant_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    status: Optional[str] = None,
+    min_confidence: Optional[float] = None,
+    max_confidence: Optional[float] = None,
+    current_user: User = Depends(get_current_active_user)
 ):
-    """Get all processing history for a specific tenant from JSON file in data folder."""
+    """
+    Get a tenant's processing history, newest first.
+    
+    Pages are requested with the next_cursor of the previous page. Entries can be filtered by
+    processing date (ISO date or timestamp), result status and confidence (0-1).
+    """
     try:
-        # Load history from JSON file in data/tenants/{tenant_id}/processing_history.json
-        history = load_tenant_history(tenant_id)
-        
-        # Sort by timestamp (most recent first) if timestamp exists
-        if history:
-            history.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-        
-        return {"status": "success", "history": history}
+        check_tenant_access(tenant_id, current_user)
+        if not cursor:
+            await run_io(import_legacy_history, tenant_id)
+        
+        page = await run_db(
+            processing_history_service.list_entries,
+            tenant_id,
+            limit=limit,
+            cursor=cursor,
+            date_from=date_from,
+            date_to=date_to,
+            status=status,
+            min_confidence=min_confidence,
+            max_confidence=max_confidence
+        )
+        return {"status": "success", **page}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error loading history for tenant {tenant_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to load history")
@@ -1624,15 +1952,16 @@ async def get_processing_history(
 async def delete_history_entry(
     tenant_id: str, 
     entry_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Delete a specific history entry for a tenant."""
     try:
-        history = load_tenant_history(tenant_id)
-        history = [entry for entry in history if entry.get("id") != entry_id]
-        save_tenant_history(tenant_id, history)
+        check_tenant_access(tenant_id, current_user)
+        await run_io(import_legacy_history, tenant_id)
+        await run_db(processing_history_service.delete_entry, tenant_id, entry_id)
         return {"status": "success", "message": "Entry deleted"}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error deleting history entry {entry_id}: {e}")
         import traceback
@@ -1642,13 +1971,16 @@ async def delete_history_entry(
 @router.delete("/history/{tenant_id}")
 async def clear_tenant_history(
     tenant_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Clear all processing history for a specific tenant."""
     try:
-        save_tenant_history(tenant_id, [])
+        check_tenant_access(tenant_id, current_user)
+        await run_io(import_legacy_history, tenant_id)
+        await run_db(processing_history_service.clear, tenant_id)
         return {"status": "success", "message": "All history cleared for tenant"}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error clearing history for tenant {tenant_id}: {e}")
         import traceback
@@ -1657,28 +1989,63 @@ async def clear_tenant_history(
 
 
 # Azure Blob Storage endpoints
+def filter_file_list(files: List[Dict[str, Any]], content_type: Optional[str] = None, search: Optional[str] = None,
+                     limit: Optional[int] = None, offset: int = 0) -> tuple:
+    """
+    Filter and paginate a live blob listing (used until the blob catalog is populated).
+    
+    Returns:
+        (files, total) where total is the number of matching files
+    """
+    if content_type:
+        files = [f for f in files if f.get("content_type") == content_type]
+    if search:
+        files = [f for f in files if search.lower() in (f.get("name") or "").lower()]
+    total = len(files)
+    files = files[offset:offset + limit] if limit else files[offset:]
+    return files, total
+
+async def list_blob_files(tenant_id: Optional[str], content_type: Optional[str], search: Optional[str],
+                          limit: Optional[int], offset: int) -> tuple:
+    """List files from the blob catalog, or from a live listing until the catalog is ready."""
+    if await run_db(blob_catalog_service.is_ready):
+        return await run_db(
+            blob_catalog_service.list_files,
+            tenant_id=tenant_id, content_type=content_type, search=search, limit=limit, offset=offset
+        )
+    files = await (async_blob_service.list_tenant_files(tenant_id) if tenant_id else async_blob_service.list_all_files())
+    return filter_file_list(files, content_type, search, limit, offset)
+
 @router.get("/blob/files/{tenant_id}")
 async def get_tenant_files(
     tenant_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    limit: Optional[int] = None,
+    offset: int = 0,
+    content_type: Optional[str] = None,
+    search: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
 ):
-    """Get all files for a specific tenant from Azure Blob Storage."""
+    """
+    Get files for a specific tenant from Azure Blob Storage.
+    
+    Optional filters: content_type, search (filename substring); paginate with limit/offset.
+    """
     try:
-        blob_service = AzureBlobService()
-        if not blob_service.is_available():
+        blob_service = async_blob_service
+        if not await blob_service.is_available():
             raise HTTPException(status_code=503, detail="Azure Blob Storage not available")
         
         # Check if user has access to this tenant's files
         if current_user.tenant_id != tenant_id and not current_user.is_admin:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        files = blob_service.list_tenant_files(tenant_id)
+        files, total = await list_blob_files(tenant_id, content_type, search, limit, offset)
         return {
             "status": "success",
             "tenant_id": tenant_id,
             "files": files,
-            "count": len(files)
+            "count": len(files),
+            "total": total
         }
     except HTTPException:
         raise
@@ -1690,23 +2057,27 @@ async def get_tenant_files(
 
 @router.get("/blob/files/admin")
 async def get_all_files_admin(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    limit: Optional[int] = None,
+    offset: int = 0,
+    content_type: Optional[str] = None,
+    search: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
 ):
     """Get all files from Azure Blob Storage (admin only)."""
     try:
         if not current_user.is_admin:
             raise HTTPException(status_code=403, detail="Admin access required")
         
-        blob_service = AzureBlobService()
-        if not blob_service.is_available():
+        blob_service = async_blob_service
+        if not await blob_service.is_available():
             raise HTTPException(status_code=503, detail="Azure Blob Storage not available")
         
-        files = blob_service.list_all_files()
+        files, total = await list_blob_files(None, content_type, search, limit, offset)
         return {
             "status": "success",
             "files": files,
-            "count": len(files)
+            "count": len(files),
+            "total": total
         }
     except HTTPException:
         raise
@@ -1768,8 +2139,7 @@ async def correct_extracted_value(
 @router.post("/ocr/enhanced/analyze-low-confidence")
 async def analyze_low_confidence_pairs(
     payload: Dict[str, Any] = Body(...),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ) -> Dict[str, Any]:
     """
     Analyze key-value pairs with confidence below 95% and provide suggestions.
@@ -1867,89 +2237,11 @@ async def analyze_low_confidence_pairs(
         updated_confidence_scores = results.pop("_updated_confidence_scores", {})
         
         # Automatically save analysis results to database cache for fast retrieval
-        try:
-            unique_file_id = payload.get("unique_file_id")
-            if unique_file_id and results:
-                import hashlib
-                file_hash = hashlib.sha256(unique_file_id.encode('utf-8')).hexdigest()
-                
-                # Strategy 1: Check by processing_id (if unique_file_id is processing_id)
-                cache_entry = db.query(ProcessedFile).filter(
-                    ProcessedFile.processing_id == unique_file_id,
-                    ProcessedFile.tenant_id == current_user.tenant_id
-                ).first()
-                
-                # Strategy 2: Check by processed_blob_path (most common - blob path is stable)
-                if not cache_entry:
-                    cache_entry = db.query(ProcessedFile).filter(
-                        ProcessedFile.processed_blob_path == unique_file_id,
-                        ProcessedFile.tenant_id == current_user.tenant_id
-                    ).first()
-                    if cache_entry:
-                        logger.info(f"✅ Found existing ProcessedFile by blob_path: {unique_file_id}")
-                
-                # Strategy 3: Check by file_hash
-                if not cache_entry:
-                    cache_entry = db.query(ProcessedFile).filter(
-                        ProcessedFile.file_hash == unique_file_id,
-                        ProcessedFile.tenant_id == current_user.tenant_id
-                    ).first()
-                
-                if cache_entry:
-                    # Update existing entry
-                    # Ensure processed_data is a dict
-                    if not isinstance(cache_entry.processed_data, dict):
-                        cache_entry.processed_data = {}
-                    
-                    # Update or create ai_analysis_cache
-                    cache_entry.processed_data["ai_analysis_cache"] = {
-                        "analysis_results": results,
-                        "timestamp": datetime.now().isoformat(),
-                        "filename": filename,
-                        "file_id": unique_file_id  # Store the unique_file_id for reference
-                    }
-                    
-                    # Update processing_id and processed_blob_path if they're missing
-                    if not cache_entry.processing_id:
-                        cache_entry.processing_id = unique_file_id
-                        logger.info(f"📝 Set processing_id: {unique_file_id}")
-                    if not cache_entry.processed_blob_path and unique_file_id.startswith(('blob_main/', 'main/')):
-                        cache_entry.processed_blob_path = unique_file_id
-                        logger.info(f"📝 Set processed_blob_path: {unique_file_id}")
-                    
-                    cache_entry.updated_at = datetime.utcnow()
-                    logger.info(f"💾 Updated existing cache entry for unique_file_id: {unique_file_id} (processing_id: {cache_entry.processing_id}, processed_blob_path: {cache_entry.processed_blob_path})")
-                else:
-                    # Create new cache entry
-                    new_entry = ProcessedFile(
-                        file_hash=file_hash,
-                        processing_id=unique_file_id,
-                        processed_blob_path=unique_file_id if unique_file_id.startswith(('blob_main/', 'main/')) else None,
-                        tenant_id=current_user.tenant_id,
-                        filename=filename,
-                        processed_data={
-                            "ai_analysis_cache": {
-                                "analysis_results": results,
-                                "timestamp": datetime.now().isoformat(),
-                                "filename": filename,
-                                "file_id": unique_file_id
-                            },
-                            "key_value_pairs": key_value_pairs,
-                            "confidence_scores": confidence_scores
-                        },
-                        created_at=datetime.utcnow()
-                    )
-                    db.add(new_entry)
-                    logger.info(f"💾 Created new cache entry for unique_file_id: {unique_file_id}")
-                
-                # Flush to ensure the data is in the database before commit
-                db.flush()
-                db.commit()
-                logger.info(f"💾 Auto-saved analysis cache for unique_file_id: {unique_file_id} (committed to database)")
-        except Exception as e:
-            logger.warning(f"Failed to auto-save analysis cache: {e}", exc_info=True)
-            db.rollback()
-            # Don't fail the request if cache save fails
+        unique_file_id = payload.get("unique_file_id")
+        if unique_file_id and results:
+            # Don't fail the request if cache save fails (logged by the service)
+            if await run_db(analysis_cache_service.save, current_user.tenant_id, unique_file_id, results, filename):
+                logger.info(f"💾 Auto-saved analysis cache for unique_file_id: {unique_file_id}")
         
         return {
             "status": "success",
@@ -1969,20 +2261,33 @@ async def analyze_low_confidence_pairs(
 @router.get("/blob/structure/{tenant_id}")
 async def get_folder_structure(
     tenant_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    path: Optional[str] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    current_user: User = Depends(get_current_active_user)
 ):
-    """Get folder structure for a specific tenant."""
+    """
+    Get folder structure for a specific tenant.
+    
+    With path, returns only that folder's subfolders and (paginated) files so the tree can be
+    expanded lazily.
+    """
     try:
-        blob_service = AzureBlobService()
-        if not blob_service.is_available():
+        blob_service = async_blob_service
+        if not await blob_service.is_available():
             raise HTTPException(status_code=503, detail="Azure Blob Storage not available")
         
         # Check if user has access to this tenant's files
         if current_user.tenant_id != tenant_id and not current_user.is_admin:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        structure = blob_service.get_folder_structure(tenant_id)
+        if await run_db(blob_catalog_service.is_ready):
+            if path is not None:
+                folder = await run_db(blob_catalog_service.list_folder, path, tenant_id, limit, offset)
+                return {"status": "success", "tenant_id": tenant_id, **folder}
+            structure = await run_db(blob_catalog_service.get_folder_structure, tenant_id)
+        else:
+            structure = await blob_service.get_folder_structure(tenant_id)
         return {
             "status": "success",
             "tenant_id": tenant_id,
@@ -1998,19 +2303,31 @@ async def get_folder_structure(
 
 @router.get("/blob/structure")
 async def get_all_folder_structure(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    path: Optional[str] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    current_user: User = Depends(get_current_active_user)
 ):
-    """Get complete folder structure (admin only)."""
+    """
+    Get complete folder structure (admin only).
+    
+    With path, returns only that folder's subfolders and (paginated) files.
+    """
     try:
         if not current_user.is_admin:
             raise HTTPException(status_code=403, detail="Admin access required")
         
-        blob_service = AzureBlobService()
-        if not blob_service.is_available():
+        blob_service = async_blob_service
+        if not await blob_service.is_available():
             raise HTTPException(status_code=503, detail="Azure Blob Storage not available")
         
-        structure = blob_service.get_folder_structure()
+        if await run_db(blob_catalog_service.is_ready):
+            if path is not None:
+                folder = await run_db(blob_catalog_service.list_folder, path, None, limit, offset)
+                return {"status": "success", **folder}
+            structure = await run_db(blob_catalog_service.get_folder_structure)
+        else:
+            structure = await blob_service.get_folder_structure()
         return {
             "status": "success",
             "structure": structure
@@ -2026,19 +2343,18 @@ async def get_all_folder_structure(
 @router.delete("/blob/files/{blob_name:path}")
 async def delete_blob_file(
     blob_name: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Delete a file from Azure Blob Storage."""
     try:
         if not current_user.is_admin:
             raise HTTPException(status_code=403, detail="Admin access required")
         
-        blob_service = AzureBlobService()
-        if not blob_service.is_available():
+        blob_service = async_blob_service
+        if not await blob_service.is_available():
             raise HTTPException(status_code=503, detail="Azure Blob Storage not available")
         
-        success = blob_service.delete_file(blob_name)
+        success = await blob_service.delete_file(blob_name)
         if success:
             return {"status": "success", "message": f"File {blob_name} deleted successfully"}
         else:
@@ -2061,15 +2377,15 @@ async def get_source_file_from_processed(
         # FastAPI automatically URL-decodes path parameters, but let's log it to verify
         logger.info(f"Looking for source file from processed file: {processed_blob_name}")
         
-        blob_service = AzureBlobService()
-        if not blob_service.is_available():
+        blob_service = async_blob_service
+        if not await blob_service.is_available():
             raise HTTPException(status_code=503, detail="Azure Blob Storage not available")
         
         # Check if user has access to the processed file
         if not check_blob_access(processed_blob_name, current_user):
             raise HTTPException(status_code=403, detail="Access denied")
         
-        source_blob_path = blob_service.find_source_file_from_processed(processed_blob_name)
+        source_blob_path = await blob_service.find_source_file_from_processed(processed_blob_name)
         
         if not source_blob_path:
             logger.warning(f"Source file not found for processed file: {processed_blob_name}")
@@ -2077,86 +2393,370 @@ async def get_source_file_from_processed(
         
         logger.info(f"Found source file: {source_blob_path} for processed file: {processed_blob_name}")
         
-        # Check if user has access to the source file
-        if not check_blob_access(source_blob_path, current_user):
-            raise HTTPException(status_code=403, detail="Access denied to source file")
+        # Check if user has access to the source file
+        if not check_blob_access(source_blob_path, current_user):
+            raise HTTPException(status_code=403, detail="Access denied to source file")
+        
+        return {
+            "status": "success",
+            "source_blob_path": source_blob_path,
+            "processed_blob_path": processed_blob_name
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting source file from processed file {processed_blob_name}: {e}")
+        import traceback
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="Failed to get source file")
+
+@router.post("/blob/source-links/backfill")
+async def backfill_source_links_endpoint(
+    dry_run: bool = False,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Queue the one-time backfill of source file links for legacy processed files (admin only)."""
+    try:
+        if not current_user.is_admin:
+            raise HTTPException(status_code=403, detail="Admin access required")
+        
+        task = celery_app.send_task("backfill_source_links", kwargs={"dry_run": dry_run}, queue="processing")
+        return {"status": "success", "task_id": task.id, "dry_run": dry_run}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error queuing source link backfill: {e}")
+        import traceback
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="Failed to queue source link backfill")
+
+@router.get("/blob/download/{blob_name:path}")
+async def download_blob_file(
+    blob_name: str,
+    detail: bool = True,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Download a file from Azure Blob Storage.
+    
+    The file is streamed chunk by chunk. Supports HTTP Range requests (PDF viewers seeking
+    pages) and ETag / If-None-Match revalidation (304 Not Modified).
+    
+    Processed JSON files stored in the compact format are returned as one JSON document
+    (gzip Content-Encoding when the client accepts it); detail=false skips the OCR detail.
+    """
+    try:
+        blob_service = async_blob_service
+        if not await blob_service.is_available():
+            raise HTTPException(status_code=503, detail="Azure Blob Storage not available")
+        
+        # Check if user has access to this file
+        if not check_blob_access(blob_name, current_user):
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        properties = await blob_service.get_blob_properties(blob_name)
+        if properties is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        
+        etag = properties.etag if properties.etag.startswith('"') else f'"{properties.etag}"'
+        compact_json = is_compact_metadata(properties.metadata)
+        if compact_json and not detail:
+            etag = f'{etag[:-1]}-summary"'
+        cache_headers = {
+            "ETag": etag,
+            # Browsers may keep the file but must revalidate with If-None-Match
+            "Cache-Control": "private, no-cache",
+            "Accept-Ranges": "bytes"
+        }
+        if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+            return Response(status_code=304, headers=cache_headers)
+        
+        if compact_json:
+            json_data = await blob_service.load_processed_json(blob_name, include_detail=detail)
+            if json_data is None:
+                raise HTTPException(status_code=404, detail="File not found")
+            
+            return await run_cpu(json_response, json_data, accept_encoding, headers={
+                "ETag": etag,
+                "Cache-Control": "private, no-cache",
+                "Content-Disposition": f"attachment; filename={blob_name.split('/')[-1]}"
+            })
+        
+        # Get filename from blob path
+        filename = blob_name.split('/')[-1]
+
+        # Determine content type from filename
+        # Handle filenames with timestamps: filename.ext_timestamp
+        # Remove timestamp pattern (YYYYMMDD_HHMMSS at the end)
+        timestamp_pattern = r'_\d{8}_\d{6}$'
+        clean_filename = re.sub(timestamp_pattern, '', filename)
+        
+        # Get extension
+        if '.' in clean_filename:
+            ext = clean_filename.rsplit('.', 1)[-1].lower()
+        else:
+            ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        
+        # Map extensions to MIME types
+        content_type_map = {
+            'pdf': 'application/pdf',
+            'png': 'image/png',
+            'jpg': 'image/jpeg',
+            'jpeg': 'image/jpeg',
+            'gif': 'image/gif',
+            'webp': 'image/webp',
+            'bmp': 'image/bmp',
+            'tiff': 'image/tiff',
+            'tif': 'image/tiff',
+        }
+        
+        media_type = content_type_map.get(ext, 'application/octet-stream')
+        
+        size = properties.size
+        try:
+            byte_range = parse_range_header(range_header, size) if size else None
+        except RangeNotSatisfiableError as e:
+            raise HTTPException(
+                status_code=416,
+                detail=str(e),
+                headers={"Content-Range": f"bytes */{e.size}"}
+            )
+        headers = {**cache_headers, "Content-Disposition": f"attachment; filename={filename}"}
+        if byte_range:
+            start, end = byte_range
+            downloader = await blob_service.open_download_stream(
+                blob_name, offset=start, length=end - start + 1, etag=properties.etag
+            )
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            status_code = 206
+        else:
+            downloader = await blob_service.open_download_stream(blob_name, etag=properties.etag)
+            headers["Content-Length"] = str(size)
+            status_code = 200
+        
+        if downloader is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        
+        return StreamingResponse(
+            downloader.chunks(),
+            status_code=status_code,
+            media_type=media_type,
+            headers=headers
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error downloading file {blob_name}: {e}")
+        import traceback
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="Failed to download file")
+
+async def resolve_result_location(result_id: str, current_user: User) -> Dict[str, Any]:
+    """Find the stored blobs of a result by processing ID or processed blob path (403/404 on failure)."""
+    location = await run_db(result_store_service.locate_result, result_id)
+    if location is None and "/processed/" in result_id:
+        # Results without a database row (synchronous batches) are fetched by blob path
+        location = {
+            "tenant_id": None,
+            "filename": None,
+            "processed_blob_path": result_id,
+            "source_blob_path": None,
+            "content_type": None
+        }
+    if location is None:
+        raise HTTPException(status_code=404, detail="Result not found")
+    
+    if not current_user.is_admin:
+        blob_paths = [path for path in (location["processed_blob_path"], location["source_blob_path"]) if path]
+        if (location["tenant_id"] and location["tenant_id"] != current_user.tenant_id) or \
+                not all(check_blob_access(path, current_user) for path in blob_paths):
+            raise HTTPException(status_code=403, detail="Access denied")
+    return location
+
+@router.get("/results/{result_id:path}/ocr-detail")
+async def get_result_ocr_detail(
+    result_id: str,
+    accept_encoding: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get the OCR detail (raw_ocr_results, raw_ocr_text) of a processing result.
+    
+    Args:
+        result_id: Processing ID or processed blob path of the result (as linked from
+            responses requested with include=)
+    """
+    try:
+        location = await resolve_result_location(result_id, current_user)
+        if not location["processed_blob_path"]:
+            raise HTTPException(status_code=404, detail="OCR detail not stored for this result")
+        
+        json_data = await async_blob_service.load_processed_json(location["processed_blob_path"])
+        if json_data is None:
+            raise HTTPException(status_code=404, detail="OCR detail not found")
+        
+        return await run_cpu(json_response, {
+            "status": "success",
+            "result_id": result_id,
+            **{key: json_data.get(key) for key in DETAIL_FIELDS}
+        }, accept_encoding)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error loading OCR detail of {result_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load OCR detail")
+
+@router.get("/results/{result_id:path}/source-file")
+async def get_result_source_file(
+    result_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get the original document of a processing result.
+    
+    Args:
+        result_id: Processing ID or processed blob path of the result (as linked from
+            responses requested with include=)
+    """
+    try:
+        location = await resolve_result_location(result_id, current_user)
+        
+        source_blob_path = location["source_blob_path"]
+        if source_blob_path:
+            properties = await async_blob_service.get_blob_properties(source_blob_path)
+            downloader = await async_blob_service.open_download_stream(
+                source_blob_path, etag=properties.etag
+            ) if properties is not None else None
+            if downloader is None:
+                raise HTTPException(status_code=404, detail="Source file not found")
+            content_type = location["content_type"] or properties.content_settings.content_type
+            return StreamingResponse(
+                downloader.chunks(),
+                media_type=content_type or "application/octet-stream",
+                headers={
+                    "Content-Length": str(properties.size),
+                    "Content-Disposition": f"attachment; filename={source_blob_path.split('/')[-1]}"
+                }
+            )
+        
+        # Without a source upload the only copy is embedded in the processed JSON
+        json_data = None
+        if location["processed_blob_path"]:
+            json_data = await async_blob_service.load_processed_json(location["processed_blob_path"])
+        low_confidence_data = (json_data or {}).get("low_confidence_data") or {}
+        if not low_confidence_data.get("source_file_base64"):
+            raise HTTPException(status_code=404, detail="Source file not stored for this result")
+        
+        content = await run_cpu(base64.b64decode, low_confidence_data["source_file_base64"])
+        return Response(
+            content=content,
+            media_type=low_confidence_data.get("source_file_content_type") or "application/octet-stream"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error loading source file of {result_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load source file")
+
+def parse_version_etag(if_match: Optional[str]) -> Optional[int]:
+    """Parse the result version from an If-Match header (3, "3" or W/"3")."""
+    if not if_match or if_match.strip() == "*":
+        return None
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="If-Match must be the result version")
+
+@router.get("/blob/fields/{blob_name:path}")
+async def get_processed_fields(
+    blob_name: str,
+    response: Response,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get the editable fields of a processed file and their version.
+    
+    The version is also returned as the ETag; send it as If-Match with PATCH to detect
+    edits made by someone else in the meantime.
+    """
+    try:
+        if not check_blob_access(blob_name, current_user):
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        fields = await run_db(processed_result_service.get_fields, blob_name)
+        if fields is None:
+            raise HTTPException(status_code=404, detail="Processed file not found")
         
+        version = fields.pop("version")
+        response.headers["ETag"] = f'"{version}"'
         return {
             "status": "success",
-            "source_blob_path": source_blob_path,
-            "processed_blob_path": processed_blob_name
+            "blob_path": blob_name,
+            "version": version,
+            "fields": fields
         }
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error getting source file from processed file {processed_blob_name}: {e}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
-        raise HTTPException(status_code=500, detail="Failed to get source file")
+        logger.error(f"Error loading fields of {blob_name}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load fields")
 
-@router.get("/blob/download/{blob_name:path}")
-async def download_blob_file(
+@router.patch("/blob/fields/{blob_name:path}")
+async def patch_processed_fields(
     blob_name: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    payload: Dict[str, Any] = Body(...),
+    if_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_active_user)
 ):
-    """Download a file from Azure Blob Storage."""
+    """
+    Apply a field-level edit to a processed file.
+    
+    Request body (all optional):
+    - updated_key_value_pairs: Dict of field keys to new values
+    - updated_confidence_scores: Dict of field keys to new confidence scores (0.0-1.0)
+    - correction_metadata: Dict of field keys to correction metadata
+    - last_correction: Last correction for the file
+    
+    Only the given fields are replaced. With If-Match, the edit is rejected with 412 if the
+    file changed since that version. The processed JSON blob is updated shortly afterwards.
+    """
     try:
-        blob_service = AzureBlobService()
-        if not blob_service.is_available():
-            raise HTTPException(status_code=503, detail="Azure Blob Storage not available")
-        
-        # Check if user has access to this file
         if not check_blob_access(blob_name, current_user):
             raise HTTPException(status_code=403, detail="Access denied")
         
-        file_data = blob_service.download_file(blob_name)
-        if file_data is None:
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        # Get filename from blob path
-        filename = blob_name.split('/')[-1]
-
-        # Determine content type from filename
-        # Handle filenames with timestamps: filename.ext_timestamp
-        # Remove timestamp pattern (YYYYMMDD_HHMMSS at the end)
-        timestamp_pattern = r'_\d{8}_\d{6}$'
-        clean_filename = re.sub(timestamp_pattern, '', filename)
-        
-        # Get extension
-        if '.' in clean_filename:
-            ext = clean_filename.rsplit('.', 1)[-1].lower()
-        else:
-            ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        expected_version = parse_version_etag(if_match)
+        result = await run_db(
+            processed_result_service.patch_fields, blob_name, payload, current_user.username, expected_version
+        )
+        if result["status"] == "not_found":
+            raise HTTPException(status_code=404, detail="Processed file not found")
+        if result["status"] == "conflict":
+            raise HTTPException(
+                status_code=412,
+                detail={"message": "The file was changed by someone else", "current_version": result["version"]}
+            )
         
-        # Map extensions to MIME types
-        content_type_map = {
-            'pdf': 'application/pdf',
-            'png': 'image/png',
-            'jpg': 'image/jpeg',
-            'jpeg': 'image/jpeg',
-            'gif': 'image/gif',
-            'webp': 'image/webp',
-            'bmp': 'image/bmp',
-            'tiff': 'image/tiff',
-            'tif': 'image/tiff',
+        response.headers["ETag"] = f'"{result["version"]}"'
+        return {
+            "status": "success",
+            "blob_path": blob_name,
+            "version": result["version"],
+            "updated_fields": len(payload.get("updated_confidence_scores") or {}),
+            "updated_values": len(payload.get("updated_key_value_pairs") or {})
         }
-        
-        media_type = content_type_map.get(ext, 'application/octet-stream')
-        
-        
-        return Response(
-            content=file_data,
-            media_type=media_type,
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error downloading file {blob_name}: {e}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
-        raise HTTPException(status_code=500, detail="Failed to download file")
+        logger.error(f"Error patching fields of {blob_name}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to update fields")
 
 @router.put("/blob/update-confidence-scores/{blob_name:path}")
 async def update_confidence_scores(
@@ -2170,27 +2770,44 @@ async def update_confidence_scores(
     Request body should contain:
     - updated_confidence_scores: Dict mapping field keys to new confidence scores (0.0-1.0)
     - updated_key_value_pairs: Optional dict of updated key-value pairs
+    
+    Files with a database row are edited field by field (see PATCH /blob/fields); the
+    whole-document rewrite below is only used for files processed without one.
     """
     try:
-        blob_service = AzureBlobService()
-        if not blob_service.is_available():
-            raise HTTPException(status_code=503, detail="Azure Blob Storage not available")
-        
         # Check if user has access to this file
         if not check_blob_access(blob_name, current_user):
             raise HTTPException(status_code=403, detail="Access denied")
         
-        # Download the current JSON file
-        json_data = blob_service.download_file(blob_name)
-        if json_data is None:
+        result = await run_db(
+            processed_result_service.patch_fields, blob_name, payload, current_user.username
+        )
+        if result["status"] == "updated":
+            return {
+                "status": "success",
+                "message": "Confidence scores updated successfully",
+                "updated_fields": len(payload.get("updated_confidence_scores") or {}),
+                "updated_values": len(payload.get("updated_key_value_pairs") or {}),
+                "blob_path": blob_name,
+                "version": result["version"]
+            }
+        
+        blob_service = async_blob_service
+        if not await blob_service.is_available():
+            raise HTTPException(status_code=503, detail="Azure Blob Storage not available")
+        
+        # Download the current JSON file (the summary only - the OCR detail is not changed)
+        properties = await blob_service.get_blob_properties(blob_name)
+        if properties is None:
             raise HTTPException(status_code=404, detail="Processed JSON file not found")
         
-        # Parse JSON
         try:
-            processed_data = json.loads(json_data.decode('utf-8'))
-        except json.JSONDecodeError as e:
+            processed_data = await blob_service.load_processed_json(blob_name, include_detail=False)
+        except ValueError as e:
             logger.error(f"Error parsing JSON from {blob_name}: {e}")
             raise HTTPException(status_code=500, detail="Invalid JSON file")
+        if processed_data is None:
+            raise HTTPException(status_code=404, detail="Processed JSON file not found")
         
         # Update confidence scores
         updated_confidence_scores = payload.get("updated_confidence_scores", {})
@@ -2237,14 +2854,9 @@ async def update_confidence_scores(
         processed_data["last_updated"] = datetime.now().isoformat()
         processed_data["updated_by"] = current_user.username
         
-        # Upload the updated JSON back to blob storage
-        blob_client = blob_service.blob_service_client.get_blob_client(
-            container=blob_service.container_name,
-            blob=blob_name
-        )
-        
-        updated_json_bytes = json.dumps(processed_data, indent=2).encode('utf-8')
-        blob_client.upload_blob(updated_json_bytes, overwrite=True)
+        # Upload the updated JSON back to blob storage in its stored format
+        if not await blob_service.save_processed_json(blob_name, processed_data, properties.metadata):
+            raise HTTPException(status_code=500, detail="Failed to save processed JSON file")
         
         logger.info(f"Successfully updated processed JSON: {blob_name}")
         
@@ -2266,8 +2878,8 @@ async def update_confidence_scores(
 async def get_blob_stats(current_user: User = Depends(get_current_active_user)):
     """Get statistics about uploaded files for the current user."""
     try:
-        blob_service = AzureBlobService()
-        if not blob_service.is_available():
+        blob_service = async_blob_service
+        if not await blob_service.is_available():
             return {
                 "status": "error",
                 "message": "Azure Blob Storage not available",
@@ -2279,8 +2891,13 @@ async def get_blob_stats(current_user: User = Depends(get_current_active_user)):
                 }
             }
         
+        # Precomputed counters once the blob catalog is populated
+        if await run_db(blob_catalog_service.is_ready):
+            stats = await run_db(blob_catalog_service.get_tenant_stats, current_user.tenant_id)
+            return {"status": "success", "stats": stats}
+        
         # Get all files for the tenant
-        files = blob_service.list_files_for_tenant(current_user.tenant_id)
+        files = await blob_service.list_files_for_tenant(current_user.tenant_id)
         
         # Calculate statistics
         total_files = len(files)
@@ -2316,23 +2933,30 @@ async def get_blob_stats(current_user: User = Depends(get_current_active_user)):
         raise HTTPException(status_code=500, detail="Failed to get blob statistics")
 
 @router.get("/blob/files")
-async def get_user_files(current_user: User = Depends(get_current_active_user)):
-    """Get all files uploaded by the current user."""
+async def get_user_files(
+    limit: Optional[int] = None,
+    offset: int = 0,
+    content_type: Optional[str] = None,
+    search: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get files uploaded by the current user's tenant (optionally filtered and paginated)."""
     try:
-        blob_service = AzureBlobService()
-        if not blob_service.is_available():
+        blob_service = async_blob_service
+        if not await blob_service.is_available():
             return {
                 "status": "error",
                 "message": "Azure Blob Storage not available",
                 "files": []
             }
         
-        files = blob_service.list_files_for_tenant(current_user.tenant_id)
+        files, total = await list_blob_files(current_user.tenant_id, content_type, search, limit, offset)
         
         return {
             "status": "success",
             "files": files,
-            "count": len(files)
+            "count": len(files),
+            "total": total
         }
         
     except Exception as e:
@@ -2344,13 +2968,12 @@ async def get_user_files(current_user: User = Depends(get_current_active_user)):
 
 @router.get("/blob/status")
 async def get_blob_storage_status(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Get Azure Blob Storage status and configuration details."""
     try:
-        blob_service = AzureBlobService()
-        status = blob_service.get_status()
+        blob_service = async_blob_service
+        status = await blob_service.get_status()
         
         return {
             "status": "success",
@@ -2362,6 +2985,254 @@ async def get_blob_storage_status(
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail="Failed to get blob storage status")
 
+@router.post("/blob/catalog/reconcile")
+async def reconcile_blob_catalog_endpoint(
+    current_user: User = Depends(get_current_active_user)
+):
+    """Queue a rebuild of the blob catalog from a full container listing (admin only)."""
+    try:
+        if not current_user.is_admin:
+            raise HTTPException(status_code=403, detail="Admin access required")
+        
+        task = celery_app.send_task("reconcile_blob_catalog", queue="processing")
+        return {
+            "status": "success",
+            "task_id": task.id,
+            "catalog_ready": await run_db(blob_catalog_service.is_ready)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error queuing blob catalog reconciliation: {e}")
+        import traceback
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="Failed to queue blob catalog reconciliation")
+
+@router.post("/blob/purge")
+async def create_purge_job(
+    payload: Dict[str, Any] = Body(...),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Queue a purge of blobs and their database records (admin only).
+    
+    Request body:
+    - tenant_id: Only purge this tenant's files (omit for all tenants)
+    - older_than_days: Only purge files last modified more than this many days ago
+    - dry_run: Only count what would be deleted (default true)
+    
+    At least one of tenant_id and older_than_days is required.
+    """
+    try:
+        if not current_user.is_admin:
+            raise HTTPException(status_code=403, detail="Admin access required")
+        
+        from services.purge_service import purge_service
+        older_than_days = payload.get("older_than_days")
+        try:
+            job = await run_db(
+                purge_service.create_job,
+                payload.get("tenant_id"),
+                int(older_than_days) if older_than_days is not None else None,
+                bool(payload.get("dry_run", True)),
+                current_user.username
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        task = celery_app.send_task("purge_blobs", kwargs={"job_id": job["job_id"]}, queue="processing")
+        return {"status": "success", "task_id": task.id, "job": job}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error queuing purge job: {e}")
+        import traceback
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="Failed to queue purge job")
+
+@router.get("/blob/purge/{job_id}")
+async def get_purge_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the progress of a purge job (admin only)."""
+    try:
+        if not current_user.is_admin:
+            raise HTTPException(status_code=403, detail="Admin access required")
+        
+        from services.purge_service import purge_service
+        job = await run_db(purge_service.get_job, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Purge job not found")
+        return {"status": "success", "job": job}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error loading purge job {job_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load purge job")
+
+@router.post("/blob/purge/{job_id}/resume")
+async def resume_purge_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Resume a failed or interrupted purge job from its stored cursor (admin only)."""
+    try:
+        if not current_user.is_admin:
+            raise HTTPException(status_code=403, detail="Admin access required")
+        
+        from services.purge_service import purge_service
+        try:
+            job = await run_db(purge_service.mark_resumable, job_id)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        if job is None:
+            raise HTTPException(status_code=404, detail="Purge job not found")
+        if job["status"] == "completed":
+            return {"status": "success", "job": job}
+        
+        task = celery_app.send_task("purge_blobs", kwargs={"job_id": job_id}, queue="processing")
+        return {"status": "success", "task_id": task.id, "job": job}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error resuming purge job {job_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to resume purge job")
+
+
+# ============================================================================
+# NULL FIELD STATISTICS ENDPOINTS
+# ============================================================================
+
+def resolve_stats_tenant(tenant_id: Optional[str], current_user: User) -> Optional[str]:
+    """Tenant whose statistics are read: the user's own, or for admins the requested one (None = all)."""
+    if current_user.is_admin:
+        return tenant_id
+    user_tenant_id = getattr(current_user, "tenant_id", None)
+    if not user_tenant_id or (tenant_id and tenant_id != user_tenant_id):
+        raise HTTPException(status_code=403, detail="Access denied")
+    return user_tenant_id
+
+def parse_date_param(value: Optional[str], name: str):
+    """Parse an ISO date (YYYY-MM-DD) parameter, rejecting malformed values with 400."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: expected YYYY-MM-DD")
+
+@router.get("/null-fields/statistics")
+async def get_null_field_statistics(
+    tenant_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    exact: bool = False,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get null required field statistics, from the daily rollup.
+    
+    exact=true aggregates the tracking rows instead (one SQL aggregate, cost grows with the
+    number of documents).
+    """
+    try:
+        from services.null_field_service import null_field_service
+        stats = await run_db(
+            null_field_service.get_null_field_statistics,
+            resolve_stats_tenant(tenant_id, current_user),
+            parse_date_param(date_from, "date_from"),
+            parse_date_param(date_to, "date_to"),
+            exact
+        )
+        return {"status": "success", "statistics": stats}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting null field statistics: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get null field statistics")
+
+@router.get("/null-fields/daily")
+async def get_null_field_daily_statistics(
+    tenant_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get null required field counts per day (for dashboards)."""
+    try:
+        from services.null_field_service import null_field_service
+        days = await run_db(
+            null_field_service.get_daily_statistics,
+            resolve_stats_tenant(tenant_id, current_user),
+            parse_date_param(date_from, "date_from"),
+            parse_date_param(date_to, "date_to")
+        )
+        return {"status": "success", "days": days}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting daily null field statistics: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get daily null field statistics")
+
+@router.get("/null-fields/documents")
+async def list_documents_with_null_fields(
+    tenant_id: Optional[str] = None,
+    limit: int = 100,
+    before_id: Optional[int] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """List documents with null required fields, newest first (pass next_before_id to get the next page)."""
+    try:
+        from services.null_field_service import null_field_service, NULL_DOCUMENTS_MAX_PAGE_SIZE
+        limit = max(1, min(limit, NULL_DOCUMENTS_MAX_PAGE_SIZE))
+        records = await run_db(
+            null_field_service.get_documents_with_null_fields,
+            resolve_stats_tenant(tenant_id, current_user),
+            limit,
+            before_id
+        )
+        documents = [
+            {
+                "id": record.id,
+                "processing_id": record.processing_id,
+                "tenant_id": record.tenant_id,
+                "filename": record.filename,
+                "null_field_count": record.null_field_count,
+                "null_field_names": record.null_field_names or [],
+                "created_at": record.created_at.isoformat() if record.created_at else None
+            }
+            for record in records
+        ]
+        return {
+            "status": "success",
+            "documents": documents,
+            "next_before_id": documents[-1]["id"] if len(documents) == limit else None
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listing documents with null fields: {e}")
+        raise HTTPException(status_code=500, detail="Failed to list documents with null fields")
+
+@router.post("/null-fields/rollup/rebuild")
+async def rebuild_null_field_rollup_endpoint(
+    tenant_id: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Queue a rebuild of the daily null field rollup from the tracking rows (admin only)."""
+    try:
+        if not current_user.is_admin:
+            raise HTTPException(status_code=403, detail="Admin access required")
+        
+        task = celery_app.send_task("rebuild_null_field_rollup", kwargs={"tenant_id": tenant_id}, queue="processing")
+        return {"status": "success", "task_id": task.id, "tenant_id": tenant_id}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error queuing null field rollup rebuild: {e}")
+        raise HTTPException(status_code=500, detail="Failed to queue null field rollup rebuild")
+
 
 # ============================================================================
 # TEMPLATE MAPPING ENDPOINTS
@@ -2370,8 +3241,7 @@ async def get_blob_storage_status(
 @router.post("/templates/upload")
 async def upload_template(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Upload an Excel template file for document mapping"""
     try:
@@ -2379,14 +3249,17 @@ async def upload_template(
         if not file.filename.endswith(('.xlsx', '.xls')):
             raise HTTPException(status_code=400, detail="Only Excel files (.xlsx, .xls) are supported")
         
-        # Read file data
-        file_data = await file.read()
+        # Read file data (size-checked while spooled)
+        with await ingest_upload(file) as upload:
+            file_data = await run_io(upload.read_bytes)
         
         # Initialize template mapper
         template_mapper = TemplateMapper()
         
         # Upload template
-        result = template_mapper.upload_template(
+        # Parsing the workbook with pandas is CPU-bound
+        result = await run_cpu(
+            template_mapper.upload_template,
             file_data=file_data,
             filename=file.filename,
             tenant_id=current_user.tenant_id
@@ -2401,6 +3274,8 @@ async def upload_template(
         else:
             raise HTTPException(status_code=400, detail=result["message"])
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading template: {e}")
         import traceback
@@ -2409,13 +3284,12 @@ async def upload_template(
 
 @router.get("/templates")
 async def list_templates(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """List all templates for the current tenant"""
     try:
         template_mapper = TemplateMapper()
-        templates = template_mapper.list_templates(current_user.tenant_id)
+        templates = await run_io(template_mapper.list_templates, current_user.tenant_id)
         
         return {
             "status": "success",
@@ -2430,13 +3304,12 @@ async def list_templates(
 @router.get("/templates/{template_id}")
 async def get_template(
     template_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Get template details and structure"""
     try:
         template_mapper = TemplateMapper()
-        template = template_mapper.get_template(template_id, current_user.tenant_id)
+        template = await run_io(template_mapper.get_template, template_id, current_user.tenant_id)
         
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
@@ -2457,13 +3330,12 @@ async def get_template(
 @router.delete("/templates/{template_id}")
 async def delete_template(
     template_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Delete a template"""
     try:
         template_mapper = TemplateMapper()
-        result = template_mapper.delete_template(template_id, current_user.tenant_id)
+        result = await run_io(template_mapper.delete_template, template_id, current_user.tenant_id)
         
         if result["success"]:
             return {
@@ -2485,15 +3357,15 @@ async def map_document_to_template(
     extracted_data: Dict[str, Any] = Body(...),
     document_id: str = Body(...),
     filename: str = Body(...),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Map extracted document data to template fields"""
     try:
         template_mapper = TemplateMapper()
         
         # Map document to template
-        mapping_result = template_mapper.map_document_to_template(
+        mapping_result = await run_io(
+            template_mapper.map_document_to_template,
             template_id=template_id,
             tenant_id=current_user.tenant_id,
             extracted_data=extracted_data,
@@ -2531,14 +3403,14 @@ async def update_mapped_values(
     template_id: str,
     document_id: str,
     updated_values: Dict[str, Any],
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Update mapped values for a document"""
     try:
         template_mapper = TemplateMapper()
         
-        result = template_mapper.update_mapped_values(
+        result = await run_io(
+            template_mapper.update_mapped_values,
             template_id=template_id,
             tenant_id=current_user.tenant_id,
             document_id=document_id,
@@ -2564,8 +3436,7 @@ async def update_mapped_values(
 async def export_consolidated_excel(
     template_id: str,
     mapping_results: List[Dict[str, Any]],
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Export consolidated Excel with all mapped documents"""
     try:
@@ -2586,7 +3457,8 @@ async def export_consolidated_excel(
             results.append(result)
         
         # Generate consolidated Excel
-        excel_data = template_mapper.generate_consolidated_excel(
+        excel_data = await run_cpu(
+            template_mapper.generate_consolidated_excel,
             template_id=template_id,
             tenant_id=current_user.tenant_id,
             mapping_results=results
@@ -2609,8 +3481,7 @@ async def export_consolidated_excel(
 async def map_from_ocr_text(
     template_id: str,
     payload: Dict[str, Any] = Body(...),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Map already-processed OCR text to a template using the LLM, without re-uploading the file.
 
@@ -2625,7 +3496,7 @@ async def map_from_ocr_text(
 
         # Build LLM-friendly template from tenant template
         template_mapper = TemplateMapper()
-        tenant_template = template_mapper.get_template(template_id, current_user.tenant_id)
+        tenant_template = await run_io(template_mapper.get_template, template_id, current_user.tenant_id)
         if not tenant_template:
             raise HTTPException(status_code=404, detail="Template not found for tenant")
 
@@ -2654,7 +3525,8 @@ async def map_from_ocr_text(
 
         # Post-process via TemplateMapper to ensure strict key set and confidence
         document_id = str(uuid.uuid4())
-        mapping_result = template_mapper.map_document_to_template(
+        mapping_result = await run_io(
+            template_mapper.map_document_to_template,
             template_id=template_id,
             tenant_id=current_user.tenant_id,
             extracted_data=processing_result.key_value_pairs,
@@ -2694,8 +3566,7 @@ async def map_from_ocr_text(
 async def export_mapped_document_excel(
     template_id: str,
     payload: Dict[str, Any] = Body(...),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Export a single mapped document as a Key-Value Pairs Excel using only visible extracted values."""
     try:
@@ -2713,7 +3584,8 @@ async def export_mapped_document_excel(
         }
 
         exporter = ExcelExporter()
-        excel_buffer = exporter.create_individual_excel(
+        excel_buffer = await run_cpu(
+            exporter.create_individual_excel,
             processed_data=processed_data,
             include_raw_text=False,
             include_metadata=True
@@ -2736,8 +3608,7 @@ async def export_mapped_document_excel(
 async def export_mapped_document_json(
     template_id: str,
     payload: Dict[str, Any] = Body(...),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Export a single mapped document as JSON with only visible extracted key-value pairs."""
     try:
@@ -2768,8 +3639,7 @@ async def process_with_template(
     enhance_quality: bool = Form(True),
     include_raw_text: bool = Form(False),
     include_metadata: bool = Form(True),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Process document with template mapping"""
     try:
@@ -2780,25 +3650,24 @@ async def process_with_template(
         
         logger.info(f"Processing document with template {template_id}: {file.filename}")
         
-        # Read file data
-        file_data = await file.read()
-        
-        # Process with Azure Computer Vision OCR
-        result = await ocr_from_path(
-            file_data=file_data,
-            original_filename=file.filename or "unknown",
-            ocr_engine="azure_computer_vision",
-            ground_truth="",
-            apply_preprocessing=apply_preprocessing,
-            enhance_quality=enhance_quality
-        )
+        # Spool the upload (size-checked while read) and stream it to OCR
+        with await ingest_upload(file) as upload:
+            file_size = upload.size
+            result = await ocr_from_path(
+                file_data=upload.open(),
+                original_filename=file.filename or "unknown",
+                ocr_engine="azure_computer_vision",
+                ground_truth="",
+                apply_preprocessing=apply_preprocessing,
+                enhance_quality=enhance_quality
+            )
         
         # Initialize enhanced text processor
         text_processor = EnhancedTextProcessor()
         
         # Load tenant template and build LLM-friendly structure
         template_mapper = TemplateMapper()
-        tenant_template = template_mapper.get_template(template_id, current_user.tenant_id)
+        tenant_template = await run_io(template_mapper.get_template, template_id, current_user.tenant_id)
         if not tenant_template:
             raise HTTPException(status_code=404, detail="Template not found for tenant")
         # Build fields map: { display name -> { type, description } }
@@ -2826,7 +3695,8 @@ async def process_with_template(
         
         # Create mapping status/metrics based on LLM output
         document_id = str(uuid.uuid4())
-        mapping_result = template_mapper.map_document_to_template(
+        mapping_result = await run_io(
+            template_mapper.map_document_to_template,
             template_id=template_id,
             tenant_id=current_user.tenant_id,
             extracted_data=processing_result.key_value_pairs,
@@ -2849,7 +3719,7 @@ async def process_with_template(
                     "file_info": {
                         "filename": file.filename,
                         "content_type": file.content_type,
-                        "size_bytes": len(file_data),
+                        "size_bytes": file_size,
                         "pages_processed": len(result.get("raw_ocr_results", []))
                     },
                     "extracted_values": filtered_public_values,
@@ -2881,7 +3751,8 @@ async def process_with_template(
                     } if include_metadata else None
                 }
                 
-                json_upload_result = blob_service.upload_processed_json(
+                json_upload_result = await run_io(
+                    blob_service.upload_processed_json,
                     json_data=processed_json_data,
                     filename=file.filename or "unknown",
                     tenant_id=current_user.tenant_id,
@@ -2941,6 +3812,8 @@ async def process_with_template(
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing document with template: {e}")
         raise HTTPException(status_code=500, detail="Failed to process document")
@@ -2982,7 +3855,7 @@ async def generate_report_summary(
             )
         
         # Generate PDF from summary text
-        pdf_content = _generate_pdf_from_summary(summary, kpi_data, status_breakdown, confidence_breakdown, table_data, selected_date)
+        pdf_content = await run_cpu(_generate_pdf_from_summary, summary, kpi_data, status_breakdown, confidence_breakdown, table_data, selected_date)
         
         # Create filename with timestamp
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -3640,8 +4513,7 @@ def _generate_pdf_from_summary(
 @router.post("/ocr/enhanced/save-analysis-cache")
 async def save_analysis_cache(
     cache_data: Dict[str, Any],
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Save AI analysis results to database cache for fast retrieval."""
     try:
@@ -3649,55 +4521,21 @@ async def save_analysis_cache(
         if not unique_file_id:
             raise HTTPException(status_code=400, detail="unique_file_id is required")
         
-        import hashlib
-        file_hash = hashlib.sha256(unique_file_id.encode('utf-8')).hexdigest()
-        
-        # Check if cache entry already exists
-        cache_entry = db.query(ProcessedFile).filter(
-            ProcessedFile.processing_id == unique_file_id
-        ).first()
-        
-        if cache_entry:
-            # Update existing entry
-            if isinstance(cache_entry.processed_data, dict):
-                cache_entry.processed_data["ai_analysis_cache"] = {
-                    "analysis_results": cache_data.get("analysis_results", {}),
-                    "timestamp": cache_data.get("timestamp", datetime.now().isoformat()),
-                    "filename": cache_data.get("filename", "unknown")
-                }
-            else:
-                cache_entry.processed_data = {
-                    "ai_analysis_cache": {
-                        "analysis_results": cache_data.get("analysis_results", {}),
-                        "timestamp": cache_data.get("timestamp", datetime.now().isoformat()),
-                        "filename": cache_data.get("filename", "unknown")
-                    }
-                }
-            cache_entry.updated_at = datetime.utcnow()
-        else:
-            # Create new cache entry in ProcessedFile table
-            new_entry = ProcessedFile(
-                file_hash=file_hash,
-                processing_id=unique_file_id,
-                tenant_id=current_user.tenant_id,
-                filename=cache_data.get("filename", "unknown"),
-                processed_data={
-                    "ai_analysis_cache": {
-                        "analysis_results": cache_data.get("analysis_results", {}),
-                        "timestamp": cache_data.get("timestamp", datetime.now().isoformat()),
-                        "filename": cache_data.get("filename", "unknown")
-                    },
-                    "key_value_pairs": cache_data.get("key_value_pairs", {}),
-                    "confidence_scores": cache_data.get("confidence_scores", {})
-                },
-                created_at=datetime.utcnow()
-            )
-            db.add(new_entry)
+        saved = await run_db(
+            analysis_cache_service.save,
+            current_user.tenant_id,
+            unique_file_id,
+            cache_data.get("analysis_results", {}),
+            cache_data.get("filename", "unknown")
+        )
+        if not saved:
+            raise HTTPException(status_code=500, detail="Failed to save analysis cache")
         
-        db.commit()
         logger.info(f"Saved analysis cache for unique_file_id: {unique_file_id}")
         return {"status": "success", "message": "Analysis cache saved"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error saving analysis cache: {e}")
         import traceback
@@ -3708,138 +4546,19 @@ async def save_analysis_cache(
 @router.get("/ocr/enhanced/get-analysis-cache/{unique_file_id:path}")
 async def get_analysis_cache(
     unique_file_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
-    """Get AI analysis results from database cache."""
-    try:
-        # URL decode the unique_file_id
-        decoded_unique_file_id = unquote(unique_file_id)
-        
-        logger.info(f"🔍 Searching for analysis cache with unique_file_id: {decoded_unique_file_id}")
-        
-        # Strategy 1: Query by processed_blob_path first (most common - this is what gets saved)
-        cache_entry = db.query(ProcessedFile).filter(
-            ProcessedFile.processed_blob_path == decoded_unique_file_id,
-            ProcessedFile.tenant_id == current_user.tenant_id
-        ).first()
-        if cache_entry:
-            logger.info(f"✅ Found cache entry by processed_blob_path (exact): {decoded_unique_file_id}")
-        
-        # Strategy 2: Query by processing_id (exact match)
-        if not cache_entry:
-            cache_entry = db.query(ProcessedFile).filter(
-                ProcessedFile.processing_id == decoded_unique_file_id,
-                ProcessedFile.tenant_id == current_user.tenant_id
-            ).first()
-            if cache_entry:
-                logger.info(f"✅ Found cache entry by processing_id: {decoded_unique_file_id}")
-        
-        # Strategy 3: Query by file_hash if unique_file_id is a hash
-        if not cache_entry and decoded_unique_file_id.startswith("hash_"):
-            hash_value = decoded_unique_file_id.replace("hash_", "")
-            cache_entry = db.query(ProcessedFile).filter(
-                ProcessedFile.file_hash == hash_value,
-                ProcessedFile.tenant_id == current_user.tenant_id
-            ).first()
-            if cache_entry:
-                logger.info(f"✅ Found cache entry by file_hash: {hash_value}")
-        
-        # Strategy 4: Search by stored file_id in ai_analysis_cache (check all entries for this tenant)
-        if not cache_entry:
-            all_files = db.query(ProcessedFile).filter(
-                ProcessedFile.tenant_id == current_user.tenant_id
-            ).all()
-            
-            for pf in all_files:
-                if isinstance(pf.processed_data, dict):
-                    ai_cache = pf.processed_data.get("ai_analysis_cache", {})
-                    stored_file_id = ai_cache.get("file_id")
-                    if stored_file_id and stored_file_id == decoded_unique_file_id:
-                        cache_entry = pf
-                        logger.info(f"✅ Found cache entry by stored file_id in ai_analysis_cache: {stored_file_id}")
-                        break
-        
-        # Strategy 5: Query by filename (exact match)
-        if not cache_entry:
-            cache_entry = db.query(ProcessedFile).filter(
-                ProcessedFile.filename == decoded_unique_file_id,
-                ProcessedFile.tenant_id == current_user.tenant_id
-            ).first()
-            if cache_entry:
-                logger.info(f"✅ Found cache entry by filename (exact): {decoded_unique_file_id}")
-        
-        # Strategy 6: Search by blob path pattern (blob paths may have different timestamps)
-        # Extract base path by removing timestamp suffix (e.g., _1766399457152)
-        if not cache_entry:
-            # Remove timestamp suffix from blob path (format: _1234567890)
-            base_path = re.sub(r'_\d+$', '', decoded_unique_file_id)
-            
-            # Query all files for this tenant and match by base path
-            all_files = db.query(ProcessedFile).filter(
-                ProcessedFile.tenant_id == current_user.tenant_id
-            ).all()
-            
-            for pf in all_files:
-                # Check if blob path base matches (ignoring timestamp suffix)
-                if pf.processed_blob_path:
-                    pf_base_path = re.sub(r'_\d+$', '', pf.processed_blob_path)
-                    if pf_base_path == base_path:
-                        if isinstance(pf.processed_data, dict) and pf.processed_data.get("ai_analysis_cache"):
-                            cache_entry = pf
-                            logger.info(f"✅ Found cache entry by blob path pattern match: {pf.processed_blob_path} (matched base: {base_path})")
-                            break
-                
-                # Also check processing_id and stored file_id in cache
-                if not cache_entry:
-                    if pf.processing_id and pf.processing_id == decoded_unique_file_id:
-                        if isinstance(pf.processed_data, dict) and pf.processed_data.get("ai_analysis_cache"):
-                            cache_entry = pf
-                            logger.info(f"✅ Found cache entry by processing_id match: {pf.processing_id}")
-                            break
-                    
-                    # Check file_id stored in ai_analysis_cache
-                    if isinstance(pf.processed_data, dict):
-                        ai_cache = pf.processed_data.get("ai_analysis_cache", {})
-                        stored_file_id = ai_cache.get("file_id")
-                        if stored_file_id:
-                            stored_base = re.sub(r'_\d+$', '', stored_file_id)
-                            if stored_base == base_path or stored_file_id == decoded_unique_file_id:
-                                cache_entry = pf
-                                logger.info(f"✅ Found cache entry by stored file_id: {stored_file_id}")
-                                break
-        
-        if not cache_entry:
-            logger.warning(f"❌ Analysis cache not found for unique_file_id: {decoded_unique_file_id}")
-            # Debug: Check if any entries exist for this tenant
-            count = db.query(ProcessedFile).filter(
-                ProcessedFile.tenant_id == current_user.tenant_id
-            ).count()
-            logger.info(f"🔍 Debug: Found {count} ProcessedFile entries for tenant {current_user.tenant_id}")
-            return {"status": "not_found", "message": "Analysis cache not found"}
-        
-        # Refresh the cache entry to ensure we have the latest data
-        db.refresh(cache_entry)
-        
-        # Check if user has access (same tenant or admin)
-        if cache_entry.tenant_id != current_user.tenant_id and not current_user.is_admin:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        processed_data = cache_entry.processed_data if isinstance(cache_entry.processed_data, dict) else {}
-        ai_cache = processed_data.get("ai_analysis_cache", {})
-        
+    """Get AI analysis results from database cache (one indexed lookup by tenant and normalized file ID)."""
+    try:
+        ai_cache = await run_db(analysis_cache_service.get, current_user.tenant_id, unique_file_id)
         if not ai_cache or not ai_cache.get("analysis_results"):
-            logger.warning(f"❌ No analysis_results in cache for: {decoded_unique_file_id}")
-            logger.info(f"🔍 Debug: processed_data keys: {list(processed_data.keys()) if isinstance(processed_data, dict) else 'not a dict'}")
-            logger.info(f"🔍 Debug: ai_cache keys: {list(ai_cache.keys()) if isinstance(ai_cache, dict) else 'not a dict'}")
-            logger.info(f"🔍 Debug: cache_entry.processing_id: {cache_entry.processing_id}")
-            logger.info(f"🔍 Debug: cache_entry.processed_blob_path: {cache_entry.processed_blob_path}")
+            logger.info(f"Analysis cache not found for unique_file_id: {unique_file_id}")
             return {"status": "not_found", "message": "Analysis cache not found"}
         
-        logger.info(f"✅ Found analysis cache with {len(ai_cache.get('analysis_results', {}))} results")
+        logger.info(f"✅ Found analysis cache with {len(ai_cache['analysis_results'])} results")
         return {
             "status": "success",
-            "analysis_results": ai_cache.get("analysis_results", {}),
+            "analysis_results": ai_cache["analysis_results"],
             "timestamp": ai_cache.get("timestamp"),
             "filename": ai_cache.get("filename", "unknown")
         }
@@ -3853,6 +4572,27 @@ async def get_analysis_cache(
         raise HTTPException(status_code=500, detail="Failed to get analysis cache")
 
 
+@router.post("/ocr/enhanced/analysis-cache/backfill")
+async def backfill_analysis_cache_endpoint(
+    dry_run: bool = False,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Queue the one-time copy of analysis results stored in processed files into the analysis cache (admin only)."""
+    try:
+        if not current_user.is_admin:
+            raise HTTPException(status_code=403, detail="Admin access required")
+        
+        task = celery_app.send_task("backfill_analysis_cache", kwargs={"dry_run": dry_run}, queue="processing")
+        return {"status": "success", "task_id": task.id, "dry_run": dry_run}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error queuing analysis cache backfill: {e}")
+        import traceback
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="Failed to queue analysis cache backfill")
+
+
 @router.post("/epic/exchange-token")
 async def exchange_epic_token(
     code: str = Body(..., description="Authorization code from Epic"),
@@ -3916,7 +4656,8 @@ async def exchange_epic_token(
         safe_secret = f"{epic_client_secret[:3]}...{epic_client_secret[-3:]}" if epic_client_secret and len(epic_client_secret) > 6 else "***"
         logger.info(f"Exchanging Epic Token - Client ID: {safe_client_id}, Redirect: {epic_redirect_uri}")
         
-        token_response = requests.post(
+        token_response = await run_io(
+            requests.post,
             epic_token_url,
             data=token_data,
             auth=(epic_client_id, epic_client_secret),
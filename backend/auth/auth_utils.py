@@ -5,8 +5,12 @@ from passlib.context import CryptContext
 import bcrypt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from models.database import get_db, User, UserSession
+from models.database import AsyncSessionLocal, User, UserSession
+from core.executors import run_io
+from services.principal_cache_service import principal_cache_service
 import secrets
 import uuid
 import os
@@ -80,7 +84,27 @@ def verify_token(token: str) -> Optional[dict]:
     except JWTError:
         return None
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
+async def _load_user(username: str) -> Optional[User]:
+    """Resolve a token subject to a user, from the principal cache when possible."""
+    principal = principal_cache_service.get(username)
+    if principal is None and principal_cache_service.use_redis:
+        principal = await run_io(principal_cache_service.get_shared, username)
+    if principal is not None:
+        return principal_cache_service.to_user(principal)
+
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(User).where(User.username == username))
+        user = result.scalars().first()
+    if user is None:
+        return None
+    principal = principal_cache_service.to_principal(user)
+    principal_cache_service.put(username, principal)
+    if principal_cache_service.use_redis:
+        await run_io(principal_cache_service.put_shared, username, principal)
+    # A fresh instance, as the tenant_id of the token is set on it below
+    return principal_cache_service.to_user(principal)
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get the current authenticated user."""
     token = credentials.credentials
     payload = verify_token(token)
@@ -100,7 +124,7 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = db.query(User).filter(User.username == username).first()
+    user = await _load_user(username)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -256,22 +280,22 @@ def get_authorized_email_user(current_user: User = Depends(get_current_active_us
     logger.info(f"Access granted for email: {user_email_lower}")
     return current_user
 
-def create_user_session(user_id: int, tenant_id: str, db: Session) -> str:
+async def create_user_session(user_id: int, tenant_id: str, db: AsyncSession) -> str:
     """Create or refresh a user session with a stable tenant_id per user.
     If a session with the same tenant_id exists, refresh last_activity and keep it active.
     """
     # Try to find existing session for this tenant_id
-    existing = db.query(UserSession).filter(
-        UserSession.tenant_id == tenant_id
-    ).first()
+    existing = (await db.execute(
+        select(UserSession).where(UserSession.tenant_id == tenant_id)
+    )).scalars().first()
     if existing:
         existing.is_active = True
         existing.last_activity = datetime.utcnow()
-        db.commit()
+        await db.commit()
         return existing.session_token
 
     # Otherwise, deactivate any sessions for this user and create a new one
-    db.query(UserSession).filter(UserSession.user_id == user_id).update({"is_active": False})
+    await db.execute(update(UserSession).where(UserSession.user_id == user_id).values(is_active=False))
     session_token = secrets.token_urlsafe(32)
     user_session = UserSession(
         user_id=user_id,
@@ -280,8 +304,8 @@ def create_user_session(user_id: int, tenant_id: str, db: Session) -> str:
         is_active=True
     )
     db.add(user_session)
-    db.commit()
-    db.refresh(user_session)
+    await db.commit()
+    await db.refresh(user_session)
     return session_token
 
 def get_user_by_tenant(tenant_id: str, db: Session) -> Optional[User]:
@@ -50,6 +50,13 @@ celery_config = {
         "core.celery_tasks.process_batch_documents": {"queue": "processing"},
         "core.celery_tasks.process_bulk_file": {"queue": "processing"},
         "core.celery_tasks.check_bulk_processing_source": {"queue": "processing"},
+        "core.celery_tasks.dispatch_bulk_queue": {"queue": "processing"},
+        "core.celery_tasks.reconcile_blob_catalog": {"queue": "processing"},
+        "core.celery_tasks.backfill_source_links": {"queue": "processing"},
+        "core.celery_tasks.backfill_analysis_cache": {"queue": "processing"},
+        "core.celery_tasks.rebuild_null_field_rollup": {"queue": "processing"},
+        "core.celery_tasks.sync_processed_snapshot": {"queue": "processing"},
+        "core.celery_tasks.purge_blobs": {"queue": "processing"},
     },
     # Worker settings
     "worker_max_tasks_per_child": 100,
@@ -69,6 +76,10 @@ celery_config = {
             "max_retries": 3,
         },
         "visibility_timeout": 3600,
+        # Priority lanes: interactive uploads (0) are consumed before bulk work (9)
+        "priority_steps": list(range(10)),
+        "sep": ":",
+        "queue_order_strategy": "priority",
         "fanout_prefix": True,
         "fanout_patterns": True,
         # Ensure we connect to master, not replica
@@ -96,16 +107,36 @@ else:
 
 celery_app.conf.update(celery_config)
 
-# Periodic tasks - runs every 5 minutes to check bulk processing/source folder
+# Periodic tasks - checks bulk processing/source folder for new files
+# With an ingestion watcher (INGESTION_WATCHER) new files are enqueued within seconds,
+# so the scan only runs as a low-frequency reconciliation sweep (hourly by default)
+INGESTION_WATCHER = os.getenv("INGESTION_WATCHER", "none").lower()
+BULK_SCAN_INTERVAL_SECONDS = float(os.getenv(
+    "BULK_SCAN_INTERVAL_SECONDS",
+    "300" if INGESTION_WATCHER in ("", "none") else "3600"
+))
+
+BLOB_CATALOG_RECONCILE_INTERVAL_SECONDS = float(os.getenv("BLOB_CATALOG_RECONCILE_INTERVAL_SECONDS", "86400"))
+
 celery_app.conf.beat_schedule = {
     'check-bulk-processing-source': {
         'task': 'check_bulk_processing_source',  # Task name registered in celery_tasks.py
-        'schedule': 300.0,  # Run every 5 minutes (300 seconds)
+        'schedule': BULK_SCAN_INTERVAL_SECONDS,
+    },
+    # Safety net for the fair scheduler: refills bulk capacity if a completion signal was missed
+    'dispatch-bulk-queue': {
+        'task': 'dispatch_bulk_queue',
+        'schedule': 10.0,
+    },
+    # Corrects drift in the blob catalog used for file listings, folder trees and stats
+    'reconcile-blob-catalog': {
+        'task': 'reconcile_blob_catalog',
+        'schedule': BLOB_CATALOG_RECONCILE_INTERVAL_SECONDS,
     },
 }
 
 logger.info(f"Celery app initialized with broker: {REDIS_URL}")
-logger.info("Bulk processing periodic task scheduled: check_bulk_processing_source (every 5 minutes)")
+logger.info(f"Bulk processing periodic task scheduled: check_bulk_processing_source (every {int(BULK_SCAN_INTERVAL_SECONDS)} seconds, watcher: {INGESTION_WATCHER})")
 
 
 def check_redis_connection():
@@ -142,4 +173,31 @@ def check_redis_connection():
     except Exception as e:
         logger.error(f"Redis connection failed: {REDIS_URL} - Error: {e}")
         logger.error("Please ensure Redis is running and accessible.")
-        return False
\ No newline at end of file
+        return False
+
+
+_redis_client = None
+
+
+def get_redis_client():
+    """
+    Get a process-wide Redis client for application data (locks, manifests, events).
+    
+    The client is created lazily on first use and shares its connection pool across
+    callers in the same process. Returns None if Redis cannot be reached.
+    """
+    global _redis_client
+    if _redis_client is not None:
+        return _redis_client
+    try:
+        import redis
+        _redis_client = redis.Redis.from_url(
+            REDIS_URL,
+            socket_connect_timeout=5,
+            socket_timeout=5,
+            decode_responses=True
+        )
+        return _redis_client
+    except Exception as e:
+        logger.error(f"Failed to create Redis client for {REDIS_URL}: {e}")
+        return None
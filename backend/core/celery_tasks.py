@@ -5,19 +5,67 @@ import uuid
 import json
 import base64
 import asyncio
+import hashlib
+import os
 import sys
 from datetime import datetime
-from typing import Dict, Any, List
-from core.celery_app import celery_app
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+from celery.signals import task_postrun, worker_init, worker_process_init
+from core.celery_app import celery_app, get_redis_client
 from utility.utils import ocr_from_path, calculate_ocr_confidence, calculate_key_value_pair_confidence_scores
 from core.enhanced_text_processor import EnhancedTextProcessor
 from services.azure_blob_service import AzureBlobService
 from services.template_mapper import TemplateMapper
 from services.null_field_service import null_field_service
+from services.single_flight_service import single_flight_service
+from services.bulk_manifest_service import bulk_manifest_service
+from services.fair_scheduler import fair_scheduler, LANE_INTERACTIVE, LANE_BULK
+from services.task_events_service import task_events_service
+from services.result_store_service import result_store_service
 
 
 logger = logging.getLogger(__name__)
 
+# How long a bulk blob stays claimed after being queued (covers queue wait + task time limit)
+BULK_CLAIM_TTL_SECONDS = int(os.getenv("BULK_CLAIM_TTL_SECONDS", "1800"))
+# Content of bulk-lane documents waiting in the fair scheduler's Redis sub-queues is spooled
+# here and only its path is queued (the directory must be shared by the API and the workers)
+TASK_PAYLOAD_DIR = Path(os.getenv(
+    "TASK_PAYLOAD_DIR", str(Path(__file__).resolve().parent.parent / "data" / "task_payloads")
+))
+
+
+def _task_tenant_id(kwargs: Dict[str, Any]) -> Optional[str]:
+    """Get the tenant a processing task belongs to from its kwargs."""
+    if not kwargs:
+        return None
+    if kwargs.get("tenant_id"):
+        return kwargs["tenant_id"]
+    if kwargs.get("blob_name"):
+        return tenant_from_bulk_blob_name(kwargs["blob_name"])
+    return None
+
+
+class ProgressTask(celery_app.Task):
+    """Task base class that also publishes state transitions as tenant progress events."""
+    
+    # Only these meta keys are sent to clients; full results stay in the result backend
+    EVENT_META_KEYS = ("message", "step", "filename", "error", "current", "total", "progress")
+    
+    def update_state(self, task_id=None, state=None, meta=None, **kwargs):
+        super().update_state(task_id=task_id, state=state, meta=meta, **kwargs)
+        try:
+            event_meta = {k: v for k, v in (meta or {}).items() if k in self.EVENT_META_KEYS}
+            task_events_service.publish(
+                _task_tenant_id(self.request.kwargs),
+                task_id or self.request.id,
+                state,
+                event_meta
+            )
+        except Exception as e:
+            logger.debug(f"Could not publish progress event: {e}")
+
 
 def run_async_in_celery(coro):
     """
@@ -54,7 +102,113 @@ def run_async_in_celery(coro):
             loop.close()
 
 
-@celery_app.task(bind=True, name="process_document", queue="processing")
+def spool_task_payload(task_id: str, file_bytes: bytes) -> str:
+    """Write a queued task's document to TASK_PAYLOAD_DIR and return its path."""
+    TASK_PAYLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    path = TASK_PAYLOAD_DIR / task_id
+    path.write_bytes(file_bytes)
+    return str(path)
+
+
+def discard_task_payload(file_path: Optional[str]):
+    """Remove a spooled task document (once its task has run or was never queued)."""
+    if not file_path:
+        return
+    try:
+        Path(file_path).unlink(missing_ok=True)
+    except OSError as e:
+        logger.warning(f"Could not remove task payload {file_path}: {e}")
+
+
+def submit_process_document(
+    file_bytes: bytes,
+    filename: str,
+    tenant_id: str,
+    content_type: str = "application/octet-stream",
+    lane: str = LANE_INTERACTIVE,
+    file_hash: Optional[str] = None,
+    **task_kwargs
+) -> Dict[str, Any]:
+    """
+    Submit a process_document task with single-flight deduplication.
+    
+    If an identical file (same tenant and SHA-256) is already being processed by a
+    task, no new task is created and the caller is attached to the in-flight one.
+    
+    Args:
+        file_bytes: Raw document bytes
+        filename: Original filename
+        tenant_id: Tenant identifier
+        content_type: MIME type of the file
+        lane: Scheduling lane (LANE_INTERACTIVE or LANE_BULK)
+        file_hash: SHA-256 of file_bytes if already computed (e.g. while the upload was spooled)
+        **task_kwargs: Extra process_document options (apply_preprocessing, template_id, ...)
+        
+    Returns:
+        Dict with task_id, processing_id and whether the submission was deduplicated
+    """
+    file_hash = file_hash or hashlib.sha256(file_bytes).hexdigest()
+    task_id = str(uuid.uuid4())
+    processing_id = str(uuid.uuid4())
+    
+    acquired, existing_owner = single_flight_service.acquire(tenant_id, file_hash, {
+        "token": task_id,
+        "task_id": task_id,
+        "processing_id": processing_id,
+        "filename": filename,
+        "template_id": task_kwargs.get("template_id")
+    })
+    if (not acquired and existing_owner and existing_owner.get("task_id")
+            and existing_owner.get("template_id") == task_kwargs.get("template_id")):
+        logger.info(f"Attaching {filename} to in-flight task {existing_owner['task_id']} (hash: {file_hash[:16]}...)")
+        if task_kwargs.get("manifest_source"):
+            # Same content is already being processed - record this source file too
+            bulk_manifest_service.mark_processed(
+                source_blob_name=task_kwargs["manifest_source"],
+                source_etag=task_kwargs.get("manifest_version"),
+                tenant_id=tenant_id,
+                filename=filename
+            )
+        return {
+            "task_id": existing_owner["task_id"],
+            "processing_id": existing_owner.get("processing_id"),
+            "deduplicated": True,
+            "original_filename": existing_owner.get("filename")
+        }
+    
+    # Bulk work can wait in Redis for a long time: queue a pointer instead of the content
+    file_path = spool_task_payload(task_id, file_bytes) if lane == LANE_BULK else None
+    try:
+        fair_scheduler.submit(
+            task_name="process_document",
+            task_id=task_id,
+            kwargs={
+                "file_data": None if file_path else base64.b64encode(file_bytes).decode('utf-8'),
+                "file_path": file_path,
+                "filename": filename,
+                "tenant_id": tenant_id,
+                "processing_id": processing_id,
+                "content_type": content_type,
+                "file_hash": file_hash if acquired else None,
+                **task_kwargs
+            },
+            tenant_id=tenant_id,
+            lane=lane
+        )
+    except Exception:
+        # Don't leave followers attached to a task that was never queued
+        single_flight_service.release(tenant_id, file_hash, task_id)
+        discard_task_payload(file_path)
+        raise
+    
+    return {
+        "task_id": task_id,
+        "processing_id": processing_id,
+        "deduplicated": False
+    }
+
+
+@celery_app.task(bind=True, base=ProgressTask, name="process_document", queue="processing")
 def process_document(
     self,
     file_data: str,  # Base64 encoded file data (for Celery serialization only)
@@ -66,7 +220,11 @@ def process_document(
     include_raw_text: bool = True,
     include_metadata: bool = True,
     template_id: str = None,
-    content_type: str = "application/octet-stream"
+    content_type: str = "application/octet-stream",
+    file_hash: str = None,
+    manifest_source: str = None,
+    manifest_version: str = None,
+    file_path: str = None
 ) -> Dict[str, Any]:
     """
     Process a single document with OCR and AI extraction.
@@ -74,7 +232,8 @@ def process_document(
     
     Args:
         self: Task instance
-        file_data: Base64 encoded document bytes (for Celery serialization only - decoded before OCR)
+        file_data: Base64 encoded document bytes (for Celery serialization only - decoded before OCR),
+            or None if the document was spooled to file_path
         filename: Original filename
         tenant_id: Tenant identifier
         processing_id: Unique processing ID
@@ -84,6 +243,10 @@ def process_document(
         include_metadata: Include processing metadata
         template_id: Optional template ID for structured extraction
         content_type: MIME type of the file
+        file_hash: SHA-256 of the file if this task owns its single-flight lock
+        manifest_source: Bulk manifest key of the source file (local watcher files), recorded on completion
+        manifest_version: Version of the source file for the manifest entry
+        file_path: Spooled document (bulk-lane submissions); removed once the task has run
         
     Returns:
         Dict with processing results
@@ -93,7 +256,7 @@ def process_document(
         
         # Decode base64 file data (base64 is only for Celery message serialization)
         # OCR processing receives raw file bytes directly
-        file_bytes = base64.b64decode(file_data)
+        file_bytes = base64.b64decode(file_data) if file_data else Path(file_path).read_bytes()
         
         # Update task state
         self.update_state(
@@ -105,16 +268,23 @@ def process_document(
         blob_service = AzureBlobService()
         if blob_service.is_available():
             existing_file = blob_service.check_file_exists_by_hash(file_bytes, tenant_id)
-            if existing_file and existing_file.get("processed_data"):
-                logger.info(f"⚠️ Duplicate file detected: {filename} - Returning existing processed data")
+            if existing_file:
+                logger.info(f"⚠️ Duplicate file detected: {filename} - Returning receipt for existing processed data")
+                
+                if manifest_source:
+                    bulk_manifest_service.mark_processed(
+                        source_blob_name=manifest_source,
+                        source_etag=manifest_version,
+                        tenant_id=tenant_id,
+                        filename=filename
+                    )
                 
-                # Return existing processed data
-                processed_data = existing_file.get("processed_data", {})
-                return {
+                # The existing result stays in the store; the API loads it from the receipt
+                processed_blob_path = existing_file.get("processed_blob_path")
+                receipt = result_store_service.make_receipt({
                     "status": "completed",
-                    "duplicate": True,
-                    "message": "File already processed - returned existing data",
                     "processing_id": existing_file.get("processing_id"),
+                    "filename": filename,
                     "file_info": {
                         "filename": filename,
                         "content_type": content_type,
@@ -122,45 +292,27 @@ def process_document(
                         "original_filename": existing_file.get("filename"),
                         "first_processed": existing_file.get("created_at")
                     },
-                    "key_value_pairs": processed_data.get("key_value_pairs", {}),
-                    "key_value_pair_confidence_scores": processed_data.get("key_value_pair_confidence_scores", {}),
-                    "summary": processed_data.get("summary", ""),
-                    "confidence_score": processed_data.get("confidence_score", 0.0),
+                    "confidence_score": existing_file.get("confidence_score"),
                     "ocr_confidence_score": existing_file.get("ocr_confidence_score"),
-                    "document_classification": processed_data.get("document_classification", "Unknown"),
-                    "processing_info": processed_data.get("processing_info", {}),
-                    "metadata": processed_data.get("metadata", {}),
                     "blob_storage": {
                         "source": {"blob_path": existing_file.get("source_blob_path"), "duplicate": True},
-                        "processed_json": {"blob_path": existing_file.get("processed_blob_path"), "duplicate": True}
+                        "processed_json": {
+                            "success": bool(processed_blob_path),
+                            "blob_path": processed_blob_path,
+                            "duplicate": True
+                        }
                     }
-                }
-        
-        # Step 2: Upload to source folder (if not duplicate)
-        self.update_state(
-            state="PROCESSING",
-            meta={"message": f"Uploading source file: {filename}", "step": "upload_source"}
-        )
+                }, tenant_id, existing_file["file_hash"], persisted_in_db=True)
+                receipt.update({
+                    "duplicate": True,
+                    "message": "File already processed - returned existing data"
+                })
+                return receipt
         
+        # Source file is uploaded once, after OCR, straight to its confidence folder
         source_blob_info = None
-        try:
-            if blob_service.is_available():
-                source_blob_info = blob_service.upload_source_document(
-                    file_data=file_bytes,
-                    filename=filename,
-                    tenant_id=tenant_id,
-                    processing_id=processing_id,
-                    content_type=content_type
-                )
-                if source_blob_info.get("duplicate"):
-                    logger.info(f"⚠️ Source file already exists: {filename} - Reusing existing blob")
-                else:
-                    logger.info(f"✓ Uploaded new source file: {filename}")
-        except Exception as e:
-            logger.warning(f"Azure Blob Storage error (non-critical): {e}")
-            source_blob_info = {"success": False, "error": str(e), "skipped": True}
         
-        # Step 3: Process with OCR (file passed directly to Document Intelligence)
+        # Step 2: Process with OCR (file passed directly to Document Intelligence)
         self.update_state(
             state="PROCESSING",
             meta={"message": f"Running OCR for {filename}", "step": "ocr"}
@@ -261,33 +413,46 @@ def process_document(
         
         # Log low-confidence pairs count (file_data is already base64 string)
         if low_confidence_pairs:
+            if not file_data:
+                file_data = base64.b64encode(file_bytes).decode('utf-8')
             logger.info(f"Identified {len(low_confidence_pairs)} low-confidence pairs for {filename} - ready for manual analysis")
         
-        # Reorganize source file based on confidence score if it was uploaded
-        # FIRST check the confidence score, THEN move the file to the correct folder
-        if source_blob_info and source_blob_info.get("success") and source_blob_info.get("blob_path"):
-            logger.info(f"[CHECK] Checking confidence score for source file: {ocr_confidence_score}")
-            try:
-                blob_service = AzureBlobService()
-                if blob_service.is_available():
-                    new_blob_path = blob_service.reorganize_source_file_by_confidence(
-                        blob_path=source_blob_info["blob_path"],
-                        tenant_id=tenant_id,
-                        processing_id=processing_id,
-                        filename=filename,
-                        confidence_score=ocr_confidence_score
-                    )
-                    if new_blob_path:
-                        source_blob_info["blob_path"] = new_blob_path
-                        logger.info(f"[SUCCESS] Reorganized source file to: {new_blob_path}")
-                    else:
-                        logger.warning(f"[WARNING] Failed to reorganize source file - returned None")
+        # Upload source file now that the confidence score (and so the target folder) is known
+        self.update_state(
+            state="PROCESSING",
+            meta={"message": f"Uploading source file: {filename}", "step": "upload_source"}
+        )
+        try:
+            if blob_service.is_available():
+                source_blob_info = blob_service.upload_source_document(
+                    file_data=file_bytes,
+                    filename=filename,
+                    tenant_id=tenant_id,
+                    processing_id=processing_id,
+                    content_type=content_type,
+                    confidence_score=ocr_confidence_score
+                )
+                if source_blob_info.get("success"):
+                    logger.info(f"✓ Uploaded source file: {filename} to {source_blob_info['blob_path']}")
                 else:
-                    logger.warning(f"[WARNING] Azure Blob Storage not available for reorganization")
-            except Exception as e:
-                logger.error(f"[ERROR] Failed to reorganize source file by confidence: {e}")
-                import traceback
-                logger.error(f"Traceback: {traceback.format_exc()}")
+                    logger.warning(f"Failed to upload source file: {source_blob_info.get('error')}")
+        except Exception as e:
+            logger.warning(f"Azure Blob Storage error (non-critical): {e}")
+            source_blob_info = {"success": False, "error": str(e), "skipped": True}
+        
+        # Template mapping results (stored with the processed JSON and returned to the client)
+        template_info = None
+        if mapping_result:
+            template_info = {
+                "template_id": template_id,
+                "mapping_result": {
+                    "document_id": mapping_result.document_id,
+                    "mapped_values": mapping_result.mapped_values,
+                    "confidence_scores": mapping_result.confidence_scores,
+                    "unmapped_fields": mapping_result.unmapped_fields,
+                    "processing_timestamp": mapping_result.processing_timestamp
+                }
+            }
         
         # Step 5: Upload processed JSON
         self.update_state(
@@ -329,17 +494,19 @@ def process_document(
                         "has_low_confidence_pairs": len(low_confidence_pairs) > 0,
                         "low_confidence_pairs": low_confidence_pairs,
                         "low_confidence_scores": low_confidence_scores_filtered,
-                        "source_file_base64": file_data,  # file_data is already base64 string
+                        "source_file_base64": file_data,  # base64 string (encoded above for spooled files)
                         "source_file_content_type": content_type,
                         "count": len(low_confidence_pairs)
-                    } if low_confidence_pairs else None
+                    } if low_confidence_pairs else None,
+                    "template_info": template_info
                 }
                 
                 json_upload_result = blob_service.upload_processed_json(
                     json_data=processed_json_data,
                     filename=filename,
                     tenant_id=tenant_id,
-                    processing_id=processing_id
+                    processing_id=processing_id,
+                    source_blob_path=source_blob_info.get("blob_path") if source_blob_info and source_blob_info.get("success") else None
                 )
                 
                 # Store null field tracking data in separate table
@@ -417,27 +584,35 @@ def process_document(
                 "has_low_confidence_pairs": len(low_confidence_pairs) > 0,
                 "low_confidence_pairs": low_confidence_pairs,
                 "low_confidence_scores": low_confidence_scores_filtered,
-                "source_file_base64": file_data,  # file_data is already base64 string
+                "source_file_base64": file_data,  # base64 string (encoded above for spooled files)
                 "source_file_content_type": content_type,
                 "count": len(low_confidence_pairs)
             } if low_confidence_pairs else None
         }
         
         # Add template mapping results if available
-        if mapping_result:
-            result["template_info"] = {
-                "template_id": template_id,
-                "mapping_result": {
-                    "document_id": mapping_result.document_id,
-                    "mapped_values": mapping_result.mapped_values,
-                    "confidence_scores": mapping_result.confidence_scores,
-                    "unmapped_fields": mapping_result.unmapped_fields,
-                    "processing_timestamp": mapping_result.processing_timestamp
-                }
-            }
+        if template_info:
+            result["template_info"] = template_info
+        
+        # Keep the full payload out of the Redis result backend: persist it and return a receipt
+        # (the API serves the full result from the processed JSON blob / ProcessedFile row)
+        content_hash = file_hash or hashlib.sha256(file_bytes).hexdigest()
+        persisted = result_store_service.save_processed_file(result, tenant_id, content_hash, filename)
+        receipt = result_store_service.make_receipt(result, tenant_id, content_hash, persisted)
+        
+        # Record bulk source files once their result is stored, so failed files are retried
+        json_uploaded = bool(json_upload_result and json_upload_result.get("success"))
+        if manifest_source and (persisted or json_uploaded):
+            bulk_manifest_service.mark_processed(
+                source_blob_name=manifest_source,
+                source_etag=manifest_version,
+                tenant_id=tenant_id,
+                filename=filename,
+                processed_blob_path=json_upload_result.get("blob_path") if json_uploaded else None
+            )
         
         logger.info(f"Document processing completed: {filename}")
-        return result
+        return receipt
         
     except Exception as e:
         logger.error(f"Error processing document {filename}: {e}")
@@ -446,9 +621,13 @@ def process_document(
             meta={"error": str(e), "filename": filename}
         )
         raise
+    finally:
+        if file_hash:
+            single_flight_service.release(tenant_id, file_hash, self.request.id)
+        discard_task_payload(file_path)
 
 
-@celery_app.task(bind=True, name="process_batch_documents", queue="processing")
+@celery_app.task(bind=True, base=ProgressTask, name="process_batch_documents", queue="processing")
 def process_batch_documents(
     self,
     files_data: List[str],  # List of base64 encoded file data (for Celery serialization only)
@@ -488,36 +667,38 @@ def process_batch_documents(
         task_results = []
         task_ids = []
         
+        # Same lane choice and quota check as batch uploads through the API
+        lane = fair_scheduler.lane_for_batch(total_files)
+        allowed, retry_after = fair_scheduler.check_admission(tenant_id, lane, incoming=total_files)
+        if not allowed:
+            raise ValueError(f"Too many documents are queued for tenant {tenant_id} - retry in {retry_after} seconds")
+        
         # Step 1: Submit all tasks to queue without waiting (PARALLEL)
         logger.info(f"Submitting {total_files} tasks to Celery workers for parallel processing...")
         
         for idx, (file_bytes, filename) in enumerate(zip(files_bytes, filenames)):
             try:
-                # Generate processing ID for this file
-                processing_id = str(uuid.uuid4())
                 content_type = (content_types[idx] if content_types and idx < len(content_types) 
                               else "application/octet-stream")
                 
-                # Encode file as base64 for Celery message serialization only
-                # OCR processing receives raw bytes after decoding
-                file_data_b64 = base64.b64encode(file_bytes).decode('utf-8')
-                
                 # Submit task to queue (this returns immediately, doesn't wait)
-                async_result = process_document.delay(
-                    file_data=file_data_b64,
+                # Identical files already in flight are attached to the existing task
+                submission = submit_process_document(
+                    file_bytes=file_bytes,
                     filename=filename,
                     tenant_id=tenant_id,
-                    processing_id=processing_id,
+                    content_type=content_type,
+                    lane=lane,
                     apply_preprocessing=apply_preprocessing,
                     enhance_quality=enhance_quality,
                     include_raw_text=include_raw_text,
-                    include_metadata=include_metadata,
-                    content_type=content_type
+                    include_metadata=include_metadata
                 )
+                async_result = process_document.AsyncResult(submission["task_id"])
                 
                 task_results.append(async_result)
                 task_ids.append(async_result.id)
-                logger.info(f"Submitted task {idx + 1}/{total_files}: {filename} (Task ID: {async_result.id})")
+                logger.info(f"Submitted task {idx + 1}/{total_files}: {filename} (Task ID: {async_result.id}, deduplicated: {submission['deduplicated']})")
                 
             except Exception as e:
                 logger.error(f"Error submitting task for {filename}: {e}")
@@ -612,11 +793,28 @@ def process_batch_documents(
         raise
 
 
-@celery_app.task(bind=True, name="process_bulk_file", queue="processing")
+def tenant_from_bulk_blob_name(blob_name: str) -> str:
+    """
+    Get the tenant a bulk source blob belongs to.
+    
+    For bulk uploads, tenant_id might be in the path (a part starting with "tenant_"),
+    otherwise the default bulk tenant is used.
+    """
+    tenant_id = "tenant_2"  # Default tenant_id for bulk uploads
+    if "/" in blob_name:
+        for part in blob_name.split("/"):
+            if part.startswith("tenant_"):
+                tenant_id = part
+                break
+    return tenant_id
+
+
+@celery_app.task(bind=True, base=ProgressTask, name="process_bulk_file", queue="processing")
 def process_bulk_file(
     self,
     blob_name: str,
-    filename: str
+    filename: str,
+    source_etag: str = None
 ) -> Dict[str, Any]:
     """
     Process a single file from bulk processing/source folder.
@@ -625,6 +823,7 @@ def process_bulk_file(
         self: Task instance
         blob_name: Full blob path (e.g., "bulk processing/source/file.pdf")
         filename: Original filename
+        source_etag: ETag of the source blob when it was picked up by the scan
         
     Returns:
         Dict with processing results
@@ -761,22 +960,15 @@ def process_bulk_file(
         }
         
         # Extract tenant_id from blob_name if available, otherwise use default
-        # For bulk uploads, tenant_id might be in the path or we use default
-        tenant_id = "tenant_2"  # Default tenant_id for bulk uploads
-        # Try to extract from blob_name if it contains tenant info
-        if "/" in blob_name:
-            path_parts = blob_name.split("/")
-            # Check if any part looks like tenant_id (starts with "tenant_")
-            for part in path_parts:
-                if part.startswith("tenant_"):
-                    tenant_id = part
-                    break
+        tenant_id = tenant_from_bulk_blob_name(blob_name)
         
         json_upload_result = blob_service.upload_bulk_processed_json(
             json_data=processed_json_data,
             filename=filename,
             confidence_score=ocr_confidence_score,
-            tenant_id=tenant_id
+            tenant_id=tenant_id,
+            source_blob_name=blob_name,
+            source_etag=source_etag
         )
         
         if not json_upload_result.get("success"):
@@ -817,6 +1009,7 @@ def process_bulk_file(
             "raw_ocr_text": ocr_result.get("combined_text", ""),
             "raw_ocr_results": ocr_result.get("raw_ocr_results", []),
             "blob_storage": {
+                "source": {"success": True, "blob_path": blob_name},
                 "processed_json": json_upload_result
             },
             "low_confidence_data": {
@@ -829,8 +1022,13 @@ def process_bulk_file(
             } if low_confidence_pairs else None
         }
         
+        # Return a receipt; the full payload (incl. the base64 source copy) lives in the processed JSON blob
+        content_hash = hashlib.sha256(file_bytes).hexdigest()
+        persisted = result_store_service.save_processed_file(result, tenant_id, content_hash, filename)
+        receipt = result_store_service.make_receipt(result, tenant_id, content_hash, persisted)
+        
         logger.info(f"[BULK] Successfully processed bulk file: {filename} (confidence: {ocr_confidence_score})")
-        return result
+        return receipt
         
     except Exception as e:
         logger.error(f"[BULK] Error processing bulk file {filename}: {e}")
@@ -841,11 +1039,105 @@ def process_bulk_file(
         raise
 
 
+def claim_bulk_source(source: str, version: Optional[str], filename: str) -> bool:
+    """
+    Claim a bulk source file version for submission (expires after BULK_CLAIM_TTL_SECONDS).
+    
+    A file whose processing fails is not recorded in the manifest, so it is submitted
+    again by a later scan once its claim has expired.
+    
+    Returns:
+        True if the caller should submit the file, False if it is already queued
+    """
+    redis_client = get_redis_client()
+    if redis_client is None:
+        return True
+    try:
+        if not redis_client.set(f"bulk:claimed:{source}:{version or ''}", "1", nx=True, ex=BULK_CLAIM_TTL_SECONDS):
+            logger.info(f"[BULK] {filename} is already queued, not submitting again")
+            return False
+    except Exception as e:
+        logger.warning(f"[BULK] Could not claim {source} in Redis, submitting anyway: {e}")
+    return True
+
+
+def enqueue_bulk_file(blob_name: str, filename: str, source_etag: str = None) -> Optional[str]:
+    """
+    Submit a process_bulk_file task unless the same blob version is already queued.
+    
+    Shared by the ingestion watchers and the periodic reconciliation sweep so a file
+    picked up by one is not submitted again by the other while it is still in flight.
+    
+    Args:
+        blob_name: Full blob path (e.g., "bulk processing/source/file.pdf")
+        filename: Original filename
+        source_etag: ETag of the source blob
+        
+    Returns:
+        Task ID if a task was submitted, None if the blob is already queued
+    """
+    if not claim_bulk_source(blob_name, source_etag, filename):
+        return None
+    
+    # Bulk files go through the tenant's fair-scheduling sub-queue
+    task_id = str(uuid.uuid4())
+    fair_scheduler.submit(
+        task_name="process_bulk_file",
+        task_id=task_id,
+        kwargs={"blob_name": blob_name, "filename": filename, "source_etag": source_etag},
+        tenant_id=tenant_from_bulk_blob_name(blob_name),
+        lane=LANE_BULK
+    )
+    return task_id
+
+
+@celery_app.task(name="dispatch_bulk_queue", queue="processing")
+def dispatch_bulk_queue() -> Dict[str, Any]:
+    """
+    Periodic task that feeds queued bulk work to the workers (weighted round-robin per tenant).
+    Dispatch also happens on every bulk submission and completion; this covers missed signals.
+    """
+    dispatched = fair_scheduler.dispatch()
+    return {"status": "completed", "dispatched": dispatched}
+
+
+@worker_init.connect
+def _report_connection_budget(sender=None, **extra):
+    """Log the database connections this worker's child processes may open."""
+    from models.database import connection_budget
+    concurrency = getattr(sender, "concurrency", None) or 1
+    logger.info(f"Database connection budget of this worker ({concurrency} child process(es)): "
+                f"{connection_budget(api_workers=0, celery_children=concurrency)}")
+
+
+@worker_process_init.connect
+def _configure_child_database(**extra):
+    """Give each prefork child its own small connection pool instead of the inherited one."""
+    from models.database import configure_worker_engine
+    configure_worker_engine()
+
+
+@task_postrun.connect
+def _record_task_finished(sender=None, task_id=None, task=None, kwargs=None, state=None, **extra):
+    """
+    Publish the final state of processing tasks and clear them from the
+    fair scheduler's backlog and in-flight sets.
+    """
+    if task is None or task.name not in ("process_document", "process_bulk_file", "process_batch_documents"):
+        return
+    tenant_id = _task_tenant_id(kwargs)
+    if state:
+        task_events_service.publish(tenant_id, task_id, state)
+    if task.name != "process_batch_documents":
+        fair_scheduler.task_finished(task_id, tenant_id)
+
+
 @celery_app.task(bind=True, name="check_bulk_processing_source", queue="processing")
 def check_bulk_processing_source(self) -> Dict[str, Any]:
     """
     Periodic task to check bulk processing/source folder for new files and process them.
-    This task runs every 5 minutes via Celery Beat.
+    This task runs via Celery Beat every 5 minutes, or hourly as a reconciliation sweep
+    when an ingestion watcher (services/ingestion_watcher.py) is enqueuing files.
     
     Returns:
         Dict with processing summary
@@ -876,6 +1168,15 @@ def check_bulk_processing_source(self) -> Dict[str, Any]:
         
         logger.info(f"[BULK] Found {len(source_files)} file(s) in bulk processing/source folder")
         
+        # Load the manifest entries of the listed blobs; backfill it from existing processed blobs on first use
+        source_blob_names = [file_info["blob_name"] for file_info in source_files]
+        processed_keys = bulk_manifest_service.get_processed_keys(source_blob_names)
+        if processed_keys is not None and not processed_keys and bulk_manifest_service.is_empty():
+            processed_base_names = blob_service.list_bulk_processed_base_names()
+            if processed_base_names:
+                bulk_manifest_service.backfill(source_files, processed_base_names)
+                processed_keys = bulk_manifest_service.get_processed_keys(source_blob_names)
+        
         # Filter out already processed files
         new_files = []
         skipped_files = []
@@ -884,7 +1185,13 @@ def check_bulk_processing_source(self) -> Dict[str, Any]:
             blob_name = file_info["blob_name"]
             filename = file_info["name"]
             
-            if blob_service.check_file_processed(blob_name):
+            if processed_keys is not None:
+                already_processed = bulk_manifest_service.is_processed(processed_keys, blob_name, file_info.get("etag"))
+            else:
+                # Manifest unavailable - fall back to scanning processed folders
+                already_processed = blob_service.check_file_processed(blob_name)
+            
+            if already_processed:
                 logger.info(f"[BULK] Skipping {filename} - already processed")
                 skipped_files.append(filename)
             else:
@@ -911,12 +1218,15 @@ def check_bulk_processing_source(self) -> Dict[str, Any]:
             filename = file_info["name"]
             
             try:
-                # Submit processing task
-                task_result = process_bulk_file.delay(blob_name=blob_name, filename=filename)
-                logger.info(f"[BULK] Submitted processing task for {filename} (Task ID: {task_result.id})")
+                # Submit processing task (skipped if a watcher already queued this file)
+                task_id = enqueue_bulk_file(blob_name=blob_name, filename=filename, source_etag=file_info.get("etag"))
+                if not task_id:
+                    skipped_files.append(filename)
+                    continue
+                logger.info(f"[BULK] Submitted processing task for {filename} (Task ID: {task_id})")
                 processed_results.append({
                     "filename": filename,
-                    "task_id": task_result.id,
+                    "task_id": task_id,
                     "status": "submitted"
                 })
             except Exception as e:
@@ -949,3 +1259,113 @@ def check_bulk_processing_source(self) -> Dict[str, Any]:
             "files_processed": 0
         }
 
+
+
+@celery_app.task(name="reconcile_blob_catalog", queue="processing", time_limit=3600, soft_time_limit=3540)
+def reconcile_blob_catalog() -> Dict[str, Any]:
+    """
+    Periodic task that rebuilds the blob catalog (and per-tenant counters) from a full
+    container listing, correcting entries missed by the upload/move/delete hooks.
+    """
+    from services.blob_catalog_service import blob_catalog_service
+    
+    blob_service = AzureBlobService()
+    if not blob_service.is_available():
+        logger.warning("[CATALOG] Azure Blob Storage not available - skipping reconciliation")
+        return {"status": "skipped", "reason": "Azure Blob Storage not available"}
+    
+    try:
+        result = blob_catalog_service.reconcile(blob_service.container_client)
+        return {"status": "completed", **result}
+    except Exception as e:
+        logger.error(f"[CATALOG] Blob catalog reconciliation failed: {e}")
+        return {"status": "failed", "error": str(e)}
+
+
+@celery_app.task(name="backfill_source_links", queue="processing", time_limit=3600, soft_time_limit=3540)
+def backfill_source_links(dry_run: bool = False) -> Dict[str, Any]:
+    """
+    One-time task that records source file links (blob metadata + ProcessedFile) for
+    processed JSON blobs written before links were persisted at processing time.
+    """
+    from services.source_link_service import source_link_service
+    
+    blob_service = AzureBlobService()
+    if not blob_service.is_available():
+        logger.warning("Azure Blob Storage not available - skipping source link backfill")
+        return {"status": "skipped", "reason": "Azure Blob Storage not available"}
+    
+    try:
+        result = source_link_service.backfill(blob_service.container_client, dry_run=dry_run)
+        return {"status": "completed", "dry_run": dry_run, **result}
+    except Exception as e:
+        logger.error(f"Source link backfill failed: {e}")
+        return {"status": "failed", "error": str(e)}
+
+
+@celery_app.task(name="backfill_analysis_cache", queue="processing", time_limit=3600, soft_time_limit=3540)
+def backfill_analysis_cache(dry_run: bool = False) -> Dict[str, Any]:
+    """
+    One-time task that copies AI analysis results stored in ProcessedFile.processed_data
+    into the indexed analysis cache table.
+    """
+    from services.analysis_cache_service import analysis_cache_service
+    
+    try:
+        result = analysis_cache_service.backfill(dry_run=dry_run)
+        return {"status": "completed", "dry_run": dry_run, **result}
+    except Exception as e:
+        logger.error(f"Analysis cache backfill failed: {e}")
+        return {"status": "failed", "error": str(e)}
+
+
+@celery_app.task(name="rebuild_null_field_rollup", queue="processing", time_limit=1800, soft_time_limit=1740)
+def rebuild_null_field_rollup(tenant_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Recompute the daily null field rollup from NullFieldTracking (initial fill for
+    documents tracked before the rollup existed).
+    """
+    try:
+        rows = null_field_service.rebuild_rollup(tenant_id)
+        return {"status": "completed", "tenant_id": tenant_id, "rollup_rows": rows}
+    except Exception as e:
+        logger.error(f"Null field rollup rebuild failed: {e}")
+        return {"status": "failed", "error": str(e)}
+
+
+@celery_app.task(bind=True, name="sync_processed_snapshot", queue="processing", max_retries=3)
+def sync_processed_snapshot(self, processed_blob_path: str) -> Dict[str, Any]:
+    """
+    Write-behind task that copies field-level edits of a result (ProcessedFile.processed_data)
+    into its processed JSON blob.
+    """
+    from services.processed_result_service import processed_result_service
+    
+    blob_service = AzureBlobService()
+    if not blob_service.is_available():
+        raise self.retry(countdown=30)
+    
+    result = processed_result_service.write_snapshot(processed_blob_path, blob_service)
+    if result["status"] == "failed":
+        logger.warning(f"Snapshot of {processed_blob_path} failed ({result.get('reason')}) - retrying")
+        raise self.retry(countdown=10)
+    return result
+
+
+@celery_app.task(name="purge_blobs", queue="processing")
+def purge_blobs(job_id: str) -> Dict[str, Any]:
+    """
+    Run a purge job (batched blob deletes + record cleanup) for one time slice, then
+    re-queue it from its stored cursor until it is finished.
+    """
+    from services.purge_service import purge_service
+    
+    blob_service = AzureBlobService()
+    if not blob_service.is_available():
+        logger.warning(f"[PURGE] Azure Blob Storage not available - retrying job {job_id} later")
+        purge_blobs.apply_async(kwargs={"job_id": job_id}, queue="processing", countdown=60)
+        return {"status": "deferred", "job_id": job_id}
+    
+    if not purge_service.run(job_id, blob_service.container_client):
+        purge_blobs.apply_async(kwargs={"job_id": job_id}, queue="processing")
+    return purge_service.get_job(job_id) or {"status": "not_found", "job_id": job_id}
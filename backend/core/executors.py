@@ -0,0 +1,189 @@
+"""
+Bounded executors for blocking work done by the async API endpoints.
+
+Every blocking call made from an async route goes through one of these size-limited
+thread pools, so it never runs on the event loop and one kind of work cannot starve
+another:
+
+- db: SQLAlchemy sessions and queries (sized to the connection pool)
+- cpu: PDF/Excel builds, pandas parsing, hashing, confidence scoring
+- io: local file reads/writes and blocking network clients (blob storage, Redis, LLM)
+
+An event-loop lag monitor measures how late the loop wakes up from a short sleep; the
+readings, the executor stats and the database pool usage are exported in Prometheus text
+format by /api/v1/metrics.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedExecutor:
+    """A named, size-limited thread pool with simple usage counters."""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"api-{name}")
+        # Only updated from the event loop thread
+        self.in_flight = 0
+        self.completed = 0
+        self.busy_seconds = 0.0
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking callable in this pool (with the caller's context variables)."""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._executor, call)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self.busy_seconds += time.perf_counter() - started
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "in_flight": self.in_flight,
+            # Calls waiting for a free thread
+            "queued": max(self.in_flight - self.max_workers, 0),
+            "completed": self.completed,
+            "busy_seconds": round(self.busy_seconds, 3)
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+db_executor = BoundedExecutor("db", int(os.getenv("API_DB_THREADS", "10")))
+cpu_executor = BoundedExecutor("cpu", int(os.getenv("API_CPU_THREADS", str(min(os.cpu_count() or 2, 8)))))
+io_executor = BoundedExecutor("io", int(os.getenv("API_IO_THREADS", "16")))
+
+EXECUTORS = (db_executor, cpu_executor, io_executor)
+
+
+async def run_db(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking database call in the db pool."""
+    return await db_executor.run(func, *args, **kwargs)
+
+
+async def run_cpu(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run CPU-heavy work in the cpu pool."""
+    return await cpu_executor.run(func, *args, **kwargs)
+
+
+async def run_io(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run blocking file or network I/O in the io pool."""
+    return await io_executor.run(func, *args, **kwargs)
+
+
+class EventLoopLagMonitor:
+    """Measures event-loop lag: how much later than requested a short sleep returns."""
+
+    def __init__(self, interval: float = 0.5, window: int = 120):
+        self.interval = interval
+        self.window = window
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._recent = []
+        self._task: Optional[asyncio.Task] = None
+        # Lag above this is logged as a warning
+        self.warn_threshold = float(os.getenv("EVENT_LOOP_LAG_WARN_SECONDS", "0.5"))
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - started - self.interval, 0.0)
+            self.last_lag = lag
+            self._recent.append(lag)
+            if len(self._recent) > self.window:
+                self._recent.pop(0)
+            self.max_lag = max(self._recent)
+            if lag > self.warn_threshold:
+                logger.warning(f"Event loop was blocked for {lag:.3f}s")
+
+    def start(self):
+        """Start monitoring on the running loop (API startup)."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "last_seconds": round(self.last_lag, 6),
+            # Over the last `window` samples
+            "max_seconds": round(self.max_lag, 6)
+        }
+
+
+loop_lag_monitor = EventLoopLagMonitor(interval=float(os.getenv("EVENT_LOOP_LAG_INTERVAL_SECONDS", "0.5")))
+
+
+def render_metrics() -> str:
+    """Render event-loop lag and executor stats in Prometheus text format."""
+    lag = loop_lag_monitor.stats()
+    lines = [
+        "# HELP api_event_loop_lag_seconds Delay of the last event-loop lag probe.",
+        "# TYPE api_event_loop_lag_seconds gauge",
+        f"api_event_loop_lag_seconds {lag['last_seconds']}",
+        "# HELP api_event_loop_lag_max_seconds Largest event-loop lag over the recent window.",
+        "# TYPE api_event_loop_lag_max_seconds gauge",
+        f"api_event_loop_lag_max_seconds {lag['max_seconds']}"
+    ]
+    metrics = (
+        ("api_executor_max_workers", "gauge", "Threads in the executor.", "max_workers"),
+        ("api_executor_in_flight", "gauge", "Calls submitted and not finished.", "in_flight"),
+        ("api_executor_queued", "gauge", "Calls waiting for a free thread.", "queued"),
+        ("api_executor_completed_total", "counter", "Calls finished.", "completed"),
+        ("api_executor_busy_seconds_total", "counter", "Time spent by finished calls, including queueing.", "busy_seconds")
+    )
+    for metric, metric_type, description, key in metrics:
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        for executor in EXECUTORS:
+            lines.append(f'{metric}{{executor="{executor.name}"}} {executor.stats()[key]}')
+    lines.extend(_render_pool_metrics())
+    return "\n".join(lines) + "\n"
+
+
+def _render_pool_metrics():
+    """Database pool usage of this process (engines without a client-side pool are skipped)."""
+    from models.database import pool_status
+    pools = {name: stats for name, stats in pool_status().items() if stats.get("mode") == "pooled"}
+    lines = []
+    metrics = (
+        ("api_db_pool_size", "Connections kept in the pool.", "pool_size"),
+        ("api_db_pool_checked_out", "Connections in use.", "checked_out"),
+        ("api_db_pool_checked_in", "Idle connections in the pool.", "checked_in"),
+        ("api_db_pool_overflow", "Connections opened beyond the pool size.", "overflow")
+    )
+    for metric, description, key in metrics:
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} gauge")
+        for name, stats in pools.items():
+            lines.append(f'{metric}{{engine="{name}"}} {stats[key]}')
+    return lines
+
+
+def shutdown_executors():
+    """Stop the executor threads (API shutdown)."""
+    for executor in EXECUTORS:
+        executor.shutdown()
@@ -5,7 +5,7 @@ This code uses Prebuilt Read operations with the Azure AI Document Intelligence
 
 import asyncio
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Union, BinaryIO
 import numpy as np
 
 from azure.core.credentials import AzureKeyCredential
@@ -51,7 +51,7 @@ class AzureDocumentIntelligenceOCR:
         """Check if the OCR engine is available."""
         return self.client is not None
     
-    async def extract_text(self, file_data: bytes, filename: str = "") -> Dict[str, Any]:
+    async def extract_text(self, file_data: Union[bytes, BinaryIO], filename: str = "") -> Dict[str, Any]:
         """Extract text from file (PDF, image) using Azure Document Intelligence with positioning."""
         if not self.client:
             raise ValueError("Azure Document Intelligence client not initialized")
@@ -160,9 +160,9 @@ class AzureDocumentIntelligenceOCR:
             logger.error(f"Azure Document Intelligence OCR failed for {filename}: {e}")
             raise
     
-    def _analyze_document_sync(self, file_content: bytes):
+    def _analyze_document_sync(self, file_content: Union[bytes, BinaryIO]):
         """
-        Synchronous wrapper for document analysis.
+        Synchronous wrapper for document analysis (file bytes or a file handle, which is streamed).
         Passes raw file bytes directly to Document Intelligence - exactly like:
         with open(file_path, "rb") as file:
             file_content = file.read()
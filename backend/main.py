@@ -5,13 +5,18 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import uvicorn
 import logging
+import os
 from api.router import router as ocr_router
 from api.auth import router as auth_router
 from utility.config import Config, setup_logging
 from auth.admin_setup import create_default_admin, create_test_user, create_or_update_admin_email
-from core.celery_app import check_redis_connection
+from core.celery_app import celery_app, check_redis_connection
 from services.epic_fhir_service import EpicFHIRService
-from models.database import create_tables
+from services.null_field_service import null_field_service
+from models.database import create_tables, connection_budget, pool_status, engine, async_engine
+from services.async_azure_blob_service import async_blob_service
+from core.executors import loop_lag_monitor, shutdown_executors
+from utility.upload_spool import RequestSizeLimitMiddleware
 
 # Setup logging
 logger = setup_logging()
@@ -34,6 +39,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized upload bodies before they are parsed
+app.add_middleware(RequestSizeLimitMiddleware)
+
 # Include routers
 app.include_router(ocr_router)
 app.include_router(auth_router)
@@ -53,6 +61,14 @@ async def startup_event():
         logger.warning("The application will continue, but database operations may fail.")
         logger.warning("Please check your database connection settings and network connectivity.")
     
+    # Report the database connections all API workers and Celery children may open
+    budget = connection_budget(
+        api_workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        celery_children=int(os.getenv("CELERY_CONCURRENCY", "4"))
+    )
+    logger.info(f"Database connection budget: {budget}")
+    logger.info(f"Database pools of this worker: {pool_status()}")
+    
     # Check Redis connection
     logger.info("Checking Redis connection...")
     if not check_redis_connection():
@@ -61,6 +77,14 @@ async def startup_event():
     else:
         logger.info("Redis connection verified!")
     
+    # Fill the null field rollup once (documents tracked before it existed)
+    try:
+        if null_field_service.claim_initial_fill():
+            celery_app.send_task("rebuild_null_field_rollup", queue="processing")
+            logger.info("Queued the initial fill of the null field rollup")
+    except Exception as e:
+        logger.warning(f"Could not queue the initial fill of the null field rollup: {e}")
+    
     # Create default users
     logger.info("Creating default admin and test user accounts...")
     try:
@@ -72,8 +96,18 @@ async def startup_event():
         logger.warning(f"Could not create default users: {e}")
         logger.warning("Users may need to be created manually once database is available.")
     
+    loop_lag_monitor.start()
     logger.info("OCR API server ready!")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release connection pools and executor threads held by the API process."""
+    await loop_lag_monitor.stop()
+    await async_blob_service.close()
+    shutdown_executors()
+    await async_engine.dispose()
+    engine.dispose()
+
 @app.get("/")
 async def root():
     """Root endpoint with API information."""
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Migration script adding the generated processed_files.confidence_score column to an existing database.
+
+Adding a STORED generated column rewrites the whole processed_files table under an
+ACCESS EXCLUSIVE lock, so it is not run on application startup. Run it once during a
+maintenance window; new databases get the column from create_tables() and need nothing.
+
+Usage:
+    python migrate_processed_confidence.py
+"""
+
+import sys
+
+from sqlalchemy import text
+
+from models.database import engine, PROCESSED_CONFIDENCE_EXPRESSION
+
+ADD_COLUMN = (
+    "ALTER TABLE processed_files ADD COLUMN IF NOT EXISTS confidence_score DOUBLE PRECISION "
+    f"GENERATED ALWAYS AS ({PROCESSED_CONFIDENCE_EXPRESSION}) STORED"
+)
+# Built without blocking writes; CONCURRENTLY cannot run inside a transaction
+CREATE_INDEX = (
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_processed_files_tenant_confidence "
+    "ON processed_files (tenant_id, confidence_score)"
+)
+
+
+def column_exists(connection):
+    """Check whether processed_files already has the confidence_score column."""
+    return connection.execute(text(
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_name = 'processed_files' AND column_name = 'confidence_score'"
+    )).first() is not None
+
+
+def main():
+    """Main migration function."""
+    print("=" * 60)
+    print("processed_files.confidence_score Migration")
+    print("=" * 60)
+
+    try:
+        with engine.begin() as connection:
+            if column_exists(connection):
+                print("✓ Column confidence_score already exists")
+            else:
+                print("Adding confidence_score (rewrites processed_files)...")
+                connection.execute(text(ADD_COLUMN))
+                print("✓ Column confidence_score added and filled")
+
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            print("Creating index ix_processed_files_tenant_confidence...")
+            connection.execute(text(CREATE_INDEX))
+            print("✓ Index ix_processed_files_tenant_confidence ready")
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        sys.exit(1)
+
+    print("\n✓ Migration completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import create_engine, event, Column, Integer, BigInteger, Float, String, Date, DateTime, Boolean, Text, ForeignKey, UniqueConstraint, Index, Computed
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, deferred
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from uuid import uuid4
 from datetime import datetime
 import os
 
@@ -19,18 +22,137 @@ POSTGRES_DB = os.getenv("POSTGRES_DB", "citus")
 from urllib.parse import quote_plus
 DATABASE_URL = f"postgresql://{quote_plus(POSTGRES_USER)}:{quote_plus(POSTGRES_PASSWORD)}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}?sslmode=require"
 
-# Create engine with connection timeout settings
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,  # Verify connections before using them
-    pool_size=10,  # Maximum number of connections to keep in the pool
-    max_overflow=20,  # Maximum number of connections that can be created beyond pool_size
-    connect_args={
-        "connect_timeout": 10,  # Connection timeout in seconds
-        "options": "-c statement_timeout=30000"  # 30 second statement timeout
-    }
-)
+# Connection budget. Every API worker process holds one sync pool (used from the db executor
+# threads) and one async pool; every Celery child process holds one small sync pool.
+# The sync pool matches the db executor (API_DB_THREADS), which runs nearly all API queries;
+# its small overflow covers the few sync queries made from other threads.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", os.getenv("API_DB_THREADS", "10")))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "2"))
+DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", "3"))
+DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", "2"))
+CELERY_DB_POOL_SIZE = int(os.getenv("CELERY_DB_POOL_SIZE", "2"))
+CELERY_DB_MAX_OVERFLOW = int(os.getenv("CELERY_DB_MAX_OVERFLOW", "2"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Connect through PgBouncer in transaction pooling mode: no client-side pooling (PgBouncer
+# pools), no startup options or session state, no asyncpg prepared statement cache
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() in ("1", "true", "yes")
+
+STATEMENT_TIMEOUT_MS = 30000
+
+def _set_local_statement_timeout(connection, *args):
+    # Transaction-scoped, so it does not leak into other clients' server connections
+    connection.exec_driver_sql(f"SET LOCAL statement_timeout = {STATEMENT_TIMEOUT_MS}")
+
+def build_engine(pool_size: int = DB_POOL_SIZE, max_overflow: int = DB_MAX_OVERFLOW):
+    """Create the sync engine (psycopg2) with the given pool size."""
+    if DB_PGBOUNCER:
+        sync_engine = create_engine(
+            DATABASE_URL,
+            poolclass=NullPool,
+            connect_args={"connect_timeout": 10}
+        )
+        event.listen(sync_engine, "begin", _set_local_statement_timeout)
+        return sync_engine
+    return create_engine(
+        DATABASE_URL,
+        pool_pre_ping=True,  # Verify connections before using them
+        pool_size=pool_size,  # Maximum number of connections to keep in the pool
+        max_overflow=max_overflow,  # Maximum number of connections that can be created beyond pool_size
+        pool_timeout=DB_POOL_TIMEOUT,
+        connect_args={
+            "connect_timeout": 10,  # Connection timeout in seconds
+            "options": f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"  # 30 second statement timeout
+        }
+    )
+
+def build_async_engine():
+    """Create the async engine (asyncpg) used by the API's request handlers."""
+    async_url = f"postgresql+asyncpg://{quote_plus(POSTGRES_USER)}:{quote_plus(POSTGRES_PASSWORD)}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+    if DB_PGBOUNCER:
+        async_engine = create_async_engine(
+            async_url,
+            poolclass=NullPool,
+            connect_args={
+                "ssl": "require",
+                "timeout": 10,
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                # Unique names, as a server connection may have served another client's statements
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__"
+            }
+        )
+        event.listen(async_engine.sync_engine, "begin", _set_local_statement_timeout)
+        return async_engine
+    return create_async_engine(
+        async_url,
+        pool_pre_ping=True,
+        pool_size=DB_ASYNC_POOL_SIZE,
+        max_overflow=DB_ASYNC_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        connect_args={
+            "ssl": "require",
+            "timeout": 10,
+            "server_settings": {"statement_timeout": str(STATEMENT_TIMEOUT_MS)}
+        }
+    )
+
+engine = build_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# No connection is opened until the first query, so worker processes that never use it cost nothing
+async_engine = build_async_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+def configure_worker_engine():
+    """
+    Replace the engine inherited from the parent process with a small per-process pool.
+    
+    Called in every Celery child process (worker_process_init), so the worker's connection
+    count is concurrency x (CELERY_DB_POOL_SIZE + CELERY_DB_MAX_OVERFLOW).
+    """
+    global engine
+    # Drop the parent's pooled connections without closing them (the parent still owns them)
+    engine.dispose(close=False)
+    engine = build_engine(CELERY_DB_POOL_SIZE, CELERY_DB_MAX_OVERFLOW)
+    SessionLocal.configure(bind=engine)
+
+def _pool_stats(pool) -> dict:
+    if isinstance(pool, NullPool) or not hasattr(pool, "checkedout"):
+        return {"mode": "pgbouncer" if DB_PGBOUNCER else "unpooled"}
+    return {
+        "mode": "pooled",
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0)
+    }
+
+def pool_status() -> dict:
+    """Connection pool usage of this process (sync and async engines)."""
+    return {"sync": _pool_stats(engine.pool), "async": _pool_stats(async_engine.sync_engine.pool)}
+
+def connection_budget(api_workers: int, celery_children: int) -> dict:
+    """
+    Maximum database connections opened by the API and Celery processes.
+    
+    Args:
+        api_workers: Number of API worker processes
+        celery_children: Number of Celery child processes (sum of all workers' concurrency)
+    """
+    if DB_PGBOUNCER:
+        return {"mode": "pgbouncer", "note": "Server connections are limited by PgBouncer's pool settings"}
+    per_api_worker = DB_POOL_SIZE + DB_MAX_OVERFLOW + DB_ASYNC_POOL_SIZE + DB_ASYNC_MAX_OVERFLOW
+    per_celery_child = CELERY_DB_POOL_SIZE + CELERY_DB_MAX_OVERFLOW
+    return {
+        "mode": "pooled",
+        "per_api_worker": per_api_worker,
+        "per_celery_child": per_celery_child,
+        "api_total": api_workers * per_api_worker,
+        "celery_total": celery_children * per_celery_child,
+        "total": api_workers * per_api_worker + celery_children * per_celery_child
+    }
+
 Base = declarative_base()
 
 class User(Base):
@@ -110,9 +232,41 @@ class NullFieldTracking(Base):
     def __repr__(self):
         return f"<NullFieldTracking(processing_id='{self.processing_id}', filename='{self.filename}', null_count={self.null_field_count})>"
 
+class NullFieldDailyRollup(Base):
+    """Null field counts per tenant and day, maintained with every NullFieldTracking insert."""
+    __tablename__ = "null_field_daily_rollup"
+    
+    tenant_id = Column(String(255), primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC day of NullFieldTracking.created_at
+    total_documents = Column(Integer, nullable=False, default=0)
+    documents_with_nulls = Column(Integer, nullable=False, default=0)
+    
+    # Documents with the required field null
+    name_null_count = Column(Integer, nullable=False, default=0)
+    dob_null_count = Column(Integer, nullable=False, default=0)
+    member_id_null_count = Column(Integer, nullable=False, default=0)
+    address_null_count = Column(Integer, nullable=False, default=0)
+    gender_null_count = Column(Integer, nullable=False, default=0)
+    insurance_id_null_count = Column(Integer, nullable=False, default=0)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<NullFieldDailyRollup(tenant_id='{self.tenant_id}', day='{self.day}', total_documents={self.total_documents})>"
+
+# Overall confidence read from processed_data (NULL when missing or not a number)
+PROCESSED_CONFIDENCE_EXPRESSION = (
+    "CASE WHEN jsonb_typeof(processed_data -> 'confidence_score') = 'number' "
+    "THEN (processed_data ->> 'confidence_score')::double precision END"
+)
+
 class ProcessedFile(Base):
     """Store complete processed file results including corrections."""
     __tablename__ = "processed_files"
+    __table_args__ = (
+        Index('ix_processed_files_tenant_confidence', 'tenant_id', 'confidence_score'),
+        Index('ix_processed_files_tenant_corrections', 'tenant_id', 'has_corrections'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     file_hash = Column(String(64), unique=True, index=True, nullable=False)  # SHA256 hash for deduplication
@@ -122,10 +276,13 @@ class ProcessedFile(Base):
     
     # Blob storage paths (for reference to source files)
     source_blob_path = Column(String(1000), nullable=True)
-    processed_blob_path = Column(String(1000), nullable=True)
+    processed_blob_path = Column(String(1000), nullable=True, index=True)
+    
+    # Complete processed data stored as JSONB (deferred: only loaded when accessed)
+    processed_data = deferred(Column(JSONB, nullable=False))  # Full JSON with key_value_pairs, confidence_scores, etc.
     
-    # Complete processed data stored as JSONB
-    processed_data = Column(JSONB, nullable=False)  # Full JSON with key_value_pairs, confidence_scores, etc.
+    # Generated from processed_data for filtering and sorting without reading the JSON
+    confidence_score = Column(Float, Computed(PROCESSED_CONFIDENCE_EXPRESSION, persisted=True), nullable=True)
     
     # OCR and processing metadata
     ocr_confidence_score = Column(String(10), nullable=True)
@@ -136,6 +293,9 @@ class ProcessedFile(Base):
     last_corrected_by = Column(String(100), nullable=True)
     last_corrected_at = Column(DateTime, nullable=True)
     
+    # Incremented by every field-level edit (optimistic concurrency for corrections)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -143,13 +303,201 @@ class ProcessedFile(Base):
     def __repr__(self):
         return f"<ProcessedFile(file_hash='{self.file_hash[:8]}...', filename='{self.filename}', has_corrections={self.has_corrections})>"
 
+class BulkProcessedManifest(Base):
+    """Manifest of bulk source blobs that have already been processed."""
+    __tablename__ = "bulk_processed_manifest"
+    __table_args__ = (
+        UniqueConstraint('source_blob_name', 'source_etag', name='uq_bulk_manifest_blob_etag'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    source_blob_name = Column(String(1000), nullable=False, index=True)  # e.g. "bulk processing/source/file.pdf"
+    source_etag = Column(String(100), nullable=False, default="")  # Blob ETag at processing time ("" if unknown)
+    tenant_id = Column(String(255), nullable=True, index=True)
+    filename = Column(String(500), nullable=True)
+    processed_blob_path = Column(String(1000), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<BulkProcessedManifest(source_blob_name='{self.source_blob_name}', source_etag='{self.source_etag}')>"
+
+class SourceDocument(Base):
+    """Location of each uploaded source document (written once, to its final confidence folder)."""
+    __tablename__ = "source_documents"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    processing_id = Column(String(255), nullable=False, unique=True, index=True)
+    tenant_id = Column(String(255), nullable=False, index=True)
+    filename = Column(String(500), nullable=False)
+    blob_path = Column(String(1000), nullable=False, index=True)
+    confidence_folder = Column(String(100), nullable=False)  # "Above-95%" or "needs to be reviewed"
+    content_type = Column(String(255), nullable=True)
+    size_bytes = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<SourceDocument(processing_id='{self.processing_id}', blob_path='{self.blob_path}')>"
+
+class BlobCatalogEntry(Base):
+    """Index of listed blobs, kept in sync on upload/move/delete and by periodic reconciliation."""
+    __tablename__ = "blob_catalog"
+    __table_args__ = (
+        Index('ix_blob_catalog_tenant_modified', 'tenant_id', 'last_modified'),
+        Index('ix_blob_catalog_folder_name', 'folder', 'name'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    blob_name = Column(String(1000), nullable=False, unique=True, index=True)
+    folder = Column(String(1000), nullable=False)  # Parent path with trailing "/" (e.g. "main/Above-95%/source/tenant_2/")
+    name = Column(String(500), nullable=False)
+    tenant_id = Column(String(255), nullable=False, index=True)
+    processing_id = Column(String(500), nullable=True)
+    size = Column(BigInteger, nullable=True)
+    content_type = Column(String(255), nullable=True)
+    last_modified = Column(DateTime, nullable=True)
+    etag = Column(String(100), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<BlobCatalogEntry(blob_name='{self.blob_name}', size={self.size})>"
+
+class BlobTenantCounter(Base):
+    """Precomputed file count and size per tenant and content type."""
+    __tablename__ = "blob_tenant_counters"
+    
+    tenant_id = Column(String(255), primary_key=True)
+    content_type = Column(String(255), primary_key=True)  # "unknown" when the blob has none
+    file_count = Column(Integer, nullable=False, default=0)
+    total_size = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<BlobTenantCounter(tenant_id='{self.tenant_id}', content_type='{self.content_type}', file_count={self.file_count})>"
+
+class BlobCatalogSync(Base):
+    """Log of blob catalog reconciliation runs."""
+    __tablename__ = "blob_catalog_sync"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+    blobs_seen = Column(Integer, nullable=True)
+    rows_removed = Column(Integer, nullable=True)
+    
+    def __repr__(self):
+        return f"<BlobCatalogSync(started_at='{self.started_at}', blobs_seen={self.blobs_seen})>"
+
+class PurgeJob(Base):
+    """Blob/record purge job for a tenant and/or retention window, with its resume cursor."""
+    __tablename__ = "purge_jobs"
+    
+    id = Column(String(36), primary_key=True)
+    tenant_id = Column(String(255), nullable=True, index=True)  # None = all tenants
+    older_than = Column(DateTime, nullable=True)  # None = regardless of age
+    dry_run = Column(Boolean, nullable=False, default=True)
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, completed, failed
+    
+    # Resume cursor: index into the purge prefixes and the listing continuation token
+    prefix_index = Column(Integer, nullable=False, default=0)
+    continuation_token = Column(Text, nullable=True)
+    # Blobs of the page being deleted (redone on resume if the run died before the cursor moved)
+    pending_blobs = Column(JSONB, nullable=True)
+    
+    blobs_matched = Column(Integer, nullable=False, default=0)
+    bytes_matched = Column(BigInteger, nullable=False, default=0)
+    blobs_deleted = Column(Integer, nullable=False, default=0)
+    blobs_failed = Column(Integer, nullable=False, default=0)
+    records_deleted = Column(JSONB, nullable=True)  # table -> rows deleted (or matched in a dry run)
+    error = Column(Text, nullable=True)
+    
+    created_by = Column(String(100), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<PurgeJob(id='{self.id}', tenant_id='{self.tenant_id}', status='{self.status}')>"
+
+class AnalysisCache(Base):
+    """AI analysis results of a result file, keyed by its unique file ID."""
+    __tablename__ = "ai_analysis_cache"
+    __table_args__ = (
+        UniqueConstraint('tenant_id', 'cache_key', name='uq_ai_analysis_cache_tenant_key'),
+        Index('ix_ai_analysis_cache_tenant_base', 'tenant_id', 'base_key'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(String(255), nullable=False, index=True)
+    cache_key = Column(String(1000), nullable=False)  # Normalized unique file ID (see analysis_cache_service.normalize_key)
+    base_key = Column(String(1000), nullable=True)  # cache_key without its timestamp suffix (fallback lookups)
+    file_id = Column(String(1000), nullable=False)  # Unique file ID as sent by the client
+    filename = Column(String(500), nullable=True)
+    analysis_results = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<AnalysisCache(tenant_id='{self.tenant_id}', cache_key='{self.cache_key}')>"
+
+class ProcessingHistory(Base):
+    """Processing history entry of a tenant (one row per saved result, append-only)."""
+    __tablename__ = "processing_history"
+    __table_args__ = (
+        UniqueConstraint('tenant_id', 'entry_id', name='uq_processing_history_tenant_entry'),
+        Index('ix_processing_history_tenant_processed', 'tenant_id', 'processed_at', 'id'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(String(255), nullable=False)
+    entry_id = Column(BigInteger, nullable=False)  # Client-side ID (epoch milliseconds)
+    filename = Column(String(500), nullable=False)
+    processing_type = Column(String(20), nullable=False, default="single")  # "single" or "batch"
+    status = Column(String(20), nullable=False, default="success")
+    confidence = Column(Float, nullable=True)  # 0-1; mean of the files for batches
+    result = Column(JSONB, nullable=False)
+    processed_at = Column(DateTime, nullable=False)
+    created_by = Column(String(100), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<ProcessingHistory(tenant_id='{self.tenant_id}', entry_id={self.entry_id}, filename='{self.filename}')>"
+
 
 
 # Create tables
+# Columns and indexes added to tables that already existed (create_all does not alter existing tables)
+ADDITIONAL_COLUMNS = [
+    "ALTER TABLE processed_files ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1",
+    "ALTER TABLE ai_analysis_cache ADD COLUMN IF NOT EXISTS base_key VARCHAR(1000)",
+    "ALTER TABLE purge_jobs ADD COLUMN IF NOT EXISTS pending_blobs JSONB",
+    # processed_files.confidence_score (and its index) are added to existing databases by
+    # migrate_processed_confidence.py: the generated column rewrites the whole table
+]
+
+ADDITIONAL_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_processed_files_processed_blob_path ON processed_files (processed_blob_path)",
+    "CREATE INDEX IF NOT EXISTS ix_processed_files_tenant_corrections ON processed_files (tenant_id, has_corrections)",
+    # Rows still holding a legacy AI analysis cache (analysis cache backfill)
+    "CREATE INDEX IF NOT EXISTS ix_processed_files_ai_analysis_cache ON processed_files (id) WHERE processed_data ? 'ai_analysis_cache'",
+    "CREATE INDEX IF NOT EXISTS ix_ai_analysis_cache_tenant_base ON ai_analysis_cache (tenant_id, base_key)",
+    # Paginated listing of documents with null fields (newest first)
+    "CREATE INDEX IF NOT EXISTS ix_null_field_tracking_tenant_nulls ON null_field_tracking (tenant_id, id) WHERE null_field_count > 0",
+]
+
+def ensure_indexes():
+    """Create columns and indexes that create_all does not add to existing tables."""
+    from sqlalchemy import text
+    with engine.begin() as connection:
+        for statement in ADDITIONAL_COLUMNS + ADDITIONAL_INDEXES:
+            connection.execute(text(statement))
+
 def create_tables():
     """Create all database tables."""
     try:
         Base.metadata.create_all(bind=engine)
+        ensure_indexes()
         return True
     except Exception as e:
         import logging
@@ -166,3 +514,8 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """Get async database session (connection is returned to the pool when the request ends)."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
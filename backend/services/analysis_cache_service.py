@@ -0,0 +1,218 @@
+"""
+Cache of AI analysis results (low-confidence field suggestions) per result file.
+
+Entries live in their own table, keyed by (tenant_id, exact unique file ID), so a lookup
+is one unique-index probe. The ID without its timestamp suffix is indexed as base_key; it is
+only used when the exact ID has no entry, to find the same file under another suffix. Previously they were stored in ProcessedFile.processed_data and
+found by trying several columns and scanning every row of the tenant. Entries stored that
+way are copied over by backfill().
+"""
+import logging
+import re
+from datetime import datetime
+from typing import Dict, Any, Optional, Iterable
+from urllib.parse import unquote
+
+from sqlalchemy import or_, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models.database import SessionLocal, AnalysisCache, ProcessedFile
+
+logger = logging.getLogger(__name__)
+
+# Rows of ProcessedFile read per backfill batch
+BACKFILL_BATCH_SIZE = 500
+
+# Timestamp suffix that the same file's blob path may carry (e.g. _1766399457152); shorter
+# numeric suffixes are part of the ID (invoice_2024 and invoice_2025 are different files)
+_TIMESTAMP_SUFFIX = re.compile(r'_\d{10,}$')
+# Entries saved before base_key existed were keyed with any numeric suffix removed
+_LEGACY_SUFFIX = re.compile(r'_\d+$')
+
+
+def normalize_key(file_id: str) -> str:
+    """
+    Normalize a unique file ID (processing ID, file hash or blob path) into its cache key.
+
+    Only URL-encoding and surrounding whitespace are removed; the key is otherwise the exact ID.
+    """
+    return unquote(file_id).strip()
+
+
+def base_key(file_id: str) -> str:
+    """Get a file ID's cache key without its timestamp suffix (fallback lookups only)."""
+    return _TIMESTAMP_SUFFIX.sub('', normalize_key(file_id))
+
+
+def fallback_filter(file_ids: Iterable[str]):
+    """
+    Filter for the entries of file IDs that have no exact entry: the same files saved under
+    another timestamp suffix, and entries saved before base_key existed.
+    """
+    keys = {normalize_key(file_id) for file_id in file_ids}
+    return or_(
+        AnalysisCache.base_key.in_(list({_TIMESTAMP_SUFFIX.sub('', key) for key in keys})),
+        and_(
+            AnalysisCache.base_key.is_(None),
+            AnalysisCache.cache_key.in_(list({_LEGACY_SUFFIX.sub('', key) for key in keys}))
+        )
+    )
+
+
+class AnalysisCacheService:
+    """Service for storing and looking up cached AI analysis results."""
+
+    @staticmethod
+    def _entry_info(entry: AnalysisCache) -> Dict[str, Any]:
+        saved_at = entry.updated_at or entry.created_at
+        return {
+            "analysis_results": entry.analysis_results or {},
+            "timestamp": saved_at.isoformat() if saved_at else None,
+            "filename": entry.filename or "unknown",
+            "file_id": entry.file_id
+        }
+
+    def save(self, tenant_id: str, file_id: str, analysis_results: Dict[str, Any],
+             filename: Optional[str] = None) -> bool:
+        """
+        Store (or replace) the analysis results of a file.
+
+        Args:
+            tenant_id: Tenant identifier
+            file_id: Unique file ID sent by the client
+            analysis_results: Analysis results by field name
+            filename: Display filename
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        session = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            stmt = pg_insert(AnalysisCache).values(
+                tenant_id=tenant_id,
+                cache_key=normalize_key(file_id),
+                base_key=base_key(file_id),
+                file_id=file_id,
+                filename=filename,
+                analysis_results=analysis_results,
+                created_at=now,
+                updated_at=now
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["tenant_id", "cache_key"],
+                set_={key: stmt.excluded[key] for key in ("base_key", "file_id", "filename", "analysis_results", "updated_at")}
+            )
+            session.execute(stmt)
+            session.commit()
+            return True
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to save analysis cache for {file_id}: {e}")
+            return False
+        finally:
+            session.close()
+
+    def get(self, tenant_id: str, file_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up the cached analysis results of a file.
+
+        Args:
+            tenant_id: Tenant identifier
+            file_id: Unique file ID sent by the client
+
+        Returns:
+            Dict with analysis_results, timestamp, filename and file_id, or None if not cached
+        """
+        session = SessionLocal()
+        try:
+            entry = session.query(AnalysisCache).filter(
+                AnalysisCache.tenant_id == tenant_id,
+                AnalysisCache.cache_key == normalize_key(file_id)
+            ).first()
+            if entry is None:
+                # Same file under another timestamp suffix (newest entry wins)
+                entry = session.query(AnalysisCache).filter(
+                    AnalysisCache.tenant_id == tenant_id,
+                    fallback_filter([file_id])
+                ).order_by(AnalysisCache.updated_at.desc()).first()
+            return self._entry_info(entry) if entry else None
+        finally:
+            session.close()
+
+    @staticmethod
+    def _legacy_keys(row) -> Iterable[str]:
+        """IDs under which the client may look up a legacy ProcessedFile cache entry."""
+        keys = {row.ai_cache.get("file_id"), row.processing_id, row.processed_blob_path, row.file_hash}
+        if row.file_hash:
+            keys.add(f"hash_{row.file_hash}")
+        return {normalize_key(key) for key in keys if isinstance(key, str) and key.strip()}
+
+    def backfill(self, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Copy analysis results stored in ProcessedFile.processed_data["ai_analysis_cache"].
+
+        Only the cache sub-document of rows that have one is read, in id order and in
+        batches. Existing entries are kept, so the backfill can be re-run safely.
+
+        Args:
+            dry_run: Only count what would be copied
+
+        Returns:
+            Dict with rows_scanned, keys_found and entries_created counts
+        """
+        stats = {"rows_scanned": 0, "keys_found": 0, "entries_created": 0}
+        ai_cache = ProcessedFile.processed_data["ai_analysis_cache"]
+        last_id = 0
+        session = SessionLocal()
+        try:
+            while True:
+                rows = session.query(
+                    ProcessedFile.id, ProcessedFile.tenant_id, ProcessedFile.processing_id,
+                    ProcessedFile.processed_blob_path, ProcessedFile.file_hash, ProcessedFile.filename,
+                    ai_cache.label("ai_cache")
+                ).filter(
+                    ProcessedFile.id > last_id,
+                    ProcessedFile.processed_data.has_key("ai_analysis_cache")
+                ).order_by(ProcessedFile.id).limit(BACKFILL_BATCH_SIZE).all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+
+                values = []
+                for row in rows:
+                    stats["rows_scanned"] += 1
+                    if not isinstance(row.ai_cache, dict) or not row.ai_cache.get("analysis_results"):
+                        continue
+                    for key in self._legacy_keys(row):
+                        values.append({
+                            "tenant_id": row.tenant_id,
+                            "cache_key": key,
+                            "base_key": base_key(key),
+                            "file_id": row.ai_cache.get("file_id") or key,
+                            "filename": row.ai_cache.get("filename") or row.filename,
+                            "analysis_results": row.ai_cache["analysis_results"],
+                            "created_at": datetime.utcnow(),
+                            "updated_at": datetime.utcnow()
+                        })
+                stats["keys_found"] += len(values)
+                if dry_run or not values:
+                    continue
+
+                stmt = pg_insert(AnalysisCache).values(values).on_conflict_do_nothing(
+                    index_elements=["tenant_id", "cache_key"]
+                )
+                stats["entries_created"] += session.execute(stmt).rowcount or 0
+                session.commit()
+
+            logger.info(f"Analysis cache backfill{' (dry run)' if dry_run else ''}: {stats}")
+            return stats
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+
+# Create singleton instance
+analysis_cache_service = AnalysisCacheService()
@@ -0,0 +1,437 @@
+"""
+Async Azure Blob Storage service for the FastAPI endpoints.
+
+Built on the azure.storage.blob.aio SDK so listings and downloads don't block the
+uvicorn event loop. Mirrors the read/list/delete operations of AzureBlobService,
+which stays the synchronous implementation used by the Celery workers.
+"""
+import asyncio
+import os
+import logging
+from typing import List, Dict, Optional, Any
+
+from azure.core.exceptions import ResourceNotFoundError, ResourceExistsError
+from services.azure_blob_service import (
+    BLOB_MAX_RETRIES, BLOB_CONNECTION_TIMEOUT, BLOB_READ_TIMEOUT,
+    get_listing_prefixes, get_blob_url, build_file_info, add_to_folder_structure,
+    parse_processed_blob_name, SourceFileMatcher, source_path_from_metadata
+)
+from services.processed_json_format import (
+    DETAIL_BLOB_KEY, detail_blob_path, merge_processed_json, encode_for_metadata, decode_processed_json
+)
+from services.blob_catalog_service import blob_catalog_service
+from services.source_link_service import source_link_service
+from core.executors import run_db
+
+logger = logging.getLogger(__name__)
+
+# Size of the first GET and of each streamed chunk for downloads (the SDK default first GET is 32 MB)
+BLOB_STREAM_CHUNK_SIZE = int(os.getenv('AZURE_BLOB_STREAM_CHUNK_SIZE', str(4 * 1024 * 1024)))
+
+
+class AsyncAzureBlobService:
+    """Async service for managing files in Azure Blob Storage from the API."""
+
+    def __init__(self):
+        self.connection_string = os.getenv('AZURE_STORAGE_CONNECTION_STRING')
+        self.container_name = os.getenv('AZURE_BLOB_CONTAINER', 'ocr-documents')
+        self.blob_service_client = None
+        self.container_client = None
+        self.initialization_error = None
+        self._init_lock = None
+
+    async def _ensure_initialized(self):
+        """Create the aio client and verify the container once (on the API's event loop)."""
+        if self.container_client is not None or not self.connection_string:
+            return
+
+        if self._init_lock is None:
+            self._init_lock = asyncio.Lock()
+
+        async with self._init_lock:
+            if self.container_client is not None:
+                return
+
+            from azure.storage.blob.aio import BlobServiceClient
+
+            blob_service_client = BlobServiceClient.from_connection_string(
+                self.connection_string,
+                retry_total=BLOB_MAX_RETRIES,
+                connection_timeout=BLOB_CONNECTION_TIMEOUT,
+                read_timeout=BLOB_READ_TIMEOUT,
+                max_single_get_size=BLOB_STREAM_CHUNK_SIZE,
+                max_chunk_get_size=BLOB_STREAM_CHUNK_SIZE
+            )
+            try:
+                container_client = blob_service_client.get_container_client(self.container_name)
+                try:
+                    await container_client.get_container_properties()
+                except ResourceNotFoundError:
+                    try:
+                        await blob_service_client.create_container(self.container_name)
+                        logger.info(f"Created container: {self.container_name}")
+                    except ResourceExistsError:
+                        pass
+
+                self.blob_service_client = blob_service_client
+                self.container_client = container_client
+                self.initialization_error = None
+                logger.info(f"Async Azure Blob Storage service initialized with container: {self.container_name}")
+            except Exception as e:
+                # Not cached: the next call retries
+                self.initialization_error = str(e)
+                logger.error(f"Failed to initialize async Azure Blob Storage: {e}")
+                await blob_service_client.close()
+
+    async def is_available(self) -> bool:
+        """Check if Azure Blob Storage is available."""
+        if not self.connection_string:
+            return False
+        try:
+            await self._ensure_initialized()
+        except Exception as e:
+            self.initialization_error = str(e)
+            logger.error(f"Failed to initialize async Azure Blob Storage: {e}")
+        return self.container_client is not None
+
+    async def get_status(self) -> Dict[str, Any]:
+        """Get detailed status of the Azure Blob Storage service."""
+        available = await self.is_available()
+        return {
+            "available": available,
+            "connection_string_provided": bool(self.connection_string),
+            "container_name": self.container_name,
+            # Do not expose raw initialization error details to clients
+            "initialization_error": "Initialization error occurred" if self.initialization_error and not available else None,
+            "blob_service_client": self.blob_service_client is not None,
+            "container_client": self.container_client is not None
+        }
+
+    async def close(self):
+        """Close the aio client and its connection pool (on API shutdown)."""
+        if self.blob_service_client is not None:
+            await self.blob_service_client.close()
+        self.blob_service_client = None
+        self.container_client = None
+
+    @staticmethod
+    async def _sync_catalog(func, *args):
+        """Apply a blob catalog update off the event loop (never fails the caller)."""
+        try:
+            await run_db(func, *args)
+        except Exception as e:
+            logger.warning(f"Failed to update blob catalog: {e}")
+
+    def _blob_url(self, blob_name: str) -> str:
+        return get_blob_url(self.blob_service_client.account_name, self.container_name, blob_name)
+
+    async def list_tenant_files(self, tenant_id: str) -> List[Dict[str, Any]]:
+        """
+        List all files for a specific tenant from all folders (source, processed, and legacy uploads).
+
+        Args:
+            tenant_id: Tenant ID to filter files
+
+        Returns:
+            List of file information dictionaries
+        """
+        if not await self.is_available():
+            return []
+
+        try:
+            files = []
+            for prefix in get_listing_prefixes(tenant_id):
+                async for blob in self.container_client.list_blobs(name_starts_with=prefix):
+                    files.append(build_file_info(blob, self._blob_url(blob.name), tenant_id))
+            return files
+
+        except Exception as e:
+            logger.error(f"Failed to list files for tenant {tenant_id}: {e}")
+            return []
+
+    async def list_files_for_tenant(self, tenant_id: str) -> List[Dict[str, Any]]:
+        """Alias for list_tenant_files (same as AzureBlobService)."""
+        return await self.list_tenant_files(tenant_id)
+
+    async def list_all_files(self) -> List[Dict[str, Any]]:
+        """
+        List all files in the blob storage from all folders (admin only).
+
+        Returns:
+            List of all file information dictionaries
+        """
+        if not await self.is_available():
+            return []
+
+        try:
+            files = []
+            for prefix in get_listing_prefixes():
+                async for blob in self.container_client.list_blobs(name_starts_with=prefix):
+                    files.append(build_file_info(blob, self._blob_url(blob.name)))
+            return files
+
+        except Exception as e:
+            logger.error(f"Failed to list all files: {e}")
+            return []
+
+    async def get_folder_structure(self, tenant_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get organized folder structure for blob storage.
+
+        Args:
+            tenant_id: Optional tenant ID to filter structure
+
+        Returns:
+            Nested dictionary representing folder structure
+        """
+        if not await self.is_available():
+            return {}
+
+        try:
+            structure = {}
+            for prefix in get_listing_prefixes(tenant_id):
+                async for blob in self.container_client.list_blobs(name_starts_with=prefix):
+                    add_to_folder_structure(
+                        structure, blob.name, self._blob_url(blob.name), blob.size, blob.last_modified,
+                        blob.content_settings.content_type if blob.content_settings else None
+                    )
+            return structure
+
+        except Exception as e:
+            logger.error(f"Failed to get folder structure: {e}")
+            return {}
+
+    async def delete_file(self, blob_name: str) -> bool:
+        """
+        Delete a file from blob storage.
+
+        Args:
+            blob_name: Name of the blob to delete
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if not await self.is_available():
+            return False
+
+        try:
+            await self.container_client.get_blob_client(blob_name).delete_blob()
+            await self._sync_catalog(blob_catalog_service.remove_blob, blob_name)
+            if blob_name.endswith(".json"):
+                try:
+                    await self.container_client.get_blob_client(detail_blob_path(blob_name)).delete_blob()
+                except ResourceNotFoundError:
+                    pass
+            logger.info(f"Successfully deleted {blob_name}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to delete {blob_name}: {e}")
+            return False
+
+    async def download_file(self, blob_name: str) -> Optional[bytes]:
+        """
+        Download a file from blob storage.
+
+        Args:
+            blob_name: Name of the blob to download
+
+        Returns:
+            File content as bytes, or None if failed
+        """
+        if not await self.is_available():
+            return None
+
+        try:
+            download_stream = await self.container_client.get_blob_client(blob_name).download_blob()
+            return await download_stream.readall()
+
+        except ResourceNotFoundError:
+            logger.warning(f"File not found: {blob_name}")
+            return None
+        except Exception as e:
+            logger.error(f"Failed to download {blob_name}: {e}")
+            return None
+
+    async def get_blob_properties(self, blob_name: str):
+        """
+        Get a blob's properties (size, ETag, content settings).
+
+        Args:
+            blob_name: Name of the blob
+
+        Returns:
+            BlobProperties, or None if the blob does not exist or storage is unavailable
+        """
+        if not await self.is_available():
+            return None
+
+        try:
+            return await self.container_client.get_blob_client(blob_name).get_blob_properties()
+        except ResourceNotFoundError:
+            return None
+
+    async def open_download_stream(self, blob_name: str, offset: Optional[int] = None,
+                                   length: Optional[int] = None, etag: Optional[str] = None):
+        """
+        Start a download without buffering the blob; iterate the result's chunks() to stream it.
+
+        Args:
+            blob_name: Name of the blob
+            offset: Start of the byte range to download
+            length: Number of bytes to download from offset
+            etag: Only download if the blob still has this ETag (keeps ranges of one version consistent)
+
+        Returns:
+            StorageStreamDownloader, or None if the blob does not exist or storage is unavailable
+        """
+        if not await self.is_available():
+            return None
+
+        kwargs = {"offset": offset, "length": length}
+        if etag:
+            from azure.core import MatchConditions
+            kwargs.update({"etag": etag, "match_condition": MatchConditions.IfNotModified})
+
+        try:
+            return await self.container_client.get_blob_client(blob_name).download_blob(**kwargs)
+        except ResourceNotFoundError:
+            return None
+
+    async def upload_file(self, blob_name: str, data: bytes, overwrite: bool = True,
+                          content_type: Optional[str] = None, content_encoding: Optional[str] = None,
+                          metadata: Optional[Dict[str, str]] = None) -> bool:
+        """
+        Upload bytes to a blob.
+
+        Args:
+            blob_name: Full blob path
+            data: Content to upload
+            overwrite: Replace the blob if it exists
+            content_type: MIME type to store with the blob
+            content_encoding: Content-Encoding of data (e.g. "gzip")
+            metadata: Blob metadata (replaces the existing metadata)
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if not await self.is_available():
+            return False
+
+        try:
+            upload_kwargs = {"overwrite": overwrite, "metadata": metadata}
+            if content_type or content_encoding:
+                from azure.storage.blob import ContentSettings
+                upload_kwargs["content_settings"] = ContentSettings(
+                    content_type=content_type, content_encoding=content_encoding
+                )
+            upload_result = await self.container_client.get_blob_client(blob_name).upload_blob(data, **upload_kwargs)
+            await self._sync_catalog(
+                blob_catalog_service.record_blob, blob_name, len(data), content_type,
+                upload_result.get("last_modified"), upload_result.get("etag")
+            )
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to upload {blob_name}: {e}")
+            return False
+
+    async def load_processed_json(self, blob_name: str, include_detail: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Load a processed JSON result stored in either format.
+
+        Args:
+            blob_name: Full blob path of the processed JSON file
+            include_detail: Fetch the OCR detail blob and merge it into the result
+
+        Returns:
+            Processed result dict, or None if the blob does not exist
+
+        Raises:
+            ValueError: If the stored data is not valid JSON
+        """
+        raw = await self.download_file(blob_name)
+        if raw is None:
+            return None
+
+        json_data = decode_processed_json(raw)
+        if include_detail and json_data.get(DETAIL_BLOB_KEY):
+            raw_detail = await self.download_file(json_data[DETAIL_BLOB_KEY])
+            detail = decode_processed_json(raw_detail) if raw_detail else None
+            if detail is None:
+                logger.warning(f"OCR detail missing for {blob_name}")
+            json_data = merge_processed_json(json_data, detail)
+        return json_data
+
+    async def save_processed_json(self, blob_name: str, json_data: Dict[str, Any],
+                                  metadata: Optional[Dict[str, str]] = None) -> bool:
+        """
+        Overwrite a processed JSON result, keeping the format it was stored in.
+
+        Args:
+            blob_name: Full blob path of the processed JSON file
+            json_data: Processed result (the summary only, for compact blobs)
+            metadata: Existing blob metadata (format marker and source link)
+
+        Returns:
+            True if successful, False otherwise
+        """
+        data, content_encoding = encode_for_metadata(json_data, metadata)
+        return await self.upload_file(
+            blob_name, data, overwrite=True, content_type="application/json",
+            content_encoding=content_encoding, metadata=metadata
+        )
+
+    async def find_source_file_from_processed(self, processed_blob_name: str) -> Optional[str]:
+        """
+        Find the source file path from a processed file blob name.
+
+        Args:
+            processed_blob_name: Full blob path of the processed JSON file
+
+        Returns:
+            Source file blob path if found, None otherwise
+        """
+        if not await self.is_available():
+            logger.error("Azure Blob Storage not available")
+            return None
+
+        # Link recorded at processing time: indexed DB lookup, then the processed blob's metadata
+        source_blob_path = await run_db(source_link_service.lookup_source, processed_blob_name)
+        if source_blob_path:
+            return source_blob_path
+        try:
+            properties = await self.container_client.get_blob_client(processed_blob_name).get_blob_properties()
+            source_blob_path = source_path_from_metadata(properties.metadata)
+            if source_blob_path:
+                return source_blob_path
+        except ResourceNotFoundError:
+            logger.warning(f"Processed file not found: {processed_blob_name}")
+        except Exception as e:
+            logger.warning(f"Failed to read metadata of {processed_blob_name}: {e}")
+
+        # Legacy processed files without a recorded link: match by filename
+        parsed = parse_processed_blob_name(processed_blob_name)
+        if not parsed:
+            return None
+
+        for prefix in parsed["search_prefixes"]:
+            try:
+                matcher = SourceFileMatcher(parsed["base_filename"], parsed["timestamp"])
+                async for blob in self.container_client.list_blobs(name_starts_with=prefix):
+                    if matcher.check(blob.name):
+                        break
+
+                if matcher.best_match:
+                    return matcher.best_match
+
+            except Exception as e:
+                logger.error(f"Error searching for source files with prefix {prefix}: {e}")
+                continue
+
+        logger.warning(f"No source file found for processed file: {processed_blob_name}")
+        return None
+
+
+# Create singleton instance
+async_blob_service = AsyncAzureBlobService()
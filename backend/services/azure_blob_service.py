@@ -5,14 +5,325 @@ Azure Blob Storage service for file management and organization.
 import os
 import uuid
 import re
+import threading
+from urllib.parse import quote, unquote
 from datetime import datetime
-from typing import List, Dict, Optional, BinaryIO, Any
+from typing import List, Dict, Optional, BinaryIO, Any, Tuple, Union
 from azure.storage.blob import BlobServiceClient, BlobClient, ContainerClient
-from azure.core.exceptions import ResourceNotFoundError, ResourceExistsError
+from azure.core.exceptions import ResourceNotFoundError, ResourceExistsError, ResourceModifiedError
 import logging
+from services.processed_json_format import (
+    DETAIL_BLOB_KEY, use_compact_format, compact_metadata, detail_blob_path, split_processed_json,
+    merge_processed_json, encode_processed_json, encode_for_metadata, decode_processed_json
+)
 
 logger = logging.getLogger(__name__)
 
+# Connection pool / retry / timeout settings for the shared Blob Storage client
+BLOB_POOL_SIZE = int(os.getenv('AZURE_BLOB_POOL_SIZE', '20'))
+BLOB_MAX_RETRIES = int(os.getenv('AZURE_BLOB_MAX_RETRIES', '3'))
+BLOB_CONNECTION_TIMEOUT = int(os.getenv('AZURE_BLOB_CONNECTION_TIMEOUT', '10'))
+BLOB_READ_TIMEOUT = int(os.getenv('AZURE_BLOB_READ_TIMEOUT', '60'))
+
+# Process-wide clients keyed by (pid, connection string, container) so every AzureBlobService
+# instance reuses warm connections and the container is only verified once per process
+_shared_clients: Dict[Tuple[int, str, str], Tuple[BlobServiceClient, ContainerClient]] = {}
+_shared_clients_lock = threading.Lock()
+
+
+def _create_blob_service_client(connection_string: str) -> BlobServiceClient:
+    """Create a BlobServiceClient with a pooled HTTP transport and configured retries/timeouts."""
+    try:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from azure.core.pipeline.transport import RequestsTransport
+        
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=BLOB_POOL_SIZE, pool_maxsize=BLOB_POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        transport = RequestsTransport(session=session, session_owner=False)
+    except ImportError:
+        transport = None
+    
+    client_kwargs = {
+        "retry_total": BLOB_MAX_RETRIES,
+        "connection_timeout": BLOB_CONNECTION_TIMEOUT,
+        "read_timeout": BLOB_READ_TIMEOUT
+    }
+    if transport is not None:
+        client_kwargs["transport"] = transport
+    return BlobServiceClient.from_connection_string(connection_string, **client_kwargs)
+
+
+def _get_shared_clients(connection_string: str, container_name: str) -> Tuple[BlobServiceClient, ContainerClient]:
+    """
+    Get the process-wide BlobServiceClient and ContainerClient, creating them and verifying
+    (or creating) the container on first use. Failures are not cached so the next call retries.
+    """
+    key = (os.getpid(), connection_string, container_name)
+    clients = _shared_clients.get(key)
+    if clients:
+        return clients
+    
+    with _shared_clients_lock:
+        clients = _shared_clients.get(key)
+        if clients:
+            return clients
+        
+        blob_service_client = _create_blob_service_client(connection_string)
+        container_client = blob_service_client.get_container_client(container_name)
+        try:
+            container_client.get_container_properties()
+        except ResourceNotFoundError:
+            try:
+                container_client = blob_service_client.create_container(container_name)
+                logger.info(f"Created container: {container_name}")
+            except ResourceExistsError:
+                # Created concurrently by another process
+                pass
+            except Exception as e:
+                logger.error(f"Failed to create container: {e}")
+                raise
+        
+        _shared_clients[key] = (blob_service_client, container_client)
+        logger.info(f"Azure Blob Storage client initialized for container: {container_name} (pool size {BLOB_POOL_SIZE})")
+        return blob_service_client, container_client
+
+
+# Folders listed for file listings and folder structures (new structure first, then legacy folders)
+LISTING_PREFIXES = [
+    "main/Above-95%/source/",
+    "main/Above-95%/processed/",
+    "main/needs to be reviewed/source/",
+    "main/needs to be reviewed/processed/",
+    "source/",  # Legacy folder
+    "processed/",  # Legacy folder
+    "uploads/blob_data/"  # Legacy folder
+]
+
+
+# Blob metadata key on processed JSON blobs linking them to their source file
+SOURCE_LINK_METADATA_KEY = "source_blob_path"
+
+
+def source_link_metadata(source_blob_path: Optional[str]) -> Optional[Dict[str, str]]:
+    """Build processed-blob metadata linking to the source file (metadata values must be ASCII)."""
+    if not source_blob_path:
+        return None
+    return {SOURCE_LINK_METADATA_KEY: quote(source_blob_path, safe="/")}
+
+
+def source_path_from_metadata(metadata: Optional[Dict[str, str]]) -> Optional[str]:
+    """Read the source file path from processed-blob metadata."""
+    value = (metadata or {}).get(SOURCE_LINK_METADATA_KEY)
+    return unquote(value) if value else None
+
+
+def get_listing_prefixes(tenant_id: Optional[str] = None) -> List[str]:
+    """Get the blob prefixes to list, optionally restricted to one tenant."""
+    if tenant_id:
+        return [f"{prefix}{tenant_id}/" for prefix in LISTING_PREFIXES]
+    return list(LISTING_PREFIXES)
+
+
+def get_blob_url(account_name: str, container_name: str, blob_name: str) -> str:
+    """Build the public URL of a blob."""
+    return f"https://{account_name}.blob.core.windows.net/{container_name}/{blob_name}"
+
+
+def parse_listing_path(blob_name: str) -> Dict[str, str]:
+    """
+    Extract filename, tenant_id and processing_id from a listed blob path.
+    
+    Args:
+        blob_name: Full blob path
+        
+    Returns:
+        Dict with filename, tenant_id and processing_id ("unknown" when not in the path)
+    """
+    # Handle new format: main/{confidence_folder}/source|processed/{tenant_id}/{filename}
+    # Handle legacy format: source|processed/{tenant_id}/.../{filename}
+    path_parts = blob_name.split('/')
+    tenant_id = "unknown"
+    processing_id = "unknown"
+    filename = path_parts[-1] if len(path_parts) > 0 else "unknown"
+    
+    # Check if it's the new format (starts with "main")
+    if len(path_parts) >= 4 and path_parts[0] == "main":
+        # processing_id is not in the path for new format, use filename as identifier
+        tenant_id = path_parts[3] if len(path_parts) > 3 else "unknown"
+        processing_id = filename.rsplit('_', 1)[0] if '_' in filename else filename
+    elif len(path_parts) >= 3:
+        tenant_id = path_parts[1]
+        # Check if path contains confidence folder (Above-95% or Below-95%)
+        if len(path_parts) >= 4 and (path_parts[2] == "Above-95%" or path_parts[2] == "Below-95%" or path_parts[2] == "needs to be reviewed"):
+            processing_id = path_parts[3] if len(path_parts) > 3 else "unknown"
+        else:
+            processing_id = path_parts[2] if len(path_parts) > 2 else "unknown"
+    
+    return {"filename": filename, "tenant_id": tenant_id, "processing_id": processing_id}
+
+
+def build_file_info(blob, blob_url: str, tenant_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build the file listing entry for a blob.
+    
+    Args:
+        blob: BlobProperties from a container listing
+        blob_url: Public URL of the blob
+        tenant_id: Tenant the listing is for (derived from the blob path if None)
+        
+    Returns:
+        File information dictionary
+    """
+    path_info = parse_listing_path(blob.name)
+    return {
+        "name": path_info["filename"],
+        "blob_name": blob.name,
+        "url": blob_url,
+        "size": blob.size,
+        "last_modified": blob.last_modified.isoformat() if blob.last_modified else None,
+        "content_type": blob.content_settings.content_type if blob.content_settings else None,
+        "processing_id": path_info["processing_id"],
+        "tenant_id": tenant_id or path_info["tenant_id"]
+    }
+
+
+def add_to_folder_structure(structure: Dict[str, Any], blob_name: str, blob_url: str, size: Optional[int],
+                            last_modified: Optional[datetime], content_type: Optional[str]) -> None:
+    """Add a blob to a nested folder structure dictionary."""
+    path_parts = blob_name.split('/')
+    
+    # Navigate/create folder structure
+    current = structure
+    for i, part in enumerate(path_parts):
+        if i == len(path_parts) - 1:  # Last part is filename
+            current[part] = {
+                "type": "file",
+                "url": blob_url,
+                "size": size,
+                "last_modified": last_modified.isoformat() if last_modified else None,
+                "content_type": content_type,
+                "folder_type": path_parts[0] if path_parts else "unknown"
+            }
+        else:
+            if part not in current:
+                current[part] = {"type": "folder", "contents": {}}
+            current = current[part]["contents"]
+
+
+def parse_processed_blob_name(processed_blob_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Work out where to look for the source file of a processed JSON blob.
+    
+    Args:
+        processed_blob_name: Full blob path of the processed JSON file
+        
+    Returns:
+        Dict with timestamp, base_filename and search_prefixes, or None if the path can't be parsed
+    """
+    processed_filename = processed_blob_name.split('/')[-1]
+    
+    # Extract tenant_id from path
+    path_parts = processed_blob_name.split('/')
+    tenant_id = None
+    confidence_folder = None
+    
+    # Check if it's new format: main/{confidence_folder}/processed/{tenant_id}/{filename}
+    if len(path_parts) >= 4 and path_parts[0] == "main":
+        confidence_folder = path_parts[1] if len(path_parts) > 1 else None
+        tenant_id = path_parts[3] if len(path_parts) > 3 else None
+    elif len(path_parts) >= 2:
+        # Legacy format: processed/{tenant_id}/.../{filename}
+        tenant_id = path_parts[1] if len(path_parts) > 1 else None
+    
+    if not tenant_id:
+        logger.error(f"Could not extract tenant_id from processed blob path: {processed_blob_name}")
+        return None
+    
+    # Parse processed filename to extract timestamp and base filename
+    timestamp = None
+    base_filename_without_ext = None
+    
+    # Try new format first: {timestamp}_{base_filename}_extracted_data.json
+    if processed_filename.endswith('_extracted_data.json'):
+        # Remove _extracted_data.json suffix
+        name_without_suffix = processed_filename.replace('_extracted_data.json', '')
+        # Timestamp pattern: YYYYMMDD_HHMMSS (8 digits, underscore, 6 digits)
+        timestamp_match = re.match(r'^(\d{8}_\d{6})_(.+)$', name_without_suffix)
+        if timestamp_match:
+            timestamp = timestamp_match.group(1)
+            base_filename_without_ext = timestamp_match.group(2)
+        else:
+            # Fallback: split by first underscore
+            parts = name_without_suffix.split('_', 1)
+            if len(parts) >= 2:
+                timestamp = parts[0]
+                base_filename_without_ext = parts[1]
+            else:
+                base_filename_without_ext = name_without_suffix
+    # Try legacy format
+    elif '_processed_' in processed_filename:
+        # Format: {base_filename}_processed_{timestamp}.json
+        name_without_ext = processed_filename.replace('.json', '')
+        parts = name_without_ext.split('_processed_')
+        if len(parts) == 2:
+            base_filename_without_ext = parts[0]
+            timestamp = parts[1]
+    
+    if not base_filename_without_ext:
+        logger.error(f"Could not extract base filename from processed filename: {processed_filename}")
+        return None
+    
+    logger.info(f"Extracted - timestamp: {timestamp}, base_filename: {base_filename_without_ext}, tenant_id: {tenant_id}")
+    
+    # Search for source files in both new and legacy locations
+    search_prefixes = []
+    if confidence_folder:
+        # New format: main/{confidence_folder}/source/{tenant_id}/
+        search_prefixes.append(f"main/{confidence_folder}/source/{tenant_id}/")
+    else:
+        # Try both confidence folders if confidence_folder not found
+        search_prefixes.append(f"main/Above-95%/source/{tenant_id}/")
+        search_prefixes.append(f"main/needs to be reviewed/source/{tenant_id}/")
+    
+    # Legacy format: source/{tenant_id}/
+    search_prefixes.append(f"source/{tenant_id}/")
+    
+    return {
+        "timestamp": timestamp,
+        "base_filename": base_filename_without_ext,
+        "search_prefixes": search_prefixes
+    }
+
+
+class SourceFileMatcher:
+    """Pick the source blob matching a processed file while blob names are streamed in."""
+    
+    def __init__(self, base_filename: str, timestamp: Optional[str]):
+        self.base_filename = base_filename
+        self.timestamp = timestamp
+        self.best_match = None
+    
+    def check(self, blob_name: str) -> bool:
+        """Check a source blob name; returns True once an exact match was found (stop listing)."""
+        source_filename = blob_name.split('/')[-1]
+        
+        # Check if source filename starts with base filename
+        if not source_filename.startswith(self.base_filename):
+            return False
+        if not self.timestamp or self.timestamp in source_filename:
+            # Exact timestamp match, or no timestamp to match
+            logger.info(f"Found match: {blob_name}")
+            self.best_match = blob_name
+            return True
+        # Store as best match if no exact match found yet
+        if not self.best_match:
+            self.best_match = blob_name
+        return False
+
+
 class AzureBlobService:
     """Service for managing files in Azure Blob Storage with organized folder structure."""
     
@@ -25,28 +336,35 @@ class AzureBlobService:
         
         if self.connection_string:
             try:
-                self.blob_service_client = BlobServiceClient.from_connection_string(self.connection_string)
                 self._ensure_container_exists()
-                logger.info(f"Azure Blob Storage service initialized successfully with container: {self.container_name}")
             except Exception as e:
                 self.initialization_error = str(e)
                 logger.error(f"Failed to initialize Azure Blob Storage: {e}")
-                # Don't set blob_service_client to None here, keep it for retry attempts
         else:
             logger.warning("Azure Blob Storage connection string not provided")
     
     def _ensure_container_exists(self):
-        """Ensure the container exists, create if it doesn't."""
+        """Attach the shared clients; the container is checked/created once per process."""
+        self.blob_service_client, self.container_client = _get_shared_clients(
+            self.connection_string, self.container_name
+        )
+    
+    def _update_catalog(self, blob_name: str, size: Optional[int], content_type: Optional[str],
+                        last_modified: Optional[datetime] = None, etag: Optional[str] = None):
+        """Record a written blob in the blob catalog (never fails the caller)."""
         try:
-            self.container_client = self.blob_service_client.get_container_client(self.container_name)
-            self.container_client.get_container_properties()
-        except ResourceNotFoundError:
-            try:
-                self.container_client = self.blob_service_client.create_container(self.container_name)
-                logger.info(f"Created container: {self.container_name}")
-            except Exception as e:
-                logger.error(f"Failed to create container: {e}")
-                raise
+            from services.blob_catalog_service import blob_catalog_service
+            blob_catalog_service.record_blob(blob_name, size, content_type, last_modified, etag)
+        except Exception as e:
+            logger.warning(f"Failed to update blob catalog for {blob_name}: {e}")
+    
+    def _remove_from_catalog(self, blob_name: str):
+        """Remove a deleted blob from the blob catalog (never fails the caller)."""
+        try:
+            from services.blob_catalog_service import blob_catalog_service
+            blob_catalog_service.remove_blob(blob_name)
+        except Exception as e:
+            logger.warning(f"Failed to remove {blob_name} from blob catalog: {e}")
     
     def is_available(self) -> bool:
         """Check if Azure Blob Storage is available."""
@@ -75,7 +393,8 @@ class AzureBlobService:
             tenant_id: Tenant ID to check within
             
         Returns:
-            Dictionary with existing file info if found, None otherwise
+            Dictionary with existing file info (blob paths and scores, not the processed
+            data) if found, None otherwise
         """
         try:
             import hashlib
@@ -87,7 +406,11 @@ class AzureBlobService:
             # Check database for existing file with same hash
             db = SessionLocal()
             try:
-                existing_file = db.query(ProcessedFile).filter(
+                existing_file = db.query(
+                    ProcessedFile.processing_id, ProcessedFile.filename, ProcessedFile.source_blob_path,
+                    ProcessedFile.processed_blob_path, ProcessedFile.confidence_score,
+                    ProcessedFile.ocr_confidence_score, ProcessedFile.created_at
+                ).filter(
                     ProcessedFile.file_hash == file_hash,
                     ProcessedFile.tenant_id == tenant_id
                 ).first()
@@ -101,7 +424,7 @@ class AzureBlobService:
                         "filename": existing_file.filename,
                         "source_blob_path": existing_file.source_blob_path,
                         "processed_blob_path": existing_file.processed_blob_path,
-                        "processed_data": existing_file.processed_data,
+                        "confidence_score": existing_file.confidence_score,
                         "ocr_confidence_score": existing_file.ocr_confidence_score,
                         "created_at": existing_file.created_at.isoformat() if existing_file.created_at else None
                     }
@@ -115,25 +438,32 @@ class AzureBlobService:
             logger.error(f"Error checking file existence by hash: {e}")
             return None
     
-    def upload_source_document(self, file_data: bytes, filename: str, tenant_id: str, 
+    def upload_source_document(self, file_data: Union[bytes, BinaryIO], filename: str, tenant_id: str, 
                              processing_id: str, content_type: str = "application/octet-stream",
                              confidence_score: Optional[float] = None, 
-                             skip_duplicate_check: bool = False) -> Dict[str, str]:
+                             skip_duplicate_check: bool = False,
+                             size_bytes: Optional[int] = None) -> Dict[str, str]:
         """
         Upload a source document to Azure Blob Storage source folder.
         
+        Callers pass the OCR confidence score so the file is written once, directly to its
+        final confidence folder (no copy-then-delete afterwards). The location is recorded
+        in the source document manifest.
+        
         NOTE: Duplicate checking is disabled - files are ALWAYS uploaded to blob storage
         even if they are duplicates. This ensures all files are stored in blob after
         credential changes.
         
         Args:
-            file_data: The file content as bytes
+            file_data: The file content as bytes, or a file handle positioned at the start
+                (streamed to the blob; pass size_bytes with it)
             filename: Original filename
             tenant_id: Tenant ID for organization
             processing_id: Unique processing ID
             content_type: MIME type of the file
             confidence_score: Optional confidence score (0-100) to determine folder path
             skip_duplicate_check: Ignored - kept for backwards compatibility (always uploads)
+            size_bytes: Size of the content when file_data is a file handle
             
         Returns:
             Dictionary with upload information
@@ -149,7 +479,6 @@ class AzureBlobService:
             # Determine folder based on confidence score
             # New path structure: main/{confidence_folder}/source/tenant_id/{filename}
             # Check confidence score and place in appropriate folder
-            # Note: Source files are initially uploaded without confidence, then moved after OCR processing
             if confidence_score is not None:
                 # Normalize confidence score: if it's between 0-1, treat as decimal (0.95 = 95%)
                 # If it's > 1, treat as percentage (95 = 95%)
@@ -170,9 +499,9 @@ class AzureBlobService:
                     confidence_folder = "needs to be reviewed"
                     logger.info(f"Source file confidence score {score_display} < 95% - placing in needs to be reviewed folder")
             else:
-                # Default to "needs to be reviewed" if confidence score not provided (will be moved after OCR)
+                # Default to "needs to be reviewed" if confidence score not provided
                 confidence_folder = "needs to be reviewed"
-                logger.info(f"Confidence score not provided for source file {filename} - initially placing in needs to be reviewed (will reorganize after OCR)")
+                logger.info(f"Confidence score not provided for source file {filename} - placing in needs to be reviewed folder")
             
             # Extract basename from filename (remove any folder paths like "sample/file.jpg" -> "file.jpg")
             # This ensures bulk uploads with folder structure don't create nested folders
@@ -186,10 +515,12 @@ class AzureBlobService:
             # New path structure: main/{confidence_folder}/source/tenant_id/{filename_basename}_{timestamp}
             blob_path = f"main/{confidence_folder}/source/{tenant_id}/{filename_basename}_{timestamp}"
             
-            logger.info(f"Uploading source file to blob storage: {filename} ({len(file_data)} bytes) to {blob_path}")
+            if isinstance(file_data, (bytes, bytearray)):
+                size_bytes = len(file_data)
+            logger.info(f"Uploading source file to blob storage: {filename} ({size_bytes} bytes) to {blob_path}")
             
             # Validate file data
-            if not file_data or len(file_data) == 0:
+            if not file_data or not size_bytes:
                 raise ValueError("File data is empty")
             
             # Upload the file
@@ -198,17 +529,32 @@ class AzureBlobService:
                 blob=blob_path
             )
             
-            blob_client.upload_blob(
+            upload_result = blob_client.upload_blob(
                 file_data,
+                length=size_bytes,
                 content_type=content_type,
                 overwrite=True
             )
+            self._update_catalog(blob_path, size_bytes, content_type,
+                                 upload_result.get("last_modified"), upload_result.get("etag"))
             
             # Get blob URL
             blob_url = blob_client.url
             
             logger.info(f"Successfully uploaded source file: {filename} to {blob_path}")
             
+            # Record where the source file lives
+            from services.source_document_service import source_document_service
+            source_document_service.record_upload(
+                processing_id=processing_id,
+                tenant_id=tenant_id,
+                filename=filename,
+                blob_path=blob_path,
+                confidence_folder=confidence_folder,
+                content_type=content_type,
+                size_bytes=size_bytes
+            )
+            
             return {
                 "success": True,
                 "blob_path": blob_path,
@@ -217,6 +563,7 @@ class AzureBlobService:
                 "tenant_id": tenant_id,
                 "processing_id": processing_id,
                 "folder": "source",
+                "confidence_folder": confidence_folder,
                 "timestamp": timestamp
             }
             
@@ -245,52 +592,12 @@ class AzureBlobService:
             files = []
             
             # List files from new path structure and legacy folders
-            prefixes = [
-                f"main/Above-95%/source/{tenant_id}/",
-                f"main/Above-95%/processed/{tenant_id}/",
-                f"main/needs to be reviewed/source/{tenant_id}/",
-                f"main/needs to be reviewed/processed/{tenant_id}/",
-                f"source/{tenant_id}/",  # Legacy folder
-                f"processed/{tenant_id}/",  # Legacy folder
-                f"uploads/blob_data/{tenant_id}/"  # Legacy folder
-            ]
-            
-            for prefix in prefixes:
+            for prefix in get_listing_prefixes(tenant_id):
                 blob_list = self.container_client.list_blobs(name_starts_with=prefix)
                 
                 for blob in blob_list:
-                    # Extract processing_id and filename from path
-                    # Handle new format: main/{confidence_folder}/source|processed/{tenant_id}/{filename}
-                    # Handle legacy format: source|processed/{tenant_id}/.../{filename}
-                    path_parts = blob.name.split('/')
-                    processing_id = "unknown"
-                    filename = path_parts[-1] if len(path_parts) > 0 else "unknown"
-                    
-                    # Check if it's the new format (starts with "main")
-                    if len(path_parts) >= 4 and path_parts[0] == "main":
-                        # New format: main/{confidence_folder}/source|processed/{tenant_id}/{filename}
-                        # processing_id is not in the path for new format, use filename as identifier
-                        processing_id = filename.rsplit('_', 1)[0] if '_' in filename else filename
-                    elif len(path_parts) >= 3:
-                        # Legacy format: source|processed/{tenant_id}/.../{filename}
-                        # Check if path contains confidence folder (Above-95% or Below-95%)
-                        if len(path_parts) >= 4 and (path_parts[2] == "Above-95%" or path_parts[2] == "Below-95%" or path_parts[2] == "needs to be reviewed"):
-                            processing_id = path_parts[3] if len(path_parts) > 3 else "unknown"
-                        else:
-                            processing_id = path_parts[2] if len(path_parts) > 2 else "unknown"
-                    
-                    # Generate the blob URL properly
-                    blob_url = f"https://{self.blob_service_client.account_name}.blob.core.windows.net/{self.container_name}/{blob.name}"
-                    files.append({
-                        "name": filename,
-                        "blob_name": blob.name,
-                        "url": blob_url,
-                        "size": blob.size,
-                        "last_modified": blob.last_modified.isoformat() if blob.last_modified else None,
-                        "content_type": blob.content_settings.content_type if blob.content_settings else None,
-                        "processing_id": processing_id,
-                        "tenant_id": tenant_id
-                    })
+                    blob_url = get_blob_url(self.blob_service_client.account_name, self.container_name, blob.name)
+                    files.append(build_file_info(blob, blob_url, tenant_id))
             
             return files
             
@@ -324,54 +631,12 @@ class AzureBlobService:
             files = []
             
             # List files from new path structure and legacy folders
-            prefixes = [
-                "main/Above-95%/source/",
-                "main/Above-95%/processed/",
-                "main/needs to be reviewed/source/",
-                "main/needs to be reviewed/processed/",
-                "source/",  # Legacy folder
-                "processed/",  # Legacy folder
-                "uploads/blob_data/"  # Legacy folder
-            ]
-            
-            for prefix in prefixes:
+            for prefix in get_listing_prefixes():
                 blob_list = self.container_client.list_blobs(name_starts_with=prefix)
                 
                 for blob in blob_list:
-                    # Extract tenant_id and processing_id from path
-                    # Handle new format: main/{confidence_folder}/source|processed/{tenant_id}/{filename}
-                    # Handle legacy format: source|processed/{tenant_id}/.../{filename}
-                    path_parts = blob.name.split('/')
-                    tenant_id = "unknown"
-                    processing_id = "unknown"
-                    filename = path_parts[-1] if len(path_parts) > 0 else "unknown"
-                    
-                    # Check if it's the new format (starts with "main")
-                    if len(path_parts) >= 4 and path_parts[0] == "main":
-                        # New format: main/{confidence_folder}/source|processed/{tenant_id}/{filename}
-                        tenant_id = path_parts[3] if len(path_parts) > 3 else "unknown"
-                        processing_id = filename.rsplit('_', 1)[0] if '_' in filename else filename
-                    elif len(path_parts) >= 3:
-                        # Legacy format: source|processed/{tenant_id}/.../{filename}
-                        tenant_id = path_parts[1]
-                        # Check if path contains confidence folder
-                        if len(path_parts) >= 4 and (path_parts[2] == "Above-95%" or path_parts[2] == "Below-95%" or path_parts[2] == "needs to be reviewed"):
-                            processing_id = path_parts[3] if len(path_parts) > 3 else "unknown"
-                        else:
-                            processing_id = path_parts[2] if len(path_parts) > 2 else "unknown"
-                    
-                    # Generate the blob URL properly
-                    blob_url = f"https://{self.blob_service_client.account_name}.blob.core.windows.net/{self.container_name}/{blob.name}"
-                    files.append({
-                        "name": filename,
-                        "blob_name": blob.name,
-                        "url": blob_url,
-                        "size": blob.size,
-                        "last_modified": blob.last_modified.isoformat() if blob.last_modified else None,
-                        "content_type": blob.content_settings.content_type if blob.content_settings else None,
-                        "processing_id": processing_id,
-                        "tenant_id": tenant_id
-                    })
+                    blob_url = get_blob_url(self.blob_service_client.account_name, self.container_name, blob.name)
+                    files.append(build_file_info(blob, blob_url))
             
             return files
             
@@ -395,52 +660,16 @@ class AzureBlobService:
         try:
             structure = {}
             
-            # Define folder prefixes to include (new structure and legacy)
-            if tenant_id:
-                prefixes = [
-                    f"main/Above-95%/source/{tenant_id}/",
-                    f"main/Above-95%/processed/{tenant_id}/",
-                    f"main/needs to be reviewed/source/{tenant_id}/",
-                    f"main/needs to be reviewed/processed/{tenant_id}/",
-                    f"source/{tenant_id}/",  # Legacy folder
-                    f"processed/{tenant_id}/",  # Legacy folder
-                    f"uploads/blob_data/{tenant_id}/"  # Legacy folder
-                ]
-            else:
-                prefixes = [
-                    "main/Above-95%/source/",
-                    "main/Above-95%/processed/",
-                    "main/needs to be reviewed/source/",
-                    "main/needs to be reviewed/processed/",
-                    "source/",  # Legacy folder
-                    "processed/",  # Legacy folder
-                    "uploads/blob_data/"  # Legacy folder
-                ]
-            
-            for prefix in prefixes:
+            # Include new structure and legacy folders
+            for prefix in get_listing_prefixes(tenant_id):
                 blob_list = self.container_client.list_blobs(name_starts_with=prefix)
                 
                 for blob in blob_list:
-                    path_parts = blob.name.split('/')
-                    
-                    # Navigate/create folder structure
-                    current = structure
-                    for i, part in enumerate(path_parts):
-                        if i == len(path_parts) - 1:  # Last part is filename
-                            # Generate the blob URL properly
-                            blob_url = f"https://{self.blob_service_client.account_name}.blob.core.windows.net/{self.container_name}/{blob.name}"
-                            current[part] = {
-                                "type": "file",
-                                "url": blob_url,
-                                "size": blob.size,
-                                "last_modified": blob.last_modified.isoformat() if blob.last_modified else None,
-                                "content_type": blob.content_settings.content_type if blob.content_settings else None,
-                                "folder_type": path_parts[0] if path_parts else "unknown"
-                            }
-                        else:
-                            if part not in current:
-                                current[part] = {"type": "folder", "contents": {}}
-                            current = current[part]["contents"]
+                    blob_url = get_blob_url(self.blob_service_client.account_name, self.container_name, blob.name)
+                    add_to_folder_structure(
+                        structure, blob.name, blob_url, blob.size, blob.last_modified,
+                        blob.content_settings.content_type if blob.content_settings else None
+                    )
             
             return structure
             
@@ -467,6 +696,9 @@ class AzureBlobService:
                 blob=blob_name
             )
             blob_client.delete_blob()
+            self._remove_from_catalog(blob_name)
+            if blob_name.endswith(".json"):
+                self._delete_detail_blob(blob_name)
             logger.info(f"Successfully deleted {blob_name}")
             return True
             
@@ -533,6 +765,14 @@ class AzureBlobService:
             source_client.delete_blob()
             logger.info(f"Deleted source blob: {source_blob_name}")
             
+            props = destination_client.get_blob_properties()
+            self._update_catalog(
+                destination_blob_name, props.size,
+                props.content_settings.content_type if props.content_settings else None,
+                props.last_modified, props.etag
+            )
+            self._remove_from_catalog(source_blob_name)
+            
             return True
             
         except Exception as e:
@@ -546,6 +786,9 @@ class AzureBlobService:
         Move a source file to the appropriate folder based on confidence score.
         FIRST checks the confidence score, THEN moves the file to the correct folder.
         
+        Only needed for source files uploaded before their confidence was known; new uploads
+        pass confidence_score to upload_source_document and are never moved.
+        
         Args:
             blob_path: Current blob path of the source file
             tenant_id: Tenant ID
@@ -631,6 +874,14 @@ class AzureBlobService:
                 logger.info(f"[MOVE] Moving file from {blob_path} to {new_blob_path} (confidence: {score_display})")
                 if self.move_blob(blob_path, new_blob_path):
                     logger.info(f"[SUCCESS] Successfully moved file to {new_blob_path} based on confidence {score_display}")
+                    from services.source_document_service import source_document_service
+                    source_document_service.record_upload(
+                        processing_id=processing_id,
+                        tenant_id=tenant_id,
+                        filename=filename,
+                        blob_path=new_blob_path,
+                        confidence_folder=confidence_folder
+                    )
                     return new_blob_path
                 else:
                     logger.error(f"[FAILED] Failed to move file from {blob_path} to {new_blob_path}")
@@ -707,8 +958,160 @@ class AzureBlobService:
             logger.error(f"Failed to download {blob_name}: {e}")
             return None
     
+    def _upload_processed_payload(self, blob_path: str, json_data: Dict[str, Any],
+                                  metadata: Optional[Dict[str, str]]) -> Tuple[BlobClient, int]:
+        """
+        Upload a processed JSON result in the configured storage format.
+        
+        In the compact format the OCR detail is written first to its own blob, so a summary
+        is never visible without its detail.
+        
+        Args:
+            blob_path: Full blob path of the processed JSON file
+            json_data: Full processed result
+            metadata: Blob metadata for the processed JSON blob
+            
+        Returns:
+            Tuple of (BlobClient of the processed blob, stored size in bytes)
+        """
+        from azure.storage.blob import ContentSettings
+        
+        if use_compact_format():
+            summary, detail = split_processed_json(json_data)
+            content_settings = ContentSettings(content_type="application/json", content_encoding="gzip")
+            if detail:
+                detail_path = detail_blob_path(blob_path)
+                self.blob_service_client.get_blob_client(container=self.container_name, blob=detail_path).upload_blob(
+                    encode_processed_json(detail, compact=True),
+                    content_settings=content_settings,
+                    overwrite=True
+                )
+                summary[DETAIL_BLOB_KEY] = detail_path
+            data = encode_processed_json(summary, compact=True)
+            metadata = compact_metadata(metadata)
+        else:
+            content_settings = ContentSettings(content_type="application/json")
+            data = encode_processed_json(json_data, compact=False)
+        
+        blob_client = self.blob_service_client.get_blob_client(container=self.container_name, blob=blob_path)
+        upload_result = blob_client.upload_blob(
+            data,
+            content_settings=content_settings,
+            metadata=metadata,
+            overwrite=True
+        )
+        self._update_catalog(blob_path, len(data), "application/json",
+                             upload_result.get("last_modified"), upload_result.get("etag"))
+        return blob_client, len(data)
+    
+    def _delete_detail_blob(self, blob_name: str):
+        """Delete the OCR detail blob of a processed JSON file, if it has one."""
+        try:
+            self.blob_service_client.get_blob_client(
+                container=self.container_name,
+                blob=detail_blob_path(blob_name)
+            ).delete_blob()
+        except ResourceNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to delete OCR detail of {blob_name}: {e}")
+    
+    def load_processed_json(self, blob_name: str, include_detail: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Load a processed JSON result stored in either format.
+        
+        Args:
+            blob_name: Full blob path of the processed JSON file
+            include_detail: Fetch the OCR detail blob and merge it into the result
+            
+        Returns:
+            Processed result dict, or None if it could not be loaded
+        """
+        raw = self.download_file(blob_name)
+        if raw is None:
+            return None
+        
+        try:
+            json_data = decode_processed_json(raw)
+            if include_detail and json_data.get(DETAIL_BLOB_KEY):
+                raw_detail = self.download_file(json_data[DETAIL_BLOB_KEY])
+                detail = decode_processed_json(raw_detail) if raw_detail else None
+                if detail is None:
+                    logger.warning(f"OCR detail missing for {blob_name}")
+                json_data = merge_processed_json(json_data, detail)
+            return json_data
+        except ValueError as e:
+            logger.error(f"Failed to parse processed JSON {blob_name}: {e}")
+            return None
+    
+    def get_blob_properties(self, blob_name: str):
+        """
+        Get a blob's properties (size, ETag, content settings, metadata).
+        
+        Args:
+            blob_name: Name of the blob
+            
+        Returns:
+            BlobProperties, or None if the blob does not exist or storage is unavailable
+        """
+        if not self.is_available():
+            return None
+        
+        try:
+            return self.blob_service_client.get_blob_client(
+                container=self.container_name,
+                blob=blob_name
+            ).get_blob_properties()
+        except ResourceNotFoundError:
+            return None
+    
+    def save_processed_json(self, blob_name: str, json_data: Dict[str, Any],
+                            metadata: Optional[Dict[str, str]] = None, etag: Optional[str] = None) -> bool:
+        """
+        Overwrite a processed JSON result, keeping the format it was stored in.
+        
+        Args:
+            blob_name: Full blob path of the processed JSON file
+            json_data: Processed result (the summary only, for compact blobs)
+            metadata: Blob metadata (format marker and source link)
+            etag: Only overwrite if the blob still has this ETag
+            
+        Returns:
+            True if successful, False otherwise (including an ETag mismatch)
+        """
+        if not self.is_available():
+            return False
+        
+        try:
+            from azure.storage.blob import ContentSettings
+            
+            data, content_encoding = encode_for_metadata(json_data, metadata)
+            upload_kwargs = {
+                "content_settings": ContentSettings(content_type="application/json", content_encoding=content_encoding),
+                "metadata": metadata,
+                "overwrite": True
+            }
+            if etag:
+                from azure.core import MatchConditions
+                upload_kwargs.update({"etag": etag, "match_condition": MatchConditions.IfNotModified})
+            
+            upload_result = self.blob_service_client.get_blob_client(
+                container=self.container_name,
+                blob=blob_name
+            ).upload_blob(data, **upload_kwargs)
+            self._update_catalog(blob_name, len(data), "application/json",
+                                 upload_result.get("last_modified"), upload_result.get("etag"))
+            return True
+            
+        except ResourceModifiedError:
+            logger.info(f"{blob_name} was modified concurrently - not overwritten")
+            return False
+        except Exception as e:
+            logger.error(f"Failed to save processed JSON {blob_name}: {e}")
+            return False
+    
     def upload_processed_json(self, json_data: Dict[str, Any], filename: str, tenant_id: str, 
-                             processing_id: str) -> Dict[str, str]:
+                             processing_id: str, source_blob_path: Optional[str] = None) -> Dict[str, str]:
         """
         Upload processed JSON data to blob storage in the processed folder.
         
@@ -717,6 +1120,7 @@ class AzureBlobService:
             filename: Original filename (used to generate JSON filename)
             tenant_id: Tenant ID for organization
             processing_id: Processing ID for organization
+            source_blob_path: Source file blob path, stored in the JSON blob's metadata
             
         Returns:
             Dictionary with upload result information
@@ -725,8 +1129,6 @@ class AzureBlobService:
             raise ValueError("Azure Blob Storage not available")
         
         try:
-            import json as json_module
-            
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             
             # Extract confidence score from json_data (prefer ocr_confidence_score, fallback to confidence_score)
@@ -811,19 +1213,9 @@ class AzureBlobService:
             
             logger.info(f"Uploading processed JSON data to blob storage: {json_filename} to {blob_path}")
             
-            # Convert dict to JSON bytes
-            json_bytes = json_module.dumps(json_data, ensure_ascii=False, indent=2).encode('utf-8')
-            
-            # Upload the JSON data
-            blob_client = self.blob_service_client.get_blob_client(
-                container=self.container_name,
-                blob=blob_path
-            )
-            
-            blob_client.upload_blob(
-                json_bytes,
-                content_type="application/json",
-                overwrite=True
+            # Upload the JSON data in the configured storage format
+            blob_client, size_bytes = self._upload_processed_payload(
+                blob_path, json_data, source_link_metadata(source_blob_path)
             )
             
             # Get blob URL
@@ -840,7 +1232,7 @@ class AzureBlobService:
                 "processing_id": processing_id,
                 "folder": "processed",
                 "timestamp": timestamp,
-                "size_bytes": len(json_bytes)
+                "size_bytes": size_bytes
             }
             
         except Exception as e:
@@ -880,7 +1272,8 @@ class AzureBlobService:
                     "url": blob_url,
                     "size": blob.size,
                     "last_modified": blob.last_modified.isoformat() if blob.last_modified else None,
-                    "content_type": blob.content_settings.content_type if blob.content_settings else None
+                    "content_type": blob.content_settings.content_type if blob.content_settings else None,
+                    "etag": blob.etag
                 })
             
             return files
@@ -889,6 +1282,40 @@ class AzureBlobService:
             logger.error(f"Failed to list bulk source files: {e}")
             return []
     
+    def list_bulk_processed_base_names(self) -> Optional[set]:
+        """
+        Collect the base filenames of all processed JSON blobs in a single pass.
+        Used to backfill the bulk processed manifest.
+        
+        Returns:
+            Set of base filenames (from {timestamp}_{base_filename}_extracted_data.json), or None on failure
+        """
+        if not self.is_available():
+            return None
+        
+        try:
+            # Current bulk uploads go to main/, older ones to bulk processing/
+            processed_prefixes = [
+                "main/Above-95%/processed/",
+                "main/needs to be reviewed/processed/",
+                "bulk processing/Above-95%/processed/",
+                "bulk processing/needs to be reviewed/processed/"
+            ]
+            pattern = re.compile(r'^\d{8}_\d{6}_(.+)_extracted_data\.json$')
+            
+            base_names = set()
+            for prefix in processed_prefixes:
+                for blob in self.container_client.list_blobs(name_starts_with=prefix):
+                    match = pattern.match(blob.name.split('/')[-1])
+                    if match:
+                        base_names.add(match.group(1))
+            
+            return base_names
+            
+        except Exception as e:
+            logger.error(f"[BULK] Failed to list processed JSON blobs: {e}")
+            return None
+    
     def check_file_processed(self, blob_name: str) -> bool:
         """
         Check if a file has already been processed by checking if it exists in processed folders.
@@ -938,7 +1365,9 @@ class AzureBlobService:
             return False
     
     def upload_bulk_processed_json(self, json_data: Dict[str, Any], filename: str, 
-                                   confidence_score: float, tenant_id: str = "tenant_2") -> Dict[str, str]:
+                                   confidence_score: float, tenant_id: str = "tenant_2",
+                                   source_blob_name: Optional[str] = None,
+                                   source_etag: Optional[str] = None) -> Dict[str, str]:
         """
         Upload processed JSON data to bulk processing folder based on confidence score.
         
@@ -947,6 +1376,9 @@ class AzureBlobService:
             filename: Original filename (used to generate JSON filename)
             confidence_score: Confidence score (0-1.0 for decimal or 0-100 for percentage)
             tenant_id: Tenant ID for organization (defaults to "tenant_2" if not provided)
+            source_blob_name: Source blob the JSON was produced from; recorded in the processed manifest
+                and in the JSON blob's metadata
+            source_etag: ETag of the source blob that was processed
             
         Returns:
             Dictionary with upload result information
@@ -955,8 +1387,6 @@ class AzureBlobService:
             return {"success": False, "error": "Azure Blob Storage not available"}
         
         try:
-            import json as json_module
-            
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             
             # Normalize confidence score and determine folder
@@ -996,19 +1426,9 @@ class AzureBlobService:
             
             logger.info(f"[BULK] Uploading processed JSON to: {blob_path}")
             
-            # Convert dict to JSON bytes
-            json_bytes = json_module.dumps(json_data, ensure_ascii=False, indent=2).encode('utf-8')
-            
-            # Upload the JSON data
-            blob_client = self.blob_service_client.get_blob_client(
-                container=self.container_name,
-                blob=blob_path
-            )
-            
-            blob_client.upload_blob(
-                json_bytes,
-                content_type="application/json",
-                overwrite=True
+            # Upload the JSON data in the configured storage format
+            blob_client, size_bytes = self._upload_processed_payload(
+                blob_path, json_data, source_link_metadata(source_blob_name)
             )
             
             # Get blob URL
@@ -1016,6 +1436,17 @@ class AzureBlobService:
             
             logger.info(f"[BULK] Successfully uploaded processed JSON: {json_filename} to {blob_path}")
             
+            # Record the source as processed so the periodic scan skips it
+            if source_blob_name:
+                from services.bulk_manifest_service import bulk_manifest_service
+                bulk_manifest_service.mark_processed(
+                    source_blob_name=source_blob_name,
+                    source_etag=source_etag,
+                    tenant_id=tenant_id,
+                    filename=filename,
+                    processed_blob_path=blob_path
+                )
+            
             return {
                 "success": True,
                 "blob_path": blob_path,
@@ -1023,7 +1454,7 @@ class AzureBlobService:
                 "filename": json_filename,
                 "folder": confidence_folder,
                 "timestamp": timestamp,
-                "size_bytes": len(json_bytes)
+                "size_bytes": size_bytes
             }
             
         except Exception as e:
@@ -1060,6 +1491,9 @@ class AzureBlobService:
         """
         Find the source file path from a processed file blob name.
         
+        Uses the link recorded at processing time; only legacy processed files fall back to
+        matching source filenames against the processed filename.
+        
         Args:
             processed_blob_name: Full blob path of the processed JSON file
                 (e.g., "main/Above-95%/processed/tenant_2/20251113_102709_pdf-sl-report-270237207-pdf_compress_extracted_data.json")
@@ -1072,106 +1506,38 @@ class AzureBlobService:
             return None
         
         try:
-            # Extract filename from blob path
-            processed_filename = processed_blob_name.split('/')[-1]
-            logger.info(f"Searching for source file matching processed file: {processed_filename}")
-            
-            # Extract tenant_id from path
-            path_parts = processed_blob_name.split('/')
-            tenant_id = None
-            confidence_folder = None
-            
-            # Check if it's new format: main/{confidence_folder}/processed/{tenant_id}/{filename}
-            if len(path_parts) >= 4 and path_parts[0] == "main":
-                confidence_folder = path_parts[1] if len(path_parts) > 1 else None
-                tenant_id = path_parts[3] if len(path_parts) > 3 else None
-            elif len(path_parts) >= 2:
-                # Legacy format: processed/{tenant_id}/.../{filename}
-                tenant_id = path_parts[1] if len(path_parts) > 1 else None
-            
-            if not tenant_id:
-                logger.error(f"Could not extract tenant_id from processed blob path: {processed_blob_name}")
-                return None
-            
-            # Parse processed filename to extract timestamp and base filename
-            timestamp = None
-            base_filename_without_ext = None
-            
-            # Try new format first: {timestamp}_{base_filename}_extracted_data.json
-            if processed_filename.endswith('_extracted_data.json'):
-                # Remove _extracted_data.json suffix
-                name_without_suffix = processed_filename.replace('_extracted_data.json', '')
-                # Timestamp pattern: YYYYMMDD_HHMMSS (8 digits, underscore, 6 digits)
-                timestamp_match = re.match(r'^(\d{8}_\d{6})_(.+)$', name_without_suffix)
-                if timestamp_match:
-                    timestamp = timestamp_match.group(1)
-                    base_filename_without_ext = timestamp_match.group(2)
-                else:
-                    # Fallback: split by first underscore
-                    parts = name_without_suffix.split('_', 1)
-                    if len(parts) >= 2:
-                        timestamp = parts[0]
-                        base_filename_without_ext = parts[1]
-                    else:
-                        base_filename_without_ext = name_without_suffix
-            # Try legacy format
-            elif '_processed_' in processed_filename:
-                # Format: {base_filename}_processed_{timestamp}.json
-                name_without_ext = processed_filename.replace('.json', '')
-                parts = name_without_ext.split('_processed_')
-                if len(parts) == 2:
-                    base_filename_without_ext = parts[0]
-                    timestamp = parts[1]
-            
-            if not base_filename_without_ext:
-                logger.error(f"Could not extract base filename from processed filename: {processed_filename}")
+            # Link recorded at processing time: indexed DB lookup, then the processed blob's metadata
+            from services.source_link_service import source_link_service
+            source_blob_path = source_link_service.lookup_source(processed_blob_name)
+            if source_blob_path:
+                return source_blob_path
+            try:
+                properties = self.blob_service_client.get_blob_client(
+                    container=self.container_name,
+                    blob=processed_blob_name
+                ).get_blob_properties()
+                source_blob_path = source_path_from_metadata(properties.metadata)
+                if source_blob_path:
+                    return source_blob_path
+            except ResourceNotFoundError:
+                logger.warning(f"Processed file not found: {processed_blob_name}")
+            
+            # Legacy processed files without a recorded link: match by filename
+            logger.info(f"Searching for source file matching processed file: {processed_blob_name.split('/')[-1]}")
+            parsed = parse_processed_blob_name(processed_blob_name)
+            if not parsed:
                 return None
             
-            logger.info(f"Extracted - timestamp: {timestamp}, base_filename: {base_filename_without_ext}, tenant_id: {tenant_id}")
-            
-            # Search for source files in both new and legacy locations
-            search_prefixes = []
-            
-            if confidence_folder:
-                # New format: main/{confidence_folder}/source/{tenant_id}/
-                search_prefixes.append(f"main/{confidence_folder}/source/{tenant_id}/")
-            else:
-                # Try both confidence folders if confidence_folder not found
-                search_prefixes.append(f"main/Above-95%/source/{tenant_id}/")
-                search_prefixes.append(f"main/needs to be reviewed/source/{tenant_id}/")
-            
-            # Legacy format: source/{tenant_id}/
-            search_prefixes.append(f"source/{tenant_id}/")
-            
             # Search for matching source files
-            for prefix in search_prefixes:
+            for prefix in parsed["search_prefixes"]:
                 try:
-                    blob_list = self.container_client.list_blobs(name_starts_with=prefix)
-                    best_match = None
-                    
-                    for blob in blob_list:
-                        source_filename = blob.name.split('/')[-1]
-                        
-                        # Check if source filename starts with base filename
-                        if source_filename.startswith(base_filename_without_ext):
-                            if timestamp:
-                                # If timestamp is provided, check if it's in the filename
-                                if timestamp in source_filename:
-                                    logger.info(f"Found exact match: {blob.name}")
-                                    return blob.name
-                                else:
-                                    # Store as best match if no exact match found yet
-                                    if not best_match:
-                                        best_match = blob.name
-                            else:
-                                # No timestamp to match, return first match
-                                logger.info(f"Found match (no timestamp): {blob.name}")
-                                return blob.name
+                    matcher = SourceFileMatcher(parsed["base_filename"], parsed["timestamp"])
+                    for blob in self.container_client.list_blobs(name_starts_with=prefix):
+                        if matcher.check(blob.name):
+                            break
                     
-                    # If we found a best match but no exact match, return it
-                    if best_match:
-                        logger.info(f"Found best match: {best_match}")
-                        return best_match
+                    if matcher.best_match:
+                        return matcher.best_match
                         
                 except Exception as e:
                     logger.error(f"Error searching for source files with prefix {prefix}: {e}")
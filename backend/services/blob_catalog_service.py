@@ -0,0 +1,478 @@
+"""
+Blob catalog: a Postgres index of the blobs under the listed folders.
+
+File listings, folder trees and per-tenant stats are served from this table instead of
+enumerating every blob prefix on each request. Entries are written on every upload,
+move and delete; a periodic reconciliation job corrects any drift (blobs written by
+other tools, missed updates) and rebuilds the per-tenant counters.
+"""
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models.database import SessionLocal, BlobCatalogEntry, BlobTenantCounter, BlobCatalogSync
+from services.azure_blob_service import LISTING_PREFIXES, parse_listing_path, get_blob_url, add_to_folder_structure
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_CONTENT_TYPE = "unknown"
+RECONCILE_BATCH_SIZE = 1000
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Convert an aware datetime to naive UTC for storage."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _isoformat_utc(value: Optional[datetime]) -> Optional[str]:
+    """Format a stored naive UTC datetime the way blob listings do (with +00:00)."""
+    return value.replace(tzinfo=timezone.utc).isoformat() if value else None
+
+
+class BlobCatalogService:
+    """Service for the blob catalog table and precomputed per-tenant counters."""
+
+    def __init__(self):
+        self.container_name = os.getenv('AZURE_BLOB_CONTAINER', 'ocr-documents')
+        connection_string = os.getenv('AZURE_STORAGE_CONNECTION_STRING') or ""
+        settings = dict(part.split('=', 1) for part in connection_string.split(';') if '=' in part)
+        self.account_name = settings.get('AccountName')
+        self._ready = False
+
+    def _build_row(self, blob_name: str, size: Optional[int], content_type: Optional[str],
+                   last_modified: Optional[datetime] = None, etag: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Build a catalog row for a blob, or None if the blob is outside the listed folders."""
+        prefix = next((prefix for prefix in LISTING_PREFIXES if blob_name.startswith(prefix)), None)
+        if prefix is None or blob_name.endswith('/'):
+            return None
+
+        remainder = blob_name[len(prefix):]
+        folder, _, name = blob_name.rpartition('/')
+        return {
+            "blob_name": blob_name,
+            "folder": f"{folder}/",
+            "name": name,
+            "tenant_id": remainder.split('/', 1)[0] if '/' in remainder else "unknown",
+            "processing_id": parse_listing_path(blob_name)["processing_id"],
+            "size": size,
+            "content_type": content_type,
+            "last_modified": _naive_utc(last_modified),
+            "etag": etag,
+            "updated_at": datetime.utcnow()
+        }
+
+    def _file_info(self, entry: BlobCatalogEntry) -> Dict[str, Any]:
+        """Convert a catalog entry to the file listing format used by the blob endpoints."""
+        return {
+            "name": entry.name,
+            "blob_name": entry.blob_name,
+            "url": get_blob_url(self.account_name, self.container_name, entry.blob_name),
+            "size": entry.size,
+            "last_modified": _isoformat_utc(entry.last_modified),
+            "content_type": entry.content_type,
+            "processing_id": entry.processing_id,
+            "tenant_id": entry.tenant_id
+        }
+
+    @staticmethod
+    def _adjust_counter(session, tenant_id: str, content_type: Optional[str], count_delta: int, size_delta: int):
+        """Apply a delta to a tenant's counter row (created on first use)."""
+        stmt = pg_insert(BlobTenantCounter).values(
+            tenant_id=tenant_id,
+            content_type=content_type or UNKNOWN_CONTENT_TYPE,
+            file_count=count_delta,
+            total_size=size_delta,
+            updated_at=datetime.utcnow()
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["tenant_id", "content_type"],
+            set_={
+                "file_count": BlobTenantCounter.file_count + stmt.excluded.file_count,
+                "total_size": BlobTenantCounter.total_size + stmt.excluded.total_size,
+                "updated_at": stmt.excluded.updated_at
+            }
+        )
+        session.execute(stmt)
+
+    def record_blob(self, blob_name: str, size: Optional[int], content_type: Optional[str],
+                    last_modified: Optional[datetime] = None, etag: Optional[str] = None) -> bool:
+        """
+        Insert or update the catalog entry for a written blob and adjust the tenant counters.
+
+        Args:
+            blob_name: Full blob path
+            size: Blob size in bytes
+            content_type: MIME type of the blob
+            last_modified: Blob last-modified time
+            etag: Blob ETag
+
+        Returns:
+            bool: True if recorded, False if skipped or failed
+        """
+        row = self._build_row(blob_name, size, content_type, last_modified, etag)
+        if not row:
+            return False
+
+        session = SessionLocal()
+        try:
+            existing = session.query(BlobCatalogEntry).filter(
+                BlobCatalogEntry.blob_name == blob_name
+            ).with_for_update().first()
+            if existing:
+                self._adjust_counter(session, existing.tenant_id, existing.content_type, -1, -(existing.size or 0))
+                for key, value in row.items():
+                    setattr(existing, key, value)
+            else:
+                session.add(BlobCatalogEntry(**row))
+            self._adjust_counter(session, row["tenant_id"], row["content_type"], 1, row["size"] or 0)
+            session.commit()
+            return True
+        except Exception as e:
+            session.rollback()
+            logger.error(f"[CATALOG] Failed to record {blob_name}: {e}")
+            return False
+        finally:
+            session.close()
+
+    def remove_blob(self, blob_name: str) -> bool:
+        """
+        Remove a deleted blob from the catalog and adjust the tenant counters.
+
+        Args:
+            blob_name: Full blob path
+
+        Returns:
+            bool: True if an entry was removed, False otherwise
+        """
+        session = SessionLocal()
+        try:
+            existing = session.query(BlobCatalogEntry).filter(
+                BlobCatalogEntry.blob_name == blob_name
+            ).with_for_update().first()
+            if not existing:
+                return False
+            self._adjust_counter(session, existing.tenant_id, existing.content_type, -1, -(existing.size or 0))
+            session.delete(existing)
+            session.commit()
+            return True
+        except Exception as e:
+            session.rollback()
+            logger.error(f"[CATALOG] Failed to remove {blob_name}: {e}")
+            return False
+        finally:
+            session.close()
+
+    def remove_blobs(self, blob_names: List[str]) -> int:
+        """
+        Remove a batch of deleted blobs from the catalog and adjust the tenant counters.
+
+        Args:
+            blob_names: Full blob paths
+
+        Returns:
+            Number of entries removed
+        """
+        if not blob_names:
+            return 0
+        session = SessionLocal()
+        try:
+            removed = session.execute(
+                BlobCatalogEntry.__table__.delete()
+                .where(BlobCatalogEntry.blob_name.in_(blob_names))
+                .returning(BlobCatalogEntry.tenant_id, BlobCatalogEntry.content_type, BlobCatalogEntry.size)
+            ).all()
+            deltas = {}
+            for row in removed:
+                count, size = deltas.get((row.tenant_id, row.content_type), (0, 0))
+                deltas[(row.tenant_id, row.content_type)] = (count + 1, size + (row.size or 0))
+            for (tenant_id, content_type), (count, size) in deltas.items():
+                self._adjust_counter(session, tenant_id, content_type, -count, -size)
+            session.commit()
+            return len(removed)
+        except Exception as e:
+            session.rollback()
+            logger.error(f"[CATALOG] Failed to remove {len(blob_names)} blobs: {e}")
+            return 0
+        finally:
+            session.close()
+
+    def is_ready(self) -> bool:
+        """Check whether the catalog has been fully populated by at least one reconciliation."""
+        if self._ready:
+            return True
+
+        session = SessionLocal()
+        try:
+            self._ready = session.query(BlobCatalogSync.id).filter(
+                BlobCatalogSync.finished_at.isnot(None)
+            ).first() is not None
+            return self._ready
+        except Exception as e:
+            logger.warning(f"[CATALOG] Could not check catalog state: {e}")
+            return False
+        finally:
+            session.close()
+
+    def list_files(self, tenant_id: Optional[str] = None, content_type: Optional[str] = None,
+                   search: Optional[str] = None, folder: Optional[str] = None,
+                   limit: Optional[int] = None, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        List catalogued files with optional filters and pagination.
+
+        Args:
+            tenant_id: Only files of this tenant
+            content_type: Only files with this MIME type
+            search: Case-insensitive filename substring
+            folder: Only files under this path prefix
+            limit: Page size (all matching files if None)
+            offset: Number of files to skip
+
+        Returns:
+            (files, total) where total is the number of matching files
+        """
+        session = SessionLocal()
+        try:
+            query = session.query(BlobCatalogEntry)
+            if tenant_id:
+                query = query.filter(BlobCatalogEntry.tenant_id == tenant_id)
+            if content_type:
+                query = query.filter(BlobCatalogEntry.content_type == content_type)
+            if search:
+                query = query.filter(BlobCatalogEntry.name.icontains(search, autoescape=True))
+            if folder:
+                query = query.filter(BlobCatalogEntry.folder.startswith(folder, autoescape=True))
+
+            total = query.count()
+            query = query.order_by(BlobCatalogEntry.blob_name).offset(offset)
+            if limit:
+                query = query.limit(limit)
+            return [self._file_info(entry) for entry in query.all()], total
+        finally:
+            session.close()
+
+    def list_folder(self, path: str = "", tenant_id: Optional[str] = None,
+                    limit: Optional[int] = None, offset: int = 0) -> Dict[str, Any]:
+        """
+        List one level of the folder tree: direct subfolders (with file counts) and files.
+
+        Args:
+            path: Folder path ("" for the root, otherwise with trailing "/")
+            tenant_id: Only files of this tenant
+            limit: Page size for the files in this folder
+            offset: Number of files to skip
+
+        Returns:
+            Dict with path, folders, files and total_files
+        """
+        if path and not path.endswith('/'):
+            path = f"{path}/"
+
+        session = SessionLocal()
+        try:
+            child = func.split_part(func.substr(BlobCatalogEntry.folder, len(path) + 1), '/', 1).label("child")
+            folder_query = session.query(
+                child,
+                func.count(BlobCatalogEntry.id),
+                func.coalesce(func.sum(BlobCatalogEntry.size), 0)
+            ).filter(
+                BlobCatalogEntry.folder.startswith(path, autoescape=True),
+                BlobCatalogEntry.folder != path
+            )
+            file_query = session.query(BlobCatalogEntry).filter(BlobCatalogEntry.folder == path)
+            if tenant_id:
+                folder_query = folder_query.filter(BlobCatalogEntry.tenant_id == tenant_id)
+                file_query = file_query.filter(BlobCatalogEntry.tenant_id == tenant_id)
+
+            folders = [
+                {"type": "folder", "name": name, "path": f"{path}{name}/", "file_count": count, "total_size": int(size)}
+                for name, count, size in folder_query.group_by(child).order_by(child).all()
+            ]
+
+            total_files = file_query.count()
+            file_query = file_query.order_by(BlobCatalogEntry.name).offset(offset)
+            if limit:
+                file_query = file_query.limit(limit)
+            files = [{"type": "file", **self._file_info(entry)} for entry in file_query.all()]
+
+            return {"path": path, "folders": folders, "files": files, "total_files": total_files}
+        finally:
+            session.close()
+
+    def get_folder_structure(self, tenant_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Build the full nested folder structure from the catalog.
+
+        Args:
+            tenant_id: Optional tenant ID to filter structure
+
+        Returns:
+            Nested dictionary in the same format as AzureBlobService.get_folder_structure
+        """
+        session = SessionLocal()
+        try:
+            query = session.query(BlobCatalogEntry)
+            if tenant_id:
+                query = query.filter(BlobCatalogEntry.tenant_id == tenant_id)
+
+            structure = {}
+            for entry in query.order_by(BlobCatalogEntry.blob_name).yield_per(2000):
+                add_to_folder_structure(
+                    structure, entry.blob_name,
+                    get_blob_url(self.account_name, self.container_name, entry.blob_name),
+                    entry.size, entry.last_modified.replace(tzinfo=timezone.utc) if entry.last_modified else None,
+                    entry.content_type
+                )
+            return structure
+        finally:
+            session.close()
+
+    def get_tenant_stats(self, tenant_id: str, recent_limit: int = 10) -> Dict[str, Any]:
+        """
+        Get file statistics for a tenant from the precomputed counters.
+
+        Args:
+            tenant_id: Tenant identifier
+            recent_limit: Number of most recent uploads to include
+
+        Returns:
+            Dict with total_files, total_size_bytes, total_size_mb, files_by_type and recent_uploads
+        """
+        session = SessionLocal()
+        try:
+            counters = session.query(BlobTenantCounter).filter(
+                BlobTenantCounter.tenant_id == tenant_id,
+                BlobTenantCounter.file_count > 0
+            ).all()
+            files_by_type = {
+                counter.content_type: {"count": counter.file_count, "total_size": counter.total_size}
+                for counter in counters
+            }
+            total_files = sum(counter.file_count for counter in counters)
+            total_size_bytes = sum(counter.total_size for counter in counters)
+
+            recent = session.query(BlobCatalogEntry).filter(
+                BlobCatalogEntry.tenant_id == tenant_id
+            ).order_by(BlobCatalogEntry.last_modified.desc().nullslast()).limit(recent_limit).all()
+
+            return {
+                "total_files": total_files,
+                "total_size_bytes": total_size_bytes,
+                "total_size_mb": round(total_size_bytes / (1024 * 1024), 2),
+                "files_by_type": files_by_type,
+                "recent_uploads": [self._file_info(entry) for entry in recent]
+            }
+        finally:
+            session.close()
+
+    def _upsert_rows(self, rows: List[Dict[str, Any]]):
+        """Insert or refresh a batch of catalog rows."""
+        session = SessionLocal()
+        try:
+            stmt = pg_insert(BlobCatalogEntry).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["blob_name"],
+                set_={key: stmt.excluded[key] for key in rows[0] if key != "blob_name"}
+            )
+            session.execute(stmt)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def reconcile(self, container_client) -> Dict[str, Any]:
+        """
+        Rebuild the catalog from a full listing of the container's listed folders.
+
+        Upserts every listed blob, removes entries for blobs that no longer exist (only
+        entries not touched since the run started, so concurrent uploads are kept) and
+        recomputes the per-tenant counters.
+
+        Args:
+            container_client: ContainerClient of the blob container
+
+        Returns:
+            Dict with blobs_seen and rows_removed
+        """
+        started_at = datetime.utcnow()
+        session = SessionLocal()
+        try:
+            sync = BlobCatalogSync(started_at=started_at)
+            session.add(sync)
+            session.commit()
+            sync_id = sync.id
+        finally:
+            session.close()
+
+        seen = set()
+        rows = []
+        for prefix in LISTING_PREFIXES:
+            for blob in container_client.list_blobs(name_starts_with=prefix):
+                row = self._build_row(
+                    blob.name, blob.size,
+                    blob.content_settings.content_type if blob.content_settings else None,
+                    blob.last_modified, blob.etag
+                )
+                if not row or blob.name in seen:
+                    continue
+                seen.add(blob.name)
+                rows.append(row)
+                if len(rows) >= RECONCILE_BATCH_SIZE:
+                    self._upsert_rows(rows)
+                    rows = []
+        if rows:
+            self._upsert_rows(rows)
+
+        session = SessionLocal()
+        try:
+            stale_names = [
+                name for (name,) in session.query(BlobCatalogEntry.blob_name).filter(
+                    BlobCatalogEntry.updated_at < started_at
+                ).yield_per(5000)
+                if name not in seen
+            ]
+            for start in range(0, len(stale_names), RECONCILE_BATCH_SIZE):
+                session.query(BlobCatalogEntry).filter(
+                    BlobCatalogEntry.blob_name.in_(stale_names[start:start + RECONCILE_BATCH_SIZE])
+                ).delete(synchronize_session=False)
+
+            # Rebuild counters from the catalog in the same transaction
+            content_type = func.coalesce(BlobCatalogEntry.content_type, UNKNOWN_CONTENT_TYPE)
+            session.query(BlobTenantCounter).delete(synchronize_session=False)
+            session.execute(pg_insert(BlobTenantCounter).from_select(
+                ["tenant_id", "content_type", "file_count", "total_size", "updated_at"],
+                select(
+                    BlobCatalogEntry.tenant_id,
+                    content_type,
+                    func.count(BlobCatalogEntry.id),
+                    func.coalesce(func.sum(BlobCatalogEntry.size), 0),
+                    func.now()
+                ).group_by(BlobCatalogEntry.tenant_id, content_type)
+            ))
+
+            session.query(BlobCatalogSync).filter(BlobCatalogSync.id == sync_id).update({
+                "finished_at": datetime.utcnow(),
+                "blobs_seen": len(seen),
+                "rows_removed": len(stale_names)
+            }, synchronize_session=False)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+        self._ready = True
+        logger.info(f"[CATALOG] Reconciled blob catalog: {len(seen)} blob(s), {len(stale_names)} stale entr(y/ies) removed")
+        return {"blobs_seen": len(seen), "rows_removed": len(stale_names)}
+
+
+# Create singleton instance
+blob_catalog_service = BlobCatalogService()
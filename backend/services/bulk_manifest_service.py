@@ -0,0 +1,185 @@
+"""
+Service for tracking which bulk processing source blobs have already been processed.
+"""
+import logging
+from typing import Dict, Any, List, Optional, Set, Tuple
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from models.database import SessionLocal, BulkProcessedManifest
+
+logger = logging.getLogger(__name__)
+
+# Source blob names per manifest lookup query
+MANIFEST_LOOKUP_CHUNK_SIZE = 1000
+
+class BulkManifestService:
+    """Service for the processed-inputs manifest used by the bulk ingestion scan."""
+
+    def get_processed_keys(self, blob_names: List[str]) -> Optional[Set[Tuple[str, str]]]:
+        """
+        Load the manifest keys of the given source blobs (queried in chunks, so a scan only
+        reads the entries of the blobs currently in the source folder).
+
+        Args:
+            blob_names: Full source blob paths of the current listing
+
+        Returns:
+            Set of (source_blob_name, source_etag) keys, or None if the manifest could not be read
+        """
+        names = list(dict.fromkeys(blob_names))
+        keys = set()
+        session = SessionLocal()
+        try:
+            for start in range(0, len(names), MANIFEST_LOOKUP_CHUNK_SIZE):
+                rows = session.query(
+                    BulkProcessedManifest.source_blob_name,
+                    BulkProcessedManifest.source_etag
+                ).filter(
+                    BulkProcessedManifest.source_blob_name.in_(names[start:start + MANIFEST_LOOKUP_CHUNK_SIZE])
+                ).all()
+                keys.update((row.source_blob_name, row.source_etag or "") for row in rows)
+            return keys
+        except Exception as e:
+            logger.error(f"[BULK] Failed to load processed manifest: {e}")
+            return None
+        finally:
+            session.close()
+
+    def is_empty(self) -> bool:
+        """Check whether the manifest has no entries at all (False if it could not be read)."""
+        session = SessionLocal()
+        try:
+            return session.query(BulkProcessedManifest.id).first() is None
+        except Exception as e:
+            logger.error(f"[BULK] Failed to check processed manifest: {e}")
+            return False
+        finally:
+            session.close()
+
+    def is_blob_processed(self, blob_name: str, etag: Optional[str] = None) -> bool:
+        """
+        Check a single source blob against the manifest (used by the event-driven watchers).
+
+        Args:
+            blob_name: Full source blob path
+            etag: Current ETag of the source blob
+
+        Returns:
+            True if the blob (at this version) has already been processed
+        """
+        session = SessionLocal()
+        try:
+            match = session.query(BulkProcessedManifest.id).filter(
+                BulkProcessedManifest.source_blob_name == blob_name,
+                BulkProcessedManifest.source_etag.in_([etag or "", ""])
+            ).first()
+            return match is not None
+        except Exception as e:
+            logger.error(f"[BULK] Failed to check processed manifest for {blob_name}: {e}")
+            return False
+        finally:
+            session.close()
+
+    @staticmethod
+    def is_processed(processed_keys: Set[Tuple[str, str]], blob_name: str, etag: Optional[str]) -> bool:
+        """
+        Check a source blob against a loaded manifest.
+
+        Entries are keyed by (blob name, ETag), so a blob counts as processed only at the
+        version that was processed; an overwritten blob gets a new ETag and is processed again.
+        Task completions record the ETag they processed and the backfill records each source
+        file's current ETag. Only entries recorded without an ETag (a caller that did not know
+        the blob's version) match any version.
+
+        Args:
+            processed_keys: Set returned by get_processed_keys()
+            blob_name: Full source blob path
+            etag: Current ETag of the source blob
+
+        Returns:
+            True if the blob (at this version) has already been processed
+        """
+        return (blob_name, etag or "") in processed_keys or (blob_name, "") in processed_keys
+
+    def mark_processed(
+        self,
+        source_blob_name: str,
+        source_etag: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+        filename: Optional[str] = None,
+        processed_blob_path: Optional[str] = None
+    ) -> bool:
+        """
+        Record a source blob as processed. Safe to call more than once.
+
+        Args:
+            source_blob_name: Full source blob path (e.g., "bulk processing/source/file.pdf")
+            source_etag: ETag of the source blob that was processed
+            tenant_id: Tenant identifier
+            filename: Original filename
+            processed_blob_path: Path of the processed JSON blob
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        return self._insert_entries([{
+            "source_blob_name": source_blob_name,
+            "source_etag": source_etag or "",
+            "tenant_id": tenant_id,
+            "filename": filename,
+            "processed_blob_path": processed_blob_path
+        }]) is not None
+
+    def backfill(self, source_files: List[Dict[str, Any]], processed_base_names: Set[str]) -> int:
+        """
+        One-time backfill of the manifest from processed JSON blobs that already exist.
+
+        A source file counts as processed if a "{timestamp}_{base_filename}_extracted_data.json"
+        blob exists for its base filename (the rule the per-file prefix scan used to apply).
+
+        Args:
+            source_files: Files returned by AzureBlobService.list_bulk_source_files()
+            processed_base_names: Base filenames returned by AzureBlobService.list_bulk_processed_base_names()
+
+        Returns:
+            Number of manifest entries written
+        """
+        entries = []
+        for file_info in source_files:
+            filename = file_info["name"]
+            base_filename = filename.rsplit('.', 1)[0] if '.' in filename else filename
+            if base_filename in processed_base_names:
+                entries.append({
+                    "source_blob_name": file_info["blob_name"],
+                    "source_etag": file_info.get("etag") or "",
+                    "tenant_id": None,
+                    "filename": filename,
+                    "processed_blob_path": None
+                })
+
+        if not entries:
+            return 0
+
+        written = self._insert_entries(entries)
+        logger.info(f"[BULK] Backfilled processed manifest with {written or 0} entr(y/ies)")
+        return written or 0
+
+    def _insert_entries(self, entries: List[Dict[str, Any]]) -> Optional[int]:
+        """Insert manifest entries, ignoring ones that already exist."""
+        session = SessionLocal()
+        try:
+            stmt = pg_insert(BulkProcessedManifest).values(entries).on_conflict_do_nothing(
+                index_elements=["source_blob_name", "source_etag"]
+            )
+            result = session.execute(stmt)
+            session.commit()
+            return result.rowcount
+        except Exception as e:
+            session.rollback()
+            logger.error(f"[BULK] Failed to write processed manifest entries: {e}")
+            return None
+        finally:
+            session.close()
+
+
+# Create singleton instance
+bulk_manifest_service = BulkManifestService()
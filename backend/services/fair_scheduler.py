@@ -0,0 +1,304 @@
+"""
+Tenant-aware scheduling and admission control for the processing queue.
+
+Two priority lanes share the Celery "processing" queue:
+- interactive: user uploads waiting on a result; sent straight to Celery at high priority
+- bulk: bulk ingestion and large batches; held in per-tenant Redis sub-queues and fed to
+  Celery by a weighted round-robin dispatcher that keeps only a few bulk tasks in flight,
+  so worker slots stay free for interactive uploads during bulk bursts
+
+Per-tenant backlogs (queued + running tasks) are tracked in Redis so the API can reject
+submissions with 429 once a tenant exceeds its quota.
+"""
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Dict, Any, Optional, Tuple
+
+from core.celery_app import celery_app, get_redis_client
+
+logger = logging.getLogger(__name__)
+
+LANE_INTERACTIVE = "interactive"
+LANE_BULK = "bulk"
+
+# Redis transport priorities: 0 is consumed first
+LANE_PRIORITIES = {
+    LANE_INTERACTIVE: 0,
+    LANE_BULK: 9
+}
+
+# Compare-and-delete so a dispatcher whose lock expired never releases the next holder's lock
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+else
+    return 0
+end
+"""
+
+
+def _load_json_env(name: str) -> Dict[str, Any]:
+    """Parse an optional JSON object from an environment variable."""
+    raw = os.getenv(name)
+    if not raw:
+        return {}
+    try:
+        value = json.loads(raw)
+        return value if isinstance(value, dict) else {}
+    except json.JSONDecodeError:
+        logger.warning(f"Ignoring invalid JSON in {name}")
+        return {}
+
+
+class FairScheduler:
+    """Weighted round-robin dispatch of bulk work and per-tenant admission control."""
+
+    PENDING_PREFIX = "fair:pending"       # list per tenant of queued bulk job specs (payload pointers, not content)
+    TENANTS_KEY = "fair:tenants"          # set of tenants with queued bulk jobs
+    CURSOR_KEY = "fair:cursor"            # tenant to start the next round-robin pass at
+    INFLIGHT_KEY = "fair:inflight:bulk"   # zset of bulk task IDs handed to Celery
+    BACKLOG_PREFIX = "fair:backlog"       # zset per tenant+lane of task IDs not finished yet
+    DISPATCH_LOCK_KEY = "fair:dispatch:lock"
+
+    def __init__(self):
+        # Bulk tasks allowed in Celery at once; keep below worker concurrency to reserve interactive capacity
+        self.bulk_max_inflight = int(os.getenv("BULK_MAX_INFLIGHT", "3"))
+        # Relative share of bulk dispatch per tenant, e.g. {"tenant_2": 3}; unlisted tenants get 1
+        self.tenant_weights = _load_json_env("TENANT_WEIGHTS")
+        # Maximum unfinished tasks per tenant and lane before the API answers 429
+        self.lane_quotas = {
+            LANE_INTERACTIVE: int(os.getenv("TENANT_INTERACTIVE_QUOTA", "50")),
+            LANE_BULK: int(os.getenv("TENANT_BULK_QUOTA", "5000"))
+        }
+        # Per-tenant overrides, e.g. {"tenant_2": {"interactive": 100, "bulk": 20000}}
+        self.tenant_quotas = _load_json_env("TENANT_QUOTAS")
+        self.retry_after_seconds = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "30"))
+        # API batches larger than this are scheduled in the bulk lane
+        self.interactive_batch_limit = int(os.getenv("INTERACTIVE_BATCH_LIMIT", "10"))
+        # Entries older than this are treated as lost (e.g. worker crash) and ignored
+        self.stale_after_seconds = int(os.getenv("FAIR_SCHEDULER_STALE_SECONDS", "21600"))
+        # A dispatched bulk task holds its slot at most this long (queue wait + 300s task time limit)
+        self.inflight_stale_seconds = int(os.getenv("BULK_INFLIGHT_STALE_SECONDS", "900"))
+
+    def _backlog_key(self, tenant_id: str, lane: str) -> str:
+        return f"{self.BACKLOG_PREFIX}:{lane}:{tenant_id}"
+
+    def _pending_key(self, tenant_id: str) -> str:
+        return f"{self.PENDING_PREFIX}:{tenant_id}"
+
+    def lane_for_batch(self, file_count: int) -> str:
+        """Pick the lane for an API batch: small batches are interactive, large ones bulk."""
+        return LANE_INTERACTIVE if file_count <= self.interactive_batch_limit else LANE_BULK
+
+    def get_quota(self, tenant_id: str, lane: str) -> int:
+        """Get the backlog quota for a tenant and lane."""
+        override = self.tenant_quotas.get(tenant_id, {})
+        return int(override.get(lane, self.lane_quotas[lane]))
+
+    def get_backlog(self, tenant_id: str, lane: str) -> int:
+        """
+        Count a tenant's unfinished tasks (queued or running) in a lane.
+
+        Returns:
+            Backlog size, or 0 if Redis is unavailable
+        """
+        client = get_redis_client()
+        if client is None:
+            return 0
+        key = self._backlog_key(tenant_id, lane)
+        try:
+            client.zremrangebyscore(key, "-inf", time.time() - self.stale_after_seconds)
+            return client.zcard(key)
+        except Exception as e:
+            logger.warning(f"[SCHEDULER] Failed to read backlog for {tenant_id}/{lane}: {e}")
+            return 0
+
+    def check_admission(self, tenant_id: str, lane: str, incoming: int = 1) -> Tuple[bool, int]:
+        """
+        Decide whether a tenant may submit more work to a lane.
+
+        Args:
+            tenant_id: Tenant identifier
+            lane: LANE_INTERACTIVE or LANE_BULK
+            incoming: Number of tasks about to be submitted
+
+        Returns:
+            (allowed, retry_after_seconds)
+        """
+        backlog = self.get_backlog(tenant_id, lane)
+        quota = self.get_quota(tenant_id, lane)
+        if backlog + incoming <= quota:
+            return True, 0
+
+        logger.warning(f"[SCHEDULER] Rejecting {incoming} {lane} task(s) for {tenant_id}: backlog {backlog}/{quota}")
+        return False, self.retry_after_seconds
+
+    def submit(self, task_name: str, task_id: str, kwargs: Dict[str, Any], tenant_id: str, lane: str) -> None:
+        """
+        Submit a task through its lane.
+
+        Interactive tasks go straight to Celery at high priority. Bulk tasks are queued in the
+        tenant's sub-queue and dispatched in weighted round-robin order. Falls back to a direct
+        Celery submission if Redis is unavailable.
+
+        Args:
+            task_name: Registered Celery task name
+            task_id: Pre-generated Celery task ID (returned to the client for polling)
+            kwargs: Task keyword arguments; bulk jobs are held in Redis, so pass references
+                (blob names, spooled file paths) rather than document content
+            tenant_id: Tenant the work belongs to
+            lane: LANE_INTERACTIVE or LANE_BULK
+        """
+        client = get_redis_client()
+        if client is not None:
+            try:
+                client.zadd(self._backlog_key(tenant_id, lane), {task_id: time.time()})
+                if lane == LANE_BULK:
+                    client.rpush(self._pending_key(tenant_id), json.dumps({
+                        "task_name": task_name,
+                        "task_id": task_id,
+                        "kwargs": kwargs
+                    }))
+                    client.sadd(self.TENANTS_KEY, tenant_id)
+                    self.dispatch()
+                    return
+            except Exception as e:
+                logger.warning(f"[SCHEDULER] Redis error, submitting {task_id} directly: {e}")
+
+        self._send(task_name, task_id, kwargs, lane)
+
+    def _send(self, task_name: str, task_id: str, kwargs: Dict[str, Any], lane: str) -> None:
+        """Hand a task to Celery with the lane's priority."""
+        celery_app.send_task(
+            task_name,
+            kwargs=kwargs,
+            task_id=task_id,
+            queue="processing",
+            priority=LANE_PRIORITIES[lane]
+        )
+
+    def dispatch(self) -> int:
+        """
+        Move queued bulk jobs into Celery in weighted round-robin order across tenants,
+        up to the bulk in-flight limit.
+
+        Returns:
+            Number of tasks dispatched
+        """
+        client = get_redis_client()
+        if client is None:
+            return 0
+
+        # One dispatcher at a time so the in-flight limit holds across processes
+        lock_token = str(uuid.uuid4())
+        try:
+            if not client.set(self.DISPATCH_LOCK_KEY, lock_token, nx=True, ex=30):
+                return 0
+        except Exception as e:
+            logger.warning(f"[SCHEDULER] Could not take dispatch lock: {e}")
+            return 0
+
+        dispatched = 0
+        try:
+            client.zremrangebyscore(self.INFLIGHT_KEY, "-inf", time.time() - self.inflight_stale_seconds)
+            slots = self.bulk_max_inflight - client.zcard(self.INFLIGHT_KEY)
+            if slots <= 0:
+                return 0
+
+            tenants = sorted(client.smembers(self.TENANTS_KEY))
+            if not tenants:
+                return 0
+
+            # Rotate so each pass starts after the tenant the previous pass started with
+            cursor = client.get(self.CURSOR_KEY)
+            start = (tenants.index(cursor) + 1) % len(tenants) if cursor in tenants else 0
+            tenants = tenants[start:] + tenants[:start]
+            client.set(self.CURSOR_KEY, tenants[0])
+
+            active = list(tenants)
+            while slots > 0 and active:
+                for tenant_id in list(active):
+                    weight = max(1, int(self.tenant_weights.get(tenant_id, 1)))
+                    for _ in range(min(weight, slots)):
+                        raw_job = client.lpop(self._pending_key(tenant_id))
+                        if raw_job is None:
+                            self._retire_tenant(client, tenant_id)
+                            active.remove(tenant_id)
+                            break
+                        job = json.loads(raw_job)
+                        try:
+                            self._send(job["task_name"], job["task_id"], job["kwargs"], LANE_BULK)
+                        except Exception:
+                            # Put the job back at the head of the tenant's queue and stop for now
+                            client.lpush(self._pending_key(tenant_id), raw_job)
+                            raise
+                        client.zadd(self.INFLIGHT_KEY, {job["task_id"]: time.time()})
+                        slots -= 1
+                        dispatched += 1
+                    if slots <= 0:
+                        break
+
+            if dispatched:
+                logger.info(f"[SCHEDULER] Dispatched {dispatched} bulk task(s) across {len(tenants)} tenant(s)")
+            return dispatched
+        except Exception as e:
+            logger.error(f"[SCHEDULER] Bulk dispatch failed: {e}")
+            return dispatched
+        finally:
+            try:
+                client.eval(_RELEASE_LOCK_SCRIPT, 1, self.DISPATCH_LOCK_KEY, lock_token)
+            except Exception:
+                pass
+
+    def _retire_tenant(self, client, tenant_id: str) -> None:
+        """Drop a tenant with an empty sub-queue from the round-robin set."""
+        client.srem(self.TENANTS_KEY, tenant_id)
+        # A job may have been queued between the empty LPOP and SREM
+        if client.llen(self._pending_key(tenant_id)):
+            client.sadd(self.TENANTS_KEY, tenant_id)
+
+    def task_finished(self, task_id: str, tenant_id: Optional[str]) -> None:
+        """
+        Record a finished task: clear it from the backlogs and refill bulk capacity.
+
+        Args:
+            task_id: Celery task ID
+            tenant_id: Tenant the task belonged to (if known)
+        """
+        client = get_redis_client()
+        if client is None:
+            return
+
+        try:
+            if tenant_id:
+                for lane in (LANE_INTERACTIVE, LANE_BULK):
+                    client.zrem(self._backlog_key(tenant_id, lane), task_id)
+            if client.zrem(self.INFLIGHT_KEY, task_id):
+                self.dispatch()
+        except Exception as e:
+            logger.warning(f"[SCHEDULER] Failed to record completion of task {task_id}: {e}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get queued bulk work per tenant and current bulk in-flight count."""
+        client = get_redis_client()
+        if client is None:
+            return {"available": False}
+
+        try:
+            tenants = sorted(client.smembers(self.TENANTS_KEY))
+            return {
+                "available": True,
+                "bulk_inflight": client.zcard(self.INFLIGHT_KEY),
+                "bulk_max_inflight": self.bulk_max_inflight,
+                "bulk_pending": {tenant_id: client.llen(self._pending_key(tenant_id)) for tenant_id in tenants}
+            }
+        except Exception as e:
+            logger.error(f"[SCHEDULER] Failed to read scheduler status: {e}")
+            return {"available": False}
+
+
+# Create singleton instance
+fair_scheduler = FairScheduler()
@@ -0,0 +1,348 @@
+"""
+Event-driven bulk ingestion watchers.
+
+Watchers pick up new bulk files as soon as they arrive and enqueue them for processing,
+instead of waiting for the periodic check_bulk_processing_source scan (which is kept
+as a low-frequency reconciliation sweep).
+
+Implementations:
+- BlobEventQueueWatcher: consumes Event Grid "BlobCreated" events delivered to an Azure Storage Queue
+- LocalDirectoryWatcher: watches a local directory (inotify via watchdog, or polling) for on-prem and tests
+
+Run with: python -m services.ingestion_watcher
+"""
+import json
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from core.celery_tasks import enqueue_bulk_file, claim_bulk_source, submit_process_document
+from services.bulk_manifest_service import bulk_manifest_service
+from services.fair_scheduler import LANE_BULK
+
+logger = logging.getLogger(__name__)
+
+# Watcher selection: "blob_events", "local" or "none"
+INGESTION_WATCHER = os.getenv("INGESTION_WATCHER", "none").lower()
+BULK_SOURCE_PREFIX = "bulk processing/source/"
+SUPPORTED_EXTENSIONS = ('.pdf', '.png', '.jpg', '.jpeg')
+# Local file versions remembered as processed, so rescans skip them without a manifest query
+SEEN_CACHE_SIZE = 10000
+
+
+class IngestionWatcher(ABC):
+    """Base class for bulk ingestion watchers."""
+
+    def __init__(self):
+        self._stop_event = threading.Event()
+
+    @abstractmethod
+    def start(self):
+        """Start the watcher and block until stop() is called."""
+
+    def stop(self):
+        """Ask the watcher to stop."""
+        self._stop_event.set()
+
+    def handle_new_blob(self, blob_name: str, etag: Optional[str] = None) -> Optional[str]:
+        """
+        Enqueue a newly created bulk source blob unless it was already processed or queued.
+
+        Args:
+            blob_name: Full blob path (e.g., "bulk processing/source/file.pdf")
+            etag: ETag of the new blob, if known
+
+        Returns:
+            Task ID if a task was submitted, None otherwise
+        """
+        if not blob_name.startswith(BULK_SOURCE_PREFIX) or blob_name.endswith('/'):
+            return None
+
+        filename = blob_name.split('/')[-1]
+        if bulk_manifest_service.is_blob_processed(blob_name, etag):
+            logger.info(f"[WATCHER] Skipping {filename} - already processed")
+            return None
+
+        task_id = enqueue_bulk_file(blob_name=blob_name, filename=filename, source_etag=etag)
+        if task_id:
+            logger.info(f"[WATCHER] Enqueued {filename} (Task ID: {task_id})")
+        return task_id
+
+
+class BlobEventQueueWatcher(IngestionWatcher):
+    """
+    Consume Event Grid blob events from an Azure Storage Queue.
+
+    Configure an Event Grid subscription on the storage account for
+    Microsoft.Storage.BlobCreated events (subject filter: the bulk source folder)
+    with a Storage Queue endpoint, and point INGESTION_EVENT_QUEUE at that queue.
+    """
+
+    def __init__(self, connection_string: Optional[str] = None, queue_name: Optional[str] = None,
+                 container_name: Optional[str] = None):
+        super().__init__()
+        self.connection_string = connection_string or os.getenv('AZURE_STORAGE_CONNECTION_STRING')
+        self.queue_name = queue_name or os.getenv('INGESTION_EVENT_QUEUE', 'bulk-ingestion-events')
+        self.container_name = container_name or os.getenv('AZURE_BLOB_CONTAINER', 'ocr-documents')
+        self.idle_wait = float(os.getenv('INGESTION_EVENT_IDLE_WAIT_SECONDS', '2'))
+        self.queue_client = None
+
+    def _connect(self):
+        """Create the queue client (azure-storage-queue is only needed for this watcher)."""
+        from azure.storage.queue import QueueClient, TextBase64DecodePolicy
+        self.queue_client = QueueClient.from_connection_string(
+            self.connection_string,
+            self.queue_name,
+            message_decode_policy=TextBase64DecodePolicy()
+        )
+
+    def _parse_event(self, content: str) -> Optional[Dict[str, str]]:
+        """
+        Extract the blob name and ETag from an Event Grid (or CloudEvents) message.
+
+        Returns:
+            Dict with blob_name and etag, or None if the event is not a BlobCreated event for our container
+        """
+        event = json.loads(content)
+        if isinstance(event, list):
+            event = event[0] if event else {}
+
+        event_type = event.get("eventType") or event.get("type", "")
+        if not event_type.endswith("BlobCreated"):
+            return None
+
+        # Subject: /blobServices/default/containers/{container}/blobs/{blob path}
+        subject = event.get("subject", "")
+        container_marker = f"/containers/{self.container_name}/blobs/"
+        if container_marker not in subject:
+            return None
+
+        data = event.get("data") or {}
+        return {
+            "blob_name": subject.split(container_marker, 1)[1],
+            "etag": data.get("eTag")
+        }
+
+    def start(self):
+        """Poll the event queue and enqueue new bulk files until stopped."""
+        if not self.connection_string:
+            raise ValueError("AZURE_STORAGE_CONNECTION_STRING is required for the blob event watcher")
+
+        self._connect()
+        logger.info(f"[WATCHER] Listening for blob events on queue '{self.queue_name}'")
+
+        while not self._stop_event.is_set():
+            received = 0
+            try:
+                for message in self.queue_client.receive_messages(messages_per_page=32, visibility_timeout=60):
+                    received += 1
+                    try:
+                        event = self._parse_event(message.content)
+                        if event:
+                            self.handle_new_blob(event["blob_name"], event["etag"])
+                        self.queue_client.delete_message(message)
+                    except Exception as e:
+                        # Leave the message on the queue; it becomes visible again and is retried
+                        logger.error(f"[WATCHER] Failed to handle blob event {message.id}: {e}")
+            except Exception as e:
+                logger.error(f"[WATCHER] Error receiving blob events: {e}")
+
+            if not received:
+                self._stop_event.wait(self.idle_wait)
+
+
+class LocalDirectoryWatcher(IngestionWatcher):
+    """
+    Watch a local directory for new documents (on-prem fax drops and tests).
+
+    Uses inotify through the optional watchdog package when installed, otherwise
+    falls back to polling the directory. New files are submitted through the
+    regular process_document task, in the bulk lane, once their size has stopped changing.
+    """
+
+    def __init__(self, directory: Optional[str] = None, tenant_id: Optional[str] = None):
+        super().__init__()
+        self.directory = Path(directory or os.getenv('INGESTION_WATCH_DIR', './bulk_source'))
+        self.tenant_id = tenant_id or os.getenv('INGESTION_TENANT_ID', 'tenant_2')
+        self.poll_interval = float(os.getenv('INGESTION_POLL_INTERVAL_SECONDS', '2'))
+        self.settle_seconds = float(os.getenv('INGESTION_SETTLE_SECONDS', '1'))
+        self._pending = set()
+        self._seen = OrderedDict()  # (source, version) keys found in the manifest, least recent first
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _file_key(path: Path) -> Optional[Dict[str, str]]:
+        """Build the manifest key for a local file (path + size/mtime version)."""
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return {
+            "source": f"file://{path.resolve()}",
+            "version": f"{stat.st_size}-{stat.st_mtime_ns}"
+        }
+
+    def _remember_processed(self, key):
+        """Remember a processed file version (bounded to SEEN_CACHE_SIZE entries)."""
+        with self._lock:
+            self._seen[key] = True
+            self._seen.move_to_end(key)
+            while len(self._seen) > SEEN_CACHE_SIZE:
+                self._seen.popitem(last=False)
+
+    def _wait_until_settled(self, path: Path) -> bool:
+        """Wait until the file has stopped growing (writer finished)."""
+        last_size = -1
+        while not self._stop_event.is_set():
+            try:
+                size = path.stat().st_size
+            except FileNotFoundError:
+                return False
+            if size == last_size and size > 0:
+                return True
+            last_size = size
+            self._stop_event.wait(self.settle_seconds)
+        return False
+
+    def handle_new_file(self, path: Path) -> Optional[str]:
+        """
+        Submit a new local file for processing unless it was already processed.
+
+        Args:
+            path: Path of the new file
+
+        Returns:
+            Task ID if a task was submitted, None otherwise
+        """
+        if not path.is_file() or path.name.startswith('.') or not path.name.lower().endswith(SUPPORTED_EXTENSIONS):
+            return None
+
+        file_key = self._file_key(path)
+        with self._lock:
+            if path in self._pending or (file_key and (file_key["source"], file_key["version"]) in self._seen):
+                return None
+            self._pending.add(path)
+
+        try:
+            if not self._wait_until_settled(path):
+                return None
+
+            file_key = self._file_key(path)
+            if not file_key:
+                return None
+            if bulk_manifest_service.is_blob_processed(file_key["source"], file_key["version"]):
+                self._remember_processed((file_key["source"], file_key["version"]))
+                return None
+            # Files still in flight are claimed; failed ones are submitted again once the claim expires
+            if not claim_bulk_source(file_key["source"], file_key["version"], path.name):
+                return None
+
+            content_type = "application/pdf" if path.name.lower().endswith('.pdf') else (
+                "image/png" if path.name.lower().endswith('.png') else "image/jpeg"
+            )
+            submission = submit_process_document(
+                file_bytes=path.read_bytes(),
+                filename=path.name,
+                tenant_id=self.tenant_id,
+                content_type=content_type,
+                lane=LANE_BULK,
+                # Recorded in the manifest by the task once the result is stored
+                manifest_source=file_key["source"],
+                manifest_version=file_key["version"]
+            )
+            logger.info(f"[WATCHER] Enqueued local file {path.name} (Task ID: {submission['task_id']})")
+            return submission["task_id"]
+        except Exception as e:
+            logger.error(f"[WATCHER] Failed to enqueue local file {path}: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._pending.discard(path)
+
+    def _scan_directory(self):
+        """Submit any files in the directory that are not yet in the manifest."""
+        for path in sorted(self.directory.iterdir()):
+            if self._stop_event.is_set():
+                break
+            self.handle_new_file(path)
+
+    def start(self):
+        """Watch the directory and submit new files until stopped."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        logger.info(f"[WATCHER] Watching local directory {self.directory.resolve()} for tenant {self.tenant_id}")
+
+        # Catch up on files that arrived while the watcher was down
+        self._scan_directory()
+
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            logger.info("[WATCHER] watchdog not installed - polling the directory instead of inotify")
+            while not self._stop_event.wait(self.poll_interval):
+                self._scan_directory()
+            return
+
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                if not event.is_directory:
+                    threading.Thread(target=watcher.handle_new_file, args=(Path(event.src_path),), daemon=True).start()
+
+            def on_moved(self, event):
+                if not event.is_directory:
+                    threading.Thread(target=watcher.handle_new_file, args=(Path(event.dest_path),), daemon=True).start()
+
+        observer = Observer()
+        observer.schedule(_Handler(), str(self.directory), recursive=False)
+        observer.start()
+        try:
+            self._stop_event.wait()
+        finally:
+            observer.stop()
+            observer.join()
+
+
+def create_ingestion_watcher(kind: Optional[str] = None) -> Optional[IngestionWatcher]:
+    """
+    Create the configured ingestion watcher.
+
+    Args:
+        kind: "blob_events", "local" or "none" (defaults to INGESTION_WATCHER)
+
+    Returns:
+        Watcher instance, or None if event-driven ingestion is disabled
+    """
+    kind = (kind or INGESTION_WATCHER).lower()
+    if kind == "blob_events":
+        return BlobEventQueueWatcher()
+    if kind == "local":
+        return LocalDirectoryWatcher()
+    if kind not in ("", "none"):
+        logger.warning(f"[WATCHER] Unknown INGESTION_WATCHER '{kind}' - event-driven ingestion disabled")
+    return None
+
+
+def main():
+    """Run the configured ingestion watcher in the foreground."""
+    from utility.config import setup_logging
+    setup_logging()
+
+    watcher = create_ingestion_watcher()
+    if watcher is None:
+        logger.info("[WATCHER] INGESTION_WATCHER is not set - relying on the periodic bulk scan only")
+        return
+
+    try:
+        watcher.start()
+    except KeyboardInterrupt:
+        watcher.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,42 @@
 """
 Service for tracking null required fields in processed documents.
+
+Every tracking row also increments its tenant's NullFieldDailyRollup row for the day, so
+dashboard statistics are summed over days rather than over documents. Rows tracked before
+the rollup existed are counted by a rebuild that the API queues on startup while the rollup
+is empty.
 """
 import logging
-from typing import Dict, Any, List
-from models.database import SessionLocal, NullFieldTracking
-from datetime import datetime
+from typing import Dict, Any, List, Optional
+from sqlalchemy import func, select, case, cast, Date
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import defer
+from core.celery_app import get_redis_client
+from models.database import SessionLocal, NullFieldTracking, NullFieldDailyRollup
+from datetime import datetime, date
 
 logger = logging.getLogger(__name__)
 
+# Statistics label, NullFieldTracking flag column and NullFieldDailyRollup count column per required field
+STAT_FIELDS = (
+    ("Name", "name_is_null", "name_null_count"),
+    ("Date of Birth", "dob_is_null", "dob_null_count"),
+    ("Member ID", "member_id_is_null", "member_id_null_count"),
+    ("Address", "address_is_null", "address_null_count"),
+    ("Gender", "gender_is_null", "gender_null_count"),
+    ("Insurance ID", "insurance_id_is_null", "insurance_id_null_count")
+)
+
+# Counted columns of NullFieldDailyRollup
+ROLLUP_COUNT_COLUMNS = ["total_documents", "documents_with_nulls"] + [column for _, _, column in STAT_FIELDS]
+
+NULL_DOCUMENTS_PAGE_SIZE = 100
+NULL_DOCUMENTS_MAX_PAGE_SIZE = 500
+
+# Redis key claimed by the API process that queues the initial rollup fill
+ROLLUP_FILL_CLAIM_KEY = "null_fields:rollup:fill_queued"
+ROLLUP_FILL_CLAIM_TTL_SECONDS = 3600
+
 class NullFieldTrackingService:
     """Service for storing and querying null field tracking data."""
     
@@ -82,6 +111,7 @@ class NullFieldTrackingService:
                 logger.info(f"  All required fields have values ✓")
             
             # Create database record
+            created_at = datetime.utcnow()
             tracking_record = NullFieldTracking(
                 processing_id=processing_id,
                 tenant_id=tenant_id,
@@ -94,10 +124,12 @@ class NullFieldTrackingService:
                 insurance_id_is_null=null_fields.get("insurance_id_is_null", False),
                 null_field_count=null_count,
                 null_field_names=null_field_names,
-                all_extracted_fields=extracted_fields
+                all_extracted_fields=extracted_fields,
+                created_at=created_at
             )
             
             session.add(tracking_record)
+            self._increment_rollup(session, tenant_id, created_at.date(), null_fields, null_count)
             session.commit()
             
             logger.info(f"\n--- DATABASE STORAGE RESULT ---")
@@ -124,26 +156,57 @@ class NullFieldTrackingService:
         finally:
             session.close()
     
-    def get_documents_with_null_fields(self, tenant_id: str = None) -> List[NullFieldTracking]:
+    @staticmethod
+    def _increment_rollup(session, tenant_id: str, day: date, null_fields: Dict[str, bool], null_count: int):
+        """Add one document to the tenant's rollup row for the day (created on first use)."""
+        values = {
+            "tenant_id": tenant_id,
+            "day": day,
+            "total_documents": 1,
+            "documents_with_nulls": 1 if null_count > 0 else 0,
+            "updated_at": datetime.utcnow()
+        }
+        for _, flag_column, count_column in STAT_FIELDS:
+            values[count_column] = 1 if null_fields.get(flag_column) else 0
+        stmt = pg_insert(NullFieldDailyRollup).values(**values)
+        set_ = {column: NullFieldDailyRollup.__table__.c[column] + stmt.excluded[column] for column in ROLLUP_COUNT_COLUMNS}
+        set_["updated_at"] = stmt.excluded.updated_at
+        session.execute(stmt.on_conflict_do_update(index_elements=["tenant_id", "day"], set_=set_))
+    
+    def get_documents_with_null_fields(
+        self,
+        tenant_id: str = None,
+        limit: int = NULL_DOCUMENTS_PAGE_SIZE,
+        before_id: Optional[int] = None
+    ) -> List[NullFieldTracking]:
         """
-        Get all documents that have null required fields.
+        Get a page of documents that have null required fields, newest first.
+        
+        The all_extracted_fields column is not loaded.
         
         Args:
             tenant_id: Optional tenant ID to filter by
+            limit: Page size (capped at NULL_DOCUMENTS_MAX_PAGE_SIZE)
+            before_id: Only records with a smaller ID (the last ID of the previous page)
             
         Returns:
             List of NullFieldTracking records
         """
+        limit = max(1, min(limit, NULL_DOCUMENTS_MAX_PAGE_SIZE))
         session = SessionLocal()
         try:
-            query = session.query(NullFieldTracking).filter(
+            query = session.query(NullFieldTracking).options(
+                defer(NullFieldTracking.all_extracted_fields)
+            ).filter(
                 NullFieldTracking.null_field_count > 0
             )
             
             if tenant_id:
                 query = query.filter(NullFieldTracking.tenant_id == tenant_id)
+            if before_id is not None:
+                query = query.filter(NullFieldTracking.id < before_id)
             
-            results = query.order_by(NullFieldTracking.created_at.desc()).all()
+            results = query.order_by(NullFieldTracking.id.desc()).limit(limit).all()
             
             logger.info(f"✓ Found {len(results)} documents with null fields")
             return results
@@ -154,49 +217,78 @@ class NullFieldTrackingService:
         finally:
             session.close()
     
-    def get_null_field_statistics(self, tenant_id: str = None) -> Dict[str, Any]:
+    @staticmethod
+    def _format_statistics(row) -> Dict[str, Any]:
+        total_documents = row.total_documents or 0
+        if total_documents == 0:
+            return {"total_documents": 0}
+        
+        null_counts = {label: getattr(row, count_column) or 0 for label, _, count_column in STAT_FIELDS}
+        documents_with_nulls = row.documents_with_nulls or 0
+        return {
+            "total_documents": total_documents,
+            "documents_with_null_fields": documents_with_nulls,
+            "documents_with_all_fields": total_documents - documents_with_nulls,
+            "null_field_counts": null_counts,
+            "most_common_null_field": max(null_counts.items(), key=lambda x: x[1])[0] if any(null_counts.values()) else None
+        }
+    
+    @staticmethod
+    def _tracking_aggregates():
+        """Rollup count columns computed from NullFieldTracking (for a SELECT)."""
+        columns = [
+            func.count(NullFieldTracking.id).label("total_documents"),
+            func.coalesce(func.sum(case((NullFieldTracking.null_field_count > 0, 1), else_=0)), 0).label("documents_with_nulls")
+        ]
+        for _, flag_column, count_column in STAT_FIELDS:
+            flag = getattr(NullFieldTracking, flag_column)
+            columns.append(func.coalesce(func.sum(case((flag.is_(True), 1), else_=0)), 0).label(count_column))
+        return columns
+    
+    def get_null_field_statistics(
+        self,
+        tenant_id: str = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        exact: bool = False
+    ) -> Dict[str, Any]:
         """
         Get statistics about null fields across all documents.
         
+        Summed from the daily rollup (cost depends on the number of days, not documents)
+        unless exact is set, in which case one aggregate query runs over the tracking rows.
+        
         Args:
             tenant_id: Optional tenant ID to filter by
+            date_from: Optional first day (UTC, inclusive)
+            date_to: Optional last day (UTC, inclusive)
+            exact: Aggregate the tracking rows instead of the rollup
             
         Returns:
             Dictionary with statistics
         """
         session = SessionLocal()
         try:
-            query = session.query(NullFieldTracking)
-            if tenant_id:
-                query = query.filter(NullFieldTracking.tenant_id == tenant_id)
+            if exact:
+                day = cast(NullFieldTracking.created_at, Date)
+                query = session.query(*self._tracking_aggregates())
+                if tenant_id:
+                    query = query.filter(NullFieldTracking.tenant_id == tenant_id)
+            else:
+                day = NullFieldDailyRollup.day
+                query = session.query(*[
+                    func.coalesce(func.sum(NullFieldDailyRollup.__table__.c[column]), 0).label(column)
+                    for column in ROLLUP_COUNT_COLUMNS
+                ])
+                if tenant_id:
+                    query = query.filter(NullFieldDailyRollup.tenant_id == tenant_id)
+            if date_from:
+                query = query.filter(day >= date_from)
+            if date_to:
+                query = query.filter(day <= date_to)
             
-            all_records = query.all()
-            total_documents = len(all_records)
-            
-            if total_documents == 0:
-                return {"total_documents": 0}
-            
-            # Count null occurrences per field
-            null_counts = {
-                "Name": sum(1 for r in all_records if r.name_is_null),
-                "Date of Birth": sum(1 for r in all_records if r.dob_is_null),
-                "Member ID": sum(1 for r in all_records if r.member_id_is_null),
-                "Address": sum(1 for r in all_records if r.address_is_null),
-                "Gender": sum(1 for r in all_records if r.gender_is_null),
-                "Insurance ID": sum(1 for r in all_records if r.insurance_id_is_null)
-            }
-            
-            documents_with_nulls = sum(1 for r in all_records if r.null_field_count > 0)
-            
-            stats = {
-                "total_documents": total_documents,
-                "documents_with_null_fields": documents_with_nulls,
-                "documents_with_all_fields": total_documents - documents_with_nulls,
-                "null_field_counts": null_counts,
-                "most_common_null_field": max(null_counts.items(), key=lambda x: x[1])[0] if any(null_counts.values()) else None
-            }
-            
-            logger.info(f"✓ Null field statistics calculated for {total_documents} documents")
+            stats = self._format_statistics(query.one())
+            logger.info(f"✓ Null field statistics calculated for {stats['total_documents']} documents")
             return stats
             
         except Exception as e:
@@ -204,6 +296,109 @@ class NullFieldTrackingService:
             return {}
         finally:
             session.close()
+    
+    def get_daily_statistics(
+        self,
+        tenant_id: str = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get null field counts per day (summed over tenants when tenant_id is not given).
+        
+        Returns:
+            List of dicts with day, total_documents, documents_with_null_fields and null_field_counts, oldest first
+        """
+        session = SessionLocal()
+        try:
+            query = session.query(NullFieldDailyRollup.day, *[
+                func.sum(NullFieldDailyRollup.__table__.c[column]).label(column) for column in ROLLUP_COUNT_COLUMNS
+            ])
+            if tenant_id:
+                query = query.filter(NullFieldDailyRollup.tenant_id == tenant_id)
+            if date_from:
+                query = query.filter(NullFieldDailyRollup.day >= date_from)
+            if date_to:
+                query = query.filter(NullFieldDailyRollup.day <= date_to)
+            
+            return [
+                {
+                    "day": row.day.isoformat(),
+                    "total_documents": row.total_documents,
+                    "documents_with_null_fields": row.documents_with_nulls,
+                    "null_field_counts": {label: getattr(row, count_column) for label, _, count_column in STAT_FIELDS}
+                }
+                for row in query.group_by(NullFieldDailyRollup.day).order_by(NullFieldDailyRollup.day).all()
+            ]
+        finally:
+            session.close()
+    
+    def rebuild_rollup(self, tenant_id: str = None) -> int:
+        """
+        Recompute the daily rollup from the tracking rows (initial fill, or after records were purged).
+        
+        Args:
+            tenant_id: Only rebuild this tenant's rows (None = all tenants)
+            
+        Returns:
+            Number of rollup rows written
+        """
+        session = SessionLocal()
+        try:
+            day = cast(NullFieldTracking.created_at, Date)
+            aggregate = select(
+                NullFieldTracking.tenant_id, day, *self._tracking_aggregates(), func.now()
+            ).group_by(NullFieldTracking.tenant_id, day)
+            
+            delete_query = session.query(NullFieldDailyRollup)
+            if tenant_id:
+                delete_query = delete_query.filter(NullFieldDailyRollup.tenant_id == tenant_id)
+                aggregate = aggregate.where(NullFieldTracking.tenant_id == tenant_id)
+            delete_query.delete(synchronize_session=False)
+            
+            # A concurrent store_null_fields may create a (tenant, day) row after the delete
+            stmt = pg_insert(NullFieldDailyRollup).from_select(
+                ["tenant_id", "day"] + ROLLUP_COUNT_COLUMNS + ["updated_at"], aggregate
+            )
+            set_ = {column: stmt.excluded[column] for column in ROLLUP_COUNT_COLUMNS}
+            set_["updated_at"] = stmt.excluded.updated_at
+            written = session.execute(
+                stmt.on_conflict_do_update(index_elements=["tenant_id", "day"], set_=set_)
+            ).rowcount or 0
+            session.commit()
+            logger.info(f"✓ Rebuilt null field rollup{f' for tenant {tenant_id}' if tenant_id else ''}: {written} row(s)")
+            return written
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def claim_initial_fill(self) -> bool:
+        """
+        Check whether the rollup still needs its initial fill (it is empty while tracking rows
+        exist) and claim queuing it, so only one API process queues the rebuild.
+        
+        Returns:
+            True if the caller should queue rebuild_null_field_rollup
+        """
+        session = SessionLocal()
+        try:
+            if session.query(NullFieldDailyRollup.tenant_id).first() is not None:
+                return False
+            if session.query(NullFieldTracking.id).first() is None:
+                return False
+        finally:
+            session.close()
+        
+        client = get_redis_client()
+        if client is None:
+            return True
+        try:
+            return bool(client.set(ROLLUP_FILL_CLAIM_KEY, "1", nx=True, ex=ROLLUP_FILL_CLAIM_TTL_SECONDS))
+        except Exception as e:
+            logger.warning(f"Could not claim the null field rollup fill in Redis, queuing anyway: {e}")
+            return True
 
 # Create singleton instance
 null_field_service = NullFieldTrackingService()
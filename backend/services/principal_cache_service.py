@@ -0,0 +1,147 @@
+"""
+Short-lived cache of authenticated users (principals), keyed by the token subject (username).
+
+get_current_user runs on every authenticated request; with the cache a user is loaded from
+the database at most once per PRINCIPAL_CACHE_TTL_SECONDS per API process. Entries are kept
+in a small in-process LRU and, if PRINCIPAL_CACHE_REDIS is enabled, in Redis so that API
+replicas share them. Updating, deactivating or deleting a user invalidates its entry; other
+API processes may still serve their local copy until it expires, so keep the TTL short.
+
+Only the user's columns (without the password hash) are cached. Each request gets its own
+detached User built from them, so per-token attributes (tenant_id) are never shared.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from core.celery_app import get_redis_client
+from models.database import User
+
+logger = logging.getLogger(__name__)
+
+# User columns kept in a cache entry
+PRINCIPAL_FIELDS = ("id", "username", "email", "is_active", "is_admin", "created_at", "last_login")
+_DATETIME_FIELDS = ("created_at", "last_login")
+
+
+class PrincipalCacheService:
+    """Service for caching resolved users between authenticated requests."""
+
+    REDIS_KEY_PREFIX = "auth:principal"
+
+    def __init__(self):
+        self.cache_size = int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024"))
+        self.cache_ttl = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+        self.use_redis = os.getenv("PRINCIPAL_CACHE_REDIS", "false").lower() in ("1", "true", "yes")
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.cache_ttl > 0 and self.cache_size > 0
+
+    def _redis_key(self, username: str) -> str:
+        return f"{self.REDIS_KEY_PREFIX}:{username}"
+
+    @staticmethod
+    def to_principal(user: User) -> Dict[str, Any]:
+        """Snapshot of a user's cached columns."""
+        return {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+
+    @staticmethod
+    def to_user(principal: Dict[str, Any]) -> User:
+        """Build a detached User from a cache entry (a new instance per request)."""
+        return User(**principal)
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        """Look up a principal in the in-process cache (no I/O)."""
+        if not self.enabled:
+            return None
+        with self._cache_lock:
+            entry = self._cache.get(username)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at < time.monotonic():
+                del self._cache[username]
+                return None
+            self._cache.move_to_end(username)
+            return principal
+
+    def put(self, username: str, principal: Dict[str, Any]):
+        """Store a principal in the in-process cache."""
+        if not self.enabled:
+            return
+        with self._cache_lock:
+            self._cache[username] = (time.monotonic() + self.cache_ttl, principal)
+            self._cache.move_to_end(username)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def get_shared(self, username: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a principal in Redis and keep it in the in-process cache (blocking; call via run_io).
+
+        Returns:
+            Principal dict, or None if not cached, Redis is disabled or unreachable
+        """
+        if not (self.enabled and self.use_redis):
+            return None
+        client = get_redis_client()
+        if client is None:
+            return None
+        try:
+            raw = client.get(self._redis_key(username))
+        except Exception as e:
+            logger.warning(f"Principal cache lookup failed for {username}: {e}")
+            return None
+        if not raw:
+            return None
+        principal = json.loads(raw)
+        for field in _DATETIME_FIELDS:
+            if principal.get(field):
+                principal[field] = datetime.fromisoformat(principal[field])
+        self.put(username, principal)
+        return principal
+
+    def put_shared(self, username: str, principal: Dict[str, Any]):
+        """Store a principal in Redis (blocking; call via run_io)."""
+        if not (self.enabled and self.use_redis):
+            return
+        client = get_redis_client()
+        if client is None:
+            return
+        try:
+            client.set(self._redis_key(username), json.dumps(principal, default=str),
+                       ex=max(1, int(self.cache_ttl)))
+        except Exception as e:
+            logger.warning(f"Principal cache store failed for {username}: {e}")
+
+    def invalidate(self, *usernames: Optional[str]):
+        """
+        Drop the cached principals of users (after an update, deactivation or deletion).
+
+        Blocking if Redis is enabled; call via run_io from async code.
+        """
+        usernames = [username for username in usernames if username]
+        with self._cache_lock:
+            for username in usernames:
+                self._cache.pop(username, None)
+        if not (self.use_redis and usernames):
+            return
+        client = get_redis_client()
+        if client is None:
+            return
+        try:
+            client.delete(*[self._redis_key(username) for username in usernames])
+        except Exception as e:
+            logger.warning(f"Principal cache invalidation failed for {usernames}: {e}")
+
+
+# Create singleton instance
+principal_cache_service = PrincipalCacheService()
@@ -0,0 +1,143 @@
+"""
+Storage format of processed JSON results.
+
+Two formats are read transparently:
+
+- legacy: one pretty-printed JSON blob holding the whole result.
+- compact: the blob at the processed path holds a gzip-compressed summary (fields,
+  confidences, classification); the bulky OCR output (word geometry, raw text, embedded
+  source file) is stored gzip-compressed in a separate "OCR detail" blob under
+  processed-detail/, which is only fetched by readers that need it.
+
+New results are written in the format selected by PROCESSED_JSON_FORMAT.
+"""
+import gzip
+import json
+import os
+from typing import Dict, Any, Optional, Tuple
+
+LEGACY_FORMAT = "legacy"
+COMPACT_FORMAT = "compact"
+PROCESSED_JSON_FORMAT = os.getenv("PROCESSED_JSON_FORMAT", COMPACT_FORMAT).strip().lower()
+GZIP_COMPRESS_LEVEL = int(os.getenv("PROCESSED_JSON_GZIP_LEVEL", "6"))
+
+# Blob metadata key marking compact processed blobs
+FORMAT_METADATA_KEY = "result_format"
+
+# Summary key pointing to the OCR detail blob
+DETAIL_BLOB_KEY = "ocr_detail_blob_path"
+
+# Top-level fields moved to the OCR detail blob
+DETAIL_FIELDS = ("raw_ocr_results", "raw_ocr_text")
+
+# Nested fields moved to the OCR detail blob (parent key -> child keys)
+DETAIL_NESTED_FIELDS = {"low_confidence_data": ("source_file_base64",)}
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def use_compact_format() -> bool:
+    """Check whether new processed results are written in the compact format."""
+    return PROCESSED_JSON_FORMAT == COMPACT_FORMAT
+
+
+def is_compact_metadata(metadata: Optional[Dict[str, str]]) -> bool:
+    """Check blob metadata for the compact format marker."""
+    return (metadata or {}).get(FORMAT_METADATA_KEY) == COMPACT_FORMAT
+
+
+def compact_metadata(metadata: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """Add the compact format marker to blob metadata."""
+    return {**(metadata or {}), FORMAT_METADATA_KEY: COMPACT_FORMAT}
+
+
+def detail_blob_path(blob_path: str) -> str:
+    """
+    Get the OCR detail blob path of a processed JSON blob.
+
+    main/{folder}/processed/{tenant}/{file} -> main/{folder}/processed-detail/{tenant}/{file},
+    outside the folders used for listings.
+    """
+    if blob_path.startswith("processed/"):
+        return "processed-detail/" + blob_path[len("processed/"):]
+    if "/processed/" in blob_path:
+        return blob_path.replace("/processed/", "/processed-detail/", 1)
+    return f"{blob_path}.detail"
+
+
+def split_processed_json(json_data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Split a processed result into its summary and OCR detail objects.
+
+    Args:
+        json_data: Full processed result
+
+    Returns:
+        Tuple of (summary, detail); detail is empty if the result has no OCR detail fields
+    """
+    summary = {key: value for key, value in json_data.items() if key not in DETAIL_FIELDS}
+    detail = {key: json_data[key] for key in DETAIL_FIELDS if key in json_data}
+
+    for parent, children in DETAIL_NESTED_FIELDS.items():
+        nested = summary.get(parent)
+        if not isinstance(nested, dict) or not any(child in nested for child in children):
+            continue
+        summary[parent] = {key: value for key, value in nested.items() if key not in children}
+        detail[parent] = {child: nested[child] for child in children if child in nested}
+
+    return summary, detail
+
+
+def merge_processed_json(summary: Dict[str, Any], detail: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Rebuild the full processed result from its summary and OCR detail objects."""
+    merged = {key: value for key, value in summary.items() if key != DETAIL_BLOB_KEY}
+    for key, value in (detail or {}).items():
+        if key in DETAIL_NESTED_FIELDS and isinstance(value, dict):
+            merged[key] = {**(merged.get(key) or {}), **value}
+        else:
+            merged[key] = value
+    return merged
+
+
+def encode_processed_json(json_data: Dict[str, Any], compact: bool) -> bytes:
+    """Serialize a processed JSON object (gzip-compressed compact JSON, or indented JSON)."""
+    if not compact:
+        return json.dumps(json_data, ensure_ascii=False, indent=2).encode("utf-8")
+    raw = json.dumps(json_data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return gzip.compress(raw, compresslevel=GZIP_COMPRESS_LEVEL)
+
+
+def encode_for_metadata(json_data: Dict[str, Any],
+                        metadata: Optional[Dict[str, str]]) -> Tuple[bytes, Optional[str]]:
+    """
+    Serialize a processed result being rewritten in the format of its existing blob.
+
+    For compact blobs only the summary is serialized; the OCR detail blob is left untouched.
+
+    Args:
+        json_data: Processed result (summary or full result)
+        metadata: Metadata of the existing blob
+
+    Returns:
+        Tuple of (data, content encoding or None)
+    """
+    if not is_compact_metadata(metadata):
+        return encode_processed_json(json_data, compact=False), None
+    if json_data.get(DETAIL_BLOB_KEY):
+        json_data, _ = split_processed_json(json_data)
+    return encode_processed_json(json_data, compact=True), "gzip"
+
+
+def decode_processed_json(data: bytes) -> Dict[str, Any]:
+    """
+    Parse a stored processed JSON object in either format.
+
+    Raises:
+        ValueError: If the data is not valid (optionally gzip-compressed) JSON
+    """
+    try:
+        if data[:2] == GZIP_MAGIC:
+            data = gzip.decompress(data)
+        return json.loads(data.decode("utf-8"))
+    except (OSError, EOFError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid processed JSON data: {e}") from e
@@ -0,0 +1,243 @@
+"""
+Field-level edits of processed results.
+
+Reviewer corrections are applied as partial JSONB updates of ProcessedFile.processed_data,
+so concurrent edits of different fields never overwrite each other. ProcessedFile.version
+is incremented by every edit and can be checked by clients (If-Match) to detect edits made
+since they loaded the file. The processed JSON blob is refreshed afterwards by a
+write-behind snapshot task; edits made within the snapshot delay share one snapshot.
+"""
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from sqlalchemy import text
+
+from core.celery_app import get_redis_client
+from models.database import SessionLocal, ProcessedFile
+
+logger = logging.getLogger(__name__)
+
+# Request fields merged key by key into processed_data (request field -> processed_data field)
+PATCH_MAP_FIELDS = {
+    "updated_key_value_pairs": "key_value_pairs",
+    "updated_confidence_scores": "key_value_pair_confidence_scores",
+    "correction_metadata": "correction_metadata"
+}
+
+# processed_data fields copied into the processed JSON blob by snapshots
+SNAPSHOT_FIELDS = (
+    "key_value_pairs", "key_value_pair_confidence_scores", "correction_metadata",
+    "last_correction", "last_updated", "updated_by"
+)
+
+# Blob metadata key recording the ProcessedFile version a snapshot was taken from
+SNAPSHOT_VERSION_METADATA_KEY = "snapshot_version"
+
+# One atomic statement: per-field merge of the nested objects, version check and bump.
+# Targets the oldest row for the blob (AI-analysis cache rows may share the path).
+_PATCH_STATEMENT = text("""
+UPDATE processed_files SET
+    processed_data = processed_data || jsonb_build_object(
+        'key_value_pairs',
+            COALESCE(processed_data -> 'key_value_pairs', CAST('{}' AS jsonb)) || CAST(:key_value_pairs AS jsonb),
+        'key_value_pair_confidence_scores',
+            COALESCE(processed_data -> 'key_value_pair_confidence_scores', CAST('{}' AS jsonb)) || CAST(:key_value_pair_confidence_scores AS jsonb),
+        'correction_metadata',
+            COALESCE(processed_data -> 'correction_metadata', CAST('{}' AS jsonb)) || CAST(:correction_metadata AS jsonb)
+    ) || CAST(:top_level AS jsonb),
+    version = version + 1,
+    has_corrections = true,
+    last_corrected_by = :username,
+    last_corrected_at = :now,
+    updated_at = :now
+WHERE id = (
+    SELECT id FROM processed_files WHERE processed_blob_path = :processed_blob_path ORDER BY id LIMIT 1
+)
+AND (CAST(:expected_version AS integer) IS NULL OR version = CAST(:expected_version AS integer))
+RETURNING version
+""")
+
+
+class ProcessedResultService:
+    """Service for field-level edits of processed results and their blob snapshots."""
+
+    SNAPSHOT_PENDING_PREFIX = "processed:snapshot:pending"
+
+    def __init__(self):
+        # Edits arriving within this window are written to the blob by one snapshot
+        self.snapshot_delay = int(os.getenv("PROCESSED_SNAPSHOT_DELAY_SECONDS", "5"))
+
+    @staticmethod
+    def _find_row(session, processed_blob_path: str, *columns):
+        """Get the given columns of the result's row (the row selected by edits)."""
+        return session.query(*columns).filter(
+            ProcessedFile.processed_blob_path == processed_blob_path
+        ).order_by(ProcessedFile.id).first()
+
+    def get_fields(self, processed_blob_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the editable fields of a processed result and their current version.
+
+        Args:
+            processed_blob_path: Full blob path of the processed JSON file
+
+        Returns:
+            Dict with version and the editable fields, or None if there is no database row
+        """
+        session = SessionLocal()
+        try:
+            row = self._find_row(session, processed_blob_path, ProcessedFile.version, ProcessedFile.processed_data)
+            if not row:
+                return None
+            processed_data = row.processed_data or {}
+            fields = {key: processed_data.get(key) for key in SNAPSHOT_FIELDS if key in processed_data}
+            return {"version": row.version, **fields}
+        except Exception as e:
+            logger.error(f"Failed to load fields of {processed_blob_path}: {e}")
+            return None
+        finally:
+            session.close()
+
+    def patch_fields(
+        self,
+        processed_blob_path: str,
+        patch: Dict[str, Any],
+        username: str,
+        expected_version: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Apply a field-level edit to a processed result.
+
+        Only the fields named in the patch are replaced; other fields (including ones edited
+        concurrently by another reviewer) are kept.
+
+        Args:
+            processed_blob_path: Full blob path of the processed JSON file
+            patch: updated_key_value_pairs / updated_confidence_scores / correction_metadata
+                (field -> new value dicts) and an optional last_correction
+            username: User making the edit
+            expected_version: Only apply the edit if the result is still at this version
+
+        Returns:
+            Dict with "status": "updated" (and the new version), "conflict" (and the
+            current version) or "not_found"
+        """
+        now = datetime.utcnow()
+        top_level = {"last_updated": datetime.now().isoformat(), "updated_by": username}
+        if patch.get("last_correction"):
+            top_level["last_correction"] = patch["last_correction"]
+
+        params = {
+            field: json.dumps(patch.get(request_field) or {})
+            for request_field, field in PATCH_MAP_FIELDS.items()
+        }
+        params.update({
+            "top_level": json.dumps(top_level),
+            "username": username,
+            "now": now,
+            "processed_blob_path": processed_blob_path,
+            "expected_version": expected_version
+        })
+
+        session = SessionLocal()
+        try:
+            new_version = session.execute(_PATCH_STATEMENT, params).scalar()
+            session.commit()
+            if new_version is not None:
+                self.schedule_snapshot(processed_blob_path)
+                return {"status": "updated", "version": new_version}
+
+            row = self._find_row(session, processed_blob_path, ProcessedFile.version)
+            if not row:
+                return {"status": "not_found"}
+            return {"status": "conflict", "version": row.version}
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _pending_key(self, processed_blob_path: str) -> str:
+        return f"{self.SNAPSHOT_PENDING_PREFIX}:{processed_blob_path}"
+
+    def schedule_snapshot(self, processed_blob_path: str) -> None:
+        """Queue a write-behind snapshot of a result, unless one is already pending."""
+        client = get_redis_client()
+        if client is not None:
+            try:
+                # The marker outlives the countdown in case the worker is busy
+                if not client.set(self._pending_key(processed_blob_path), "1", nx=True,
+                                  ex=max(self.snapshot_delay * 20, 60)):
+                    return
+            except Exception as e:
+                logger.warning(f"Redis unavailable for snapshot coalescing: {e}")
+
+        try:
+            from core.celery_app import celery_app
+            celery_app.send_task(
+                "sync_processed_snapshot",
+                kwargs={"processed_blob_path": processed_blob_path},
+                queue="processing",
+                countdown=self.snapshot_delay
+            )
+        except Exception as e:
+            logger.error(f"Failed to queue snapshot of {processed_blob_path}: {e}")
+
+    def write_snapshot(self, processed_blob_path: str, blob_service) -> Dict[str, Any]:
+        """
+        Copy the edited fields of a result from the database into its processed JSON blob.
+
+        Skips the write if the blob already holds this version. The blob is overwritten only
+        if it has not changed since it was read, so concurrent snapshots cannot regress it.
+
+        Args:
+            processed_blob_path: Full blob path of the processed JSON file
+            blob_service: AzureBlobService instance
+
+        Returns:
+            Dict with status and version
+        """
+        client = get_redis_client()
+        if client is not None:
+            try:
+                # Edits committed from now on queue another snapshot
+                client.delete(self._pending_key(processed_blob_path))
+            except Exception as e:
+                logger.warning(f"Failed to clear pending snapshot marker: {e}")
+
+        session = SessionLocal()
+        try:
+            row = self._find_row(session, processed_blob_path, ProcessedFile.version, ProcessedFile.processed_data)
+            if not row:
+                return {"status": "skipped", "reason": "no database row"}
+            version = row.version
+            processed_data = dict(row.processed_data or {})
+        finally:
+            session.close()
+
+        properties = blob_service.get_blob_properties(processed_blob_path)
+        if properties is None:
+            return {"status": "skipped", "reason": "processed blob not found"}
+
+        metadata = dict(properties.metadata or {})
+        if int(metadata.get(SNAPSHOT_VERSION_METADATA_KEY) or 0) >= version:
+            return {"status": "up_to_date", "version": version}
+
+        json_data = blob_service.load_processed_json(processed_blob_path, include_detail=False)
+        if json_data is None:
+            return {"status": "failed", "reason": "processed blob could not be read"}
+
+        json_data.update({key: processed_data[key] for key in SNAPSHOT_FIELDS if key in processed_data})
+        metadata[SNAPSHOT_VERSION_METADATA_KEY] = str(version)
+        if not blob_service.save_processed_json(processed_blob_path, json_data, metadata, etag=properties.etag):
+            return {"status": "failed", "reason": "processed blob could not be written", "version": version}
+
+        logger.info(f"Wrote snapshot version {version} of {processed_blob_path}")
+        return {"status": "written", "version": version}
+
+
+# Create singleton instance
+processed_result_service = ProcessedResultService()
@@ -0,0 +1,261 @@
+"""
+Per-tenant processing history stored in the database.
+
+Saving a result is a single insert, so concurrent saves from several API replicas do not
+overwrite each other. Listing is keyset-paginated on (processed_at, id), newest first, with
+date, status and confidence filters applied in the query. Entries of the legacy per-tenant
+JSON files are imported with import_entries().
+"""
+import base64
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import and_, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models.database import SessionLocal, ProcessingHistory
+
+logger = logging.getLogger(__name__)
+
+HISTORY_PAGE_SIZE = 100
+HISTORY_MAX_PAGE_SIZE = 500
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    """Parse an ISO timestamp (as sent by browsers, e.g. "2025-01-01T10:00:00.000Z") into naive UTC."""
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _result_confidence(result: Dict[str, Any]) -> Optional[float]:
+    """Confidence of a single result, or the mean confidence of a batch's files."""
+    if isinstance(result.get("individual_results"), list):
+        scores = [
+            item.get("confidence_score") for item in result["individual_results"]
+            if isinstance(item, dict) and isinstance(item.get("confidence_score"), (int, float))
+        ]
+        return sum(scores) / len(scores) if scores else None
+    score = result.get("confidence_score")
+    return float(score) if isinstance(score, (int, float)) else None
+
+
+def encode_cursor(entry: ProcessingHistory) -> str:
+    """Opaque cursor pointing after an entry."""
+    raw = json.dumps([entry.processed_at.isoformat(), entry.id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    """
+    Decode a cursor into (processed_at, id).
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        processed_at, entry_pk = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(processed_at), int(entry_pk)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class ProcessingHistoryService:
+    """Service for saving and listing processing history entries."""
+
+    @staticmethod
+    def _entry_info(entry: ProcessingHistory) -> Dict[str, Any]:
+        return {
+            "id": entry.entry_id,
+            "timestamp": entry.processed_at.isoformat() + "Z",
+            "filename": entry.filename,
+            "result": entry.result,
+            "processing_type": entry.processing_type,
+            "status": entry.status,
+            "confidence": entry.confidence
+        }
+
+    @staticmethod
+    def _row_values(tenant_id: str, data: Dict[str, Any], created_by: Optional[str] = None) -> Dict[str, Any]:
+        result = data.get("result") if isinstance(data.get("result"), dict) else {}
+        entry_id = data.get("id")
+        return {
+            "tenant_id": tenant_id,
+            "entry_id": int(entry_id) if isinstance(entry_id, (int, float)) else int(datetime.now().timestamp() * 1000),
+            "filename": data.get("filename") or "Unknown",
+            "processing_type": data.get("processing_type") or "single",
+            "status": result.get("status") or "success",
+            "confidence": _result_confidence(result),
+            "result": result,
+            "processed_at": _parse_timestamp(data.get("timestamp")) or datetime.utcnow(),
+            "created_by": created_by,
+            "created_at": datetime.utcnow()
+        }
+
+    def add_entry(self, tenant_id: str, data: Dict[str, Any], created_by: Optional[str] = None) -> int:
+        """
+        Append a history entry (a repeated save of the same entry ID is ignored).
+
+        Args:
+            tenant_id: Tenant identifier
+            data: Entry with id, timestamp, filename, result and processing_type
+            created_by: Username of the saving user
+
+        Returns:
+            Entry ID
+        """
+        values = self._row_values(tenant_id, data, created_by)
+        session = SessionLocal()
+        try:
+            stmt = pg_insert(ProcessingHistory).values(**values).on_conflict_do_nothing(
+                index_elements=["tenant_id", "entry_id"]
+            )
+            session.execute(stmt)
+            session.commit()
+            return values["entry_id"]
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def import_entries(self, tenant_id: str, entries: List[Dict[str, Any]]) -> int:
+        """
+        Import entries of a legacy history file (entries already imported are skipped).
+
+        Returns:
+            Number of entries inserted
+        """
+        values = [self._row_values(tenant_id, entry) for entry in entries if isinstance(entry, dict)]
+        if not values:
+            return 0
+        session = SessionLocal()
+        try:
+            stmt = pg_insert(ProcessingHistory).values(values).on_conflict_do_nothing(
+                index_elements=["tenant_id", "entry_id"]
+            )
+            inserted = session.execute(stmt).rowcount or 0
+            session.commit()
+            return inserted
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def list_entries(
+        self,
+        tenant_id: str,
+        limit: int = HISTORY_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        status: Optional[str] = None,
+        min_confidence: Optional[float] = None,
+        max_confidence: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        List a tenant's history entries, newest first.
+
+        Args:
+            tenant_id: Tenant identifier
+            limit: Page size (capped at HISTORY_MAX_PAGE_SIZE)
+            cursor: next_cursor of the previous page
+            date_from: Only entries processed at or after this ISO date/timestamp
+            date_to: Only entries processed up to this ISO date (inclusive) or timestamp
+            status: Only entries with this status
+            min_confidence: Only entries with at least this confidence (0-1)
+            max_confidence: Only entries with at most this confidence (0-1)
+
+        Returns:
+            Dict with history (list of entries), next_cursor and has_more
+
+        Raises:
+            ValueError: If the cursor or a date is malformed
+        """
+        limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+        session = SessionLocal()
+        try:
+            query = session.query(ProcessingHistory).filter(ProcessingHistory.tenant_id == tenant_id)
+            if date_from:
+                start = _parse_timestamp(date_from)
+                if start is None:
+                    raise ValueError(f"Invalid date_from: {date_from}")
+                query = query.filter(ProcessingHistory.processed_at >= start)
+            if date_to:
+                end = _parse_timestamp(date_to)
+                if end is None:
+                    raise ValueError(f"Invalid date_to: {date_to}")
+                if len(date_to) == 10:
+                    # Date only: include the whole day
+                    query = query.filter(ProcessingHistory.processed_at < end + timedelta(days=1))
+                else:
+                    query = query.filter(ProcessingHistory.processed_at <= end)
+            if status:
+                query = query.filter(ProcessingHistory.status == status)
+            if min_confidence is not None:
+                query = query.filter(ProcessingHistory.confidence >= min_confidence)
+            if max_confidence is not None:
+                query = query.filter(ProcessingHistory.confidence <= max_confidence)
+            if cursor:
+                processed_at, entry_pk = decode_cursor(cursor)
+                query = query.filter(or_(
+                    ProcessingHistory.processed_at < processed_at,
+                    and_(ProcessingHistory.processed_at == processed_at, ProcessingHistory.id < entry_pk)
+                ))
+
+            rows = query.order_by(
+                ProcessingHistory.processed_at.desc(), ProcessingHistory.id.desc()
+            ).limit(limit + 1).all()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            return {
+                "history": [self._entry_info(row) for row in rows],
+                "next_cursor": encode_cursor(rows[-1]) if has_more else None,
+                "has_more": has_more
+            }
+        finally:
+            session.close()
+
+    def delete_entry(self, tenant_id: str, entry_id: int) -> int:
+        """Delete one history entry. Returns the number of rows deleted."""
+        session = SessionLocal()
+        try:
+            deleted = session.query(ProcessingHistory).filter(
+                ProcessingHistory.tenant_id == tenant_id,
+                ProcessingHistory.entry_id == entry_id
+            ).delete(synchronize_session=False)
+            session.commit()
+            return deleted
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def clear(self, tenant_id: str) -> int:
+        """Delete all history entries of a tenant. Returns the number of rows deleted."""
+        session = SessionLocal()
+        try:
+            deleted = session.query(ProcessingHistory).filter(
+                ProcessingHistory.tenant_id == tenant_id
+            ).delete(synchronize_session=False)
+            session.commit()
+            return deleted
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+
+# Create singleton instance
+processing_history_service = ProcessingHistoryService()
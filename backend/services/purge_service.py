@@ -0,0 +1,354 @@
+"""
+Purge of a tenant's files and/or files older than a retention window.
+
+Blobs are deleted with the Blob Batch API (up to 256 deletes per request), several batches
+in parallel. Progress is stored in a PurgeJob row after every listing page, so a job that
+runs out of time (or whose worker dies) resumes where it stopped. Database records of the
+purged documents (ProcessedFile, NullFieldTracking, SourceDocument, AnalysisCache,
+ProcessingHistory) are removed with each page, selected by the blobs actually deleted, so
+records of blobs that failed to delete are kept. The names of a page are saved in the job
+before its blobs are deleted, and its record deletes are committed together with the cursor
+advance, so a run that dies in between redoes the page (blobs already gone count as deleted)
+instead of leaving their records behind. Dry runs only count what would be deleted.
+"""
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import or_
+
+from models.database import SessionLocal, PurgeJob, ProcessedFile, NullFieldTracking, SourceDocument, AnalysisCache, ProcessingHistory
+from services.analysis_cache_service import normalize_key, fallback_filter
+from services.azure_blob_service import get_listing_prefixes
+from services.processed_json_format import detail_blob_path
+
+logger = logging.getLogger(__name__)
+
+# Blob Batch API limit
+PURGE_BATCH_SIZE = 256
+PURGE_CONCURRENCY = int(os.getenv("PURGE_CONCURRENCY", "4"))
+PURGE_PAGE_SIZE = int(os.getenv("PURGE_PAGE_SIZE", "5000"))
+# Work done per task run before the job is re-queued (below the Celery time limit)
+PURGE_RUN_SECONDS = int(os.getenv("PURGE_RUN_SECONDS", "240"))
+# A queued or running job not updated for this long has lost its runner and may be resumed
+PURGE_STALE_SECONDS = int(os.getenv("PURGE_STALE_SECONDS", str(PURGE_RUN_SECONDS * 3)))
+
+# Intake folder of bulk processing (not organized by tenant)
+BULK_SOURCE_PREFIX = "bulk processing/source/"
+
+# Database records removed with the blobs
+PURGED_MODELS = (ProcessedFile, NullFieldTracking, SourceDocument, AnalysisCache, ProcessingHistory)
+
+
+def get_purge_prefixes(tenant_id: Optional[str] = None) -> List[str]:
+    """Get the blob prefixes a purge walks (the bulk intake folder only for all-tenant purges)."""
+    prefixes = get_listing_prefixes(tenant_id)
+    if not tenant_id:
+        prefixes.append(BULK_SOURCE_PREFIX)
+    return prefixes
+
+
+class PurgeService:
+    """Service for creating and running resumable purge jobs."""
+
+    @staticmethod
+    def _job_info(job: PurgeJob) -> Dict[str, Any]:
+        return {
+            "job_id": job.id,
+            "tenant_id": job.tenant_id,
+            "older_than": job.older_than.isoformat() if job.older_than else None,
+            "dry_run": job.dry_run,
+            "status": job.status,
+            "blobs_matched": job.blobs_matched,
+            "bytes_matched": job.bytes_matched,
+            "blobs_deleted": job.blobs_deleted,
+            "blobs_failed": job.blobs_failed,
+            "records_deleted": job.records_deleted,
+            "error": job.error,
+            "created_by": job.created_by,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None
+        }
+
+    def create_job(self, tenant_id: Optional[str], older_than_days: Optional[int], dry_run: bool,
+                   created_by: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Create a purge job.
+
+        Args:
+            tenant_id: Only purge this tenant's files (None = all tenants)
+            older_than_days: Only purge files last modified more than this many days ago
+            dry_run: Only count what would be deleted
+            created_by: Username of the requesting admin
+
+        Returns:
+            Job info dict
+
+        Raises:
+            ValueError: If neither a tenant nor a retention window is given
+        """
+        if not tenant_id and older_than_days is None:
+            raise ValueError("A tenant_id or older_than_days is required")
+        if older_than_days is not None and older_than_days < 0:
+            raise ValueError("older_than_days must not be negative")
+
+        session = SessionLocal()
+        try:
+            job = PurgeJob(
+                id=str(uuid.uuid4()),
+                tenant_id=tenant_id,
+                older_than=datetime.utcnow() - timedelta(days=older_than_days) if older_than_days is not None else None,
+                dry_run=dry_run,
+                status="queued",
+                prefix_index=0,
+                blobs_matched=0,
+                bytes_matched=0,
+                blobs_deleted=0,
+                blobs_failed=0,
+                created_by=created_by,
+                created_at=datetime.utcnow()
+            )
+            session.add(job)
+            session.commit()
+            return self._job_info(job)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a purge job's info, or None if it does not exist."""
+        session = SessionLocal()
+        try:
+            job = session.query(PurgeJob).filter(PurgeJob.id == job_id).first()
+            return self._job_info(job) if job else None
+        finally:
+            session.close()
+
+    @staticmethod
+    def _is_match(blob, older_than: Optional[datetime]) -> bool:
+        if older_than is None:
+            return True
+        if blob.last_modified is None:
+            return False
+        last_modified = blob.last_modified
+        if last_modified.tzinfo is not None:
+            last_modified = last_modified.astimezone(timezone.utc).replace(tzinfo=None)
+        return last_modified < older_than
+
+    @staticmethod
+    def _delete_batch(container_client, blob_names: List[str], detail_names: set) -> Tuple[List[str], int]:
+        """Delete one batch of blobs. Returns (deleted names, failure count)."""
+        deleted, failed = [], 0
+        responses = container_client.delete_blobs(
+            *blob_names, delete_snapshots="include", raise_on_any_failure=False
+        )
+        for blob_name, response in zip(blob_names, responses):
+            if response.status_code in (200, 202):
+                deleted.append(blob_name)
+            elif response.status_code == 404:
+                # Already gone; OCR detail blobs only exist for compact results
+                if blob_name not in detail_names:
+                    deleted.append(blob_name)
+            else:
+                failed += 1
+                logger.warning(f"[PURGE] Failed to delete {blob_name}: HTTP {response.status_code}")
+        return deleted, failed
+
+    def _purge_page(self, session, job: PurgeJob, blobs: List[Any], container_client, executor) -> None:
+        """Count (and unless dry run, delete) the matching blobs of one listing page and their records."""
+        matched = [blob for blob in blobs if self._is_match(blob, job.older_than)]
+        job.blobs_matched += len(matched)
+        job.bytes_matched += sum(blob.size or 0 for blob in matched)
+        if not matched:
+            return
+        if job.dry_run:
+            self._add_record_counts(job, self._purge_records(session, job, [blob.name for blob in matched]))
+            return
+
+        # Saved first, so the page can be redone if the run dies before the cursor is advanced
+        job.pending_blobs = [blob.name for blob in matched]
+        session.commit()
+        self._delete_pending(session, job, container_client, executor)
+
+    def _delete_pending(self, session, job: PurgeJob, container_client, executor) -> None:
+        """
+        Delete the blobs saved in job.pending_blobs and their records, then clear the list.
+        Nothing is committed; the caller commits together with the cursor advance.
+        """
+        blob_names = list(job.pending_blobs or [])
+        detail_names = {detail_blob_path(name) for name in blob_names if name.endswith(".json")}
+        names = blob_names + sorted(detail_names)
+        batches = [names[i:i + PURGE_BATCH_SIZE] for i in range(0, len(names), PURGE_BATCH_SIZE)]
+
+        deleted = []
+        for batch_deleted, batch_failed in executor.map(
+            lambda batch: self._delete_batch(container_client, batch, detail_names), batches
+        ):
+            deleted.extend(batch_deleted)
+            job.blobs_failed += batch_failed
+        deleted_blobs = [name for name in deleted if name not in detail_names]
+        job.blobs_deleted += len(deleted_blobs)
+
+        from services.blob_catalog_service import blob_catalog_service
+        blob_catalog_service.remove_blobs(deleted_blobs)
+        self._add_record_counts(job, self._purge_records(session, job, deleted_blobs))
+        job.pending_blobs = None
+
+    @staticmethod
+    def _purge_records(session, job: PurgeJob, blob_names: List[str]) -> Dict[str, int]:
+        """
+        Delete (or in a dry run, count) the database records of the given blobs.
+
+        ProcessedFile and SourceDocument rows are matched by blob path; null field tracking,
+        AI analysis cache and history entries by the processing ID or path of those files.
+        """
+        if not blob_names:
+            return {}
+        processing_ids = [
+            row.processing_id for row in
+            session.query(SourceDocument.processing_id).filter(SourceDocument.blob_path.in_(blob_names))
+        ]
+        file_ids = blob_names + processing_ids
+        cache_keys = list({normalize_key(key) for key in file_ids})
+        filters = {
+            ProcessedFile: or_(
+                ProcessedFile.processed_blob_path.in_(blob_names),
+                ProcessedFile.source_blob_path.in_(blob_names)
+            ),
+            NullFieldTracking: NullFieldTracking.processing_id.in_(processing_ids),
+            SourceDocument: SourceDocument.blob_path.in_(blob_names),
+            AnalysisCache: or_(AnalysisCache.cache_key.in_(cache_keys), fallback_filter(file_ids)),
+            ProcessingHistory: ProcessingHistory.result["processing_id"].astext.in_(processing_ids)
+        }
+        counts = {}
+        for model in PURGED_MODELS:
+            query = session.query(model).filter(filters[model])
+            if job.tenant_id:
+                query = query.filter(model.tenant_id == job.tenant_id)
+            counts[model.__tablename__] = query.count() if job.dry_run else query.delete(synchronize_session=False)
+        return counts
+
+    @staticmethod
+    def _add_record_counts(job: PurgeJob, counts: Dict[str, int]):
+        totals = dict(job.records_deleted or {})
+        for table, count in counts.items():
+            totals[table] = totals.get(table, 0) + count
+        # Assign a new dict so the JSONB column is written
+        job.records_deleted = totals
+
+    def run(self, job_id: str, container_client) -> bool:
+        """
+        Run a purge job from its stored cursor until it finishes or the run time is used up.
+
+        Args:
+            job_id: Purge job ID
+            container_client: ContainerClient of the blob container
+
+        Returns:
+            True if the job is finished (completed or failed), False if it must be resumed
+        """
+        session = SessionLocal()
+        try:
+            job = session.query(PurgeJob).filter(PurgeJob.id == job_id).first()
+            if not job or job.status in ("completed", "failed"):
+                return True
+
+            job.status = "running"
+            job.error = None
+            session.commit()
+
+            prefixes = get_purge_prefixes(job.tenant_id)
+            deadline = time.monotonic() + PURGE_RUN_SECONDS
+            with ThreadPoolExecutor(max_workers=PURGE_CONCURRENCY) as executor:
+                if job.pending_blobs:
+                    # The previous run died while deleting a page; its cursor still points at it
+                    logger.info(f"[PURGE] Job {job_id} redoing {len(job.pending_blobs)} blob(s) of an unfinished page")
+                    self._delete_pending(session, job, container_client, executor)
+                    session.commit()
+                while job.prefix_index < len(prefixes):
+                    page_iterator = container_client.list_blobs(
+                        name_starts_with=prefixes[job.prefix_index], results_per_page=PURGE_PAGE_SIZE
+                    ).by_page(continuation_token=job.continuation_token)
+                    for page in page_iterator:
+                        self._purge_page(session, job, list(page), container_client, executor)
+                        job.continuation_token = page_iterator.continuation_token
+                        if not job.continuation_token:
+                            break
+                        session.commit()
+                        if time.monotonic() > deadline:
+                            logger.info(f"[PURGE] Job {job_id} paused at {prefixes[job.prefix_index]} - resuming later")
+                            return False
+
+                    job.prefix_index += 1
+                    job.continuation_token = None
+                    session.commit()
+                    if time.monotonic() > deadline and job.prefix_index < len(prefixes):
+                        return False
+
+            job.status = "completed"
+            job.finished_at = datetime.utcnow()
+            session.commit()
+            logger.info(f"[PURGE] Job {job_id} completed: {self._job_info(job)}")
+
+            if not job.dry_run and (job.records_deleted or {}).get(NullFieldTracking.__tablename__):
+                # Daily null field counts of the removed documents
+                from services.null_field_service import null_field_service
+                try:
+                    null_field_service.rebuild_rollup(job.tenant_id)
+                except Exception as e:
+                    logger.warning(f"[PURGE] Failed to rebuild null field rollup after job {job_id}: {e}")
+            return True
+
+        except Exception as e:
+            session.rollback()
+            logger.error(f"[PURGE] Job {job_id} failed: {e}")
+            job = session.query(PurgeJob).filter(PurgeJob.id == job_id).first()
+            if job:
+                job.status = "failed"
+                job.error = str(e)
+                session.commit()
+            return True
+        finally:
+            session.close()
+
+    def mark_resumable(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Re-queue a failed job, or one whose runner died, from its stored cursor.
+
+        A queued or running job is only resumed once it has not been updated for
+        PURGE_STALE_SECONDS, so a live runner never gets a second one on the same cursor.
+
+        Returns:
+            Job info dict, or None if the job does not exist
+
+        Raises:
+            ValueError: If the job is still being run
+        """
+        session = SessionLocal()
+        try:
+            job = session.query(PurgeJob).filter(PurgeJob.id == job_id).first()
+            if not job:
+                return None
+            if job.status in ("queued", "running"):
+                last_update = job.updated_at or job.created_at
+                if last_update and last_update > datetime.utcnow() - timedelta(seconds=PURGE_STALE_SECONDS):
+                    raise ValueError(f"Purge job {job_id} is {job.status}; it can be resumed once it has "
+                                     f"made no progress for {PURGE_STALE_SECONDS} seconds")
+            if job.status != "completed":
+                job.status = "queued"
+                job.updated_at = datetime.utcnow()
+                session.commit()
+            return self._job_info(job)
+        finally:
+            session.close()
+
+
+# Create singleton instance
+purge_service = PurgeService()
@@ -0,0 +1,278 @@
+"""
+Out-of-band storage of processing results.
+
+Celery tasks persist the full processed payload (processed JSON blob + ProcessedFile row)
+and return only a small receipt to the Redis result backend. The API rebuilds the full
+result from the persistent store when a client asks for it.
+"""
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from urllib.parse import quote
+
+from models.database import SessionLocal, ProcessedFile, SourceDocument
+from services.processed_json_format import DETAIL_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Top-level fields of the full result that are kept in the receipt
+RECEIPT_FIELDS = (
+    "status", "processing_id", "filename", "blob_name", "file_info", "confidence_score",
+    "ocr_confidence_score", "document_classification", "processing_time", "processing_info",
+    "blob_storage"
+)
+
+# Heavy parts of a result, returned only when named in include= (if include= is given)
+INCLUDE_OCR_DETAIL = "ocr_detail"
+INCLUDE_SOURCE_FILE = "source_file"
+INCLUDE_OPTIONS = (INCLUDE_OCR_DETAIL, INCLUDE_SOURCE_FILE)
+
+# Fields of the full result that are also stored in ProcessedFile.processed_data
+PROCESSED_DATA_FIELDS = (
+    "key_value_pairs", "key_value_pair_confidence_scores", "summary", "confidence_score",
+    "ocr_confidence_score", "document_classification", "processing_info", "metadata", "template_info"
+)
+
+
+class ResultStoreService:
+    """Service for slim task receipts and loading full results from the persistent store."""
+
+    @staticmethod
+    def is_receipt(result: Any) -> bool:
+        """Check whether a task result is a slim receipt."""
+        return isinstance(result, dict) and result.get("receipt") is True
+
+    def save_processed_file(self, result: Dict[str, Any], tenant_id: str, file_hash: str,
+                            filename: str) -> bool:
+        """
+        Create or update the ProcessedFile row for a task result.
+
+        Follows the synchronous endpoint's convention: processing_id holds the processed
+        blob path when the JSON upload succeeded, otherwise the processing ID.
+
+        Args:
+            result: Full processing result
+            tenant_id: Tenant identifier
+            file_hash: SHA-256 of the source file
+            filename: Original filename
+
+        Returns:
+            bool: True if saved, False otherwise
+        """
+        blob_storage = result.get("blob_storage") or {}
+        processed_json = blob_storage.get("processed_json") or {}
+        source = blob_storage.get("source") or {}
+        processed_blob_path = processed_json.get("blob_path") if processed_json.get("success") else None
+        ocr_confidence_score = result.get("ocr_confidence_score")
+        processing_time = result.get("processing_time")
+        processed_data = {key: result.get(key) for key in PROCESSED_DATA_FIELDS if result.get(key) is not None}
+
+        session = SessionLocal()
+        try:
+            existing_file = session.query(ProcessedFile).filter(ProcessedFile.file_hash == file_hash).first()
+            if existing_file:
+                existing_file.processing_id = processed_blob_path or result["processing_id"]
+                existing_file.processed_blob_path = processed_blob_path
+                existing_file.source_blob_path = source.get("blob_path") if source.get("success") else None
+                existing_file.processed_data = processed_data
+                existing_file.ocr_confidence_score = str(ocr_confidence_score) if ocr_confidence_score else None
+                existing_file.processing_time = str(processing_time) if processing_time else None
+                existing_file.updated_at = datetime.utcnow()
+                # Full rewrite: ETags taken from the previous document no longer match
+                existing_file.version = ProcessedFile.version + 1
+            else:
+                session.add(ProcessedFile(
+                    file_hash=file_hash,
+                    processing_id=processed_blob_path or result["processing_id"],
+                    tenant_id=tenant_id,
+                    filename=filename,
+                    source_blob_path=source.get("blob_path") if source.get("success") else None,
+                    processed_blob_path=processed_blob_path,
+                    processed_data=processed_data,
+                    ocr_confidence_score=str(ocr_confidence_score) if ocr_confidence_score else None,
+                    processing_time=str(processing_time) if processing_time else None,
+                    created_at=datetime.utcnow()
+                ))
+            session.commit()
+            return True
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to save processed file for {filename}: {e}")
+            return False
+        finally:
+            session.close()
+
+    def make_receipt(self, result: Dict[str, Any], tenant_id: str, file_hash: str,
+                     persisted_in_db: bool) -> Dict[str, Any]:
+        """
+        Reduce a full result to a receipt if the full payload is stored somewhere.
+
+        Args:
+            result: Full processing result
+            tenant_id: Tenant identifier
+            file_hash: SHA-256 of the source file
+            persisted_in_db: Whether save_processed_file() succeeded
+
+        Returns:
+            Receipt dict, or the full result unchanged if nothing was persisted
+        """
+        processed_json = (result.get("blob_storage") or {}).get("processed_json") or {}
+        if not processed_json.get("success") and not persisted_in_db:
+            logger.warning(f"Result for {result.get('processing_id')} was not persisted - returning full payload")
+            return result
+
+        receipt = {key: result[key] for key in RECEIPT_FIELDS if key in result}
+        low_confidence_data = result.get("low_confidence_data") or {}
+        receipt.update({
+            "receipt": True,
+            "tenant_id": tenant_id,
+            "file_hash": file_hash,
+            "summary_stats": {
+                "fields_extracted": len(result["key_value_pairs"] or {}) if "key_value_pairs" in result else None,
+                "low_confidence_count": low_confidence_data.get("count", 0),
+                "pages_processed": (result.get("file_info") or {}).get("pages_processed")
+            }
+        })
+        if result.get("template_info"):
+            receipt["template_info"] = {"template_id": result["template_info"].get("template_id")}
+        return receipt
+
+    def load_full_result(self, receipt: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Rebuild the full result for a receipt from the processed JSON blob, falling back to
+        the ProcessedFile row. Blocking - call it in a thread from async code.
+
+        Args:
+            receipt: Receipt returned by a task
+
+        Returns:
+            Full result dict, or None if the payload could not be found
+        """
+        processed_json = (receipt.get("blob_storage") or {}).get("processed_json") or {}
+        payload = None
+        if processed_json.get("success") and processed_json.get("blob_path"):
+            try:
+                from services.azure_blob_service import AzureBlobService
+                payload = AzureBlobService().load_processed_json(processed_json["blob_path"])
+            except Exception as e:
+                logger.warning(f"Failed to load processed JSON {processed_json.get('blob_path')}: {e}")
+
+        if payload is None and receipt.get("file_hash"):
+            session = SessionLocal()
+            try:
+                processed_file = session.query(ProcessedFile.processed_data).filter(
+                    ProcessedFile.file_hash == receipt["file_hash"],
+                    ProcessedFile.tenant_id == receipt.get("tenant_id")
+                ).first()
+                if processed_file:
+                    payload = dict(processed_file.processed_data or {})
+            except Exception as e:
+                logger.warning(f"Failed to load processed file for {receipt.get('processing_id')}: {e}")
+            finally:
+                session.close()
+
+        if payload is None:
+            return None
+
+        full_result = {**payload, **{k: v for k, v in receipt.items() if k not in ("receipt", "template_info")}}
+        if payload.get("template_info") is None and receipt.get("template_info"):
+            full_result["template_info"] = receipt["template_info"]
+        return full_result
+
+    @staticmethod
+    def select_fields(result: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+        """Keep only the requested top-level fields (all fields if none requested)."""
+        if not fields:
+            return result
+        return {key: result[key] for key in fields if key in result}
+
+    @staticmethod
+    def result_id(result: Dict[str, Any]) -> Optional[str]:
+        """Get the ID a result's stored parts are fetched by: its processed blob path, else its processing ID."""
+        processed_json = (result.get("blob_storage") or {}).get("processed_json") or {}
+        if processed_json.get("success") and processed_json.get("blob_path"):
+            return processed_json["blob_path"]
+        return result.get("processing_id")
+
+    def shape_result(self, result: Any, fields: Optional[List[str]] = None,
+                     include: Optional[List[str]] = None) -> Any:
+        """
+        Apply a client's field selection to a result.
+
+        Args:
+            result: Full result (returned unchanged if it is not a dict)
+            fields: Top-level fields to return (None = all)
+            include: Heavy parts to keep (INCLUDE_OPTIONS); None keeps everything. Parts left
+                out are replaced by links to fetch them lazily.
+
+        Returns:
+            Shaped copy of the result
+        """
+        if not isinstance(result, dict) or (fields is None and include is None):
+            return result
+
+        shaped = dict(result)
+        if include is not None:
+            result_id = self.result_id(result)
+            result_path = f"/api/v1/results/{quote(str(result_id), safe='/')}"
+            links = {}
+            if INCLUDE_OCR_DETAIL not in include and any(shaped.get(key) for key in DETAIL_FIELDS):
+                for key in DETAIL_FIELDS:
+                    shaped.pop(key, None)
+                links[INCLUDE_OCR_DETAIL] = f"{result_path}/ocr-detail"
+            low_confidence_data = shaped.get("low_confidence_data")
+            if (INCLUDE_SOURCE_FILE not in include and isinstance(low_confidence_data, dict)
+                    and "source_file_base64" in low_confidence_data):
+                shaped["low_confidence_data"] = {
+                    key: value for key, value in low_confidence_data.items() if key != "source_file_base64"
+                }
+                links[INCLUDE_SOURCE_FILE] = f"{result_path}/source-file"
+            if links and result_id:
+                shaped["links"] = links
+
+        if fields:
+            shaped = self.select_fields(shaped, fields + (["links"] if "links" in shaped else []))
+        return shaped
+
+    def locate_result(self, processing_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Find the stored blobs of a result by processing ID (or processed blob path).
+
+        Args:
+            processing_id: Processing ID returned with the result, or its processed blob path
+
+        Returns:
+            Dict with tenant_id, filename, processed_blob_path, source_blob_path and
+            content_type (blob paths may be None), or None if the result is unknown
+        """
+        session = SessionLocal()
+        try:
+            source = session.query(SourceDocument).filter(SourceDocument.processing_id == processing_id).first()
+            query = session.query(
+                ProcessedFile.tenant_id, ProcessedFile.filename,
+                ProcessedFile.processed_blob_path, ProcessedFile.source_blob_path
+            )
+            if source:
+                processed_file = query.filter(ProcessedFile.source_blob_path == source.blob_path).first()
+            else:
+                # ProcessedFile.processing_id holds the processed blob path when the upload succeeded
+                processed_file = query.filter(ProcessedFile.processing_id == processing_id).first() or \
+                    query.filter(ProcessedFile.processed_blob_path == processing_id).first()
+            if not source and not processed_file:
+                return None
+            return {
+                "tenant_id": source.tenant_id if source else processed_file.tenant_id,
+                "filename": source.filename if source else processed_file.filename,
+                "processed_blob_path": processed_file.processed_blob_path if processed_file else None,
+                "source_blob_path": source.blob_path if source else processed_file.source_blob_path,
+                "content_type": source.content_type if source else None
+            }
+        except Exception as e:
+            logger.error(f"Failed to locate result {processing_id}: {e}")
+            return None
+        finally:
+            session.close()
+
+
+# Create singleton instance
+result_store_service = ResultStoreService()
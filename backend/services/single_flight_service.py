@@ -0,0 +1,189 @@
+"""
+Redis-backed single-flight coordination for concurrent uploads of the same file.
+
+The first upload of a (tenant, SHA-256) pair takes a short-lived lock and runs the
+full OCR/LLM pipeline. Identical uploads that arrive while it is still in flight
+attach to the owner's task/processing ID instead of spawning duplicate work. Synchronous
+owners publish a receipt under their own token for followers waiting on the same lock.
+"""
+import json
+import logging
+import os
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from core.celery_app import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Compare-and-delete so an owner never releases a lock it no longer holds
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+else
+    return 0
+end
+"""
+
+
+class SingleFlightService:
+    """Service for collapsing concurrent processing of identical files."""
+
+    LOCK_PREFIX = "singleflight:lock"
+    RESULT_PREFIX = "singleflight:result"
+
+    def __init__(self):
+        # Lock must outlive the Celery hard time limit (300s) so followers keep attaching
+        self.lock_ttl = int(os.getenv("SINGLE_FLIGHT_LOCK_TTL_SECONDS", "330"))
+        # Completed results stay around briefly for late followers of synchronous uploads
+        self.result_ttl = int(os.getenv("SINGLE_FLIGHT_RESULT_TTL_SECONDS", "120"))
+
+    def _lock_key(self, tenant_id: str, file_hash: str) -> str:
+        return f"{self.LOCK_PREFIX}:{tenant_id}:{file_hash}"
+
+    def _result_key(self, tenant_id: str, file_hash: str, token: str) -> str:
+        # Keyed by the owner token so followers never pick up an earlier owner's result
+        return f"{self.RESULT_PREFIX}:{tenant_id}:{file_hash}:{token}"
+
+    def acquire(self, tenant_id: str, file_hash: str, owner: Dict[str, Any]) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Try to become the single in-flight processor for a file.
+
+        Args:
+            tenant_id: Tenant identifier
+            file_hash: SHA-256 hex digest of the file content
+            owner: Owner info stored in the lock; must contain a unique "token"
+                (the Celery task ID or processing ID) used for release
+
+        Returns:
+            (True, None) if the lock was acquired (or Redis is unavailable, so the
+            caller should process normally), otherwise (False, existing_owner_info)
+        """
+        client = get_redis_client()
+        if client is None:
+            return True, None
+
+        key = self._lock_key(tenant_id, file_hash)
+        try:
+            if client.set(key, json.dumps(owner), nx=True, ex=self.lock_ttl):
+                logger.info(f"[SINGLE-FLIGHT] Acquired lock for hash {file_hash[:16]}... (token: {owner.get('token')})")
+                self._clear_result(client, tenant_id, file_hash, owner.get("token"))
+                return True, None
+
+            existing = client.get(key)
+            if existing is None:
+                # Owner released between SET and GET - retry once
+                if client.set(key, json.dumps(owner), nx=True, ex=self.lock_ttl):
+                    self._clear_result(client, tenant_id, file_hash, owner.get("token"))
+                    return True, None
+                existing = client.get(key)
+
+            existing_owner = json.loads(existing) if existing else None
+            if existing_owner:
+                logger.info(f"[SINGLE-FLIGHT] Hash {file_hash[:16]}... already in flight (token: {existing_owner.get('token')}) - attaching")
+                return False, existing_owner
+            return True, None
+        except Exception as e:
+            logger.warning(f"[SINGLE-FLIGHT] Lock acquisition failed, processing without dedup: {e}")
+            return True, None
+
+    def _clear_result(self, client, tenant_id: str, file_hash: str, token: Optional[str]):
+        """Drop a result left under this token by an earlier run (e.g. a retried request)."""
+        if token:
+            client.delete(self._result_key(tenant_id, file_hash, token))
+
+    def release(self, tenant_id: str, file_hash: str, token: str) -> bool:
+        """
+        Release the lock if it is still held by the given token.
+
+        Args:
+            tenant_id: Tenant identifier
+            file_hash: SHA-256 hex digest of the file content
+            token: Owner token passed in acquire()
+
+        Returns:
+            True if the lock was released, False otherwise
+        """
+        client = get_redis_client()
+        if client is None:
+            return False
+
+        try:
+            lock_value = client.get(self._lock_key(tenant_id, file_hash))
+            if not lock_value or json.loads(lock_value).get("token") != token:
+                return False
+            released = client.eval(_RELEASE_SCRIPT, 1, self._lock_key(tenant_id, file_hash), lock_value)
+            if released:
+                logger.info(f"[SINGLE-FLIGHT] Released lock for hash {file_hash[:16]}...")
+            return bool(released)
+        except Exception as e:
+            logger.warning(f"[SINGLE-FLIGHT] Failed to release lock for hash {file_hash[:16]}...: {e}")
+            return False
+
+    def publish_result(self, tenant_id: str, file_hash: str, token: str, result: Dict[str, Any]) -> bool:
+        """
+        Store the owner's result so followers attached to its token can reuse it.
+
+        Args:
+            tenant_id: Tenant identifier
+            file_hash: SHA-256 hex digest of the file content
+            token: Owner token passed in acquire()
+            result: JSON-serializable result; publish a receipt, not the full payload
+
+        Returns:
+            True if stored, False otherwise
+        """
+        client = get_redis_client()
+        if client is None:
+            return False
+
+        try:
+            client.set(self._result_key(tenant_id, file_hash, token), json.dumps(result, default=str), ex=self.result_ttl)
+            return True
+        except Exception as e:
+            logger.warning(f"[SINGLE-FLIGHT] Failed to publish result for hash {file_hash[:16]}...: {e}")
+            return False
+
+    def wait_for_result(self, tenant_id: str, file_hash: str, token: str, timeout: Optional[float] = None,
+                        poll_interval: float = 1.0) -> Optional[Dict[str, Any]]:
+        """
+        Block until the in-flight owner publishes its result or gives up the lock.
+
+        Intended for synchronous callers; run it in a thread from async code.
+
+        Args:
+            tenant_id: Tenant identifier
+            file_hash: SHA-256 hex digest of the file content
+            token: Token of the owner returned by acquire()
+            timeout: Maximum seconds to wait (defaults to the lock TTL)
+            poll_interval: Seconds between checks
+
+        Returns:
+            The published result, or None if the owner finished without publishing
+            one (failure) or the timeout was reached
+        """
+        client = get_redis_client()
+        if client is None:
+            return None
+
+        deadline = time.monotonic() + (timeout if timeout is not None else self.lock_ttl)
+        result_key = self._result_key(tenant_id, file_hash, token)
+        lock_key = self._lock_key(tenant_id, file_hash)
+        try:
+            while time.monotonic() < deadline:
+                published = client.get(result_key)
+                if published:
+                    return json.loads(published)
+                lock_value = client.get(lock_key)
+                if not lock_value or json.loads(lock_value).get("token") != token:
+                    # Owner finished; one last look for a result written just before release
+                    published = client.get(result_key)
+                    return json.loads(published) if published else None
+                time.sleep(poll_interval)
+        except Exception as e:
+            logger.warning(f"[SINGLE-FLIGHT] Error while waiting for result of hash {file_hash[:16]}...: {e}")
+        return None
+
+
+# Create singleton instance
+single_flight_service = SingleFlightService()
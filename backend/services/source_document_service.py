@@ -0,0 +1,70 @@
+"""
+Service for the source document manifest (where each uploaded source file lives).
+"""
+import logging
+from datetime import datetime
+from typing import Optional
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from models.database import SessionLocal, SourceDocument
+
+logger = logging.getLogger(__name__)
+
+class SourceDocumentService:
+    """Service for recording source document locations (looked up by result_store_service.locate_result)."""
+
+    def record_upload(
+        self,
+        processing_id: str,
+        tenant_id: str,
+        filename: str,
+        blob_path: str,
+        confidence_folder: str,
+        content_type: Optional[str] = None,
+        size_bytes: Optional[int] = None
+    ) -> bool:
+        """
+        Record (or update) the location of an uploaded source document.
+
+        Args:
+            processing_id: Processing ID of the document
+            tenant_id: Tenant identifier
+            filename: Original filename
+            blob_path: Full blob path of the source file
+            confidence_folder: Confidence folder the file was written to
+            content_type: MIME type of the file
+            size_bytes: File size
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        session = SessionLocal()
+        try:
+            values = {
+                "processing_id": processing_id,
+                "tenant_id": tenant_id,
+                "filename": filename,
+                "blob_path": blob_path,
+                "confidence_folder": confidence_folder,
+                "content_type": content_type,
+                "size_bytes": size_bytes,
+                "created_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow()
+            }
+            stmt = pg_insert(SourceDocument).values(**values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["processing_id"],
+                set_={key: stmt.excluded[key] for key in ("blob_path", "confidence_folder", "updated_at")}
+            )
+            session.execute(stmt)
+            session.commit()
+            return True
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to record source document {blob_path}: {e}")
+            return False
+        finally:
+            session.close()
+
+
+# Create singleton instance
+source_document_service = SourceDocumentService()
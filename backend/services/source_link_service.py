@@ -0,0 +1,157 @@
+"""
+Source <-> processed file linkage.
+
+The source blob path of a processed JSON file is persisted at processing time, in
+ProcessedFile.source_blob_path (looked up by the indexed processed_blob_path) and in the
+processed blob's metadata. This service answers lookups and backfills the link for
+processed blobs written before it existed.
+"""
+import logging
+from typing import Dict, Any, List, Optional
+
+from models.database import SessionLocal, ProcessedFile
+from services.azure_blob_service import (
+    LISTING_PREFIXES, SOURCE_LINK_METADATA_KEY, source_link_metadata, source_path_from_metadata,
+    parse_processed_blob_name, SourceFileMatcher
+)
+
+logger = logging.getLogger(__name__)
+
+# Folders holding processed JSON blobs
+PROCESSED_PREFIXES = [prefix for prefix in LISTING_PREFIXES if prefix.endswith("processed/")]
+
+
+class SourceLinkService:
+    """Service for looking up and backfilling source file links of processed files."""
+
+    def lookup_source(self, processed_blob_path: str) -> Optional[str]:
+        """
+        Look up the source blob of a processed file in the database.
+
+        Args:
+            processed_blob_path: Full blob path of the processed JSON file
+
+        Returns:
+            Source blob path, or None if not recorded
+        """
+        session = SessionLocal()
+        try:
+            row = session.query(ProcessedFile.source_blob_path).filter(
+                ProcessedFile.processed_blob_path == processed_blob_path,
+                ProcessedFile.source_blob_path.isnot(None)
+            ).first()
+            return row.source_blob_path if row else None
+        except Exception as e:
+            logger.warning(f"Failed to look up source link for {processed_blob_path}: {e}")
+            return None
+        finally:
+            session.close()
+
+    def _load_links(self) -> Dict[str, str]:
+        """Load all recorded processed -> source links."""
+        session = SessionLocal()
+        try:
+            rows = session.query(ProcessedFile.processed_blob_path, ProcessedFile.source_blob_path).filter(
+                ProcessedFile.processed_blob_path.isnot(None),
+                ProcessedFile.source_blob_path.isnot(None)
+            ).all()
+            return {row.processed_blob_path: row.source_blob_path for row in rows}
+        finally:
+            session.close()
+
+    def _save_links(self, links: Dict[str, str]) -> int:
+        """Fill in ProcessedFile.source_blob_path where it is missing."""
+        if not links:
+            return 0
+        session = SessionLocal()
+        try:
+            updated = 0
+            for processed_blob_path, source_blob_path in links.items():
+                updated += session.query(ProcessedFile).filter(
+                    ProcessedFile.processed_blob_path == processed_blob_path,
+                    ProcessedFile.source_blob_path.is_(None)
+                ).update({"source_blob_path": source_blob_path}, synchronize_session=False)
+            session.commit()
+            return updated
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to save source links: {e}")
+            return 0
+        finally:
+            session.close()
+
+    @staticmethod
+    def _match_legacy_source(processed_blob_path: str, container_client,
+                             listing_cache: Dict[str, List[str]]) -> Optional[str]:
+        """Find a source file by processed filename, listing each source folder only once."""
+        parsed = parse_processed_blob_name(processed_blob_path)
+        if not parsed:
+            return None
+
+        for prefix in parsed["search_prefixes"]:
+            if prefix not in listing_cache:
+                listing_cache[prefix] = [blob.name for blob in container_client.list_blobs(name_starts_with=prefix)]
+            matcher = SourceFileMatcher(parsed["base_filename"], parsed["timestamp"])
+            for blob_name in listing_cache[prefix]:
+                if matcher.check(blob_name):
+                    break
+            if matcher.best_match:
+                return matcher.best_match
+        return None
+
+    def backfill(self, container_client, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Persist source links for processed blobs written before links were recorded.
+
+        Uses the ProcessedFile row when it has a source path, otherwise falls back to the
+        filename matching used by older versions. Links are written to the processed blob's
+        metadata and to ProcessedFile rows missing a source path.
+
+        Args:
+            container_client: ContainerClient of the blob container
+            dry_run: Only count what would be linked
+
+        Returns:
+            Dict with processed_blobs, already_linked, linked and unmatched counts
+        """
+        known_links = self._load_links()
+        listing_cache = {}
+        db_links = {}
+        stats = {"processed_blobs": 0, "already_linked": 0, "linked": 0, "unmatched": 0}
+
+        for prefix in PROCESSED_PREFIXES:
+            for blob in container_client.list_blobs(name_starts_with=prefix, include=["metadata"]):
+                stats["processed_blobs"] += 1
+                source_blob_path = source_path_from_metadata(blob.metadata)
+                if source_blob_path:
+                    stats["already_linked"] += 1
+                    if blob.name not in known_links:
+                        db_links[blob.name] = source_blob_path
+                    continue
+
+                source_blob_path = known_links.get(blob.name) or self._match_legacy_source(
+                    blob.name, container_client, listing_cache
+                )
+                if not source_blob_path:
+                    stats["unmatched"] += 1
+                    continue
+
+                stats["linked"] += 1
+                if dry_run:
+                    continue
+                try:
+                    metadata = dict(blob.metadata or {})
+                    metadata.update(source_link_metadata(source_blob_path))
+                    container_client.get_blob_client(blob.name).set_blob_metadata(metadata)
+                except Exception as e:
+                    logger.warning(f"Failed to set {SOURCE_LINK_METADATA_KEY} metadata on {blob.name}: {e}")
+                if blob.name not in known_links:
+                    db_links[blob.name] = source_blob_path
+
+        stats["db_rows_updated"] = 0 if dry_run else self._save_links(db_links)
+        logger.info(f"Source link backfill{' (dry run)' if dry_run else ''}: {stats}")
+        return stats
+
+
+# Create singleton instance
+source_link_service = SourceLinkService()
@@ -0,0 +1,139 @@
+"""
+Task progress events over Redis pub/sub.
+
+Celery tasks publish their state transitions to a per-tenant channel; the API fans them
+out to clients over Server-Sent Events. Clients that cannot stream fall back to
+batch status lookups that read all Celery result keys with pipelined MGETs.
+"""
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional, AsyncIterator
+
+from core.celery_app import REDIS_URL, get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Key prefix used by Celery's Redis result backend
+CELERY_RESULT_KEY_PREFIX = "celery-task-meta-"
+
+
+class TaskEventsService:
+    """Service for publishing and streaming task progress events."""
+
+    CHANNEL_PREFIX = "task-events"
+    MGET_CHUNK_SIZE = 500
+
+    def __init__(self):
+        self._async_client = None
+
+    def _channel(self, tenant_id: str) -> str:
+        return f"{self.CHANNEL_PREFIX}:{tenant_id}"
+
+    def _get_async_client(self):
+        """Get the API process's asyncio Redis client (created lazily)."""
+        if self._async_client is None:
+            import redis.asyncio as aioredis
+            self._async_client = aioredis.Redis.from_url(
+                REDIS_URL,
+                socket_connect_timeout=5,
+                decode_responses=True
+            )
+        return self._async_client
+
+    def publish(self, tenant_id: Optional[str], task_id: str, state: str,
+                meta: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Publish a task state transition to the tenant's channel (called from Celery workers).
+
+        Args:
+            tenant_id: Tenant the task belongs to
+            task_id: Celery task ID
+            state: Task state (PROCESSING, SUCCESS, FAILURE, ...)
+            meta: Small progress payload (message, step, filename, error)
+
+        Returns:
+            True if published, False otherwise
+        """
+        if not tenant_id:
+            return False
+        client = get_redis_client()
+        if client is None:
+            return False
+
+        try:
+            client.publish(self._channel(tenant_id), json.dumps({
+                "task_id": task_id,
+                "state": state,
+                "meta": meta or {},
+                "timestamp": datetime.utcnow().isoformat()
+            }, default=str))
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to publish task event for {task_id}: {e}")
+            return False
+
+    async def stream(self, tenant_id: str, task_ids: Optional[set] = None,
+                     heartbeat_seconds: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Subscribe to a tenant's task events.
+
+        Args:
+            tenant_id: Tenant to stream events for
+            task_ids: Only yield events for these task IDs (all tasks if None)
+            heartbeat_seconds: Yield None after this long without events so callers can send keep-alives
+
+        Yields:
+            Event dicts, or None as a heartbeat
+        """
+        pubsub = self._get_async_client().pubsub()
+        await pubsub.subscribe(self._channel(tenant_id))
+        try:
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat_seconds)
+                if message is None:
+                    yield None
+                    continue
+                try:
+                    event = json.loads(message["data"])
+                except (TypeError, ValueError):
+                    continue
+                if task_ids and event.get("task_id") not in task_ids:
+                    continue
+                yield event
+        finally:
+            await pubsub.unsubscribe(self._channel(tenant_id))
+            close = getattr(pubsub, "aclose", None) or pubsub.close
+            await close()
+
+    async def get_task_metas(self, task_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Read Celery result metadata for many tasks in one pipelined round trip.
+
+        Args:
+            task_ids: Celery task IDs
+
+        Returns:
+            Dict of task_id -> stored meta ({"status", "result", ...}), or None if no result is
+            stored yet (PENDING)
+        """
+        client = self._get_async_client()
+        async with client.pipeline(transaction=False) as pipe:
+            for start in range(0, len(task_ids), self.MGET_CHUNK_SIZE):
+                chunk = task_ids[start:start + self.MGET_CHUNK_SIZE]
+                pipe.mget([f"{CELERY_RESULT_KEY_PREFIX}{task_id}" for task_id in chunk])
+            chunks = await pipe.execute()
+
+        metas = {}
+        raw_values = [value for chunk in chunks for value in chunk]
+        for task_id, raw in zip(task_ids, raw_values):
+            try:
+                metas[task_id] = json.loads(raw) if raw else None
+            except ValueError:
+                logger.warning(f"Unreadable result metadata for task {task_id}")
+                metas[task_id] = None
+        return metas
+
+
+# Create singleton instance
+task_events_service = TaskEventsService()
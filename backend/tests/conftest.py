@@ -0,0 +1,105 @@
+"""
+Shared pytest fixtures.
+
+Tests import the application packages the way the API does (from services..., from utility...),
+so the backend directory is put on sys.path. Modules whose third-party dependencies are not
+installed are skipped with pytest.importorskip.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeRedis:
+    """In-memory stand-in for the subset of the redis-py API used by the services (decode_responses=True)."""
+
+    def __init__(self):
+        self.data = {}
+
+    # Strings
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def eval(self, script, numkeys, *keys_and_args):
+        # Only the compare-and-delete lock release script is used
+        key, expected = keys_and_args[0], keys_and_args[numkeys]
+        if self.data.get(key) == expected:
+            return self.delete(key)
+        return 0
+
+    # Sorted sets
+    def zadd(self, key, mapping):
+        zset = self.data.setdefault(key, {})
+        added = sum(1 for member in mapping if member not in zset)
+        zset.update(mapping)
+        return added
+
+    def zcard(self, key):
+        return len(self.data.get(key, {}))
+
+    def zrem(self, key, *members):
+        zset = self.data.get(key, {})
+        return sum(1 for member in members if zset.pop(member, None) is not None)
+
+    def zremrangebyscore(self, key, min_score, max_score):
+        zset = self.data.get(key, {})
+        low, high = float(min_score), float(max_score)
+        stale = [member for member, score in zset.items() if low <= score <= high]
+        for member in stale:
+            del zset[member]
+        return len(stale)
+
+    # Lists
+    def rpush(self, key, *values):
+        items = self.data.setdefault(key, [])
+        items.extend(values)
+        return len(items)
+
+    def lpush(self, key, *values):
+        items = self.data.setdefault(key, [])
+        for value in values:
+            items.insert(0, value)
+        return len(items)
+
+    def lpop(self, key):
+        items = self.data.get(key)
+        return items.pop(0) if items else None
+
+    def llen(self, key):
+        return len(self.data.get(key, []))
+
+    # Sets
+    def sadd(self, key, *members):
+        members_set = self.data.setdefault(key, set())
+        added = len(set(members) - members_set)
+        members_set.update(members)
+        return added
+
+    def srem(self, key, *members):
+        members_set = self.data.get(key, set())
+        removed = len(set(members) & members_set)
+        members_set.difference_update(members)
+        return removed
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
@@ -0,0 +1,35 @@
+import pytest
+
+from utility.byte_range import RangeNotSatisfiableError, parse_range_header
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=999-999", (999, 999)),
+])
+def test_satisfiable_ranges(header, expected):
+    assert parse_range_header(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [
+    None,
+    "",
+    "items=0-10",
+    "bytes=0-10,20-30",
+    "bytes=abc-",
+    "bytes=5-3",
+])
+def test_ignored_ranges_serve_whole_file(header):
+    assert parse_range_header(header, 1000) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=2000-3000"])
+def test_range_beyond_end_is_not_satisfiable(header):
+    with pytest.raises(RangeNotSatisfiableError) as exc_info:
+        parse_range_header(header, 1000)
+
+    assert exc_info.value.size == 1000
@@ -0,0 +1,94 @@
+import pytest
+
+pytest.importorskip("celery")
+pytest.importorskip("redis")
+pytest.importorskip("dotenv")
+
+from services import fair_scheduler as fair_scheduler_module  # noqa: E402
+from services.fair_scheduler import LANE_BULK, LANE_INTERACTIVE, FairScheduler  # noqa: E402
+
+
+@pytest.fixture
+def sent(monkeypatch, fake_redis):
+    calls = []
+    monkeypatch.setattr(fair_scheduler_module, "get_redis_client", lambda: fake_redis)
+    monkeypatch.setattr(
+        fair_scheduler_module.celery_app, "send_task",
+        lambda task_name, kwargs, task_id, queue, priority: calls.append((task_id, priority))
+    )
+    return calls
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.setenv("BULK_MAX_INFLIGHT", "0")
+    return FairScheduler()
+
+
+def queue_jobs(scheduler, tenant_id, count):
+    for index in range(count):
+        scheduler.submit("process_document", f"{tenant_id}-{index}", {}, tenant_id, LANE_BULK)
+
+
+def test_interactive_is_sent_directly(scheduler, sent):
+    scheduler.submit("process_document", "task-1", {}, "tenant_a", LANE_INTERACTIVE)
+
+    assert sent == [("task-1", 0)]
+
+
+def test_bulk_dispatch_round_robins_tenants(scheduler, sent):
+    queue_jobs(scheduler, "tenant_a", 3)
+    queue_jobs(scheduler, "tenant_b", 3)
+    assert sent == []
+
+    scheduler.bulk_max_inflight = 4
+    assert scheduler.dispatch() == 4
+
+    assert [task_id for task_id, _ in sent] == ["tenant_a-0", "tenant_b-0", "tenant_a-1", "tenant_b-1"]
+    assert {priority for _, priority in sent} == {9}
+
+
+def test_next_pass_starts_with_next_tenant(scheduler, sent):
+    queue_jobs(scheduler, "tenant_a", 2)
+    queue_jobs(scheduler, "tenant_b", 2)
+    scheduler.bulk_max_inflight = 1
+    scheduler.dispatch()
+
+    scheduler.task_finished("tenant_a-0", "tenant_a")
+
+    assert [task_id for task_id, _ in sent] == ["tenant_a-0", "tenant_b-0"]
+
+
+def test_tenant_weights(scheduler, sent):
+    scheduler.tenant_weights = {"tenant_a": 2}
+    queue_jobs(scheduler, "tenant_a", 4)
+    queue_jobs(scheduler, "tenant_b", 4)
+
+    scheduler.bulk_max_inflight = 6
+    scheduler.dispatch()
+
+    assert [task_id for task_id, _ in sent] == [
+        "tenant_a-0", "tenant_a-1", "tenant_b-0", "tenant_a-2", "tenant_a-3", "tenant_b-1"
+    ]
+
+
+def test_empty_tenant_is_retired(scheduler, sent, fake_redis):
+    queue_jobs(scheduler, "tenant_a", 1)
+    queue_jobs(scheduler, "tenant_b", 3)
+
+    scheduler.bulk_max_inflight = 4
+    scheduler.dispatch()
+
+    assert [task_id for task_id, _ in sent] == ["tenant_a-0", "tenant_b-0", "tenant_b-1", "tenant_b-2"]
+    assert fake_redis.smembers(FairScheduler.TENANTS_KEY) == {"tenant_b"}
+
+
+def test_admission_quota(scheduler, sent):
+    scheduler.lane_quotas[LANE_BULK] = 2
+    queue_jobs(scheduler, "tenant_a", 2)
+
+    assert scheduler.check_admission("tenant_a", LANE_BULK) == (False, scheduler.retry_after_seconds)
+    assert scheduler.check_admission("tenant_b", LANE_BULK) == (True, 0)
+
+    scheduler.task_finished("tenant_a-0", "tenant_a")
+    assert scheduler.check_admission("tenant_a", LANE_BULK) == (True, 0)
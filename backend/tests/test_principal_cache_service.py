@@ -0,0 +1,96 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("psycopg2")
+pytest.importorskip("asyncpg")
+pytest.importorskip("celery")
+pytest.importorskip("redis")
+pytest.importorskip("dotenv")
+
+from services import principal_cache_service as principal_cache_module  # noqa: E402
+from services.principal_cache_service import PrincipalCacheService  # noqa: E402
+
+
+def principal(username):
+    return {
+        "id": 1, "username": username, "email": f"{username}@example.com", "is_active": True,
+        "is_admin": False, "created_at": datetime(2024, 1, 1, 9, 0), "last_login": None
+    }
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(principal_cache_module.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def service(monkeypatch, fake_redis):
+    monkeypatch.setenv("PRINCIPAL_CACHE_TTL_SECONDS", "30")
+    monkeypatch.setenv("PRINCIPAL_CACHE_SIZE", "2")
+    monkeypatch.setenv("PRINCIPAL_CACHE_REDIS", "true")
+    monkeypatch.setattr(principal_cache_module, "get_redis_client", lambda: fake_redis)
+    return PrincipalCacheService()
+
+
+def test_invalidate_drops_local_entry(service, clock):
+    service.put("alice", principal("alice"))
+    service.put("bob", principal("bob"))
+
+    service.invalidate("alice", None)
+
+    assert service.get("alice") is None
+    assert service.get("bob") == principal("bob")
+
+
+def test_invalidate_drops_shared_entry(service, clock, fake_redis):
+    service.put_shared("alice", principal("alice"))
+    assert service.get_shared("alice") == principal("alice")
+
+    service.invalidate("alice")
+
+    assert service.get("alice") is None
+    assert service.get_shared("alice") is None
+    assert fake_redis.data == {}
+
+
+def test_entry_expires_after_ttl(service, clock):
+    service.put("alice", principal("alice"))
+
+    clock.now += 29
+    assert service.get("alice") == principal("alice")
+
+    clock.now += 2
+    assert service.get("alice") is None
+
+
+def test_least_recently_used_entry_is_evicted(service, clock):
+    service.put("alice", principal("alice"))
+    service.put("bob", principal("bob"))
+    service.get("alice")
+
+    service.put("carol", principal("carol"))
+
+    assert service.get("bob") is None
+    assert service.get("alice") is not None
+    assert service.get("carol") is not None
+
+
+def test_disabled_cache(monkeypatch):
+    monkeypatch.setenv("PRINCIPAL_CACHE_TTL_SECONDS", "0")
+    service = PrincipalCacheService()
+
+    service.put("alice", principal("alice"))
+
+    assert service.get("alice") is None
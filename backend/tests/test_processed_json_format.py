@@ -0,0 +1,103 @@
+import gzip
+import json
+
+import pytest
+
+from services.processed_json_format import (
+    DETAIL_BLOB_KEY,
+    compact_metadata,
+    decode_processed_json,
+    detail_blob_path,
+    encode_for_metadata,
+    encode_processed_json,
+    merge_processed_json,
+    split_processed_json,
+)
+
+
+def full_result():
+    return {
+        "file_name": "invoice.pdf",
+        "key_value_pairs": {"Total": "12.50"},
+        "raw_ocr_results": [{"page": 1, "words": [{"text": "Total"}]}],
+        "raw_ocr_text": "Total 12.50",
+        "low_confidence_data": {"fields": ["Total"], "source_file_base64": "JVBERi0x"},
+    }
+
+
+def test_split_moves_ocr_detail_out_of_summary():
+    summary, detail = split_processed_json(full_result())
+
+    assert summary == {
+        "file_name": "invoice.pdf",
+        "key_value_pairs": {"Total": "12.50"},
+        "low_confidence_data": {"fields": ["Total"]},
+    }
+    assert detail == {
+        "raw_ocr_results": [{"page": 1, "words": [{"text": "Total"}]}],
+        "raw_ocr_text": "Total 12.50",
+        "low_confidence_data": {"source_file_base64": "JVBERi0x"},
+    }
+
+
+def test_split_without_detail_fields():
+    summary, detail = split_processed_json({"key_value_pairs": {}, "low_confidence_data": {"fields": []}})
+
+    assert summary == {"key_value_pairs": {}, "low_confidence_data": {"fields": []}}
+    assert detail == {}
+
+
+def test_merge_restores_split_result():
+    summary, detail = split_processed_json(full_result())
+    summary[DETAIL_BLOB_KEY] = "main/processed-detail/tenant_1/invoice.json"
+
+    assert merge_processed_json(summary, detail) == full_result()
+
+
+def test_merge_without_detail_drops_pointer():
+    summary = {"key_value_pairs": {"Total": "12.50"}, DETAIL_BLOB_KEY: "processed-detail/x.json"}
+
+    assert merge_processed_json(summary, None) == {"key_value_pairs": {"Total": "12.50"}}
+
+
+@pytest.mark.parametrize("compact", [True, False])
+def test_encode_decode_round_trip(compact):
+    data = {"key_value_pairs": {"Name": "Zoë"}, "confidence": 0.93}
+
+    encoded = encode_processed_json(data, compact=compact)
+
+    assert (encoded[:2] == b"\x1f\x8b") is compact
+    assert decode_processed_json(encoded) == data
+
+
+def test_decode_legacy_json():
+    assert decode_processed_json(json.dumps({"a": 1}).encode("utf-8")) == {"a": 1}
+
+
+def test_decode_rejects_corrupt_gzip():
+    corrupt = gzip.compress(b'{"a": 1}')[:-6]
+
+    with pytest.raises(ValueError):
+        decode_processed_json(corrupt)
+
+
+def test_encode_for_metadata_keeps_blob_format():
+    result = full_result()
+    result[DETAIL_BLOB_KEY] = "processed-detail/invoice.json"
+
+    legacy_data, legacy_encoding = encode_for_metadata(result, {})
+    compact_data, compact_encoding = encode_for_metadata(result, compact_metadata(None))
+
+    assert legacy_encoding is None
+    assert json.loads(legacy_data) == result
+    assert compact_encoding == "gzip"
+    assert "raw_ocr_results" not in decode_processed_json(compact_data)
+
+
+@pytest.mark.parametrize("blob_path, expected", [
+    ("main/invoices/processed/tenant_1/a.json", "main/invoices/processed-detail/tenant_1/a.json"),
+    ("processed/tenant_1/a.json", "processed-detail/tenant_1/a.json"),
+    ("other/a.json", "other/a.json.detail"),
+])
+def test_detail_blob_path(blob_path, expected):
+    assert detail_blob_path(blob_path) == expected
@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("psycopg2")
+pytest.importorskip("asyncpg")
+pytest.importorskip("celery")
+pytest.importorskip("redis")
+pytest.importorskip("dotenv")
+
+from services import processed_result_service as processed_result_module  # noqa: E402
+from services.processed_result_service import _PATCH_STATEMENT, ProcessedResultService  # noqa: E402
+
+BLOB_PATH = "main/invoices/processed/tenant_1/invoice.json"
+
+
+class FakeSession:
+    """Session whose UPDATE ... RETURNING yields a fixed version (None when no row matched)."""
+
+    def __init__(self, returned_version):
+        self.returned_version = returned_version
+        self.params = None
+        self.committed = False
+        self.closed = False
+
+    def execute(self, statement, params):
+        self.params = params
+        return SimpleNamespace(scalar=lambda: self.returned_version)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def patch_env(monkeypatch):
+    """Install a fake session and current row; returns (service, session holder, snapshot calls)."""
+    state = {"session": None, "row": None}
+    snapshots = []
+    monkeypatch.setattr(processed_result_module, "SessionLocal", lambda: state["session"])
+    monkeypatch.setattr(ProcessedResultService, "_find_row",
+                        staticmethod(lambda session, processed_blob_path, *columns: state["row"]))
+    service = ProcessedResultService()
+    monkeypatch.setattr(service, "schedule_snapshot", snapshots.append)
+    return service, state, snapshots
+
+
+def test_statement_checks_expected_version():
+    sql = str(_PATCH_STATEMENT)
+
+    assert "CAST(:expected_version AS integer) IS NULL OR version = CAST(:expected_version AS integer)" in sql
+    assert "version = version + 1" in sql
+    assert "RETURNING version" in sql
+
+
+def test_patch_applied(patch_env):
+    service, state, snapshots = patch_env
+    state["session"] = FakeSession(returned_version=4)
+
+    result = service.patch_fields(BLOB_PATH, {"updated_key_value_pairs": {"Total": "13.00"}}, "alice", expected_version=3)
+
+    assert result == {"status": "updated", "version": 4}
+    assert state["session"].params["expected_version"] == 3
+    assert state["session"].params["key_value_pairs"] == '{"Total": "13.00"}'
+    assert state["session"].params["correction_metadata"] == "{}"
+    assert snapshots == [BLOB_PATH]
+
+
+def test_stale_version_is_a_conflict(patch_env):
+    service, state, snapshots = patch_env
+    state["session"] = FakeSession(returned_version=None)
+    state["row"] = SimpleNamespace(version=5)
+
+    result = service.patch_fields(BLOB_PATH, {"updated_key_value_pairs": {"Total": "13.00"}}, "alice", expected_version=3)
+
+    assert result == {"status": "conflict", "version": 5}
+    assert snapshots == []
+    assert state["session"].closed
+
+
+def test_missing_row_is_not_found(patch_env):
+    service, state, snapshots = patch_env
+    state["session"] = FakeSession(returned_version=None)
+
+    assert service.patch_fields(BLOB_PATH, {}, "alice") == {"status": "not_found"}
@@ -0,0 +1,30 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("psycopg2")
+pytest.importorskip("asyncpg")
+pytest.importorskip("dotenv")
+
+from services.processing_history_service import decode_cursor, encode_cursor  # noqa: E402
+
+
+@pytest.mark.parametrize("processed_at", [
+    datetime(2024, 3, 1, 12, 30, 15, 123456),
+    datetime(2024, 3, 1, 12, 30, 15, tzinfo=timezone.utc),
+])
+def test_cursor_round_trip(processed_at):
+    entry = SimpleNamespace(processed_at=processed_at, id=42)
+
+    cursor = encode_cursor(entry)
+
+    assert decode_cursor(cursor) == (processed_at, 42)
+    assert "/" not in cursor and "+" not in cursor
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "W10=", "WyJ4IiwgMV0="])
+def test_malformed_cursor(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
@@ -0,0 +1,80 @@
+import pytest
+
+pytest.importorskip("celery")
+pytest.importorskip("redis")
+pytest.importorskip("dotenv")
+
+from services import single_flight_service as single_flight_module  # noqa: E402
+from services.single_flight_service import SingleFlightService  # noqa: E402
+
+TENANT = "tenant_1"
+FILE_HASH = "ab" * 32
+
+
+@pytest.fixture
+def service(monkeypatch, fake_redis):
+    monkeypatch.setattr(single_flight_module, "get_redis_client", lambda: fake_redis)
+    return SingleFlightService()
+
+
+def test_follower_attaches_to_leader(service):
+    assert service.acquire(TENANT, FILE_HASH, {"token": "leader", "task_id": "task-1"}) == (True, None)
+
+    acquired, owner = service.acquire(TENANT, FILE_HASH, {"token": "follower"})
+
+    assert acquired is False
+    assert owner == {"token": "leader", "task_id": "task-1"}
+
+
+def test_other_tenant_is_not_collapsed(service):
+    service.acquire(TENANT, FILE_HASH, {"token": "leader"})
+
+    assert service.acquire("tenant_2", FILE_HASH, {"token": "other"}) == (True, None)
+
+
+def test_release_only_by_owner(service):
+    service.acquire(TENANT, FILE_HASH, {"token": "leader"})
+
+    assert service.release(TENANT, FILE_HASH, "follower") is False
+    assert service.release(TENANT, FILE_HASH, "leader") is True
+    assert service.acquire(TENANT, FILE_HASH, {"token": "next"}) == (True, None)
+
+
+def test_follower_receives_published_result(service):
+    service.acquire(TENANT, FILE_HASH, {"token": "leader"})
+    service.publish_result(TENANT, FILE_HASH, "leader", {"processing_id": "p-1"})
+    service.release(TENANT, FILE_HASH, "leader")
+
+    assert service.wait_for_result(TENANT, FILE_HASH, "leader", timeout=1, poll_interval=0) == {"processing_id": "p-1"}
+
+
+def test_follower_stops_waiting_when_leader_fails(service):
+    service.acquire(TENANT, FILE_HASH, {"token": "leader"})
+    service.release(TENANT, FILE_HASH, "leader")
+
+    assert service.wait_for_result(TENANT, FILE_HASH, "leader", timeout=1, poll_interval=0) is None
+
+
+def test_follower_ignores_result_of_newer_owner(service):
+    service.acquire(TENANT, FILE_HASH, {"token": "leader"})
+    service.release(TENANT, FILE_HASH, "leader")
+    service.acquire(TENANT, FILE_HASH, {"token": "second"})
+    service.publish_result(TENANT, FILE_HASH, "second", {"processing_id": "p-2"})
+
+    assert service.wait_for_result(TENANT, FILE_HASH, "leader", timeout=1, poll_interval=0) is None
+
+
+def test_acquire_clears_stale_result_of_same_token(service):
+    service.publish_result(TENANT, FILE_HASH, "leader", {"processing_id": "old"})
+
+    service.acquire(TENANT, FILE_HASH, {"token": "leader"})
+
+    assert service.wait_for_result(TENANT, FILE_HASH, "leader", timeout=0) is None
+
+
+def test_without_redis_everyone_processes(monkeypatch):
+    monkeypatch.setattr(single_flight_module, "get_redis_client", lambda: None)
+    service = SingleFlightService()
+
+    assert service.acquire(TENANT, FILE_HASH, {"token": "a"}) == (True, None)
+    assert service.acquire(TENANT, FILE_HASH, {"token": "b"}) == (True, None)
@@ -0,0 +1,51 @@
+"""
+Parsing of HTTP Range request headers for blob downloads.
+"""
+from typing import Optional, Tuple
+
+
+class RangeNotSatisfiableError(ValueError):
+    """Raised when a requested range starts beyond the end of the file (HTTP 416)."""
+
+    def __init__(self, size: int):
+        self.size = size
+        super().__init__("Requested range not satisfiable")
+
+
+def parse_range_header(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range HTTP Range header ("bytes=start-end", "bytes=start-", "bytes=-suffix").
+    
+    Returns:
+        (start, end) inclusive byte positions, or None to serve the whole file
+        
+    Raises:
+        RangeNotSatisfiableError: If the range starts beyond the end of the file
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec:
+        # Multipart ranges are not supported - serve the whole file
+        return None
+    
+    start_text, _, end_text = spec.partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            start = max(size - int(end_text), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    
+    if end_text and start_text and end < start:
+        # Invalid range (e.g. bytes=5-3) - ignored as per RFC 9110
+        return None
+    
+    end = min(end, size - 1)
+    if start >= size:
+        raise RangeNotSatisfiableError(size)
+    return start, end
@@ -1,7 +1,7 @@
 import os
 import logging
 import fitz  
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Union, BinaryIO
 from io import BytesIO
 from PIL import Image
 
@@ -198,9 +198,19 @@ class FileSizeValidator:
     """Validates file sizes."""
     
     @staticmethod
-    def validate_file_size(file_data: bytes, filename: str = "") -> bool:
+    def get_size_bytes(file_data: Union[bytes, BinaryIO]) -> int:
+        """Get the size of file bytes or of a seekable file handle (its position is kept)."""
+        if isinstance(file_data, (bytes, bytearray)):
+            return len(file_data)
+        position = file_data.tell()
+        size = file_data.seek(0, os.SEEK_END)
+        file_data.seek(position)
+        return size
+    
+    @staticmethod
+    def validate_file_size(file_data: Union[bytes, BinaryIO], filename: str = "") -> bool:
         """Validate file size is within limits."""
-        size_mb = len(file_data) / (1024 * 1024)
+        size_mb = FileSizeValidator.get_size_bytes(file_data) / (1024 * 1024)
         
         if size_mb > Config.MAX_FILE_SIZE_MB:
             logger.error(f"File {filename} size {size_mb:.2f}MB exceeds limit of {Config.MAX_FILE_SIZE_MB}MB")
@@ -210,6 +220,6 @@ class FileSizeValidator:
         return True
     
     @staticmethod
-    def get_file_size_mb(file_data: bytes) -> float:
+    def get_file_size_mb(file_data: Union[bytes, BinaryIO]) -> float:
         """Get file size in MB."""
-        return len(file_data) / (1024 * 1024)
\ No newline at end of file
+        return FileSizeValidator.get_size_bytes(file_data) / (1024 * 1024)
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""
+Fast, compressed JSON responses for large result payloads.
+
+Bodies are serialized with orjson when it is installed (falling back to the standard
+library encoder). Bodies larger than RESPONSE_COMPRESS_MIN_KB are compressed with
+Brotli, if the brotli package is installed and the client accepts br, or else with gzip.
+Encoding a multi-megabyte result is CPU-bound, so call json_response() through run_cpu
+from async code.
+"""
+import gzip
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # Optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip is used instead
+    brotli = None
+
+RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_KB", "32")) * 1024
+RESPONSE_GZIP_LEVEL = 6
+RESPONSE_BROTLI_QUALITY = 5
+
+
+def dumps_json(data: Any) -> bytes:
+    """Serialize data to UTF-8 JSON (unknown types such as datetimes become strings)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            # e.g. integers beyond 64 bits; the standard encoder handles them
+            pass
+    return json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+
+
+def _accepts(accept_encoding: Optional[str], coding: str) -> bool:
+    """Check an Accept-Encoding header for a content coding (ignoring q=0 entries)."""
+    for entry in (accept_encoding or "").lower().split(","):
+        name, _, params = entry.strip().partition(";")
+        if name.strip() in (coding, "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def compress_body(body: bytes, accept_encoding: Optional[str],
+                  min_bytes: int = RESPONSE_COMPRESS_MIN_BYTES) -> Tuple[bytes, Optional[str]]:
+    """
+    Compress a response body in the best coding the client accepts.
+
+    Returns:
+        Tuple of (body, content coding or None if left uncompressed)
+    """
+    if len(body) < min_bytes:
+        return body, None
+    if brotli is not None and _accepts(accept_encoding, "br"):
+        return brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY), "br"
+    if _accepts(accept_encoding, "gzip"):
+        return gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL), "gzip"
+    return body, None
+
+
+def json_response(data: Any, accept_encoding: Optional[str] = None, status_code: int = 200,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """Build a JSON response, compressed if it is large and the client accepts it."""
+    body, coding = compress_body(dumps_json(data), accept_encoding)
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    if coding:
+        headers["Content-Encoding"] = coding
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,199 @@
+"""
+Spooled ingestion of uploaded files.
+
+Uploads are copied chunk by chunk into a SpooledTemporaryFile, which stays in memory up to
+UPLOAD_SPOOL_MEMORY_MB and moves to disk beyond that. The SHA-256 is computed as the chunks
+arrive, and an upload is rejected as soon as it crosses the size limit, before the rest of
+it is read. Downstream stages get the hash and size up front. They read the content from
+the spool only when they need it, so duplicates and rejected files never fully enter memory.
+
+RequestSizeLimitMiddleware rejects oversized request bodies before the multipart body is
+parsed. It checks Content-Length, or counts bytes while the body is streamed. Routes that
+take a single file are held to the per-file limit (plus form overhead) instead of the
+whole-request limit of batch uploads.
+"""
+import hashlib
+import logging
+import os
+from tempfile import SpooledTemporaryFile
+from typing import Optional, BinaryIO, Dict
+
+from fastapi import UploadFile
+from starlette.responses import JSONResponse
+
+from core.executors import run_io
+from utility.config import Config
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# Per-file limit (same as FileSizeValidator)
+MAX_UPLOAD_BYTES = Config.MAX_FILE_SIZE_MB * MB
+UPLOAD_CHUNK_SIZE = MB
+UPLOAD_SPOOL_MEMORY_BYTES = int(os.getenv("UPLOAD_SPOOL_MEMORY_MB", "8")) * MB
+# Whole request limit (batch uploads carry several files)
+MAX_UPLOAD_REQUEST_BYTES = int(os.getenv("MAX_UPLOAD_REQUEST_MB", "1000")) * MB
+# Form fields and multipart framing sent along with one file
+MULTIPART_OVERHEAD_BYTES = MB
+# Routes that accept exactly one file
+SINGLE_FILE_UPLOAD_PATHS = (
+    "/api/v1/ocr/enhanced/process",
+    "/api/v1/ocr/enhanced/process/async",
+    "/api/v1/ocr/enhanced/process-with-template",
+    "/api/v1/templates/upload",
+)
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the size limit."""
+
+    def __init__(self, filename: Optional[str], limit_bytes: int):
+        self.filename = filename
+        self.limit_bytes = limit_bytes
+        super().__init__(
+            f"File {filename or 'upload'} exceeds maximum allowed size of {limit_bytes / MB:.0f}MB"
+        )
+
+
+class SpooledUpload:
+    """An uploaded file held in a spooled temporary file, with its size and SHA-256."""
+
+    def __init__(self, spool: SpooledTemporaryFile, size: int, sha256: str,
+                 filename: Optional[str], content_type: Optional[str]):
+        self._spool = spool
+        self.size = size
+        self.sha256 = sha256
+        self.filename = filename
+        self.content_type = content_type
+
+    def open(self) -> BinaryIO:
+        """Get the spooled content as a file handle positioned at the start."""
+        self._spool.seek(0)
+        return self._spool
+
+    def read_bytes(self) -> bytes:
+        """Read the whole content (blocking if the spool was moved to disk)."""
+        return self.open().read()
+
+    def close(self):
+        self._spool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _append_chunk(spool: SpooledTemporaryFile, digest, chunk: bytes):
+    digest.update(chunk)
+    spool.write(chunk)
+
+
+async def spool_upload(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> SpooledUpload:
+    """
+    Copy an uploaded file into a spooled temporary file, hashing it on the way.
+
+    Args:
+        upload: Uploaded file
+        max_bytes: Size limit of the file
+
+    Returns:
+        SpooledUpload (the caller closes it)
+
+    Raises:
+        UploadTooLargeError: As soon as the file is found to exceed max_bytes
+    """
+    declared_size = getattr(upload, "size", None)
+    if declared_size is not None and declared_size > max_bytes:
+        await upload.close()
+        raise UploadTooLargeError(upload.filename, max_bytes)
+
+    spool = SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MEMORY_BYTES)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLargeError(upload.filename, max_bytes)
+            await run_io(_append_chunk, spool, digest, chunk)
+    except Exception:
+        spool.close()
+        raise
+    finally:
+        # Release the framework's copy of the upload
+        await upload.close()
+
+    spool.seek(0)
+    return SpooledUpload(spool, size, digest.hexdigest(), upload.filename, upload.content_type)
+
+
+class RequestSizeLimitMiddleware:
+    """
+    ASGI middleware answering 413 to request bodies larger than max_bytes, or than the
+    limit of their path in path_limits (by default the single-file upload routes).
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_REQUEST_BYTES,
+                 path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        if path_limits is None:
+            path_limits = {path: MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES for path in SINGLE_FILE_UPLOAD_PATHS}
+        self.path_limits = path_limits
+
+    async def _reject(self, scope, receive, send, max_bytes: int):
+        response = JSONResponse(
+            status_code=413,
+            content={"detail": f"Request body exceeds maximum allowed size of {max_bytes / MB:.0f}MB"}
+        )
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.path_limits.get(scope.get("path", "").rstrip("/"), self.max_bytes)
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+            await self._reject(scope, receive, send, max_bytes)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # Stop the body here; the app sees a client disconnect
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if exceeded and not response_started:
+                # Replaced by the 413 response below
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not response_started:
+            logger.warning(f"Rejected request to {scope.get('path')}: body exceeds {max_bytes} bytes")
+            await self._reject(scope, receive, send, max_bytes)
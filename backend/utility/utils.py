@@ -1,7 +1,7 @@
 import asyncio
 import logging
 import time
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Union, BinaryIO
 
 from utility.config import Config, setup_logging
 from core.ocr_engines import OCREngineFactory
@@ -49,7 +49,7 @@ class MetricsCollector:
 logger = setup_logging()
 
 async def ocr_from_path(
-    file_data: bytes,
+    file_data: Union[bytes, BinaryIO],
     original_filename: str = "",
     ocr_engine: str = "azure_computer_vision",
     ground_truth: str = "",
@@ -61,7 +61,8 @@ async def ocr_from_path(
     Files are passed directly to Document Intelligence without image preprocessing.
     
     Args:
-        file_data: Raw file bytes (PDF or image)
+        file_data: Raw file bytes (PDF or image), or a file handle positioned at the start
+            (e.g. a spooled upload) so large files are not copied into memory
         original_filename: Original filename for format detection
         ocr_engine: OCR engine to use ('azure_computer_vision' or 'azure_document_intelligence')
         ground_truth: Optional ground truth text for accuracy evaluation
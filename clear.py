@@ -78,13 +78,18 @@ if problematic_blobs:
     
     if choice == "1":
         print("\nDeleting files in 'Above-95' folder...")
-        for blob_name in problematic_blobs:
+        # Blob Batch API: up to 256 deletes per request
+        for start in range(0, len(problematic_blobs), 256):
+            batch = problematic_blobs[start:start + 256]
             try:
-                blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
-                blob_client.delete_blob()
-                print(f"  ✓ Deleted: {blob_name}")
+                responses = container_client.delete_blobs(*batch, raise_on_any_failure=False)
+                for blob_name, response in zip(batch, responses):
+                    if response.status_code in (200, 202, 404):
+                        print(f"  ✓ Deleted: {blob_name}")
+                    else:
+                        print(f"  ✗ Failed to delete {blob_name}: HTTP {response.status_code}")
             except Exception as e:
-                print(f"  ✗ Failed to delete {blob_name}: {e}")
+                print(f"  ✗ Failed to delete batch starting at {batch[0]}: {e}")
         print("\n✅ Cleanup complete!")
         
     elif choice == "2":
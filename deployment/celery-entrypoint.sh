@@ -20,7 +20,7 @@ chmod 666 /app/logs/ocr_processing.log /app/backend/ocr_processing.log
 exec celery -A core.celery_app worker \
     --loglevel=info \
     --pool=prefork \
-    --concurrency=4 \
+    --concurrency=${CELERY_CONCURRENCY:-4} \
     --queues=processing \
     --uid=1000 \
     --gid=1000
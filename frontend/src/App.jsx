@@ -216,10 +216,17 @@ function App() {
         setProgress((completedCount / taskIds.length) * 100);
 
         if (completedCount === taskIds.length) {
+          // Progress polls return receipts only; fetch the full results once
+          const finalResponse = await fetch(`${API_BASE_URL}/api/v1/tasks/batch-status?include_results=true`, {
+            method: 'POST',
+            headers: { ...authService.getAuthHeaders(), 'Content-Type': 'application/json' },
+            body: JSON.stringify(taskIds)
+          });
+          const finalStatus = await finalResponse.json();
           return {
             status: 'completed',
-            batch_info: status.summary,
-            individual_results: status.tasks.map(t => t.result).filter(r => r)
+            batch_info: finalStatus.summary,
+            individual_results: finalStatus.tasks.map(t => t.result).filter(r => r)
           };
         } else {
           await new Promise(resolve => setTimeout(resolve, 1000));